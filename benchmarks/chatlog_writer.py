@@ -0,0 +1,98 @@
+"""
+Benchmark audit log: tulis sinkron (write + fsync per pesan di thread
+handler) vs ChatLogWriter (antrian + group commit di thread writer).
+
+Beberapa thread "handler" masing-masing mencatat M pesan. Yang diukur:
+  - msg/s dari sisi handler (berapa lama handler tertahan oleh logging)
+  - msg/s sampai semua record ter-fsync ke disk
+  - jumlah fsync (commit)
+
+Jalankan dari root repo:
+    PYTHONPATH=src python benchmarks/chatlog_writer.py --threads 8 --messages 2000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from app.chatlog import ChatLogWriter  # noqa: E402
+
+MESSAGE = b"halo semua, ini pesan chat biasa untuk benchmark"
+
+
+def run_threads(threads: int, work) -> float:
+    workers = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def bench_none(threads: int, messages: int):
+    def work(t):
+        for i in range(messages):
+            f"{time.time():.6f}\tlobby\tuser{t}\t".encode("utf-8") + MESSAGE + b"\n"
+    elapsed = run_threads(threads, work)
+    return elapsed, elapsed, 0
+
+
+def bench_sync(directory: str, threads: int, messages: int):
+    lock = threading.Lock()
+    f = open(os.path.join(directory, "sync.log"), "ab")
+
+    def work(t):
+        for i in range(messages):
+            record = f"{time.time():.6f}\tlobby\tuser{t}\t".encode("utf-8") + MESSAGE + b"\n"
+            with lock:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+    elapsed = run_threads(threads, work)
+    f.close()
+    return elapsed, elapsed, threads * messages
+
+
+def bench_async(directory: str, threads: int, messages: int):
+    writer = ChatLogWriter(os.path.join(directory, "async"))
+    writer.start()
+
+    def work(t):
+        for i in range(messages):
+            writer.append("lobby", f"user{t}", MESSAGE)
+    start = time.perf_counter()
+    handler_elapsed = run_threads(threads, work)
+    writer.close(timeout=60)
+    return handler_elapsed, time.perf_counter() - start, writer.commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark audit log chat")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=1000, help="Pesan per thread")
+    parser.add_argument("--dir", default=None, help="Direktori uji (default: tempdir)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(dir=args.dir)
+    total = args.threads * args.messages
+    try:
+        print(f"{'mode':>8} {'handler msg/s':>14} {'durable msg/s':>14} {'fsyncs':>8}")
+        for mode, bench in (("none", lambda: bench_none(args.threads, args.messages)),
+                            ("sync", lambda: bench_sync(directory, args.threads, args.messages)),
+                            ("async", lambda: bench_async(directory, args.threads, args.messages))):
+            handler_elapsed, durable_elapsed, fsyncs = bench()
+            durable = "-" if mode == "none" else f"{total / durable_elapsed:.0f}"
+            print(f"{mode:>8} {total / handler_elapsed:>14.0f} {durable:>14} {fsyncs:>8}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
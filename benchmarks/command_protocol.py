@@ -0,0 +1,143 @@
+"""
+Benchmark protokol perintah: teks (versi 1) vs paket biner (versi 2).
+
+Campuran pesan client -> server (sebagian besar chat dengan panjang acak,
+sisanya perintah seperti !presence, !join, !history) diukur dari sisi:
+  - byte di wire per pesan, termasuk header frame 4 byte, untuk arah
+    client -> server dan untuk pesan chat server -> client
+  - segment per chat per penerima (setiap broadcast di-chunk sendiri, 64
+    byte payload per segment) dan CPU membangun segment-segment itu;
+    biaya ini dibayar sekali per penerima, jadi paling menentukan
+  - CPU server untuk memilah satu pesan menjadi (perintah, argumen):
+    decode + strip + split "username: " + lookup tabel (teks) vs
+    unpack header + lookup opcode (biner)
+
+Jalankan dari root repo:
+    PYTHONPATH=src python benchmarks/command_protocol.py --messages 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from app.commands import (CommandCodec, OP_CHAT, OPCODE_COMMANDS, PROTOCOL_BINARY,  # noqa: E402
+                          decode_packet, encode_chat, formatted_time, is_packet)
+from protocol.framing import HEADER_SIZE as FRAME_HEADER_SIZE, encode_message  # noqa: E402
+from protocol.segment import PreparedMessage, Segment  # noqa: E402
+
+COMMANDS = {"!presence", "!join", "!leave", "!history", "!rooms", "!stats"}
+
+
+def workload(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    names = [f"user{i}" for i in range(50)]
+    words = "ok sip nanti makan siang di kantin jam berapa rapat besok pagi deploy".split()
+    inputs = []
+    for i in range(count):
+        name = rng.choice(names)
+        roll = rng.random()
+        if roll < 0.85:
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(1, 16)))
+        elif roll < 0.9:
+            text = "!presence"
+        elif roll < 0.95:
+            text = f"!join room{rng.randrange(5)}"
+        else:
+            text = f"!history {rng.randrange(10, 50)}"
+        inputs.append((name, text))
+    return inputs
+
+
+def parse_text(messages: list) -> int:
+    handled = 0
+    for message in messages:
+        text = message.decode("utf-8", errors="replace").strip()
+        if ": " in text:
+            username, decoded_msg = text.split(": ", 1)
+        else:
+            decoded_msg = text
+        if decoded_msg.startswith("!"):
+            command, _, arg = decoded_msg.partition(" ")
+            handled += command in COMMANDS
+        else:
+            handled += 1
+    return handled
+
+
+def parse_binary(messages: list) -> int:
+    handled = 0
+    for message in messages:
+        if is_packet(message):
+            opcode, _, room_id, body = decode_packet(message)
+            arg = body.decode("utf-8", errors="replace").strip()
+            if opcode == OP_CHAT:
+                handled += 1
+            else:
+                handled += OPCODE_COMMANDS.get(opcode) in COMMANDS
+    return handled
+
+
+def transmit(messages: list) -> int:
+    """Bangun segment satu penerima untuk setiap pesan; return jumlah segment."""
+    segments = 0
+    for message in messages:
+        for chunk, payload_sum in PreparedMessage(encode_message(message)).chunks:
+            Segment(src_port=55555, dst_port=40000, seq_num=segments, ack_num=1, flags=0x10,
+                    payload=chunk, payload_sum=payload_sum).to_bytes()
+            segments += 1
+    return segments
+
+
+def timed(func, arg):
+    start = time.perf_counter()
+    result = func(arg)
+    return time.perf_counter() - start, result
+
+
+def wire(messages: list) -> float:
+    return sum(len(m) + FRAME_HEADER_SIZE for m in messages) / len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark protokol perintah teks vs biner")
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+
+    inputs = workload(args.messages)
+    text_codec, binary_codec = CommandCodec(), CommandCodec()
+    binary_codec.version = PROTOCOL_BINARY
+    text_in = [text_codec.encode(name, text) for name, text in inputs]
+    binary_in = [binary_codec.encode(name, text) for name, text in inputs]
+    chats = [(name, text) for name, text in inputs if not text.startswith("!")]
+
+    text_parse, handled_text = timed(parse_text, text_in)
+    binary_parse, handled_binary = timed(parse_binary, binary_in)
+    assert handled_text == handled_binary == len(inputs), (handled_text, handled_binary)
+    sent_at = datetime.now()
+    timestamp = formatted_time(sent_at)
+    text_out = [f"{timestamp} {name}: {text}".encode("utf-8") for name, text in chats]
+    binary_out = [encode_chat(text, int(name[4:]) + 1, 0, sent_at) for name, text in chats]
+    text_transmit, text_segments = timed(transmit, text_out)
+    binary_transmit, binary_segments = timed(transmit, binary_out)
+
+    n, c = len(inputs), len(chats)
+    print(f"{n} pesan client -> server ({c} chat)")
+    print(f"{'':30} {'teks':>10} {'biner':>10} {'rasio':>7}")
+    rows = [
+        ("byte/pesan client->server", wire(text_in), wire(binary_in)),
+        ("byte/chat server->client", wire(text_out), wire(binary_out)),
+        ("segment/chat per penerima", text_segments / c, binary_segments / c),
+        ("segment per penerima (us/chat)", text_transmit / c * 1e6, binary_transmit / c * 1e6),
+        ("parse server (us/pesan)", text_parse / n * 1e6, binary_parse / n * 1e6),
+    ]
+    for label, text, binary in rows:
+        print(f"{label:30} {text:>10.2f} {binary:>10.2f} {text / binary:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
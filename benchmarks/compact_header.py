@@ -0,0 +1,115 @@
+"""
+Benchmark header segment: header penuh 20 byte vs header kompak.
+
+Mensimulasikan satu koneksi yang mengirim --messages pesan chat (frame
+length-prefix, teks sepanjang --min..--max byte) dengan payload maksimal
+64 byte per segment. Setiap segment data dijawab satu ACK tanpa payload,
+persis seperti BetterUDPSocket. Seq/ack bertambah seperti koneksi
+sungguhan, jadi ukuran delta varint ikut tumbuh seiring byte yang sudah
+dikirim.
+
+Yang diukur: byte di wire per pesan (data + ACK), goodput (byte aplikasi /
+byte di wire) dan pesan per detik pada link --link-kbps, serta CPU
+membangun dan mem-parse satu segment.
+
+Jalankan dari root repo:
+    PYTHONPATH=src python benchmarks/compact_header.py --messages 20000 --link-kbps 256
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from protocol.framing import encode_message  # noqa: E402
+from protocol.segment import CompactContext, Segment  # noqa: E402
+
+PAYLOAD = 64
+CLIENT_PORT, SERVER_PORT = 40000, 50000
+
+
+def workload(count: int, low: int, high: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz     "
+    return [encode_message(f"[3:45 PM] user{rng.randrange(50)}: ".encode("utf-8")
+                           + "".join(rng.choice(letters) for _ in range(rng.randint(low, high))).encode("utf-8"))
+            for _ in range(count)]
+
+
+def segments(messages: list, client_isn: int, server_isn: int) -> list:
+    """(segment data client->server, ACK server->client) untuk setiap chunk."""
+    pairs = []
+    seq = client_isn + 1
+    for message in messages:
+        for i in range(0, len(message), PAYLOAD):
+            chunk = message[i:i + PAYLOAD]
+            data = Segment(CLIENT_PORT, SERVER_PORT, seq & 0xFFFFFFFF, (server_isn + 1) & 0xFFFFFFFF,
+                           flags=0x10, payload=chunk)
+            seq += len(chunk)
+            ack = Segment(SERVER_PORT, CLIENT_PORT, (server_isn + 1) & 0xFFFFFFFF, seq & 0xFFFFFFFF,
+                          flags=0x10)
+            pairs.append((data, ack))
+    return pairs
+
+
+def encode(pairs: list, client, server) -> tuple:
+    start = time.perf_counter()
+    raw = [(data.to_bytes(client), ack.to_bytes(server)) for data, ack in pairs]
+    return raw, time.perf_counter() - start
+
+
+def decode(raw: list, client, server) -> float:
+    start = time.perf_counter()
+    for data, ack in raw:
+        Segment.from_bytes(data, server)
+        Segment.from_bytes(ack, client)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark header penuh vs header kompak")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--min", type=int, default=5, help="Panjang teks chat minimal")
+    parser.add_argument("--max", type=int, default=60, help="Panjang teks chat maksimal")
+    parser.add_argument("--link-kbps", type=float, default=256)
+    args = parser.parse_args()
+
+    messages = workload(args.messages, args.min, args.max)
+    client_isn, server_isn = random.randrange(2**32), random.randrange(2**32)
+    conn_id = (client_isn ^ server_isn) & 0x3FFF
+    client = CompactContext(conn_id, CLIENT_PORT, SERVER_PORT, client_isn + 1, server_isn + 1)
+    server = CompactContext(conn_id, SERVER_PORT, CLIENT_PORT, server_isn + 1, client_isn + 1)
+    pairs = segments(messages, client_isn, server_isn)
+
+    n = len(messages)
+    app_bytes = sum(len(m) for m in messages)
+    results = {}
+    for label, contexts in (("penuh", (None, None)), ("kompak", (client, server))):
+        raw, encode_time = encode(pairs, *contexts)
+        decode_time = decode(raw, *contexts)
+        wire = sum(len(data) + len(ack) for data, ack in raw)
+        results[label] = dict(wire=wire, header=wire - app_bytes,
+                              encode=encode_time, decode=decode_time)
+
+    link = args.link_kbps * 1000 / 8
+    print(f"{n} pesan chat, rata-rata {app_bytes / n:.1f} byte per frame, "
+          f"{len(pairs) / n:.2f} segment per pesan (+ ACK)")
+    print(f"{'':34} {'penuh':>10} {'kompak':>10} {'rasio':>7}")
+    full, compact = results["penuh"], results["kompak"]
+    rows = [
+        ("byte header per pesan (data+ACK)", full["header"] / n, compact["header"] / n),
+        ("byte di wire per pesan", full["wire"] / n, compact["wire"] / n),
+        ("goodput (%)", app_bytes / full["wire"] * 100, app_bytes / compact["wire"] * 100),
+        (f"pesan/detik @{args.link_kbps:g} kbps", link / (full["wire"] / n), link / (compact["wire"] / n)),
+        ("bangun segment (us)", full["encode"] / len(pairs) / 2 * 1e6, compact["encode"] / len(pairs) / 2 * 1e6),
+        ("parse segment (us)", full["decode"] / len(pairs) / 2 * 1e6, compact["decode"] / len(pairs) / 2 * 1e6),
+    ]
+    for label, a, b in rows:
+        print(f"{label:34} {a:>10.2f} {b:>10.2f} {b / a:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark kompresi payload: tanpa kompresi vs blok zlib per koneksi.
+
+Dua beban yang mewakili trafik server -> client:
+  - chat: setiap pesan chat server (frame "[H:MM PM] nama: teks") dikirim
+    sendiri-sendiri, seperti broadcast satu pesan. Kompresi memakai blok
+    DICT (preset dictionary) yang dibuat sekali untuk semua penerima, atau
+    RAW untuk pesan yang lebih kecil dari batas bypass.
+  - bulk: catch-up history (--catchup pesan terakhir dalam satu
+    PreparedMessage bulk) dengan stream deflate per koneksi.
+
+Yang diukur: byte di wire (payload + header segment 20 byte), jumlah
+segment, waktu kirim pada link lambat (--link-kbps) dan CPU kompresi serta
+dekompresi per pesan.
+
+Jalankan dari root repo:
+    PYTHONPATH=src python benchmarks/compression.py --messages 20000 --link-kbps 256
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from protocol.compression import Compressor, Decompressor  # noqa: E402
+from protocol.framing import encode_message  # noqa: E402
+from protocol.segment import PreparedMessage, Segment  # noqa: E402
+
+PAYLOAD = 64
+
+
+def chat_messages(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    names = [f"user{i}" for i in range(50)]
+    words = ("ok sip nanti makan siang di kantin jam berapa rapat besok pagi deploy "
+             "server sudah jalan belum tolong cek log error di staging").split()
+    messages = []
+    for _ in range(count):
+        hour, minute = rng.randint(1, 12), rng.randrange(60)
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(1, 16)))
+        roll = rng.random()
+        if roll < 0.9:
+            line = f"[{hour}:{minute:02d} PM] {rng.choice(names)}: {text}"
+        elif roll < 0.95:
+            line = f"[{hour}:{minute:02d} PM] [SERVER]: {rng.choice(names)} has joined!."
+        else:
+            line = f"[{hour}:{minute:02d} PM] [SERVER]: {rng.choice(names)} has left the chat."
+        messages.append(encode_message(line.encode("utf-8")))
+    return messages
+
+
+def segments(data: bytes, payload: int) -> int:
+    return max(1, -(-len(data) // payload))
+
+
+def wire(payloads: list, payload: int) -> tuple:
+    """(byte di wire, jumlah segment) untuk daftar data yang di-chunk sendiri-sendiri."""
+    count = sum(segments(p, payload) for p in payloads)
+    return sum(len(p) for p in payloads) + count * Segment.HEADER_SIZE, count
+
+
+def run_chat(messages: list) -> dict:
+    compressor, decompressor = Compressor({}), Decompressor({})
+    prepared = [PreparedMessage(m) for m in messages]
+    start = time.perf_counter()
+    blocks = [compressor.prepare(p, PAYLOAD).data for p in prepared]
+    compress_time = time.perf_counter() - start
+    start = time.perf_counter()
+    restored = [decompressor.feed(b) for b in blocks]
+    decompress_time = time.perf_counter() - start
+    assert restored == messages
+    # Penerima kedua memakai blok yang sama tanpa mengompres ulang
+    start = time.perf_counter()
+    for p in prepared:
+        Compressor({}).prepare(p, PAYLOAD)
+    shared_time = time.perf_counter() - start
+    return dict(blocks=blocks, compress=compress_time, decompress=decompress_time,
+                shared=shared_time, bypassed=compressor.stats["compress_bypassed"])
+
+
+def run_bulk(messages: list, catchup: int) -> dict:
+    batches = [b"".join(messages[i:i + catchup]) for i in range(0, len(messages), catchup)]
+    # Satu catch-up per koneksi baru: setiap catch-up mulai dari stream kosong
+    start = time.perf_counter()
+    blocks = [Compressor({}).prepare(PreparedMessage(b, 1024, bulk=True), PAYLOAD).data for b in batches]
+    compress_time = time.perf_counter() - start
+    start = time.perf_counter()
+    restored = [Decompressor({}).feed(b) for b in blocks]
+    decompress_time = time.perf_counter() - start
+    assert restored == batches
+    return dict(batches=batches, blocks=blocks, compress=compress_time, decompress=decompress_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kompresi payload")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--catchup", type=int, default=20, help="Pesan per catch-up history")
+    parser.add_argument("--link-kbps", type=float, default=256, help="Kecepatan link lambat untuk estimasi waktu kirim")
+    args = parser.parse_args()
+
+    messages = chat_messages(args.messages)
+    n = len(messages)
+    chat = run_chat(messages)
+    bulk = run_bulk(messages, args.catchup)
+
+    plain_bytes, plain_segments = wire(messages, PAYLOAD)
+    chat_bytes, chat_segments = wire(chat["blocks"], PAYLOAD)
+    bulk_plain_bytes, _ = wire(bulk["batches"], 1024)
+    bulk_bytes, _ = wire(bulk["blocks"], 1024)
+    link = args.link_kbps * 1000 / 8
+
+    print(f"{n} pesan chat, rata-rata {sum(map(len, messages)) / n:.1f} byte per frame, "
+          f"{chat['bypassed']} di bawah batas bypass")
+    print(f"{'chat (satu pesan per send)':34} {'tanpa':>10} {'kompresi':>10} {'rasio':>7}")
+    rows = [
+        ("byte di wire/pesan", plain_bytes / n, chat_bytes / n),
+        ("segment/pesan", plain_segments / n, chat_segments / n),
+        (f"waktu kirim @{args.link_kbps:g} kbps (ms/pesan)", plain_bytes / n / link * 1e3,
+         chat_bytes / n / link * 1e3),
+    ]
+    for label, plain, compressed in rows:
+        print(f"{label:34} {plain:>10.2f} {compressed:>10.2f} {compressed / plain:>6.2f}x")
+    print(f"{'CPU kompresi, penerima pertama':34} {chat['compress'] / n * 1e6:>10.2f} us/pesan")
+    print(f"{'CPU kompresi, penerima berikutnya':34} {chat['shared'] / n * 1e6:>10.2f} us/pesan")
+    print(f"{'CPU dekompresi':34} {chat['decompress'] / n * 1e6:>10.2f} us/pesan")
+
+    batches = len(bulk["batches"])
+    print(f"\ncatch-up {args.catchup} pesan (bulk, stream deflate), {batches} kali")
+    print(f"{'byte di wire/catch-up':34} {bulk_plain_bytes / batches:>10.1f} {bulk_bytes / batches:>10.1f} "
+          f"{bulk_bytes / bulk_plain_bytes:>6.2f}x")
+    print(f"{'CPU kompresi':34} {bulk['compress'] / batches * 1e6:>10.2f} us/catch-up")
+    print(f"{'CPU dekompresi':34} {bulk['decompress'] / batches * 1e6:>10.2f} us/catch-up")
+
+
+if __name__ == "__main__":
+    main()
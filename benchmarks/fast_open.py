@@ -0,0 +1,120 @@
+"""
+Benchmark fast open: latensi reconnect sampai pesan pertama (`!awal`)
+diterima server, dengan dan tanpa cookie fast open.
+
+RTT diemulasikan dengan menunda setiap datagram client -> server sebesar
+--rtt milidetik. Tanpa cookie, baris `!awal` baru dikirim setelah handshake
+selesai (server menerimanya ±2 RTT setelah connect() dimulai). Dengan
+cookie, baris tersebut ikut di SYN dan diterima ±1 RTT.
+
+Jalankan dari root repo:
+    PYTHONPATH=src python benchmarks/fast_open.py --rtt 50 --reconnects 10
+"""
+import argparse
+import os
+import queue
+import socket
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from protocol.socket_wrapper import BetterUDPSocket, fast_open_cookies  # noqa: E402
+
+LINE = b"AWAL: !awal benchmark\n"
+
+
+class DelayedSocket:
+    """Socket UDP yang menunda setiap sendto() selama `delay` detik (urutan tetap)."""
+    def __init__(self, delay: float):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.delay = delay
+        self.queue: "queue.Queue[tuple]" = queue.Queue()
+        threading.Thread(target=self._sender, daemon=True).start()
+
+    def _sender(self):
+        while True:
+            due, data, addr = self.queue.get()
+            time.sleep(max(0.0, due - time.perf_counter()))
+            try:
+                self.sock.sendto(data, addr)
+            except OSError:
+                return
+
+    def sendto(self, data: bytes, addr: tuple) -> int:
+        self.queue.put((time.perf_counter() + self.delay, data, addr))
+        return len(data)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def serve(listener: BetterUDPSocket, arrivals: "queue.Queue[float]", stop: threading.Event):
+    """Accept loop: catat waktu baris pertama dari setiap koneksi tiba."""
+    def handle(conn: BetterUDPSocket):
+        buffer = b""
+        deadline = time.time() + 10
+        while conn.connected and time.time() < deadline:
+            buffer += conn.receive(timeout=0.1)
+            if b"\n" in buffer:
+                arrivals.put(time.perf_counter())
+                buffer = b""
+                deadline = time.time() + 2
+        conn.close()
+
+    while not stop.is_set():
+        try:
+            conn, _ = listener.accept(timeout=0.2)
+        except (TimeoutError, ValueError):
+            continue
+        threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+def reconnect(addr: tuple, rtt: float, arrivals: "queue.Queue[float]") -> float:
+    client = BetterUDPSocket(DelayedSocket(rtt), debug=False)
+    start = time.perf_counter()
+    client.connect(*addr, data=LINE)
+    latency = arrivals.get(timeout=10) - start
+    client.close()
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fast open")
+    parser.add_argument("--rtt", type=float, default=50, help="RTT emulasi (ms)")
+    parser.add_argument("--reconnects", type=int, default=10)
+    args = parser.parse_args()
+    rtt = args.rtt / 1000
+
+    listener = BetterUDPSocket(debug=False)
+    listener.listen("127.0.0.1", 0)
+    listener.enable_fast_open()
+    addr = ("127.0.0.1", listener.udp_socket.getsockname()[1])
+    arrivals: "queue.Queue[float]" = queue.Queue()
+    stop = threading.Event()
+    threading.Thread(target=serve, args=(listener, arrivals, stop), daemon=True).start()
+
+    print(f"RTT {args.rtt:.0f} ms, {args.reconnects} reconnect")
+    print(f"{'mode':>10} {'median ms':>10} {'min ms':>8} {'RTT':>6}")
+    for mode in ("handshake", "fast open"):
+        latencies = []
+        for _ in range(args.reconnects):
+            if mode == "handshake":
+                fast_open_cookies.clear()
+            else:
+                # Koneksi pertama sudah menyimpan cookie; pastikan tetap ada
+                assert addr in fast_open_cookies
+            latencies.append(reconnect(addr, rtt, arrivals))
+        median = statistics.median(latencies)
+        print(f"{mode:>10} {median * 1000:>10.1f} {min(latencies) * 1000:>8.1f} {median / rtt:>6.2f}")
+
+    stop.set()
+    print(f"Server: fast open accepted={listener.stats['fast_open_accepted']} "
+          f"rejected={listener.stats['fast_open_rejected']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark parsing pesan: delimiter newline (cara lama: `in` + `split` pada
+bytes yang terus bertambah) vs framing length-prefix dengan MessageDecoder.
+
+Stream berisi --messages pesan chat yang dipotong per --chunk byte (ukuran
+data yang dikembalikan receive(): 64 byte per segment, atau jauh lebih
+besar saat banyak segment tiba sekaligus, misalnya catch-up history atau
+client yang lambat membaca). Yang diukur adalah waktu parsing saja.
+
+Jalankan dari root repo:
+    PYTHONPATH=src python benchmarks/framing.py --messages 100000 --chunk 64 1380 65536
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from protocol.framing import MessageDecoder, encode_message  # noqa: E402
+
+
+def chunks(stream: bytes, size: int) -> list:
+    return [stream[i:i + size] for i in range(0, len(stream), size)]
+
+
+def parse_newline(parts: list) -> int:
+    count = 0
+    buffer = b""
+    for chunk in parts:
+        buffer += chunk
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            count += 1
+    return count
+
+
+def parse_framed(parts: list) -> int:
+    count = 0
+    decoder = MessageDecoder()
+    for chunk in parts:
+        decoder.feed(chunk)
+        while decoder.next_message() is not None:
+            count += 1
+    return count
+
+
+def timed(parse, parts: list, expected: int) -> float:
+    start = time.perf_counter()
+    count = parse(parts)
+    elapsed = time.perf_counter() - start
+    assert count == expected, (count, expected)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark framing pesan")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--chunk", type=int, nargs="+", default=[64, 1380, 65536])
+    args = parser.parse_args()
+
+    messages = [f"[12:00 PM] user{i % 50}: message number {i}".encode("utf-8")
+                for i in range(args.messages)]
+    newline_stream = b"".join(m + b"\n" for m in messages)
+    framed_stream = b"".join(encode_message(m) for m in messages)
+
+    print(f"{args.messages} pesan, rata-rata {len(newline_stream) / args.messages:.0f} byte")
+    print(f"{'chunk':>7} {'newline us/msg':>15} {'framed us/msg':>14} {'framed msg/s':>13} {'speedup':>8}")
+    for size in args.chunk:
+        old = timed(parse_newline, chunks(newline_stream, size), args.messages)
+        new = timed(parse_framed, chunks(framed_stream, size), args.messages)
+        print(f"{size:>7} {old / args.messages * 1e6:>15.2f} {new / args.messages * 1e6:>14.2f} "
+              f"{args.messages / new:>13.0f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
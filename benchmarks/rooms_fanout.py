@@ -0,0 +1,72 @@
+"""
+Benchmark fan-out room: broadcast ke semua client vs broadcast ke room kecil.
+
+Server tidak dijalankan lewat jaringan; benchmark ini mengisi tabel global
+server (connected_clients, client_outboxes, rooms) dengan N client palsu
+beserta Outbox asli, lalu mengukur waktu broadcast_message(). Outbox tidak
+di-start, jadi yang terukur hanya biaya memilih penerima dan mengantri.
+
+Jalankan dari root repo:
+    PYTHONPATH=src python benchmarks/rooms_fanout.py --clients 1000 5000 --room-size 5
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from app import server  # noqa: E402
+from app.fanout import Outbox  # noqa: E402
+from app.rooms import RoomIndex, DEFAULT_ROOM  # noqa: E402
+
+
+class FakeConn:
+    max_payload_size = 64
+    connected = True
+    blocking = True
+
+
+def populate(num_clients: int, room_size: int):
+    server.connected_clients.clear()
+    server.client_outboxes.clear()
+    server.rooms = RoomIndex()
+    options = {"maxlen": 1 << 30, "max_bytes": 1 << 40, "overflow": "drop_oldest", "stall_timeout": None}
+    for i in range(num_clients):
+        addr = ("10.0.0.1", i)
+        conn = FakeConn()
+        server.connected_clients[addr] = conn
+        server.client_outboxes[addr] = Outbox(conn, **options)
+        server.rooms.join(addr, DEFAULT_ROOM)
+        server.rooms.join(addr, f"room-{i // room_size}")
+    return num_clients // room_size
+
+
+def timed(targets: list) -> float:
+    """Rata-rata detik per broadcast; target None = semua client."""
+    payload = b"12:00 PM bench: hello room"
+    start = time.perf_counter()
+    for room in targets:
+        server.broadcast_message(payload, exclude_sender=False, room=room)
+    return (time.perf_counter() - start) / len(targets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fan-out room")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--room-size", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'rooms':>6} {'global us/msg':>14} {'room us/msg':>12} {'speedup':>8}")
+    for num_clients in args.clients:
+        num_rooms = populate(num_clients, args.room_size)
+        global_cost = timed([None] * max(1, args.messages // 10))
+        room_cost = timed([f"room-{i % num_rooms}" for i in range(args.messages)])
+        print(f"{num_clients:>8} {num_rooms:>6} {global_cost * 1e6:>14.1f} {room_cost * 1e6:>12.1f} "
+              f"{global_cost / room_cost:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
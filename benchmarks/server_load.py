@@ -0,0 +1,200 @@
+"""
+Load test: bandingkan engine server `thread` vs `reactor`.
+
+Untuk setiap engine dan jumlah client, benchmark ini menjalankan server di
+subprocess, menghubungkan N client BetterUDPSocket (semuanya dijalankan dari
+satu selectors loop di proses ini), lalu setiap client mengirim pesan
+secara periodik. Yang diukur:
+  - CPU server (utime+stime dari /proc, jadi hanya Linux) selama pengukuran
+  - jumlah thread server
+  - latency (p50/p95/p99), tergantung --workload:
+      heartbeat : `!heartbeat` -> balasan COUNT (jalur urgent, tanpa outbox)
+      chat      : pesan chat -> salinan broadcast-nya kembali ke pengirim;
+                  setiap client menerima pesan semua client lewat outbox,
+                  jadi ini mengukur latency fan-out di bawah beban
+
+Jalankan dari root repo:
+    PYTHONPATH=src python benchmarks/server_load.py --clients 100 500 1000
+    PYTHONPATH=src python benchmarks/server_load.py --workload chat --clients 10 50
+
+Dengan --shards N server dijalankan sebagai N proses (SO_REUSEPORT); CPU
+dijumlahkan dari semua proses shard.
+"""
+import argparse
+import os
+import resource
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from protocol.socket_wrapper import BetterUDPSocket  # noqa: E402
+
+
+def free_udp_port() -> int:
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def proc_cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # field 14 (utime) dan 15 (stime), dihitung setelah "(comm)"
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def child_pids(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def server_pids(pid: int) -> list:
+    # Mode sharded: proses induk hanya menunggu, kerja ada di proses anak
+    return [pid] + child_pids(pid)
+
+
+def proc_threads(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def start_server(engine: str, port: int, shards: int = 1) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, "src"))
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.server", "127.0.0.1", "-p", str(port),
+         "--engine", engine, "--shards", str(shards), "-q"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def run_case(engine: str, n_clients: int, duration: float, interval: float, shards: int = 1,
+             workload: str = "heartbeat") -> dict:
+    port = free_udp_port()
+    server = start_server(engine, port, shards)
+    time.sleep(0.5)
+    pids = server_pids(server.pid)
+
+    clients = []
+    try:
+        tags = {}
+        for i in range(n_clients):
+            c = BetterUDPSocket(debug=False)
+            c.connect("127.0.0.1", port, timeout=10.0)
+            c.setblocking(False)
+            clients.append(c)
+            tags[c] = f" c{i}".encode("utf-8")
+
+        sel = selectors.DefaultSelector()
+        outstanding = {}
+        for c in clients:
+            sel.register(c, selectors.EVENT_READ, c)
+            outstanding[c] = deque()
+
+        latencies = []
+        # Sebar jadwal heartbeat agar tidak semua client mengirim bersamaan
+        next_send = {c: time.time() + interval * i / n_clients for i, c in enumerate(clients)}
+
+        cpu_start = sum(proc_cpu_seconds(p) for p in pids)
+        t_start = time.time()
+        while time.time() - t_start < duration:
+            now = time.time()
+            for c in clients:
+                if now >= next_send[c]:
+                    if workload == "chat":
+                        c.send_message(b"load:" + tags[c])
+                    else:
+                        c.send_message(b"load: !heartbeat")
+                    outstanding[c].append(now)
+                    next_send[c] = now + interval
+                if c.send_window.buffer:
+                    c.service_timers(now)
+
+            for key, _ in sel.select(0.01):
+                c = key.data
+                message = c.recv_message()
+                while message is not None:
+                    if workload == "chat":
+                        # Salinan pesan sendiri (broadcast juga ke pengirim, berurutan)
+                        reply = message.endswith(b"load:" + tags[c])
+                    else:
+                        reply = message.startswith(b"COUNT:")
+                    if reply and outstanding[c]:
+                        latencies.append(time.time() - outstanding[c].popleft())
+                    message = c.recv_message()
+        elapsed = time.time() - t_start
+        cpu = sum(proc_cpu_seconds(p) for p in pids) - cpu_start
+        threads = sum(proc_threads(p) for p in pids)
+    finally:
+        for p in reversed(pids):
+            try:
+                os.kill(p, signal.SIGKILL)
+            except OSError:
+                pass
+        server.wait()
+        for c in clients:
+            c.udp_socket.close()
+
+    sent = len(latencies) + sum(len(q) for q in outstanding.values())
+    return {
+        "engine": engine if shards == 1 else f"{engine}x{shards}",
+        "clients": n_clients,
+        "cpu_pct": 100.0 * cpu / elapsed,
+        "threads": threads,
+        "replies": len(latencies),
+        "sent": sent,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server engine load test.")
+    parser.add_argument("--clients", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--engines", nargs="+", default=["thread", "reactor"])
+    parser.add_argument("--duration", type=float, default=10.0, help="Detik pengukuran per kasus")
+    parser.add_argument("--interval", type=float, default=1.0, help="Interval heartbeat per client")
+    parser.add_argument("--shards", type=int, default=1, help="Jumlah proses shard server")
+    parser.add_argument("--workload", choices=["heartbeat", "chat"], default="heartbeat",
+                        help="heartbeat: !heartbeat -> COUNT; chat: broadcast chat lewat outbox")
+    args = parser.parse_args()
+
+    # Setiap client memakai satu file descriptor
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    print(f"{'engine':<10} {'clients':>7} {'cpu%':>7} {'threads':>7} "
+          f"{'replies':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for n in args.clients:
+        for engine in args.engines:
+            r = run_case(engine, n, args.duration, args.interval, args.shards, args.workload)
+            print(f"{r['engine']:<10} {r['clients']:>7} {r['cpu_pct']:>7.1f} {r['threads']:>7} "
+                  f"{r['replies']:>4}/{r['sent']:<4} {r['p50']:>9.1f} {r['p95']:>9.1f} {r['p99']:>9.1f}",
+                  flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# chatlog.py
+import bisect
+import os
+import queue
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+
+class LogSegment:
+    """
+    Satu file segment log beserta sparse index-nya.
+
+    File `chat-<n>.log` berisi satu record per baris:
+        <timestamp>\t<room>\t<pengirim>\t<pesan>
+    File `chat-<n>.idx` berisi baris `<timestamp> <offset>` untuk record
+    pertama setiap ±`index_every` byte, sehingga range query cukup bisect di
+    index lalu membaca dari offset tersebut.
+    """
+    def __init__(self, directory: str, number: int):
+        self.number = number
+        self.path = os.path.join(directory, f"chat-{number:06d}.log")
+        self.index_path = os.path.join(directory, f"chat-{number:06d}.idx")
+        self.index: List[Tuple[float, int]] = []
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                for line in f:
+                    ts, offset = line.split()
+                    self.index.append((float(ts), int(offset)))
+        self.size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    @property
+    def first_timestamp(self) -> Optional[float]:
+        return self.index[0][0] if self.index else None
+
+    def start_offset(self, start: float) -> int:
+        """Offset index terakhir yang timestamp-nya < start (aman untuk mulai scan)."""
+        position = bisect.bisect_left(self.index, (start, -1))
+        return self.index[position - 1][1] if position > 0 else 0
+
+
+class ChatLogWriter:
+    """
+    Audit log semua pesan chat, ditulis oleh satu thread writer.
+
+    append() hanya memasukkan record ke antrian lalu kembali, sehingga
+    handler client tidak pernah menunggu disk. Writer mengambil semua record
+    yang sudah antri (maksimal `max_batch`) sebagai satu group commit: satu
+    write + satu fsync untuk seluruh batch. Saat writer sibuk fsync, record
+    baru menumpuk dan ikut batch berikutnya.
+
+    File dipecah per `segment_bytes`; setiap segment punya sparse index
+    timestamp -> offset untuk range query (read_range()).
+    """
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024,
+                 index_every: int = 4096, max_batch: int = 1024,
+                 max_queue: int = 100000, fsync: bool = True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_every = index_every
+        self.max_batch = max_batch
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self.queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max_queue)
+        self.segments: List[LogSegment] = [
+            LogSegment(directory, number) for number in sorted(
+                int(name[5:11]) for name in os.listdir(directory)
+                if name.startswith("chat-") and name.endswith(".log")
+            )
+        ]
+        self.lock = threading.Lock()
+        self.append_lock = threading.Lock()
+        self.file = None
+        self.index_file = None
+        self.last_indexed = None
+        if not self.segments:
+            self.segments.append(LogSegment(directory, 1))
+        self._open_segment(self.segments[-1])
+        self.thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self.records = 0
+        self.commits = 0
+        self.dropped = 0
+        self.bytes_written = 0
+
+    def _open_segment(self, segment: LogSegment):
+        self.file = open(segment.path, "ab")
+        self.index_file = open(segment.index_path, "a")
+        self.last_indexed = segment.index[-1][1] if segment.index else None
+
+    def append(self, room: str, sender: str, message: bytes, timestamp: float = None) -> bool:
+        """Antrikan satu record. Return False (dan dihitung) jika antrian penuh."""
+        body = message.rstrip(b"\n").replace(b"\n", b" ")
+        # Timestamp diambil di dalam lock agar urutan di antrian (dan di
+        # file) monoton, syarat bisect pada sparse index
+        with self.append_lock:
+            timestamp = time.time() if timestamp is None else timestamp
+            record = f"{timestamp:.6f}\t{room}\t{sender.replace(chr(9), ' ')}\t".encode("utf-8") + body + b"\n"
+            try:
+                self.queue.put_nowait(record)
+                return True
+            except queue.Full:
+                self.dropped += 1
+                return False
+
+    def start(self):
+        self.thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.thread.start()
+
+    def _writer_loop(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            batch = [record]
+            stop = False
+            # Group commit: ambil semua yang sudah antri tanpa menunggu
+            while len(batch) < self.max_batch:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            self.write_batch(batch)
+            if stop:
+                return
+
+    def write_batch(self, batch: List[bytes]):
+        """Tulis batch record lalu fsync sekali (dipakai thread writer)."""
+        with self.lock:
+            segment = self.segments[-1]
+            if segment.size and segment.size >= self.segment_bytes:
+                segment = self._roll_segment()
+
+            for record in batch:
+                if self.last_indexed is None or segment.size - self.last_indexed >= self.index_every:
+                    timestamp = float(record.split(b"\t", 1)[0])
+                    segment.index.append((timestamp, segment.size))
+                    self.index_file.write(f"{timestamp:.6f} {segment.size}\n")
+                    self.last_indexed = segment.size
+                segment.size += len(record)
+            data = b"".join(batch)
+            self.file.write(data)
+            self.file.flush()
+            self.index_file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+
+            self.records += len(batch)
+            self.commits += 1
+            self.bytes_written += len(data)
+
+    def _roll_segment(self) -> LogSegment:
+        self.file.close()
+        self.index_file.close()
+        segment = LogSegment(self.directory, self.segments[-1].number + 1)
+        self.segments.append(segment)
+        self._open_segment(segment)
+        return segment
+
+    def read_range(self, start: float, end: float) -> Iterator[Tuple[float, str, str, bytes]]:
+        """
+        Yield (timestamp, room, pengirim, pesan) untuk record dengan
+        start <= timestamp <= end. Hanya record yang sudah di-commit terbaca.
+        """
+        with self.lock:
+            segments = list(self.segments)
+            sizes = [segment.size for segment in segments]
+        for i, segment in enumerate(segments):
+            # Segment berikutnya mulai setelah `end`: tidak perlu dibaca
+            if segment.first_timestamp is None or segment.first_timestamp > end:
+                break
+            if i + 1 < len(segments) and segments[i + 1].first_timestamp is not None \
+                    and segments[i + 1].first_timestamp < start:
+                continue
+            with open(segment.path, "rb") as f:
+                f.seek(segment.start_offset(start))
+                while f.tell() < sizes[i]:
+                    line = f.readline()
+                    timestamp, room, sender, message = line.rstrip(b"\n").split(b"\t", 3)
+                    timestamp = float(timestamp)
+                    if timestamp > end:
+                        return
+                    if timestamp >= start:
+                        yield timestamp, room.decode("utf-8"), sender.decode("utf-8"), message
+
+    def stats(self) -> dict:
+        return {
+            "records": self.records,
+            "commits": self.commits,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize(),
+            "segments": len(self.segments),
+            "bytes": self.bytes_written,
+        }
+
+    def close(self, timeout: float = 5.0):
+        """Tulis sisa antrian lalu tutup file."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout)
+        with self.lock:
+            self.file.close()
+            self.index_file.close()
@@ -2,57 +2,144 @@
 from prompt_toolkit import PromptSession
 from prompt_toolkit.patch_stdout import patch_stdout
 from collections import deque
-from protocol.socket_wrapper import BetterUDPSocket
+from protocol.framing import encode_message
+from protocol.socket_wrapper import BetterUDPSocket, load_fast_open_cookies, save_fast_open_cookies
+from app.sessions import ResumeState, backoff_delays
+from app.commands import PROTOCOL_BINARY, CommandCodec, is_packet
 import threading, time, os, argparse, socket
 
 thread_lock = threading.Lock()
 
-# Fungsi menerima data chat dari server, merangkai segmen hingga newline
-def receiveDataServer(clientSocket: BetterUDPSocket, msgs: deque, server_ip: str):
-    cnt = 0
-    buffer = b""
+# Koneksi aktif; diganti thread penerima saat reconnect
+clientSock: BetterUDPSocket = None
+
+# Token sesi dan jumlah pesan yang sudah diterima, untuk !resume
+resumeState = ResumeState()
+
+# Protokol perintah (teks atau biner) hasil negosiasi saat !awal/!resume
+commandCodec = CommandCodec()
+
+# Jumlah user online terakhir (COUNT dari server)
+onlineCount = 0
+
+# Connect (ulang) ke server dengan exponential backoff. Pesan pertama (!awal,
+# atau !resume jika sudah punya sesi) ikut di SYN bila ada cookie fast open
+def connectServer(server_ip: str, server_port: int, name: str, fast_open_cache: str,
+                  onUrgent=None) -> BetterUDPSocket:
+    for delay in backoff_delays():
+        sock = BetterUDPSocket(debug=False)
+        # Pesan kontrol (SHUTDOWN, COUNT, balasan !kill) datang lewat jalur urgent
+        sock.on_urgent = onUrgent
+        # Tawarkan kompresi, header kompak dan FEC; masing-masing hanya aktif
+        # jika server menjalankan --compress / --compact-header / --fec
+        sock.enable_compression()
+        sock.enable_compact_header()
+        sock.enable_fec()
+        # Berlangganan jumlah online; server mengirim COUNT hanya saat berubah.
+        # Join menawarkan protokol biner; sampai server menjawab, kirim teks
+        commandCodec.reset()
+        initialData = (encode_message(resumeState.join_line(name, commandCodec.offer()).encode("utf-8"))
+                       + encode_message(b"[PRESENCE]: !presence"))
+        try:
+            print(f"Mencoba menghubungi server {server_ip}:{server_port} ...")
+            sock.connect(server_ip, server_port, data=initialData)
+        except Exception:
+            try:
+                sock.close()
+            except Exception:
+                pass
+            print(f"Gagal terhubung, mencoba lagi dalam {delay:.1f} detik ...")
+            time.sleep(delay)
+            continue
+        # Deteksi server yang hilang tanpa FIN (jaringan putus)
+        sock.enable_keepalive(idle=5.0, interval=1.0, probes=3)
+        print(f"Berhasil terhubung ke server {server_ip}:{server_port}!")
+        if fast_open_cache:
+            save_fast_open_cookies(fast_open_cache)
+        return sock
+
+# Pesan kontrol dari jalur urgent; tidak menunggu data chat yang masih antri
+# dan tidak dihitung untuk resume (bukan bagian stream sesi)
+def receiveUrgent(data: bytes, msgs: deque, server_ip: str):
+    global onlineCount
+    decoded_msg = data.decode("utf-8", errors="replace")
+    if decoded_msg == "SHUTDOWN":
+        # Jangan menahan thread yang memanggil callback ini
+        print("Exiting in 3 seconds...")
+        threading.Timer(3, os._exit, args=(0,)).start()
+    elif decoded_msg.startswith("COUNT: "):
+        try:
+            onlineCount = int(decoded_msg.split(": ", 1)[1])
+        except ValueError:
+            pass
+    else:
+        msgs.extend(decoded_msg.splitlines())
+    displayChat(msgs, server_ip, onlineCount)
+
+# Fungsi menerima pesan chat dari server (satu frame = satu pesan utuh)
+def receiveDataServer(msgs: deque, server_ip: str, server_port: int, getName, fast_open_cache: str,
+                      onUrgent=None):
+    global clientSock, onlineCount
     while True:
         try:
-            chunk = clientSocket.receive(timeout=0.1)
-            if not chunk:
+            message = clientSock.recv_message(timeout=0.1)
+            if message is None:
+                if clientSock.peer_closed:
+                    # Server menutup koneksi (FIN); FIN+ACK sudah dikirim
+                    print("Connection closed by server.")
+                    clientSock.close()
+                    os._exit(0)
                 continue
 
-            buffer += chunk
+            if is_packet(message):
+                # Paket biner: chat ber-id, atau update tabel nama (USER/ROOM)
+                resumeState.on_packet()
+                line = commandCodec.decode(message)
+                if line is not None:
+                    msgs.append(line)
+                    displayChat(msgs, server_ip, onlineCount)
+                continue
 
-            # Selama ada newline, proses satu baris utuh
-            while b"\n" in buffer:
-                line, buffer = buffer.split(b"\n", 1)
-                decoded_msg = line.decode("utf-8", errors="replace")
+            decoded_msg = message.decode("utf-8", errors="replace")
 
-                if decoded_msg == "SHUTDOWN":
-                    print("Exiting in 3 seconds...")
-                    time.sleep(3)
-                    os._exit(0)
+            # Penanda sesi dan hitungan pesan untuk resume
+            if resumeState.on_line(decoded_msg):
+                continue
 
-                if decoded_msg.startswith("COUNT: "):
-                    _, c = decoded_msg.split(": ", 1)
-                    try:
-                        cnt = int(c)
-                    except:
-                        pass
-                    # Jangan append ke msgs, langsung lanjut
-                    continue
+            # Jawaban negosiasi protokol
+            if commandCodec.on_reply(decoded_msg):
+                continue
 
-                # Append pesan baru dan refresh tampilan
-                msgs.append(decoded_msg)
-            displayChat(msgs, server_ip, cnt)
+            if decoded_msg == "SHUTDOWN":
+                print("Exiting in 3 seconds...")
+                time.sleep(3)
+                os._exit(0)
 
-        except Exception:
-            continue
+            if decoded_msg.startswith("COUNT: "):
+                # Balasan !heartbeat / !presence
+                _, c = decoded_msg.split(": ", 1)
+                try:
+                    onlineCount = int(c)
+                except:
+                    pass
+            else:
+                # Pesan bisa berisi beberapa baris (mis. balasan !stats)
+                msgs.extend(decoded_msg.splitlines())
+            displayChat(msgs, server_ip, onlineCount)
 
-# Fungsi heartbeat sebagai tanda request data ke server
-def heartbeat(clientSocket: BetterUDPSocket):
-    while True:
-        try:
-            with thread_lock:
-                clientSocket.send("[HEARTBEAT]: !heartbeat\n".encode("utf-8"))
-            time.sleep(3)
         except Exception:
+            if clientSock.peer_closed:
+                # Server menutup koneksi (FIN)
+                print("Connection closed by server.")
+                os._exit(0)
+            if clientSock.dead or not clientSock.connected:
+                # Koneksi hilang tanpa FIN: sambung ulang lalu lanjutkan sesi
+                # dari baris terakhir yang diterima (!resume)
+                print("Koneksi terputus, menyambung ulang ...")
+                newSock = connectServer(server_ip, server_port, getName(), fast_open_cache, onUrgent)
+                with thread_lock:
+                    oldSock, clientSock = clientSock, newSock
+                oldSock.close()
             continue
 
 # Mendisplay chat 20 terakhir dalam msgs
@@ -68,6 +155,8 @@ def main():
     parser.add_argument("host", help="Server IP address")
     parser.add_argument("-p", "--port", type=int, required=True, help="Server port")
     parser.add_argument("-n", "--name", type=str, required=True, help="Display name")
+    parser.add_argument("--fast-open-cache", default=None, metavar="FILE",
+                        help="Simpan cookie fast open di FILE agar reconnect berikutnya lebih cepat")
     args = parser.parse_args()
 
     SERVER_IP = args.host
@@ -78,37 +167,24 @@ def main():
         print("Display name is not allowed. Please use another display name.")
         return
 
-    clientSock = BetterUDPSocket(debug=False)
+    global clientSock
+    if args.fast_open_cache:
+        load_fast_open_cookies(args.fast_open_cache)
 
-    # Loop hingga berhasil connect ke server
-    while not clientSock.connected:
-        try:
-            print(f"Mencoba menghubungi server {SERVER_IP}:{SERVER_PORT} ...")
-            clientSock.connect(SERVER_IP, SERVER_PORT)
-            print(f"Berhasil terhubung ke server {SERVER_IP}:{SERVER_PORT}!")
-            time.sleep(1)
-            os.system('cls' if os.name == 'nt' else 'clear')
-        except Exception:
-            continue
+    msgs = deque(maxlen=20)
+    onUrgent = lambda data: receiveUrgent(data, msgs, SERVER_IP)
 
-    msgAwal = f"AWAL: !awal {CLIENT_NAME}\n"
-    with thread_lock:
-        clientSock.send(msgAwal.encode("utf-8"))
+    # Loop (dengan backoff) hingga berhasil connect ke server
+    clientSock = connectServer(SERVER_IP, SERVER_PORT, CLIENT_NAME, args.fast_open_cache, onUrgent)
+    time.sleep(1)
+    os.system('cls' if os.name == 'nt' else 'clear')
 
     session = PromptSession()
-    msgs = deque(maxlen=20)
 
-    # Mulai thread penerima data
+    # Mulai thread penerima data (juga menangani reconnect)
     threading.Thread(
         target=receiveDataServer,
-        args=(clientSock, msgs, SERVER_IP),
-        daemon=True
-    ).start()
-
-    # Mulai thread heartbeat
-    threading.Thread(
-        target=heartbeat,
-        args=(clientSock,),
+        args=(msgs, SERVER_IP, SERVER_PORT, lambda: CLIENT_NAME, args.fast_open_cache, onUrgent),
         daemon=True
     ).start()
 
@@ -121,7 +197,7 @@ def main():
 
                 if msg == "!disconnect":
                     with thread_lock:
-                        clientSock.send(f"{CLIENT_NAME}: {msg}\n".encode("utf-8"))
+                        clientSock.send_message(commandCodec.encode(CLIENT_NAME, msg))
                     print("Berhasil disconnect dari server!")
                     time.sleep(1)
                     print("Menutup aplikasi...")
@@ -131,7 +207,7 @@ def main():
 
                 elif msg.startswith("!kill"):
                     with thread_lock:
-                        clientSock.send(f"{CLIENT_NAME}: {msg}\n".encode("utf-8"))
+                        clientSock.send_message(commandCodec.encode(CLIENT_NAME, msg))
                     continue
 
                 elif msg.startswith("!change"):
@@ -145,18 +221,22 @@ def main():
                         continue
 
                     with thread_lock:
-                        clientSock.send(f"[SERVER]: {OLD} changes its username to {CLIENT_NAME}\n".encode("utf-8"))
+                        if commandCodec.version >= PROTOCOL_BINARY:
+                            # Paket tidak membawa nama: beri tahu server lewat !name
+                            clientSock.send_message(commandCodec.encode(CLIENT_NAME, f"!name {CLIENT_NAME}"))
+                        else:
+                            clientSock.send_message(f"[SERVER]: {OLD} changes its username to {CLIENT_NAME}".encode("utf-8"))
                     continue
 
-                # Chat biasa; selalu akhiri dengan newline
+                # Chat biasa; satu pesan per frame
                 with thread_lock:
-                    clientSock.send(f"{CLIENT_NAME}: {msg}\n".encode("utf-8"))
+                    clientSock.send_message(commandCodec.encode(CLIENT_NAME, msg))
 
             except (EOFError, KeyboardInterrupt):
                 # Ctrl+D atau Ctrl+C → disconnect gracefully
                 try:
                     with thread_lock:
-                        clientSock.send(f"{CLIENT_NAME}: !disconnect\n".encode("utf-8"))
+                        clientSock.send_message(commandCodec.encode(CLIENT_NAME, "!disconnect"))
                 except:
                     pass
                 break
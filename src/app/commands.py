@@ -0,0 +1,233 @@
+# commands.py
+import re
+import struct
+import threading
+from datetime import datetime
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+# Versi protokol perintah. Versi 1: setiap pesan adalah teks
+# "username: pesan" / "username: !perintah arg". Versi 2: client juga
+# mengirim paket biner, dan server mengirim pesan chat sebagai paket CHAT
+# ber-id. Versi dinegosiasikan saat !awal/!resume: client menambahkan
+# penawaran " proto=1,2", server menjawab "PROTO <versi> <user id>". Client
+# lama tidak menawarkan apa pun dan tetap memakai teks.
+PROTOCOL_TEXT = 1
+PROTOCOL_BINARY = 2
+SUPPORTED_PROTOCOLS = (PROTOCOL_TEXT, PROTOCOL_BINARY)
+OFFER_PATTERN = re.compile(r"^(.*) proto=(\d+(?:,\d+)*)$")
+REPLY_PREFIX = "PROTO "
+
+# Paket (satu frame): opcode u8, user id u16, room id u16, lalu body
+# (UTF-8, panjangnya dari frame). Dari client, user id selalu 0 (server tahu
+# pengirimnya dari koneksi) dan room id 0 berarti room aktif. Dari server,
+# room id 0 berarti room default.
+HEADER = struct.Struct("!BHH")
+HEADER_SIZE = HEADER.size
+MAX_ID = 0xFFFF
+# Body paket CHAT dari server diawali waktu kirim di server (menit sejak
+# tengah malam, waktu lokal server), agar timestamp sama dengan yang dilihat
+# client teks, juga untuk paket hasil replay sesi
+CHAT_TIME = struct.Struct("!H")
+
+# Opcode < 0x20 tidak pernah menjadi byte pertama pesan teks, jadi paket dan
+# teks bisa dibedakan per frame. Byte whitespace ASCII (0x09-0x0D) tidak
+# dipakai agar paket tidak tertukar dengan teks yang di-strip.
+OP_CHAT = 0x01
+OP_DISCONNECT = 0x02
+OP_KILL = 0x03
+OP_HEARTBEAT = 0x04
+OP_PRESENCE = 0x05
+OP_STATS = 0x06
+OP_JOIN = 0x07
+OP_LEAVE = 0x08
+OP_ROOMS = 0x0E
+OP_HISTORY = 0x0F
+OP_NAME = 0x10
+# Server -> client: nama untuk user id / room id yang dipakai paket CHAT
+OP_USER = 0x11
+OP_ROOM = 0x12
+
+# Perintah teks <-> opcode. !awal dan !resume tidak punya opcode: keduanya
+# dikirim sebelum negosiasi selesai.
+COMMAND_OPCODES: Dict[str, int] = {
+    "!disconnect": OP_DISCONNECT,
+    "!kill": OP_KILL,
+    "!heartbeat": OP_HEARTBEAT,
+    "!presence": OP_PRESENCE,
+    "!stats": OP_STATS,
+    "!join": OP_JOIN,
+    "!leave": OP_LEAVE,
+    "!rooms": OP_ROOMS,
+    "!history": OP_HISTORY,
+    "!name": OP_NAME,
+}
+OPCODE_COMMANDS: Dict[int, str] = {op: command for command, op in COMMAND_OPCODES.items()}
+PACKET_OPCODES = frozenset([OP_CHAT, OP_USER, OP_ROOM, *OPCODE_COMMANDS])
+
+
+def is_packet(data: bytes) -> bool:
+    """True jika frame adalah paket biner, bukan teks."""
+    return bool(data) and data[0] in PACKET_OPCODES
+
+
+def encode_packet(opcode: int, body: bytes = b"", user_id: int = 0, room_id: int = 0) -> bytes:
+    return HEADER.pack(opcode, user_id, room_id) + body
+
+
+def encode_chat(text: str, user_id: int, room_id: int, sent_at: datetime) -> bytes:
+    """Paket CHAT server -> client beserta waktu kirimnya."""
+    minutes = CHAT_TIME.pack(sent_at.hour * 60 + sent_at.minute)
+    return encode_packet(OP_CHAT, minutes + text.encode("utf-8"), user_id, room_id)
+
+
+def decode_packet(data: bytes) -> Tuple[int, int, int, bytes]:
+    """Return (opcode, user id, room id, body)."""
+    try:
+        opcode, user_id, room_id = HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError(f"Packet too short: {len(data)} bytes") from None
+    return opcode, user_id, room_id, data[HEADER_SIZE:]
+
+
+def make_offer(versions=SUPPORTED_PROTOCOLS) -> str:
+    """Penawaran versi yang ditambahkan di akhir baris !awal/!resume."""
+    return " proto=" + ",".join(str(v) for v in versions)
+
+
+def parse_offer(arg: str) -> Tuple[str, Tuple[int, ...]]:
+    """
+    Pisahkan penawaran versi dari argumen terakhir !awal/!resume.
+    Return (argumen tanpa penawaran, versi yang ditawarkan); tuple kosong
+    berarti client lama yang tidak menawarkan apa pun (teks).
+    """
+    match = OFFER_PATTERN.match(arg)
+    if match is None:
+        return arg, ()
+    return match.group(1), tuple(int(v) for v in match.group(2).split(","))
+
+
+def choose_protocol(offered: Tuple[int, ...]) -> int:
+    common = [v for v in offered if v in SUPPORTED_PROTOCOLS]
+    return max(common, default=PROTOCOL_TEXT)
+
+
+def formatted_time(when: Optional[datetime] = None) -> str:
+    """Format waktu yang sama dengan pesan teks server: [H:MM AM/PM]."""
+    return (when or datetime.now()).strftime("[%I:%M %p]").lstrip("0").replace(" 0", " ")
+
+
+class IdTable:
+    """
+    Id numerik kecil (1..max_id) untuk key seperti alamat client atau nama
+    room, agar paket cukup membawa id 2 byte. Id dibagikan bergiliran dan
+    baru dipakai ulang setelah berputar, sehingga paket lama (mis. replay
+    sesi) tidak cepat merujuk pemilik id yang berbeda. 0 = tidak ada id
+    (tabel penuh).
+    """
+    def __init__(self, max_id: int = MAX_ID):
+        self.max_id = max_id
+        self.ids: Dict[Hashable, int] = {}
+        self.keys: Dict[int, Hashable] = {}
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> int:
+        return self.ids.get(key, 0)
+
+    def key_of(self, id_: int) -> Optional[Hashable]:
+        return self.keys.get(id_)
+
+    def assign(self, key: Hashable) -> Tuple[int, bool]:
+        """Return (id, baru). (0, False) jika semua id sedang dipakai."""
+        with self.lock:
+            id_ = self.ids.get(key)
+            if id_ is not None:
+                return id_, False
+            if len(self.keys) >= self.max_id:
+                return 0, False
+            while self.next_id in self.keys:
+                self.next_id = self.next_id % self.max_id + 1
+            id_ = self.next_id
+            self.next_id = id_ % self.max_id + 1
+            self.ids[key] = id_
+            self.keys[id_] = key
+            return id_, True
+
+    def release(self, key: Hashable) -> int:
+        with self.lock:
+            id_ = self.ids.pop(key, 0)
+            self.keys.pop(id_, None)
+            return id_
+
+    def items(self) -> List[Tuple[Hashable, int]]:
+        with self.lock:
+            return list(self.ids.items())
+
+
+class CommandCodec:
+    """
+    Sisi client: versi protokol hasil negosiasi, encode input user, dan
+    decode paket dari server menjadi baris chat. Tabel id -> nama diisi
+    paket USER/ROOM dan disimpan lintas reconnect agar paket hasil replay
+    sesi tetap bisa ditampilkan.
+    """
+    def __init__(self):
+        self.version = PROTOCOL_TEXT
+        self.user_id = 0
+        self.users: Dict[int, str] = {}
+        self.rooms: Dict[int, str] = {}
+
+    def offer(self) -> str:
+        return make_offer()
+
+    def on_reply(self, text: str) -> bool:
+        """Return True jika pesan adalah jawaban negosiasi (tidak ditampilkan)."""
+        if not text.startswith(REPLY_PREFIX):
+            return False
+        parts = text.split()
+        if len(parts) != 3 or not parts[1].isdigit() or not parts[2].isdigit():
+            return False
+        self.version = int(parts[1])
+        self.user_id = int(parts[2])
+        return True
+
+    def reset(self):
+        """Koneksi baru: kembali ke teks sampai server menjawab penawaran."""
+        self.version = PROTOCOL_TEXT
+
+    def encode(self, name: str, text: str) -> bytes:
+        """Input user sebagai satu pesan: paket jika sudah biner, selain itu teks."""
+        if self.version >= PROTOCOL_BINARY:
+            if not text.startswith("!"):
+                return encode_packet(OP_CHAT, text.encode("utf-8"))
+            command, _, arg = text.partition(" ")
+            opcode = COMMAND_OPCODES.get(command)
+            if opcode is not None:
+                return encode_packet(opcode, arg.encode("utf-8"))
+            # Perintah tak dikenal tetap dikirim sebagai teks agar server
+            # menjawab "Unknown command"
+        return f"{name}: {text}".encode("utf-8")
+
+    def decode(self, data: bytes) -> Optional[str]:
+        """Baris chat dari paket server, atau None untuk paket tabel id."""
+        opcode, user_id, room_id, body = decode_packet(data)
+        text = body.decode("utf-8", errors="replace")
+        if opcode == OP_USER:
+            self.users[user_id] = text
+            return None
+        if opcode == OP_ROOM:
+            self.rooms[room_id] = text
+            return None
+        if opcode != OP_CHAT:
+            return None
+        try:
+            minutes, = CHAT_TIME.unpack_from(body)
+        except struct.error:
+            raise ValueError(f"CHAT packet too short: {len(body)} bytes") from None
+        text = body[CHAT_TIME.size:].decode("utf-8", errors="replace")
+        timestamp = formatted_time(datetime.now().replace(hour=minutes // 60 % 24, minute=minutes % 60))
+        name = self.users.get(user_id, f"User#{user_id}")
+        if room_id:
+            return f"{timestamp} [#{self.rooms.get(room_id, room_id)}] {name}: {text}"
+        return f"{timestamp} {name}: {text}"
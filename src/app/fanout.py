@@ -0,0 +1,254 @@
+# fanout.py
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Union
+from protocol.segment import PreparedMessage
+from protocol.socket_wrapper import BetterUDPSocket
+
+
+OVERFLOW_POLICIES = ("drop_oldest", "disconnect", "coalesce")
+
+
+class OutboxOverflow(Exception):
+    """Outbox penuh dengan kebijakan `disconnect`, atau sender macet terlalu lama."""
+
+
+class Outbox:
+    """
+    Antrian keluar (bounded) milik satu koneksi client.
+
+    broadcast cukup memanggil put() lalu kembali; pengiriman ke jaringan
+    dikerjakan oleh "sender" koneksi tersebut:
+      - koneksi blocking  : thread sender milik outbox (start())
+      - koneksi non-blocking (engine reactor): event loop memanggil pump()
+    Semua pesan yang sudah antri dikirim sebagai satu batch, sehingga satu
+    putaran ACK melayani banyak pesan sekaligus. Pesan broadcast berupa
+    PreparedMessage yang di-chunk sekali dan dipakai bersama semua outbox.
+
+    Backpressure: antrian dibatasi `maxlen` pesan dan `max_bytes` byte.
+    Saat batas terlewati, `overflow` menentukan tindakannya:
+      - drop_oldest : buang pesan tertua sampai muat
+      - disconnect  : tutup outbox dan laporkan lewat on_error
+      - coalesce    : gabungkan antrian menjadi satu pesan; jika byte masih
+                      melebihi batas, pesan tertua dibuang
+    Jika `stall_timeout` di-set, sender yang tertahan di satu batch lebih
+    lama dari itu (peer berhenti ACK) dianggap slow consumer dan diputus.
+
+    `on_sent(data)` (opsional) dipanggil dengan byte setiap batch saat batch
+    diambil sender, yaitu setelah overflow membuang/menggabungkan pesan.
+    """
+    def __init__(self, conn: BetterUDPSocket, maxlen: int = 256,
+                 on_error: Optional[Callable[['Outbox', Exception], None]] = None,
+                 max_bytes: int = 64 * 1024,
+                 overflow: str = "drop_oldest",
+                 stall_timeout: Optional[float] = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.conn = conn
+        self.maxlen = maxlen
+        self.max_bytes = max_bytes
+        self.overflow = overflow
+        self.stall_timeout = stall_timeout
+        self.on_error = on_error
+        self.queue: Deque[Union[bytes, PreparedMessage]] = deque()
+        self.queued_bytes = 0
+        self.cond = threading.Condition()
+        self.closed = False
+        self.sending = False
+        self.send_started = 0.0
+        self.error: Optional[Exception] = None
+        self.thread = None
+        self.on_sent: Optional[Callable[[bytes], None]] = None
+
+        # Metrics
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.sent_messages = 0
+        self.sent_bytes = 0
+
+    def put(self, message: Union[bytes, PreparedMessage]) -> bool:
+        """
+        Antrikan pesan tanpa blocking. Return False jika outbox sudah ditutup;
+        jika penutupan karena overflow/stall, alasannya ada di `error`.
+        """
+        error = None
+        with self.cond:
+            if self.closed:
+                return False
+
+            if (self.stall_timeout is not None and self.sending
+                    and time.time() - self.send_started > self.stall_timeout):
+                error = OutboxOverflow(f"sender stalled for more than {self.stall_timeout}s")
+            elif (len(self.queue) >= self.maxlen
+                    or self.queued_bytes + len(message) > self.max_bytes):
+                error = self._handle_overflow(len(message))
+
+            if error is None:
+                self.queue.append(message)
+                self.queued_bytes += len(message)
+                self.max_depth = max(self.max_depth, len(self.queue))
+                self.cond.notify_all()
+
+        if error is not None:
+            # Jangan panggil on_error di sini: pemanggil put() (broadcast)
+            # bisa sedang memegang lock; cukup return False dan simpan error
+            self._fail(error, notify=False)
+            return False
+        return True
+
+    def _handle_overflow(self, incoming: int) -> Optional[Exception]:
+        """Terapkan kebijakan overflow (dipanggil dengan cond dipegang)."""
+        if self.overflow == "disconnect":
+            return OutboxOverflow(f"outbox full ({len(self.queue)} messages, {self.queued_bytes} bytes)")
+
+        # drop_oldest dan coalesce sama-sama membuang pesan tertua jika byte
+        # antrian tidak cukup untuk pesan baru
+        while self.queue and self.queued_bytes + incoming > self.max_bytes:
+            self._drop_oldest()
+
+        if len(self.queue) >= self.maxlen:
+            if self.overflow == "coalesce":
+                merged = b"".join(m.data if isinstance(m, PreparedMessage) else m for m in self.queue)
+                self.coalesced += len(self.queue) - 1
+                self.queue.clear()
+                self.queue.append(merged)
+            else:
+                while len(self.queue) >= self.maxlen:
+                    self._drop_oldest()
+        return None
+
+    def _drop_oldest(self):
+        self.queued_bytes -= len(self.queue.popleft())
+        self.dropped += 1
+
+    def stats(self) -> dict:
+        """Snapshot metrics outbox."""
+        with self.cond:
+            return {
+                "depth": len(self.queue),
+                "bytes": self.queued_bytes,
+                "max_depth": self.max_depth,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "sent_messages": self.sent_messages,
+                "sent_bytes": self.sent_bytes,
+                "stalled_for": time.time() - self.send_started if self.sending else 0.0,
+            }
+
+    def start(self):
+        """Jalankan thread sender untuk koneksi blocking."""
+        self.thread = threading.Thread(target=self._sender_loop, daemon=True)
+        self.thread.start()
+
+    def _take_batch(self) -> List[PreparedMessage]:
+        # PreparedMessage dipakai apa adanya; bytes yang berurutan digabung
+        # dulu agar segment-nya tetap terisi penuh
+        batch: List[PreparedMessage] = []
+        raw: List[bytes] = []
+        chunk_size = self.conn.max_payload_size
+        for message in self.queue:
+            if isinstance(message, PreparedMessage):
+                if raw:
+                    batch.append(PreparedMessage(b"".join(raw), chunk_size))
+                    raw = []
+                batch.append(message)
+            else:
+                raw.append(message)
+        if raw:
+            batch.append(PreparedMessage(b"".join(raw), chunk_size))
+        if self.on_sent is not None:
+            self.on_sent(b"".join(m.data for m in batch))
+        self.sent_messages += len(self.queue)
+        self.sent_bytes += self.queued_bytes
+        self.queue.clear()
+        self.queued_bytes = 0
+        self.sending = True
+        self.send_started = time.time()
+        return batch
+
+    def _sender_loop(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if not self.queue:
+                    return
+                batch = self._take_batch()
+
+            try:
+                self.conn.send_prepared(batch)
+            except Exception as e:
+                self._fail(e)
+                return
+            finally:
+                with self.cond:
+                    self.sending = False
+                    self.cond.notify_all()
+
+    def pump(self):
+        """
+        Untuk koneksi non-blocking: serahkan batch berikutnya ke socket hanya
+        jika batch sebelumnya sudah keluar dari antrian chunk socket.
+        Dipanggil oleh event loop setiap tick.
+        """
+        if self.conn.pending_chunks:
+            return
+        with self.cond:
+            if not self.queue:
+                self.sending = False
+                self.cond.notify_all()
+                return
+            batch = self._take_batch()
+        try:
+            self.conn.send_prepared(batch)
+        except Exception as e:
+            self._fail(e)
+
+    def _fail(self, error: Exception, notify: bool = True):
+        with self.cond:
+            if self.closed:
+                return
+            self.error = error
+            self.closed = True
+            if isinstance(error, OutboxOverflow):
+                self.queue.clear()
+                self.queued_bytes = 0
+            # Gagal kirim (koneksi mati): antrian dibiarkan agar take_pending()
+            # masih bisa menyimpannya ke sesi; close() tetap membuangnya
+            self.cond.notify_all()
+        if notify and self.on_error:
+            self.on_error(self, error)
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Tunggu sampai antrian kosong dan batch terakhir selesai dikirim.
+        Hanya untuk outbox dengan thread sender. Return False jika timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.cond:
+            while (self.queue or self.sending) and not self.closed:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def take_pending(self) -> bytes:
+        """Tutup outbox dan kembalikan byte yang masih antri (belum dikirim)."""
+        with self.cond:
+            pending = b"".join(m.data if isinstance(m, PreparedMessage) else m for m in self.queue)
+            self.closed = True
+            self.queue.clear()
+            self.queued_bytes = 0
+            self.cond.notify_all()
+            return pending
+
+    def close(self):
+        """Tutup outbox; pesan yang masih antri dibuang."""
+        with self.cond:
+            self.closed = True
+            self.queue.clear()
+            self.queued_bytes = 0
+            self.cond.notify_all()
@@ -0,0 +1,269 @@
+# federation.py
+import base64
+import binascii
+import hmac
+import itertools
+import secrets
+import socket
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from protocol.framing import FramingError, encode_message
+from protocol.socket_wrapper import BetterUDPSocket
+from app.fanout import Outbox
+
+
+# Link antar server memakai segment besar: banyak pesan relay muat dalam satu
+# segment sehingga satu putaran ACK membawa satu batch penuh
+FEDERATION_MTU = 1400
+LINK_OUTBOX_OPTIONS = {
+    "maxlen": 4096,
+    "max_bytes": 1024 * 1024,
+    "overflow": "drop_oldest",
+    "stall_timeout": None,
+}
+
+
+class FederationLink:
+    """Satu koneksi ke server lain beserta antrian keluarnya."""
+    def __init__(self, addr: tuple, conn: BetterUDPSocket, outbox: Outbox,
+                 node_id: str, outbound: bool):
+        self.addr = addr
+        self.conn = conn
+        self.outbox = outbox
+        self.node_id = node_id
+        self.outbound = outbound
+
+
+class Federation:
+    """
+    Menghubungkan beberapa server chat menjadi satu room logis.
+
+    Server saling terhubung lewat BetterUDPSocket biasa, dengan framing
+    pesan yang sama seperti client. Sisi yang membuka link mengirim pesan
+    `!peer <node_id> [secret]`; setelah itu kedua arah membawa pesan
+    `!relay <origin> <msg_id> <base64 pesan>`.
+
+    - Autentikasi link: `!peer` hanya diterima dengan `secret` yang sama.
+      Alamat asal tidak dipercaya (client lokal pun berasal dari 127.0.0.1),
+      jadi tanpa secret semua link masuk ditolak.
+    - Loop prevention: setiap pesan diberi (origin, msg_id). Pesan yang sudah
+      pernah dilihat (cache `seen` terbatas) atau berasal dari node ini
+      sendiri dibuang, dan pesan tidak pernah dikirim balik ke link asalnya.
+      Topologi mesh/cycle pun aman. 32 bit atas msg_id adalah epoch acak
+      per proses, sehingga node yang di-restart tidak mengulang msg_id yang
+      masih tersimpan di cache `seen` node lain.
+    - Per-link queue: setiap link punya Outbox sendiri, sehingga link yang
+      lambat tidak menahan link lain maupun client lokal.
+    - Batching: Outbox menggabungkan frame relay yang antri menjadi satu
+      kiriman dan link memakai segment FEDERATION_MTU.
+
+    Pesan untuk satu room membawa nama room sebagai field tambahan:
+    `!relay <origin> <msg_id> <base64 pesan> <room>`.
+
+    `deliver(message, room)` dipanggil untuk pesan dari node lain yang harus
+    dikirim ke client lokal (room None = semua client).
+    """
+    def __init__(self, node_id: str, deliver: Callable[[bytes, Optional[str]], None],
+                 seen_size: int = 4096, debug: bool = False, secret: Optional[str] = None):
+        self.node_id = node_id
+        self.deliver = deliver
+        self.seen_size = seen_size
+        self.debug = debug
+        self.secret = secret
+        self.seen: "OrderedDict[tuple, None]" = OrderedDict()
+        self.links: Dict[tuple, FederationLink] = {}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.epoch = secrets.randbits(32)
+        self._msg_ids = itertools.count((self.epoch << 32) | 1)
+
+        # Metrics
+        self.relayed_in = 0
+        self.relayed_out = 0
+        self.duplicates = 0
+
+    def _remember(self, origin: str, msg_id: int) -> bool:
+        """Catat (origin, msg_id). Return False jika sudah pernah dilihat."""
+        key = (origin, msg_id)
+        with self.lock:
+            if origin == self.node_id or key in self.seen:
+                self.duplicates += 1
+                return False
+            self.seen[key] = None
+            if len(self.seen) > self.seen_size:
+                self.seen.popitem(last=False)
+            return True
+
+    def publish(self, message: bytes, room: Optional[str] = None):
+        """Teruskan pesan broadcast lokal ke semua node lain."""
+        self._forward(self.node_id, next(self._msg_ids), message, room, exclude=None)
+
+    def _forward(self, origin: str, msg_id: int, message: bytes, room: Optional[str],
+                 exclude: Optional[tuple]):
+        line = f"!relay {origin} {msg_id} ".encode("utf-8") + base64.b64encode(message)
+        if room is not None:
+            line += b" " + room.encode("utf-8")
+        frame = encode_message(line)
+        with self.lock:
+            links = [link for link in self.links.values() if link.addr != exclude]
+        for link in links:
+            if link.outbox.put(frame):
+                self.relayed_out += 1
+
+    def peer_line(self) -> bytes:
+        """Pesan pembuka link keluar: `!peer <node_id> [secret]`."""
+        line = f"!peer {self.node_id}"
+        if self.secret is not None:
+            line += f" {self.secret}"
+        return line.encode("utf-8")
+
+    def accept_peer(self, addr: tuple, args: str) -> Optional[str]:
+        """
+        Periksa argumen `!peer` dari koneksi masuk `addr`. Return node_id
+        jika koneksi boleh menjadi link federation, None jika ditolak.
+        """
+        parts = args.split(" ")
+        if self.secret is None or len(parts) != 2 or not parts[0]:
+            return None
+        if not hmac.compare_digest(parts[1].encode("utf-8"), self.secret.encode("utf-8")):
+            return None
+        return parts[0]
+
+    def handle_link_line(self, addr: tuple, text: str) -> bool:
+        """
+        Proses satu baris dari link federation. Return True jika baris
+        tersebut adalah pesan federation (walaupun duplikat).
+        """
+        parts = text.split(" ")
+        if len(parts) not in (4, 5) or parts[0] != "!relay":
+            return False
+        _, origin, msg_id, encoded = parts[:4]
+        room = parts[4] if len(parts) == 5 else None
+        try:
+            message = base64.b64decode(encoded, validate=True)
+            msg_id = int(msg_id)
+        except (ValueError, binascii.Error):
+            print(f"[FEDERATION] Malformed relay from {addr}")
+            return True
+
+        if not self._remember(origin, msg_id):
+            return True
+        self.relayed_in += 1
+        self.deliver(message, room)
+        self._forward(origin, msg_id, message, room, exclude=addr)
+        return True
+
+    def attach(self, addr: tuple, conn: BetterUDPSocket, outbox: Outbox,
+               node_id: str, outbound: bool = False) -> FederationLink:
+        """Daftarkan koneksi sebagai link federation."""
+        conn.set_segment_size(FEDERATION_MTU)
+        # Batas antrian link jauh lebih longgar daripada client biasa dan
+        # kegagalannya ditangani oleh pemilik link, bukan callback client
+        for option, value in LINK_OUTBOX_OPTIONS.items():
+            setattr(outbox, option, value)
+        outbox.on_error = None
+        link = FederationLink(addr, conn, outbox, node_id, outbound)
+        with self.lock:
+            self.links[addr] = link
+        print(f"[FEDERATION] Link {'to' if outbound else 'from'} node {node_id} ({addr}) established")
+        return link
+
+    def detach(self, addr: tuple) -> Optional[FederationLink]:
+        with self.lock:
+            link = self.links.pop(addr, None)
+        if link is not None:
+            link.outbox.close()
+            print(f"[FEDERATION] Link with node {link.node_id} ({addr}) closed")
+        return link
+
+    def is_link(self, addr: tuple) -> bool:
+        with self.lock:
+            return addr in self.links
+
+    def pump(self):
+        """Kosongkan outbox link non-blocking (engine reactor)."""
+        with self.lock:
+            links = list(self.links.values())
+        for link in links:
+            if link.outbox.queue and not link.conn.blocking:
+                link.outbox.pump()
+
+    def connect_to(self, host: str, port: int):
+        """Buka dan pertahankan link ke node lain di thread tersendiri."""
+        thread = threading.Thread(target=self._maintain_link, args=(host, port), daemon=True)
+        thread.start()
+
+    def _maintain_link(self, host: str, port: int):
+        backoff = 1.0
+        while not self.stop_event.is_set():
+            conn = BetterUDPSocket(debug=self.debug)
+            try:
+                conn.connect(host, port)
+            except Exception as e:
+                if self.debug:
+                    print(f"[FEDERATION] Cannot reach {host}:{port}: {e}")
+                conn.udp_socket.close()
+                # Node lain mungkin belum jalan, coba lagi dengan backoff
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+
+            backoff = 1.0
+            addr = conn.peer_addr
+            # Link ke node yang mati terdeteksi lewat keepalive lalu dibuka ulang
+            conn.enable_keepalive()
+            outbox = Outbox(conn)
+            outbox.start()
+            outbox.put(encode_message(self.peer_line()))
+            self.attach(addr, conn, outbox, node_id=f"{host}:{port}", outbound=True)
+            try:
+                self._read_link(addr, conn)
+            finally:
+                self.detach(addr)
+                try:
+                    if conn.connected:
+                        conn.close()
+                except Exception:
+                    pass
+            self.stop_event.wait(backoff)
+
+    def _read_link(self, addr: tuple, conn: BetterUDPSocket):
+        while conn.connected and not self.stop_event.is_set():
+            try:
+                message = conn.recv_message(timeout=1.0)
+            except socket.timeout:
+                continue
+            except FramingError as e:
+                print(f"[FEDERATION] Protocol error from {addr}: {e}")
+                return
+            except Exception:
+                return
+            if message is None:
+                continue
+            text = message.decode("utf-8", errors="replace").strip()
+            # Pesan selain relay (misalnya balasan server) diabaikan
+            self.handle_link_line(addr, text)
+
+    def stats(self) -> dict:
+        with self.lock:
+            links = len(self.links)
+        return {
+            "links": links,
+            "relayed_in": self.relayed_in,
+            "relayed_out": self.relayed_out,
+            "duplicates": self.duplicates,
+        }
+
+    def close(self):
+        """Tutup semua link."""
+        self.stop_event.set()
+        with self.lock:
+            links = list(self.links.values())
+        for link in links:
+            self.detach(link.addr)
+            try:
+                if link.conn.connected:
+                    link.conn.close()
+            except Exception:
+                pass
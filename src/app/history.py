@@ -0,0 +1,147 @@
+# history.py
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Iterator, List, Optional, Tuple
+from protocol.segment import PreparedMessage
+
+
+# Catch-up dikirim dengan segment besar (setara link federation), bukan
+# chunk 64 byte per baris
+CATCHUP_PAYLOAD = 1400 - 20
+
+
+class HistoryLog:
+    """
+    Log append-only berbasis mmap untuk history chat.
+
+    Format record: room_len (u16) | msg_len (u32) | room | pesan. Sisa file
+    yang belum terpakai berisi nol, sehingga room_len == 0 menandai akhir
+    data. File diperbesar dua kali lipat (lalu di-mmap ulang) saat penuh.
+    """
+    HEADER = struct.Struct("!HI")
+
+    def __init__(self, path: str, initial_size: int = 1024 * 1024):
+        self.path = path
+        self.file = open(path, "a+b")
+        size = os.fstat(self.file.fileno()).st_size
+        if size == 0:
+            self.file.truncate(initial_size)
+            size = initial_size
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.offset = self._find_end()
+
+    def _find_end(self) -> int:
+        offset = 0
+        for offset, _, _ in self._scan():
+            pass
+        return offset
+
+    def _scan(self) -> Iterator[Tuple[int, str, bytes]]:
+        """Yield (offset akhir record, room, pesan) untuk setiap record utuh."""
+        offset = 0
+        size = len(self.map)
+        while offset + self.HEADER.size <= size:
+            room_len, msg_len = self.HEADER.unpack_from(self.map, offset)
+            end = offset + self.HEADER.size + room_len + msg_len
+            if room_len == 0 or end > size:
+                break
+            start = offset + self.HEADER.size
+            room = self.map[start:start + room_len].decode("utf-8", errors="replace")
+            yield end, room, self.map[start + room_len:end]
+            offset = end
+
+    def replay(self) -> Iterator[Tuple[str, bytes]]:
+        for _, room, message in self._scan():
+            yield room, message
+
+    def append(self, room: str, message: bytes):
+        encoded_room = room.encode("utf-8")
+        record = self.HEADER.pack(len(encoded_room), len(message)) + encoded_room + message
+        if self.offset + len(record) > len(self.map):
+            self._grow(self.offset + len(record))
+        self.map[self.offset:self.offset + len(record)] = record
+        self.offset += len(record)
+
+    def _grow(self, needed: int):
+        size = len(self.map)
+        while size < needed:
+            size *= 2
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+
+class HistoryStore:
+    """
+    Ring buffer history per room (maksimal `capacity` pesan per room).
+
+    Ring room yang jarang dipakai dibuang (LRU) jika jumlah room melebihi
+    `max_rooms`, karena nama room ditentukan user. Jika `log` diberikan,
+    setiap pesan juga ditulis ke HistoryLog dan ring diisi ulang dari log
+    saat server start.
+    """
+    def __init__(self, capacity: int = 100, max_rooms: int = 1024,
+                 log: Optional[HistoryLog] = None):
+        self.capacity = capacity
+        self.max_rooms = max_rooms
+        self.log = log
+        self.rings: "OrderedDict[str, Deque[bytes]]" = OrderedDict()
+        self.lock = threading.Lock()
+        if log is not None:
+            for room, message in log.replay():
+                self._ring(room).append(message)
+
+    def _ring(self, room: str) -> Deque[bytes]:
+        ring = self.rings.get(room)
+        if ring is None:
+            ring = self.rings[room] = deque(maxlen=self.capacity)
+            if len(self.rings) > self.max_rooms:
+                self.rings.popitem(last=False)
+        else:
+            self.rings.move_to_end(room)
+        return ring
+
+    def append(self, room: str, message: bytes):
+        with self.lock:
+            self._ring(room).append(message)
+            if self.log is not None:
+                self.log.append(room, message)
+
+    def recent(self, room: str, n: int) -> List[bytes]:
+        """n pesan terakhir di room, dari yang terlama."""
+        with self.lock:
+            ring = self.rings.get(room)
+            if not ring or n <= 0:
+                return []
+            return list(ring)[-n:]
+
+    def catch_up(self, room: str, n: int, header: bytes = b"",
+                 frame: Optional[Callable[[bytes], bytes]] = None) -> Optional[PreparedMessage]:
+        """
+        n pesan terakhir sebagai satu PreparedMessage bulk, siap dimasukkan
+        ke outbox. Jika `frame` diberikan (mis. framing.encode_message),
+        header dan setiap pesan dibungkus frame sendiri. Return None jika
+        history room kosong.
+        """
+        messages = self.recent(room, n)
+        if not messages:
+            return None
+        if frame is not None:
+            messages = [frame(message) for message in messages]
+            header = frame(header) if header else b""
+        return PreparedMessage(header + b"".join(messages), CATCHUP_PAYLOAD, bulk=True)
+
+    def close(self):
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
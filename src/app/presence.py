@@ -0,0 +1,73 @@
+# presence.py
+import threading
+import time
+from typing import Callable, Optional
+
+
+class PresenceNotifier:
+    """
+    Push jumlah client online ke subscriber, menggantikan polling !heartbeat.
+
+    Setiap perubahan keanggotaan cukup memanggil mark_changed(). Perubahan
+    dikumpulkan selama `window` detik, lalu `get_count()` dibaca sekali dan
+    `publish(count)` hanya dipanggil jika nilainya berbeda dari yang terakhir
+    dikirim. Join/leave beruntun (mis. 100 client connect bersamaan) hanya
+    menghasilkan satu update.
+
+    Dijalankan oleh thread sendiri (start()) atau dipoll dari event loop
+    (poll()).
+    """
+    def __init__(self, get_count: Callable[[], int], publish: Callable[[int], None],
+                 window: float = 0.25):
+        self.get_count = get_count
+        self.publish = publish
+        self.window = window
+        self.dirty_since: Optional[float] = None
+        self.last_count: Optional[int] = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+
+        # Metrics
+        self.changes = 0
+        self.updates = 0
+
+    def mark_changed(self):
+        with self.lock:
+            self.changes += 1
+            if self.dirty_since is None:
+                self.dirty_since = time.time()
+        self.wakeup.set()
+
+    def poll(self, now: float = None) -> bool:
+        """Kirim update jika window sudah lewat. Return True jika ada yang dikirim."""
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.dirty_since is None or now - self.dirty_since < self.window:
+                return False
+            self.dirty_since = None
+        count = self.get_count()
+        if count == self.last_count:
+            return False
+        self.last_count = count
+        self.updates += 1
+        self.publish(count)
+        return True
+
+    def start(self):
+        self.running = True
+
+        def _loop():
+            while self.running:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                time.sleep(self.window)
+                self.poll()
+
+        self.thread = threading.Thread(target=_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
@@ -0,0 +1,74 @@
+# ratelimit.py
+import time
+from typing import Tuple
+
+
+RATE_LIMIT_PENALTIES = ("delay", "drop", "disconnect")
+
+
+class TokenBucket:
+    """
+    Token bucket: token bertambah `rate` per detik sampai maksimal `burst`.
+    Satu pesan memakai `amount` token. rate <= 0 berarti tidak dibatasi.
+    """
+    def __init__(self, rate: float, burst: float, now: float = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.time() if now is None else now
+
+    def _refill(self, now: float):
+        if now > self.last:
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Detik sampai `amount` token tersedia (0 = sekarang), tanpa memakai token."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        # Pesan yang lebih besar dari burst cukup menunggu bucket penuh
+        amount = min(amount, self.burst)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= min(amount, self.burst)
+
+
+class RateLimiter:
+    """
+    Batas laju per koneksi: pesan/detik dan byte/detik, masing-masing dengan
+    token bucket sendiri. Pesan hanya lolos jika kedua bucket cukup.
+
+    admit() mengembalikan (verdict, wait):
+      - ("ok", 0)          : pesan boleh diproses, token sudah dipakai
+      - ("delay", detik)   : penalty delay; tunda pembacaan lalu panggil lagi
+      - ("drop", 0)        : penalty drop; buang pesan
+      - ("disconnect", 0)  : penalty disconnect; putus client
+    """
+    def __init__(self, msg_rate: float, msg_burst: float, byte_rate: float, byte_burst: float,
+                 penalty: str = "delay"):
+        if penalty not in RATE_LIMIT_PENALTIES:
+            raise ValueError(f"Unknown rate limit penalty: {penalty}")
+        self.messages = TokenBucket(msg_rate, msg_burst)
+        self.bytes = TokenBucket(byte_rate, byte_burst)
+        self.penalty = penalty
+
+        # Metrics
+        self.admitted = 0
+        self.limited = 0
+
+    def admit(self, nbytes: int, now: float = None) -> Tuple[str, float]:
+        now = time.time() if now is None else now
+        wait = max(self.messages.wait_time(1, now), self.bytes.wait_time(nbytes, now))
+        if wait == 0:
+            self.messages.consume(1)
+            self.bytes.consume(nbytes)
+            self.admitted += 1
+            return "ok", 0.0
+        self.limited += 1
+        if self.penalty == "delay":
+            return "delay", wait
+        return self.penalty, 0.0
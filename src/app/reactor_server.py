@@ -0,0 +1,210 @@
+# reactor_server.py
+import selectors
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from protocol.framing import FramingError, HEADER_SIZE as FRAME_HEADER_SIZE
+from protocol.socket_wrapper import BetterUDPSocket
+
+
+class ClientState:
+    """State per koneksi yang dipegang oleh event loop."""
+    def __init__(self, conn: BetterUDPSocket, addr: tuple):
+        self.conn = conn
+        self.addr = addr
+        self.username = f"User-{addr[1]}"
+        self.established = False
+        # Rate limit delay: pesan `held` tidak diproses sebelum waktu ini
+        self.paused_until: Optional[float] = None
+        self.held: Optional[bytes] = None
+
+
+class ReactorServer:
+    """
+    Engine server berbasis selectors (epoll di Linux). Satu thread menjalankan
+    semua koneksi BetterUDPSocket dalam mode non-blocking: handshake,
+    pembacaan segment, ACK, dan retransmission. Setiap pesan (frame
+    length-prefix, lihat protocol.framing) yang lengkap diteruskan apa
+    adanya (teks atau paket biner) ke callback handler.
+
+    Callback:
+      on_connect(conn, addr) -> bool          : daftarkan client, False = tolak
+      on_message(conn, addr, username, data)  : return (username, disconnect)
+      on_disconnect(conn, addr, username)     : bersihkan client
+      on_tick()                               : opsional, dipanggil setiap putaran loop
+      admit(addr, nbytes) -> (verdict, wait)  : opsional, rate limit per pesan
+                                                (lihat RateLimiter.admit)
+
+    Pesan yang kena penalty delay ditahan dan diproses lagi setelah jeda;
+    selama jeda data baru tetap dibaca (dan di-ACK) ke decoder sampai byte
+    yang tertahan melewati `paused_buffer_limit`, lalu client diputus.
+    """
+    def __init__(self,
+                 listener: BetterUDPSocket,
+                 on_connect: Callable[[BetterUDPSocket, tuple], bool],
+                 on_message: Callable[[BetterUDPSocket, tuple, str, bytes], Tuple[str, bool]],
+                 on_disconnect: Callable[[BetterUDPSocket, tuple, str], None],
+                 stop_event: threading.Event,
+                 on_tick: Callable[[], None] = None,
+                 tick: float = 0.05,
+                 admit: Callable[[tuple, int], Tuple[str, float]] = None,
+                 paused_buffer_limit: int = 64 * 1024):
+        self.listener = listener
+        self.on_connect = on_connect
+        self.on_message = on_message
+        self.on_disconnect = on_disconnect
+        self.stop_event = stop_event
+        self.on_tick = on_tick
+        self.tick = tick
+        self.admit = admit
+        self.paused_buffer_limit = paused_buffer_limit
+        self.selector = selectors.DefaultSelector()
+        self.clients: Dict[tuple, ClientState] = {}
+
+    def run(self):
+        """Jalankan event loop sampai stop_event di-set."""
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ, None)
+        try:
+            while not self.stop_event.is_set():
+                for key, _ in self.selector.select(self.tick):
+                    if key.data is None:
+                        self._accept_ready()
+                    else:
+                        self._read_ready(key.data)
+                self._service_timers()
+        finally:
+            try:
+                self.selector.unregister(self.listener)
+            except (KeyError, ValueError):
+                pass
+
+    def drain(self, timeout: float = 2.0):
+        """
+        Setelah event loop berhenti, terus proses ACK dan retransmission
+        sampai semua data keluar terkirim atau timeout habis.
+        """
+        deadline = time.time() + timeout
+        checked_tick = False
+        while time.time() < deadline:
+            busy = [s for s in self.clients.values()
+                    if s.conn.connected and (s.conn.pending_chunks or s.conn.send_window.buffer)]
+            if not busy and checked_tick:
+                break
+            # Minimal satu tick agar on_tick sempat menyerahkan data yang masih antri
+            checked_tick = True
+            for key, _ in self.selector.select(self.tick):
+                if key.data is not None:
+                    key.data.conn.pump()
+            self._service_timers()
+
+    def _accept_ready(self):
+        while True:
+            accepted = self.listener.accept_nowait()
+            if accepted is None:
+                return
+            conn, addr = accepted
+            if addr in self.clients:
+                # SYN duplikat (retransmit) untuk koneksi yang sedang handshake
+                conn.udp_socket.close()
+                continue
+            state = ClientState(conn, addr)
+            self.clients[addr] = state
+            self.selector.register(conn, selectors.EVENT_READ, state)
+            if conn.connected:
+                # Fast open: data dari SYN sudah di buffer, proses sekarang
+                self._read_ready(state)
+
+    def _read_ready(self, state: ClientState):
+        conn = state.conn
+
+        if not state.established:
+            # Selesaikan handshake dulu (final ACK), data ikut diproses pump()
+            conn.pump()
+            if not conn.connected:
+                return
+            state.established = True
+            if not self.on_connect(conn, state.addr):
+                self._drop(state, notify=False)
+                return
+
+        if not conn.connected:
+            return
+        if state.paused_until is not None:
+            # Tetap baca (dan ACK) data baru; pesan diproses setelah jeda
+            conn.message_decoder.feed(conn.receive())
+            if conn.message_decoder.buffered > self.paused_buffer_limit:
+                print(f"[REACTOR] <{state.username}> ({state.addr}) Flooding while rate limited, dropping")
+                self._drop(state)
+            return
+        self._process_messages(state)
+
+    def _process_messages(self, state: ClientState):
+        conn = state.conn
+        while True:
+            message, state.held = state.held, None
+            try:
+                if message is None and conn.connected:
+                    message = conn.recv_message()
+                elif message is None:
+                    message = conn.message_decoder.next_message()
+            except FramingError as e:
+                print(f"[REACTOR] <{state.username}> ({state.addr}) Protocol error: {e}")
+                self._drop(state)
+                return
+            if message is None:
+                return
+            if self.admit is not None:
+                verdict, wait = self.admit(state.addr, len(message) + FRAME_HEADER_SIZE)
+                if verdict == "delay":
+                    # Pesan ditahan, dicoba lagi oleh _service_timers
+                    state.held = message
+                    state.paused_until = time.time() + wait
+                    return
+                if verdict == "drop":
+                    continue
+                if verdict == "disconnect":
+                    self._drop(state)
+                    return
+            try:
+                state.username, disconnect = self.on_message(conn, state.addr, state.username, message)
+            except Exception as e:
+                print(f"[REACTOR] <{state.username}> ({state.addr}) Handler error: {e}")
+                disconnect = True
+            if disconnect:
+                self._drop(state)
+                return
+            if self.stop_event.is_set():
+                return
+
+    def _service_timers(self):
+        if self.on_tick:
+            self.on_tick()
+        now = time.time()
+        for state in list(self.clients.values()):
+            conn = state.conn
+            if state.paused_until is not None and now >= state.paused_until and conn.connected:
+                state.paused_until = None
+                self._process_messages(state)
+                if state.addr not in self.clients:
+                    continue
+            if not state.established and not conn.connected and now > conn.handshake_deadline:
+                # Final ACK tidak pernah datang
+                self._drop(state, notify=False)
+                continue
+            if state.established and not conn.connected:
+                self._drop(state)
+                continue
+            if conn.send_window.buffer or conn._synack is not None or conn.keepalive_idle is not None:
+                conn.service_timers(now)
+
+    def _drop(self, state: ClientState, notify: bool = True):
+        self.clients.pop(state.addr, None)
+        try:
+            self.selector.unregister(state.conn)
+        except (KeyError, ValueError):
+            pass
+        if notify:
+            self.on_disconnect(state.conn, state.addr, state.username)
+        else:
+            state.conn.close()
@@ -0,0 +1,96 @@
+# reaper.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional
+
+
+class IdleReaper:
+    """
+    Pelacak aktivitas terakhir setiap koneksi dengan satu struktur timer.
+
+    Entri disimpan di OrderedDict yang terurut menurut waktu aktivitas
+    terakhir: touch() memindahkan entri ke belakang (O(1)), sehingga entri
+    paling lama diam selalu ada di depan. poll() cukup memeriksa bagian depan
+    dan mengeluarkan semua yang kedaluwarsa sekaligus (maksimal `batch_size`
+    per panggilan), lalu memanggil on_expire(keys) sekali untuk satu batch.
+
+    timeout=None: tidak ada eviction karena diam, hanya lewat expire()
+    (misalnya koneksi yang dinyatakan mati oleh keepalive).
+    """
+    def __init__(self, timeout: Optional[float], on_expire: Callable[[List[Hashable]], None],
+                 batch_size: int = 256):
+        self.timeout = timeout
+        self.on_expire = on_expire
+        self.batch_size = batch_size
+        self.entries: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+        # Metrics
+        self.evicted = 0
+        self.batches = 0
+
+    def add(self, key: Hashable, now: float = None):
+        """Mulai lacak key."""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.entries[key] = now
+            self.entries.move_to_end(key)
+
+    def touch(self, key: Hashable, now: float = None):
+        """Catat aktivitas key. Key yang tidak dilacak (sudah dikeluarkan) diabaikan."""
+        now = time.time() if now is None else now
+        with self.lock:
+            if key in self.entries:
+                self.entries[key] = now
+                self.entries.move_to_end(key)
+
+    def expire(self, key: Hashable):
+        """Tandai key untuk dikeluarkan pada poll() berikutnya."""
+        with self.lock:
+            if key in self.entries:
+                self.entries[key] = float("-inf")
+                self.entries.move_to_end(key, last=False)
+
+    def remove(self, key: Hashable):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def poll(self, now: float = None) -> List[Hashable]:
+        """Keluarkan satu batch key yang kedaluwarsa dan laporkan lewat on_expire."""
+        now = time.time() if now is None else now
+        cutoff = float("-inf") if self.timeout is None else now - self.timeout
+        expired = []
+        with self.lock:
+            while self.entries and len(expired) < self.batch_size:
+                key, last = next(iter(self.entries.items()))
+                if last > cutoff:
+                    break
+                self.entries.popitem(last=False)
+                expired.append(key)
+        if expired:
+            self.evicted += len(expired)
+            self.batches += 1
+            self.on_expire(expired)
+        return expired
+
+    def start(self, interval: float = 0.5):
+        """Jalankan poll() periodik di thread sendiri (engine thread)."""
+        self.running = True
+
+        def _loop():
+            while self.running:
+                time.sleep(interval)
+                while self.poll():
+                    pass
+
+        self.thread = threading.Thread(target=_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,92 @@
+# rooms.py
+import re
+import threading
+from typing import Dict, Hashable, List, Set, Tuple
+
+
+DEFAULT_ROOM = "lobby"
+ROOM_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+
+class RoomIndex:
+    """
+    Index keanggotaan room untuk fan-out yang tertarget.
+
+    - members  : room   -> set member (untuk fan-out, O(ukuran room))
+    - rooms_of : member -> set room   (reverse index, untuk leave_all saat
+                                       client keluar tanpa memindai semua room)
+    - active   : member -> room tujuan pesan chat member tersebut
+
+    Room yang kosong dihapus otomatis, kecuali DEFAULT_ROOM.
+    """
+    def __init__(self):
+        self.members: Dict[str, Set[Hashable]] = {DEFAULT_ROOM: set()}
+        self.rooms_of: Dict[Hashable, Set[str]] = {}
+        self.active: Dict[Hashable, str] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def valid_name(room: str) -> bool:
+        return bool(ROOM_NAME_PATTERN.match(room))
+
+    def join(self, member: Hashable, room: str, activate: bool = True) -> bool:
+        """Masukkan member ke room. Return False jika sudah menjadi anggota."""
+        with self.lock:
+            joined = self.rooms_of.setdefault(member, set())
+            is_new = room not in joined
+            joined.add(room)
+            self.members.setdefault(room, set()).add(member)
+            if activate or member not in self.active:
+                self.active[member] = room
+            return is_new
+
+    def leave(self, member: Hashable, room: str) -> bool:
+        """Keluarkan member dari room. Return False jika bukan anggota."""
+        with self.lock:
+            joined = self.rooms_of.get(member)
+            if not joined or room not in joined:
+                return False
+            joined.discard(room)
+            self._discard_member(room, member)
+            if self.active.get(member) == room:
+                # Pindah ke room lain yang masih diikuti, utamakan lobby
+                if DEFAULT_ROOM in joined or not joined:
+                    self.active[member] = DEFAULT_ROOM
+                else:
+                    self.active[member] = sorted(joined)[0]
+            return True
+
+    def leave_all(self, member: Hashable) -> List[str]:
+        """Hapus member dari semua room (client disconnect)."""
+        with self.lock:
+            joined = self.rooms_of.pop(member, set())
+            self.active.pop(member, None)
+            for room in joined:
+                self._discard_member(room, member)
+            return sorted(joined)
+
+    def _discard_member(self, room: str, member: Hashable):
+        members = self.members.get(room)
+        if members is None:
+            return
+        members.discard(member)
+        if not members and room != DEFAULT_ROOM:
+            del self.members[room]
+
+    def members_of(self, room: str) -> List[Hashable]:
+        """Salinan daftar anggota room (aman diiterasi tanpa lock)."""
+        with self.lock:
+            return list(self.members.get(room, ()))
+
+    def rooms_for(self, member: Hashable) -> List[str]:
+        with self.lock:
+            return sorted(self.rooms_of.get(member, ()))
+
+    def active_room(self, member: Hashable) -> str:
+        with self.lock:
+            return self.active.get(member, DEFAULT_ROOM)
+
+    def list_rooms(self) -> List[Tuple[str, int]]:
+        """(nama room, jumlah anggota), terurut menurut nama."""
+        with self.lock:
+            return sorted((room, len(members)) for room, members in self.members.items())
@@ -1,9 +1,31 @@
 # server.py - Fixed version
+import argparse
+import os
+import shutil
 import socket
+import sys
+import tempfile
 import threading
 import time
 from datetime import datetime
-from protocol.socket_wrapper import BetterUDPSocket
+from protocol.segment import PreparedMessage
+from protocol.framing import FramingError, HEADER_SIZE as FRAME_HEADER_SIZE, encode_message
+from protocol.socket_wrapper import BetterUDPSocket, close_all
+from app.reactor_server import ReactorServer
+from app.workers import KeyedExecutor
+from app.fanout import Outbox, OutboxOverflow, OVERFLOW_POLICIES
+from app.shard_bus import ShardBus
+from app.federation import Federation
+from app.presence import PresenceNotifier
+from app.reaper import IdleReaper
+from app.rooms import RoomIndex, DEFAULT_ROOM
+from app.history import HistoryLog, HistoryStore
+from app.chatlog import ChatLogWriter
+from app.ratelimit import RATE_LIMIT_PENALTIES, RateLimiter
+from app.sessions import SessionStore
+from app.commands import (OPCODE_COMMANDS, OP_CHAT, OP_ROOM, OP_USER, PROTOCOL_BINARY,
+                          REPLY_PREFIX, IdTable, choose_protocol, decode_packet, encode_chat,
+                          encode_packet, is_packet, parse_offer)
 
 
 # Event untuk memberi sinyal shutdown server
@@ -13,147 +35,1070 @@ SERVER_KILL_PASSWORD = "admin123"
 
 # Thread-safe client management
 connected_clients = {}
+client_outboxes = {}  # addr -> Outbox, antrian keluar per koneksi
 clients_lock = threading.Lock()
 
-def get_formatted_time():
-    """Returns current time in format [HH:MM AM/PM] without leading zero."""
-    return datetime.now().strftime("[%I:%M %p]").lstrip("0").replace(" 0", " ")
+# Keanggotaan room; setiap client otomatis masuk DEFAULT_ROOM
+rooms = RoomIndex()
 
-def broadcast_message(message: bytes, sender_addr: tuple = None, exclude_sender: bool = True):
-    """Safely broadcast message to all connected clients."""
+# Konfigurasi backpressure untuk setiap Outbox (lihat app.fanout.Outbox)
+outbox_options = {}
+slow_consumer_disconnects = 0
+
+# Keepalive transport untuk setiap koneksi client (kosong = nonaktif)
+keepalive_options = {}
+dead_peer_reaps = 0
+
+# Worker pool untuk eksekusi perintah chat (None = dijalankan di thread client)
+command_pool = None
+WORKER_FLUSH_TIMEOUT = 10.0
+
+# Mode sharded (--shards N): bus ke proses shard lain dan jumlah client
+# terakhir yang dilaporkan setiap shard peer
+shard_bus = None
+peer_client_counts = {}
+
+# Mode federation (--node-id/--peer): relay broadcast ke server lain
+federation = None
+
+# Client yang berlangganan update jumlah online (!presence); COUNT dikirim
+# server hanya saat jumlahnya berubah
+presence_subscribers = set()
+presence = None
+
+# Nama tampilan client (dari !awal atau pesan chat) untuk pesan leave
+client_names = {}
+
+# Reaper koneksi diam/mati; client yang sudah dilepas reaper dicatat agar
+# release_client tidak mengumumkan leave dua kali
+reaper = None
+reaped_clients = set()
+
+# History chat per room; client baru/reconnect menerima `history_catchup`
+# pesan terakhir dalam satu transfer
+history = None
+history_catchup = 20
+
+# Audit log pesan chat (--chat-log); ditulis thread writer tersendiri
+chat_log = None
+
+# Rate limit per client (token bucket pesan/detik dan byte/detik), dicek
+# sebelum baris diproses sehingga flood tidak dikalikan oleh fan-out
+rate_limit_options = {}
+rate_limiters = {}
+rate_limit_counts = {"delayed": 0, "dropped": 0, "disconnected": 0}
+
+# Listener dengan fast open aktif (--fast-open), untuk statistik cookie
+fast_open_listener = None
+
+# Sesi yang bisa dilanjutkan (!resume) setelah koneksi mati; None = nonaktif.
+# Client ber-sesi menerima catch-up history saat baris pertamanya, bukan saat
+# connect, agar client yang resume tidak menerima history dua kali
+sessions = None
+pending_catchup = set()
+
+# Protokol perintah biner (app.commands). Client yang menegosiasikan versi 2
+# menerima pesan chat sebagai paket CHAT ber-id; nama untuk id dikirim
+# sekali lewat paket USER/ROOM. Id dibagi semua client di server ini.
+binary_clients = set()
+user_ids = IdTable()
+room_ids = IdTable()
+announced_names = {}  # user id -> nama terakhir yang dikirim ke client biner
+ids_lock = threading.Lock()
+
+def get_formatted_time(when: datetime = None):
+    """Returns current time (or `when`) in format [HH:MM AM/PM] without leading zero."""
+    return (when or datetime.now()).strftime("[%I:%M %p]").lstrip("0").replace(" 0", " ")
+
+def _close_in_background(conn: BetterUDPSocket):
+    """Tutup koneksi tanpa menahan thread pemanggil."""
+    try:
+        if conn.connected and conn.blocking:
+            # close() menunggu FIN+ACK; jangan tahan thread yang sedang broadcast
+            threading.Thread(target=conn.close, daemon=True).start()
+        elif conn.connected or conn.dead:
+            conn.close()
+    except:
+        pass
+
+def forget_protocol(addr: tuple):
+    """Lepas id user dan mode biner client yang keluar."""
+    binary_clients.discard(addr)
+    announced_names.pop(user_ids.release(addr), None)
+
+def remove_client(addr: tuple):
+    """Hapus client yang gagal dikirimi dari daftar dan tutup koneksinya."""
     with clients_lock:
-        disconnected_clients = []
-        
-        for addr, conn in connected_clients.items():
+        conn = connected_clients.pop(addr, None)
+        outbox = client_outboxes.pop(addr, None)
+        presence_subscribers.discard(addr)
+        forget_protocol(addr)
+        client_names.pop(addr, None)
+        rate_limiters.pop(addr, None)
+    rooms.leave_all(addr)
+    if reaper is not None:
+        reaper.remove(addr)
+    if outbox is not None:
+        outbox.close()
+    if conn is None:
+        return
+    print(f"[{get_formatted_time()}] Removing disconnected client {addr}")
+    publish_presence()
+    _close_in_background(conn)
+
+def leave_message(names) -> bytes:
+    """Satu pesan leave untuk satu atau beberapa client sekaligus."""
+    if len(names) == 1:
+        text = f"{names[0]} has left the chat."
+    else:
+        text = f"{', '.join(names[:-1])} and {names[-1]} have left the chat."
+    return f"{get_formatted_time()} [SERVER]: {text}".encode("utf-8")
+
+def reap_clients(addrs):
+    """
+    Callback IdleReaper: lepas satu batch client yang diam terlalu lama atau
+    mati (keepalive), umumkan dalam satu broadcast, lalu tutup koneksinya.
+    Thread handler / event loop pemilik koneksi melihat koneksi tertutup dan
+    memanggil release_client, yang tidak mengumumkan ulang.
+    """
+    if sessions is not None:
+        with clients_lock:
+            conns = [(addr, connected_clients.get(addr)) for addr in addrs]
+        addrs = [addr for addr, conn in conns if conn is None or not detach_session(conn, addr)]
+
+    reaped = []
+    with clients_lock:
+        for addr in addrs:
+            conn = connected_clients.pop(addr, None)
+            if conn is None:
+                continue
+            outbox = client_outboxes.pop(addr, None)
+            presence_subscribers.discard(addr)
+            forget_protocol(addr)
+            reaped_clients.add(addr)
+            reaped.append((conn, outbox, client_names.pop(addr, f"User-{addr[1]}")))
+            rate_limiters.pop(addr, None)
+            rooms.leave_all(addr)
+        remaining = len(connected_clients)
+    if not reaped:
+        return
+
+    for _, outbox, _ in reaped:
+        if outbox is not None:
+            outbox.close()
+    names = [name for _, _, name in reaped]
+    print(f"[{get_formatted_time()}] Reaped {len(reaped)} idle/dead clients: {', '.join(names)}. Total: {remaining}")
+    if not shutdown_event.is_set():
+        broadcast_message(leave_message(names), exclude_sender=False)
+    publish_presence()
+    for conn, _, _ in reaped:
+        _close_in_background(conn)
+
+def _on_outbox_error(outbox: Outbox, error: Exception):
+    addr = outbox.conn.peer_addr
+    global slow_consumer_disconnects
+    if isinstance(error, OutboxOverflow):
+        slow_consumer_disconnects += 1
+        print(f"[{get_formatted_time()}] Slow consumer {addr} disconnected: {error}")
+    else:
+        print(f"[{get_formatted_time()}] Failed to send to {addr}: {error}")
+        with clients_lock:
+            conn = connected_clients.get(addr)
+        # Koneksi ber-sesi yang mati disimpan dulu (room dan antrian outbox)
+        # sebelum remove_client membuang keduanya
+        if conn is not None and detach_session(conn, addr):
+            return
+    remove_client(addr)
+
+def _on_peer_dead(conn: BetterUDPSocket):
+    """Peer tidak menjawab keepalive; handler/event loop akan melepasnya."""
+    global dead_peer_reaps
+    dead_peer_reaps += 1
+    print(f"[{get_formatted_time()}] Client {conn.peer_addr} stopped answering keepalive probes.")
+    if reaper is not None:
+        # Dilepas reaper pada putaran berikutnya, bersama client mati lainnya
+        reaper.expire(conn.peer_addr)
+
+def broadcast_message(message: bytes, sender_addr: tuple = None, exclude_sender: bool = True,
+                      local_only: bool = False, federate: bool = True, room: str = None,
+                      packet: bytes = None):
+    """
+    Antrikan pesan ke outbox setiap client yang terhubung, atau hanya ke
+    anggota `room` jika diberikan. Pengiriman sebenarnya dikerjakan sender
+    masing-masing koneksi, jadi broadcast tidak pernah menunggu ACK dan
+    clients_lock hanya dipegang sebentar.
+    Di mode sharded/federation pesan juga diteruskan ke shard dan server
+    lain, kecuali local_only (federate=False: hanya tidak ke server lain).
+    `packet` (opsional) adalah bentuk biner pesan untuk client protokol
+    versi 2; client lain, history dan server lain tetap menerima teks.
+    """
+    if shard_bus is not None and not local_only:
+        if room is None:
+            published = shard_bus.publish("broadcast", message)
+        else:
+            published = shard_bus.publish("room", room.encode("utf-8") + b"\n" + message)
+        if not published:
+            print(f"[{get_formatted_time()}] Broadcast of {len(message)} bytes too large for other shards, not forwarded.")
+    if federation is not None and not local_only and federate:
+        federation.publish(message, room)
+
+    # Room: biaya fan-out sebanding jumlah anggota, bukan jumlah client
+    members = None if room is None else rooms.members_of(room)
+    if members is not None and history is not None:
+        history.append(room, message)
+
+    # Frame, chunk dan checksum payload dihitung sekali untuk semua penerima
+    prepared = PreparedMessage(encode_message(message))
+    binary = prepared if packet is None else PreparedMessage(encode_message(packet))
+    disconnected_clients = []
+    with clients_lock:
+        if members is None:
+            recipients = connected_clients.items()
+        else:
+            recipients = [(addr, connected_clients[addr]) for addr in members if addr in connected_clients]
+        for addr, conn in recipients:
             if exclude_sender and addr == sender_addr:
                 continue
-                
-            try:
-                if conn.connected:
-                    conn.send(message)
-                else:
-                    disconnected_clients.append(addr)
-            except Exception as e:
-                print(f"[{get_formatted_time()}] Failed to send to {addr}: {e}")
-                disconnected_clients.append(addr)
-        
-        # Clean up disconnected clients
-        for addr in disconnected_clients:
-            if addr in connected_clients:
-                print(f"[{get_formatted_time()}] Removing disconnected client {addr}")
-                try:
-                    if connected_clients[addr].connected:
-                         connected_clients[addr].close()
-                except:
-                    pass
-                del connected_clients[addr]
+
+            outbox = client_outboxes.get(addr)
+            data = binary if addr in binary_clients else prepared
+            if not conn.connected or outbox is None or not outbox.put(data):
+                disconnected_clients.append((addr, outbox))
+
+    # Sesi terputus tetap menerima pesan selama grace period (dikirim saat resume)
+    if sessions is not None and sessions.detached:
+        for addr, session in sessions.detached_sessions():
+            if members is None or addr in members:
+                session.record(binary.data if session.binary else prepared.data)
+
+    # Clean up disconnected clients (di luar clients_lock)
+    for addr, outbox in disconnected_clients:
+        if outbox is not None and outbox.error is not None:
+            _on_outbox_error(outbox, outbox.error)
+        else:
+            remove_client(addr)
+
+def send_to_client(client_conn: BetterUDPSocket, client_address: tuple, message: bytes):
+    """Kirim balasan ke satu client lewat outbox-nya agar urutan tetap terjaga."""
+    send_framed(client_conn, client_address, encode_message(message))
+
+def send_framed(client_conn: BetterUDPSocket, client_address: tuple, data: bytes):
+    """Seperti send_to_client, untuk byte yang sudah berupa satu/lebih frame."""
+    with clients_lock:
+        outbox = client_outboxes.get(client_address)
+    if outbox is None:
+        client_conn.send(data)
+    elif not outbox.put(data) and outbox.error is not None:
+        _on_outbox_error(outbox, outbox.error)
+
+def send_control(message: bytes, addrs: list = None, local_only: bool = False):
+    """
+    Kirim pesan kontrol (SHUTDOWN, COUNT, balasan !kill) lewat jalur urgent
+    transport, bukan outbox: pesan mendahului data chat yang masih antri di
+    outbox dan window client, dan client menerimanya lewat on_urgent.
+    addrs=None berarti semua client lokal (dan client shard lain, kecuali
+    local_only).
+    """
+    if shard_bus is not None and addrs is None and not local_only:
+        if not shard_bus.publish("control", message):
+            print(f"[{get_formatted_time()}] Control message of {len(message)} bytes too large for other shards, not forwarded.")
+    with clients_lock:
+        if addrs is None:
+            targets = list(connected_clients.values())
+        else:
+            targets = [connected_clients[addr] for addr in addrs if addr in connected_clients]
+    for conn in targets:
+        try:
+            conn.send(message, urgent=True)
+        except (RuntimeError, OSError):
+            # Koneksi sedang ditutup; dilepas oleh handler/reaper
+            continue
+
+def send_history(client_conn: BetterUDPSocket, client_address: tuple, room: str, count: int) -> bool:
+    """
+    Kirim `count` pesan terakhir room sebagai satu transfer bulk (segment
+    besar) lewat outbox client. Return False jika history kosong/nonaktif.
+    """
+    if history is None:
+        return False
+    header = f"{get_formatted_time()} [SERVER]: Recent messages in #{room}:".encode("utf-8")
+    prepared = history.catch_up(room, count, header, frame=encode_message)
+    if prepared is None:
+        return False
+    with clients_lock:
+        outbox = client_outboxes.get(client_address)
+    if outbox is None:
+        client_conn.send_prepared([prepared])
+    elif not outbox.put(prepared) and outbox.error is not None:
+        _on_outbox_error(outbox, outbox.error)
+    return True
+
+def total_client_count() -> int:
+    """Jumlah client di shard ini ditambah jumlah yang dilaporkan shard lain."""
+    with clients_lock:
+        local = len(connected_clients)
+    return local + sum(peer_client_counts.values())
+
+def publish_presence():
+    """
+    Dipanggil setiap kali jumlah client lokal berubah: jadwalkan push COUNT
+    ke subscriber dan laporkan jumlah lokal ke shard lain.
+    """
+    if presence is not None:
+        presence.mark_changed()
+    if shard_bus is None:
+        return
+    with clients_lock:
+        local = len(connected_clients)
+    shard_bus.publish("count", str(local).encode("utf-8"))
+
+def push_presence(count: int):
+    """Kirim COUNT ke semua subscriber (dipanggil PresenceNotifier)."""
+    message = f"COUNT: {count}".encode("utf-8")
+    with clients_lock:
+        subscribers = list(presence_subscribers)
+    send_control(message, subscribers)
+
+def on_bus_message(kind: str, sender_id: int, payload: bytes):
+    """Tangani pesan dari shard lain."""
+    if kind == "broadcast":
+        broadcast_message(payload, exclude_sender=False, local_only=True)
+    elif kind == "room":
+        room, _, message = payload.partition(b"\n")
+        broadcast_message(message, exclude_sender=False, local_only=True, room=room.decode("utf-8"))
+    elif kind == "control":
+        send_control(payload, local_only=True)
+    elif kind == "count":
+        peer_client_counts[sender_id] = int(payload)
+        if presence is not None:
+            presence.mark_changed()
+    elif kind == "hello":
+        # Shard baru (atau yang restart) minta jumlah client terkini
+        peer_client_counts[sender_id] = int(payload)
+        publish_presence()
+    elif kind == "shutdown":
+        print(f"[{get_formatted_time()}] Shutdown requested by shard {sender_id}.")
+        shutdown_event.set()
+
+def outbox_metrics() -> dict:
+    """Agregat metrics backpressure semua outbox."""
+    with clients_lock:
+        stats = [outbox.stats() for outbox in client_outboxes.values()]
+    return {
+        "clients": len(stats),
+        "depth": sum(s["depth"] for s in stats),
+        "max_depth": max((s["max_depth"] for s in stats), default=0),
+        "dropped": sum(s["dropped"] for s in stats),
+        "coalesced": sum(s["coalesced"] for s in stats),
+        "slow_disconnects": slow_consumer_disconnects,
+    }
+
+def reactor_tick():
+    """Dipanggil event loop reactor setiap tick."""
+    if shard_bus is not None:
+        # Broadcast dari shard lain masuk outbox dulu, lalu ikut di-flush
+        shard_bus.poll()
+    if presence is not None:
+        presence.poll()
+    if reaper is not None:
+        reaper.poll()
+    expire_sessions()
+    flush_outboxes()
+
+def flush_outboxes():
+    """Kosongkan outbox koneksi non-blocking."""
+    if federation is not None:
+        federation.pump()
+    with clients_lock:
+        outboxes = list(client_outboxes.values())
+    for outbox in outboxes:
+        if outbox.queue and not outbox.conn.blocking:
+            outbox.pump()
+
+def handle_message(client_conn: BetterUDPSocket, client_address: tuple, username: str, message: bytes):
+    """
+    Proses satu pesan (frame) dari client: paket biner (app.commands) atau
+    teks. Dipakai oleh engine thread maupun engine reactor.
+    Return (username, client_requested_disconnect).
+    """
+    if is_packet(message):
+        return handle_packet(client_conn, client_address, username, message)
+    text = message.decode("utf-8", errors="replace").strip()
+    if not text:
+        return username, False
+    return handle_line(client_conn, client_address, username, text)
+
+def handle_line(client_conn: BetterUDPSocket, client_address: tuple, username: str, text: str):
+    """Proses satu pesan teks ("username: pesan" atau "username: !perintah arg")."""
+    if federation is not None:
+        if text.startswith("!peer "):
+            node_id = federation.accept_peer(client_address, text.split(" ", 1)[1])
+            if node_id is not None:
+                attach_peer(client_conn, client_address, node_id)
+                return username, False
+            # Bukan peer yang dikenal: diproses sebagai pesan chat biasa
+            print(f"[FEDERATION] Rejected !peer from {client_address}")
+        if federation.is_link(client_address):
+            # Link federation hanya membawa baris relay
+            federation.handle_link_line(client_address, text)
+            return username, False
+
+    if reaper is not None:
+        reaper.touch(client_address)
+
+    # Sekarang text berformat "username: message"
+    if ": " in text:
+        username, decoded_msg = text.split(": ", 1)
+    else:
+        # Jika tak sesuai format, kita jadikan keseluruhan sebagai message
+        decoded_msg = text
+
+    print(f"[{get_formatted_time()}] <{username}> ({client_address}): {decoded_msg}")
+
+    if decoded_msg.startswith("!"):
+        command, _, arg = decoded_msg.partition(" ")
+        return run_command(client_conn, client_address, username, command, arg)
+    return run_command(client_conn, client_address, username, None, decoded_msg)
+
+def handle_packet(client_conn: BetterUDPSocket, client_address: tuple, username: str, data: bytes):
+    """Proses satu paket biner: opcode dipetakan ke perintah yang sama dengan teks."""
+    if federation is not None and federation.is_link(client_address):
+        return username, False
+    if reaper is not None:
+        reaper.touch(client_address)
+
+    opcode, _, room_id, body = decode_packet(data)
+    # Paket tidak membawa nama; pakai nama dari !awal/!name
+    username = client_names.get(client_address, username)
+    arg = body.decode("utf-8", errors="replace").strip()
+    command = OPCODE_COMMANDS.get(opcode)
+    print(f"[{get_formatted_time()}] <{username}> ({client_address}): {command or ''} {arg}".rstrip())
+
+    if opcode == OP_CHAT:
+        room = room_ids.key_of(room_id) if room_id else None
+        return run_command(client_conn, client_address, username, None, arg, room)
+    if command is None:
+        # Paket server->client (USER/ROOM) tidak berlaku dari client
+        reply = f"[{get_formatted_time()}] [SERVER]: Unknown command opcode: {opcode}"
+        send_to_client(client_conn, client_address, reply.encode("utf-8"))
+        return username, False
+    return run_command(client_conn, client_address, username, command, arg)
+
+def run_command(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+                command: str, arg: str, room: str = None):
+    """Jalankan perintah lewat tabel COMMANDS; command None = pesan chat."""
+    if client_address in pending_catchup:
+        pending_catchup.discard(client_address)
+        if command != "!resume":
+            send_history(client_conn, client_address, DEFAULT_ROOM, history_catchup)
+
+    if command is None:
+        return cmd_chat(client_conn, client_address, username, arg, room)
+    handler = COMMANDS.get(command)
+    if handler is None:
+        unknown_cmd = f"[{get_formatted_time()}] [SERVER]: Unknown command: {command}"
+        send_to_client(client_conn, client_address, unknown_cmd.encode("utf-8"))
+        return username, False
+    return handler(client_conn, client_address, username, command, arg)
+
+def cmd_chat(client_conn: BetterUDPSocket, client_address: tuple, username: str, text: str,
+             room: str = None):
+    """Pesan chat biasa → broadcast ke room aktif pengirim (atau `room` jika anggota)."""
+    client_names[client_address] = username
+    sent_at = datetime.now()
+    timestamp = get_formatted_time(sent_at)
+    if room is None or room not in rooms.rooms_for(client_address):
+        room = rooms.active_room(client_address)
+    if room == DEFAULT_ROOM:
+        full_message = f"{timestamp} {username}: {text}"
+    else:
+        full_message = f"{timestamp} [#{room}] {username}: {text}"
+    if chat_log is not None:
+        chat_log.append(room, f"{username}@{client_address[0]}:{client_address[1]}",
+                        text.encode("utf-8"))
+    packet = chat_packet(client_address, username, room, text, sent_at) if binary_clients else None
+    broadcast_message(full_message.encode("utf-8"),
+                      sender_addr=client_address,
+                      exclude_sender=False,
+                      room=room,
+                      packet=packet)
+    return username, False
+
+def cmd_disconnect(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+                   command: str, arg: str):
+    print(f"[{get_formatted_time()}] <{username}> ({client_address}) requested disconnect.")
+    return username, True
+
+def cmd_kill(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+             command: str, arg: str):
+    if not arg:
+        error_msg = (
+            f"{get_formatted_time()} [SERVER]: Invalid !kill format. Use: !kill <password>"
+        )
+        send_control(error_msg.encode("utf-8"), [client_address])
+    elif arg == SERVER_KILL_PASSWORD:
+        print(f"{get_formatted_time()} SERVER SHUTDOWN INITIATED BY {username} ({client_address}).")
+        shutdown_message = (
+            f"{get_formatted_time()} [SERVER]: Server is shutting down NOW. "
+            f"(Initiated by {username})"
+        )
+        # Server lain di federation tetap berjalan
+        broadcast_message(shutdown_message.encode("utf-8"),
+                          exclude_sender=False, federate=False)
+        send_control(b"SHUTDOWN")
+        if shard_bus is not None:
+            shard_bus.publish("shutdown")
+        shutdown_event.set()
+    else:
+        error_msg = (
+            f"{get_formatted_time()} [SERVER]: Incorrect password for !kill command."
+        )
+        send_control(error_msg.encode("utf-8"), [client_address])
+    return username, False
+
+def cmd_heartbeat(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+                  command: str, arg: str):
+    # Polling lama (client versi sebelumnya); client baru memakai !presence
+    count_msg = f"COUNT: {total_client_count()}"
+    send_to_client(client_conn, client_address, count_msg.encode("utf-8"))
+    return username, False
+
+def cmd_presence(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+                 command: str, arg: str):
+    # Berlangganan: kirim jumlah saat ini, selanjutnya hanya saat berubah
+    with clients_lock:
+        presence_subscribers.add(client_address)
+    count_msg = f"COUNT: {total_client_count()}"
+    send_to_client(client_conn, client_address, count_msg.encode("utf-8"))
+    return username, False
+
+def cmd_stats(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+              command: str, arg: str):
+    m = outbox_metrics()
+    stats_msg = (
+        f"{get_formatted_time()} [SERVER]: outbox clients={m['clients']} depth={m['depth']} "
+        f"max_depth={m['max_depth']} dropped={m['dropped']} coalesced={m['coalesced']} "
+        f"slow_disconnects={m['slow_disconnects']} dead_peers={dead_peer_reaps}"
+    )
+    if federation is not None:
+        f = federation.stats()
+        stats_msg += (
+            f"\n{get_formatted_time()} [SERVER]: federation links={f['links']} "
+            f"relayed_in={f['relayed_in']} relayed_out={f['relayed_out']} duplicates={f['duplicates']}"
+        )
+    if rate_limit_options:
+        stats_msg += (
+            f"\n{get_formatted_time()} [SERVER]: rate limit delayed={rate_limit_counts['delayed']} "
+            f"dropped={rate_limit_counts['dropped']} disconnected={rate_limit_counts['disconnected']}"
+        )
+    if sessions is not None:
+        st = sessions.stats()
+        stats_msg += (
+            f"\n{get_formatted_time()} [SERVER]: sessions active={st['active']} detached={st['detached']} "
+            f"resumed={st['resumed']} expired={st['expired']} replayed={st['replayed_lines']}"
+        )
+    if fast_open_listener is not None:
+        stats_msg += (
+            f"\n{get_formatted_time()} [SERVER]: fast open accepted={fast_open_listener.stats['fast_open_accepted']} "
+            f"rejected={fast_open_listener.stats['fast_open_rejected']}"
+        )
+    if chat_log is not None:
+        c = chat_log.stats()
+        stats_msg += (
+            f"\n{get_formatted_time()} [SERVER]: chat log records={c['records']} commits={c['commits']} "
+            f"queued={c['queued']} dropped={c['dropped']} segments={c['segments']}"
+        )
+    with clients_lock:
+        binary = len(binary_clients)
+    stats_msg += (
+        f"\n{get_formatted_time()} [SERVER]: protocol binary_clients={binary} "
+        f"user_ids={len(user_ids.ids)} room_ids={len(room_ids.ids)}"
+    )
+    if client_conn.compressor is not None:
+        # Statistik koneksi peminta sendiri (sebelum pesan ini dikompres)
+        c = client_conn.stats
+        stats_msg += (
+            f"\n{get_formatted_time()} [SERVER]: compression out={c['compress_in']}->{c['compress_out']} "
+            f"ratio={c['compress_ratio']:.2f} bypassed={c['compress_bypassed']} "
+            f"cpu_ms={c['compress_time'] * 1000:.1f} in={c['decompress_in']}->{c['decompress_out']} "
+            f"decompress_cpu_ms={c['decompress_time'] * 1000:.1f}"
+        )
+    if client_conn.fec_encoder is not None:
+        c = client_conn.stats
+        stats_msg += (
+            f"\n{get_formatted_time()} [SERVER]: fec group={c['fec_group']} loss={c['fec_loss']:.3f} "
+            f"parity_sent={c['fec_parity_sent']} losses={c['fec_losses']} "
+            f"recovered={c['fec_recovered']} unrecoverable={c['fec_unrecoverable']}"
+        )
+    send_to_client(client_conn, client_address, stats_msg.encode("utf-8"))
+    return username, False
+
+def cmd_room(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+             command: str, arg: str):
+    client_names[client_address] = username
+    handle_room_command(client_conn, client_address, f"{command} {arg}".strip())
+    return username, False
+
+def cmd_history(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+                command: str, arg: str):
+    count = int(arg) if arg.isdigit() else history_catchup
+    if history is not None:
+        count = min(count, history.capacity)
+    room = rooms.active_room(client_address)
+    if not send_history(client_conn, client_address, room, count):
+        reply = f"{get_formatted_time()} [SERVER]: No history for #{room}."
+        send_to_client(client_conn, client_address, reply.encode("utf-8"))
+    return username, False
+
+def cmd_awal(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+             command: str, arg: str):
+    nama, offered = parse_offer(arg)
+    nama = nama or username
+    client_names[client_address] = nama
+    if offered:
+        negotiate_protocol(client_conn, client_address, offered)
+    timestamp = get_formatted_time()
+    full_message = f"{timestamp} [SERVER]: {nama} has joined!."
+    broadcast_message(full_message.encode("utf-8"),
+                      sender_addr=client_address,
+                      exclude_sender=False)
+    if sessions is not None:
+        session = sessions.create(client_address, nama)
+        session.binary = client_address in binary_clients
+        attach_session(client_address, session, session.start_stream(0))
+    return nama, False
+
+def cmd_resume(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+               command: str, arg: str):
+    parts = arg.split(" ", 2)
+    if len(parts) == 3 and parts[1].isdigit():
+        name, offered = parse_offer(parts[2])
+        if offered:
+            negotiate_protocol(client_conn, client_address, offered)
+        return resume_session(client_conn, client_address, parts[0], int(parts[1]), name), False
+    reply = f"{get_formatted_time()} [SERVER]: Invalid !resume format."
+    send_to_client(client_conn, client_address, reply.encode("utf-8"))
+    return username, False
+
+def cmd_name(client_conn: BetterUDPSocket, client_address: tuple, username: str,
+             command: str, arg: str):
+    """!name <nama baru>: ganti nama tampilan (client biner tidak mengirim nama per pesan)."""
+    old = client_names.get(client_address, username)
+    if not arg or arg.upper() == "SERVER" or ": " in arg:
+        reply = f"{get_formatted_time()} [SERVER]: Display name is not allowed."
+        send_to_client(client_conn, client_address, reply.encode("utf-8"))
+        return username, False
+    client_names[client_address] = arg
+    notice = f"{get_formatted_time()} [SERVER]: {old} changes its username to {arg}"
+    broadcast_message(notice.encode("utf-8"), sender_addr=client_address, exclude_sender=False)
+    return arg, False
+
+# Perintah teks "!perintah" -> handler; paket biner dipetakan ke perintah yang
+# sama lewat OPCODE_COMMANDS, jadi kedua protokol menjalankan kode yang sama
+COMMANDS = {
+    "!disconnect": cmd_disconnect,
+    "!kill": cmd_kill,
+    "!heartbeat": cmd_heartbeat,
+    "!presence": cmd_presence,
+    "!stats": cmd_stats,
+    "!join": cmd_room,
+    "!leave": cmd_room,
+    "!rooms": cmd_room,
+    "!history": cmd_history,
+    "!awal": cmd_awal,
+    "!resume": cmd_resume,
+    "!name": cmd_name,
+}
+
+def negotiate_protocol(client_conn: BetterUDPSocket, client_address: tuple, offered):
+    """
+    Jawab penawaran versi dari !awal/!resume dengan "PROTO <versi> <user id>".
+    Client biner juga menerima tabel id -> nama user dan room yang sedang
+    dipakai, sebelum paket CHAT pertamanya.
+    """
+    version = choose_protocol(offered)
+    with ids_lock:
+        user_id = 0
+        if version == PROTOCOL_BINARY:
+            user_id, _ = user_ids.assign(client_address)
+            with clients_lock:
+                binary_clients.add(client_address)
+        else:
+            with clients_lock:
+                binary_clients.discard(client_address)
+        data = encode_message(f"{REPLY_PREFIX}{version} {user_id}".encode("utf-8"))
+        if version == PROTOCOL_BINARY:
+            for uid, name in announced_names.items():
+                data += encode_message(encode_packet(OP_USER, name.encode("utf-8"), uid))
+            for room, rid in room_ids.items():
+                data += encode_message(encode_packet(OP_ROOM, room.encode("utf-8"), room_id=rid))
+        send_framed(client_conn, client_address, data)
+
+def chat_packet(client_address: tuple, username: str, room: str, text: str,
+                sent_at: datetime) -> bytes:
+    """
+    Paket CHAT untuk client biner. Nama pengirim (dan room selain default)
+    diumumkan dulu ke semua client biner jika berubah/baru, termasuk sesi biner
+    yang sedang terputus: pengirimnya bisa keluar sebelum sesi itu resume,
+    dan saat itu namanya tidak lagi ada di announced_names. Return None jika
+    id habis (client biner menerima teks).
+    """
+    with ids_lock:
+        announce = []
+        user_id, _ = user_ids.assign(client_address)
+        if user_id and announced_names.get(user_id) != username:
+            announced_names[user_id] = username
+            announce.append(encode_packet(OP_USER, username.encode("utf-8"), user_id))
+        room_id = 0
+        if room != DEFAULT_ROOM:
+            room_id, is_new = room_ids.assign(room)
+            if is_new:
+                announce.append(encode_packet(OP_ROOM, room.encode("utf-8"), room_id=room_id))
+        if announce:
+            prepared = PreparedMessage(b"".join(encode_message(p) for p in announce))
+            with clients_lock:
+                outboxes = [client_outboxes[addr] for addr in binary_clients if addr in client_outboxes]
+            for outbox in outboxes:
+                outbox.put(prepared)
+            if sessions is not None and sessions.detached:
+                for _, session in sessions.detached_sessions():
+                    if session.binary:
+                        session.record(prepared.data)
+    if not user_id or (room != DEFAULT_ROOM and not room_id):
+        return None
+    return encode_chat(text, user_id, room_id, sent_at)
+
+def handle_room_command(client_conn: BetterUDPSocket, client_address: tuple, command: str):
+    """!join <room>, !leave [room], !rooms"""
+    parts = command.split()
+    name = client_names.get(client_address, f"User-{client_address[1]}")
+    timestamp = get_formatted_time()
+
+    if parts[0] == "!rooms":
+        active = rooms.active_room(client_address)
+        listing = ", ".join(f"#{room} ({count})" for room, count in rooms.list_rooms())
+        joined = ", ".join(f"#{room}" for room in rooms.rooms_for(client_address))
+        reply = f"{timestamp} [SERVER]: Rooms: {listing}. Joined: {joined}. Active: #{active}"
+
+    elif parts[0] == "!join" and len(parts) == 2 and RoomIndex.valid_name(parts[1]):
+        room = parts[1]
+        is_new = rooms.join(client_address, room)
+        reply = f"{timestamp} [SERVER]: Now chatting in #{room} ({len(rooms.members_of(room))} members)."
+        send_to_client(client_conn, client_address, reply.encode("utf-8"))
+        if is_new:
+            # Catch-up dulu, baru umumkan ke anggota lain
+            send_history(client_conn, client_address, room, history_catchup)
+            broadcast_message(f"{timestamp} [SERVER]: {name} joined #{room}.".encode("utf-8"),
+                              sender_addr=client_address, room=room)
+        return
+
+    elif parts[0] == "!leave" and len(parts) <= 2:
+        room = parts[1] if len(parts) == 2 else rooms.active_room(client_address)
+        if room == DEFAULT_ROOM:
+            reply = f"{timestamp} [SERVER]: You cannot leave #{DEFAULT_ROOM}."
+        elif rooms.leave(client_address, room):
+            broadcast_message(f"{timestamp} [SERVER]: {name} left #{room}.".encode("utf-8"),
+                              sender_addr=client_address, room=room)
+            reply = (f"{timestamp} [SERVER]: Left #{room}. "
+                     f"Now chatting in #{rooms.active_room(client_address)}.")
+        else:
+            reply = f"{timestamp} [SERVER]: You are not in #{room}."
+
+    else:
+        reply = (f"{timestamp} [SERVER]: Usage: !join <room>, !leave [room], !rooms "
+                 f"(room: huruf, angka, - atau _, maksimal 32)")
+
+    send_to_client(client_conn, client_address, reply.encode("utf-8"))
+
+def attach_peer(client_conn: BetterUDPSocket, client_address: tuple, node_id: str):
+    """Jadikan koneksi masuk sebagai link federation dari server `node_id`."""
+    with clients_lock:
+        connected_clients.pop(client_address, None)
+        outbox = client_outboxes.pop(client_address, None)
+        client_names.pop(client_address, None)
+        forget_protocol(client_address)
+        # Link federation tidak dibatasi rate limit client
+        rate_limiters.pop(client_address, None)
+    rooms.leave_all(client_address)
+    if reaper is not None:
+        reaper.remove(client_address)
+    if outbox is None:
+        return
+    federation.attach(client_address, client_conn, outbox, node_id)
+    publish_presence()
+
+def attach_session(client_address: tuple, session, data: bytes):
+    """
+    Mulai stream sesi di koneksi `client_address`: `data` (frame) diawali
+    penanda SESSION; pesan setelahnya dicatat sesi saat diambil sender outbox.
+    """
+    with clients_lock:
+        conn = connected_clients.get(client_address)
+        outbox = client_outboxes.get(client_address)
+    if outbox is None:
+        return
+    with outbox.cond:
+        outbox.on_sent = session.record
+    send_framed(conn, client_address, data)
+
+def resume_session(client_conn: BetterUDPSocket, client_address: tuple, token: str,
+                   received: int, name: str) -> str:
+    """
+    !resume <token> <baris diterima> <nama>: pindahkan sesi ke koneksi ini,
+    pulihkan nama dan room, lalu kirim ulang baris setelah posisi client.
+    Tidak ada pengumuman join/leave. Token tidak dikenal = join baru.
+    """
+    timestamp = get_formatted_time()
+    session, old_addr = (None, None) if sessions is None else sessions.resume(token, client_address)
+    if session is None:
+        notice = f"{timestamp} [SERVER]: Session expired, joining as a new client."
+        send_to_client(client_conn, client_address, notice.encode("utf-8"))
+        send_history(client_conn, client_address, DEFAULT_ROOM, history_catchup)
+        handle_line(client_conn, client_address, name, f"{name}: !awal {name}")
+        return name
+
+    if old_addr != client_address:
+        with clients_lock:
+            old_conn = connected_clients.pop(old_addr, None)
+            old_outbox = client_outboxes.pop(old_addr, None)
+            if old_conn is not None:
+                # Koneksi lama belum terdeteksi mati: lepas tanpa pengumuman
+                reaped_clients.add(old_addr)
+                presence_subscribers.discard(old_addr)
+                forget_protocol(old_addr)
+                client_names.pop(old_addr, None)
+                rate_limiters.pop(old_addr, None)
+        if old_outbox is not None:
+            session.record(old_outbox.take_pending())
+        if old_conn is not None:
+            session.rooms = rooms.rooms_for(old_addr)
+            session.active_room = rooms.active_room(old_addr)
+            if reaper is not None:
+                reaper.remove(old_addr)
+            _close_in_background(old_conn)
+        for room in session.rooms:
+            rooms.join(client_address, room, activate=False)
+        if session.active_room is not None:
+            rooms.join(client_address, session.active_room)
+        rooms.leave_all(old_addr)
+
+    session.name = name
+    session.binary = client_address in binary_clients
+    client_names[client_address] = name
+    start, replay, missed = session.rewind(received)
+    data = session.start_stream(start) + b"".join(replay)
+    if missed:
+        notice = f"{timestamp} [SERVER]: {missed} messages were lost while you were away."
+        data += encode_message(notice.encode("utf-8"))
+    replayed = len(replay)
+    sessions.replayed_lines += replayed
+    attach_session(client_address, session, data)
+    print(f"[{timestamp}] <{name}> ({client_address}) resumed session from {old_addr}: "
+          f"{replayed} lines replayed, {missed} lost")
+    publish_presence()
+    return name
+
+def detach_session(client_conn: BetterUDPSocket, client_address: tuple) -> bool:
+    """
+    Koneksi ber-sesi yang mati (keepalive) tidak langsung diumumkan leave:
+    sesi disimpan selama grace period dan tetap menerima pesan room-nya.
+    Return True jika koneksi sudah ditangani di sini.
+    """
+    if sessions is None:
+        return False
+    if sessions.is_detached(client_address):
+        # Sudah dilepas reaper; pemilik koneksi cukup menutupnya
+        _close_in_background(client_conn)
+        return True
+    session = sessions.get(client_address)
+    if session is None:
+        return False
+    if shutdown_event.is_set() or not client_conn.dead or not session.streaming:
+        # Putus disengaja (!disconnect, FIN, kick) atau client belum
+        # menerima token: tidak ada yang bisa di-resume
+        sessions.end(client_address)
+        return False
+
+    with clients_lock:
+        connected_clients.pop(client_address, None)
+        outbox = client_outboxes.pop(client_address, None)
+        presence_subscribers.discard(client_address)
+        forget_protocol(client_address)
+        client_names.pop(client_address, None)
+        rate_limiters.pop(client_address, None)
+        pending_catchup.discard(client_address)
+        remaining = len(connected_clients)
+    if reaper is not None:
+        reaper.remove(client_address)
+    if outbox is not None:
+        # Baris yang belum sempat dikirim ikut dikirim saat resume
+        session.record(outbox.take_pending())
+    sessions.detach(client_address, rooms.rooms_for(client_address), rooms.active_room(client_address))
+    print(f"[{get_formatted_time()}] <{session.name}> ({client_address}) connection lost; "
+          f"session kept for {sessions.grace:g}s. Total: {remaining}")
+    publish_presence()
+    _close_in_background(client_conn)
+    return True
+
+def expire_sessions():
+    """Umumkan leave untuk sesi terputus yang grace period-nya habis."""
+    if sessions is None or not sessions.detached:
+        return
+    expired = sessions.expire()
+    if not expired:
+        return
+    for addr, _ in expired:
+        rooms.leave_all(addr)
+        with clients_lock:
+            reaped_clients.discard(addr)
+    names = [session.name for _, session in expired]
+    print(f"[{get_formatted_time()}] Sessions expired: {', '.join(names)}")
+    if not shutdown_event.is_set():
+        broadcast_message(leave_message(names), exclude_sender=False)
+
+def release_client(client_conn: BetterUDPSocket, client_address: tuple, username: str):
+    """Broadcast pesan leave, hapus client dari daftar, lalu tutup koneksinya."""
+    if federation is not None and federation.detach(client_address) is not None:
+        try:
+            if client_conn.connected:
+                client_conn.close()
+        except Exception:
+            pass
+        return
+
+    if detach_session(client_conn, client_address):
+        return
+
+    print(f"[{get_formatted_time()}] <{username}> ({client_address}) Closing client connection.")
+
+    if reaper is not None:
+        reaper.remove(client_address)
+    with clients_lock:
+        reaped = client_address in reaped_clients
+        reaped_clients.discard(client_address)
+        name = client_names.pop(client_address, username)
+
+    # Broadcast "left chat" (kecuali server shutdown atau sudah diumumkan reaper)
+    if not reaped and not shutdown_event.is_set() and (
+            client_conn.connected or client_conn.dead or client_conn.peer_closed):
+        broadcast_message(leave_message([name]),
+                          sender_addr=client_address,
+                          exclude_sender=False)
+
+    rooms.leave_all(client_address)
+    with clients_lock:
+        outbox = client_outboxes.pop(client_address, None)
+        presence_subscribers.discard(client_address)
+        forget_protocol(client_address)
+        rate_limiters.pop(client_address, None)
+        pending_catchup.discard(client_address)
+        if client_address in connected_clients:
+            del connected_clients[client_address]
+            print(f"[{get_formatted_time()}] Client {client_address} removed. Total: {len(connected_clients)}")
+    if outbox is not None:
+        outbox.close()
+    publish_presence()
+
+    try:
+        # Koneksi mati: close() hanya menutup socket tanpa FIN. Koneksi yang
+        # ditutup peer (LAST_ACK) diselesaikan di background lalu socket-nya
+        # dibebaskan, jadi tidak ada socket setengah tertutup yang tertinggal
+        client_conn.close()
+    except Exception as e:
+        print(f"[{get_formatted_time()}] Error closing connection for {client_address}: {e}")
+
+def check_rate_limit(client_address: tuple, nbytes: int):
+    """
+    Terapkan rate limit untuk satu baris dari client. Return (verdict, wait)
+    seperti RateLimiter.admit(); client tanpa limiter selalu "ok".
+    """
+    limiter = rate_limiters.get(client_address)
+    if limiter is None:
+        return "ok", 0.0
+    verdict, wait = limiter.admit(nbytes)
+    if verdict == "delay":
+        rate_limit_counts["delayed"] += 1
+    elif verdict == "drop":
+        rate_limit_counts["dropped"] += 1
+    elif verdict == "disconnect":
+        rate_limit_counts["disconnected"] += 1
+        print(f"[{get_formatted_time()}] Client {client_address} exceeded rate limit. Disconnecting.")
+        with clients_lock:
+            conn = connected_clients.get(client_address)
+        if conn is not None:
+            notice = f"{get_formatted_time()} [SERVER]: Rate limit exceeded. You are disconnected."
+            send_to_client(conn, client_address, notice.encode("utf-8"))
+    return verdict, wait
+
+class HandlerState:
+    """State client yang dibagi antara thread pembaca dan worker pool."""
+    def __init__(self, username: str):
+        self.username = username
+        self.disconnect = threading.Event()
+
+def dispatch_message(client_conn: BetterUDPSocket, client_address: tuple, state: HandlerState, message: bytes):
+    """Jalankan handle_message untuk satu pesan dan simpan hasilnya ke state."""
+    if state.disconnect.is_set():
+        # Baris setelah !disconnect diabaikan
+        return
+    try:
+        state.username, requested = handle_message(client_conn, client_address, state.username, message)
+    except Exception as e:
+        print(f"[{get_formatted_time()}] <{state.username}> ({client_address}) Handler error: {e}")
+        requested = True
+    if requested:
+        state.disconnect.set()
 
 def client_handler(client_conn: BetterUDPSocket, client_address: tuple):
     """Handle individual client communication in separate thread."""
     print(f"[{get_formatted_time()}] Started handler for client {client_address}")
-    username = f"User-{client_address[1]}"  # Default username, bisa diubah dengan mekanisme login
+    state = HandlerState(f"User-{client_address[1]}")  # Default username, bisa diubah dengan mekanisme login
 
-    # Buffer untuk merangkai potongan segmen hingga one-line (\n) lengkap
-    buffer = b""
-    client_requested_disconnect = False
+    rate_limited = False
     try:
-        while client_conn.connected and not shutdown_event.is_set() and not client_requested_disconnect:
+        while client_conn.connected and not shutdown_event.is_set() and not state.disconnect.is_set():
             try:
-                # Terima potongan byte (timeout pendek)
-                chunk = client_conn.receive(timeout=1.0)
-                if not chunk:
+                # Satu pesan utuh (frame length-prefix), timeout pendek
+                message = client_conn.recv_message(timeout=1.0)
+                if message is None:
                     # Kalau tidak ada, cek shutdown_event, lalu ulangi loop
                     if shutdown_event.is_set():
                         break
                     continue
 
-                # Tambahkan ke buffer
-                buffer += chunk
+                # Rate limit di thread pembaca, sebelum worker/fan-out.
+                # Penalty delay menahan pembacaan sehingga client yang
+                # flood tertahan oleh window-nya sendiri.
+                nbytes = len(message) + FRAME_HEADER_SIZE
+                verdict, wait = check_rate_limit(client_address, nbytes)
+                while verdict == "delay" and not shutdown_event.is_set():
+                    time.sleep(wait)
+                    verdict, wait = check_rate_limit(client_address, nbytes)
+                if verdict == "drop":
+                    continue
+                if verdict == "disconnect":
+                    # Bukan state.disconnect: pesan yang sudah lolos dan
+                    # antri di worker pool tetap diproses
+                    rate_limited = True
+                    break
 
-                # Selagi ada newline, proses satu baris penuh
-                while b"\n" in buffer:
-                    if client_requested_disconnect:
-                        break
-                    line, buffer = buffer.split(b"\n", 1)
-                    text = line.decode("utf-8", errors="replace").strip()
-                    if not text:
-                        continue
-
-                    # Sekarang text berformat "username: message"
-                    if ": " in text:
-                        username, decoded_msg = text.split(": ", 1)
-                    else:
-                        # Jika tak sesuai format, kita jadikan keseluruhan sebagai message
-                        decoded_msg = text
-
-                    print(f"[{get_formatted_time()}] <{username}> ({client_address}): {decoded_msg}")
-
-                    # Tangani perintah khusus
-                    if decoded_msg == "!disconnect":
-                        print(f"[{get_formatted_time()}] <{username}> ({client_address}) requested disconnect.")
-                        client_requested_disconnect = True
-                        break
+                if command_pool is not None:
+                    # Parsing, logging dan broadcast dikerjakan worker pool;
+                    # urutan pesan per client tetap terjaga.
+                    command_pool.submit(client_address, dispatch_message,
+                                        client_conn, client_address, state, message)
+                    continue
 
-                    elif decoded_msg.startswith("!kill"):
-                        parts = decoded_msg.split(" ", 1)
-                        if len(parts) == 2 and parts[0] == "!kill":
-                            password_attempt = parts[1]
-                            if password_attempt == SERVER_KILL_PASSWORD:
-                                print(f"{get_formatted_time()} SERVER SHUTDOWN INITIATED BY {username} ({client_address}).")
-                                shutdown_message = (
-                                    f"{get_formatted_time()} [SERVER]: Server is shutting down NOW. "
-                                    f"(Initiated by {username})"
-                                )
-                                broadcast_message((shutdown_message + "\n").encode("utf-8"),
-                                                  exclude_sender=False)
-                                broadcast_message(b"SHUTDOWN\n", exclude_sender=False)
-                                shutdown_event.set()
-                                break
-                            else:
-                                error_msg = (
-                                    f"{get_formatted_time()} [SERVER]: Incorrect password for !kill command.\n"
-                                )
-                                client_conn.send(error_msg.encode("utf-8"))
-                        else:
-                            error_msg = (
-                                f"{get_formatted_time()} [SERVER]: Invalid !kill format. Use: !kill <password>\n"
-                            )
-                            client_conn.send(error_msg.encode("utf-8"))
-                        continue
-
-                    elif decoded_msg == "!heartbeat":
-                        # Kirim jumlah klien yang terhubung
-                        count_msg = f"COUNT: {len(connected_clients)}\n"
-                        client_conn.send(count_msg.encode("utf-8"))
-                        continue
-
-                    elif decoded_msg.startswith("!awal"):
-                        _, nama = decoded_msg.split(" ", 1)
-                        timestamp = get_formatted_time()
-                        full_message = f"{timestamp} [SERVER]: {nama} has joined!.\n"
-                        broadcast_message(full_message.encode("utf-8"),
-                                          sender_addr=client_address,
-                                          exclude_sender=False)
-
-                    elif decoded_msg.startswith("!"):
-                        unknown_cmd = (
-                            f"[{get_formatted_time()}] [SERVER]: Unknown command: {decoded_msg.split()[0]}\n"
-                        )
-                        client_conn.send(unknown_cmd.encode("utf-8"))
-                        continue
-
-                    else:
-                        # Pesan chat biasa → broadcast (termasuk newline)
-                        timestamp = get_formatted_time()
-                        full_message = f"{timestamp} {username}: {decoded_msg}\n"
-                        broadcast_message(full_message.encode("utf-8"),
-                                          sender_addr=client_address,
-                                          exclude_sender=False)
+                dispatch_message(client_conn, client_address, state, message)
 
                 # Jika keluar akibat !disconnect atau shutdown, hentikan loop
                 if shutdown_event.is_set() or not client_conn.connected:
                     break
 
+            except FramingError as e:
+                print(f"[{get_formatted_time()}] <{state.username}> ({client_address}) Protocol error: {e}")
+                break
+
             except socket.timeout:
                 # Timeout receive → periksa shutdown_event lalu ulangi
                 if shutdown_event.is_set():
@@ -161,38 +1106,65 @@ def client_handler(client_conn: BetterUDPSocket, client_address: tuple):
                 continue
 
             except ConnectionResetError:
-                print(f"[{get_formatted_time()}] Connection reset by {username} ({client_address}).")
-                client_requested_disconnect = True 
+                print(f"[{get_formatted_time()}] Connection reset by {state.username} ({client_address}).")
+                state.disconnect.set()
                 break
 
             except Exception as e:
-                print(f"[{get_formatted_time()}] <{username}> ({client_address}) Handler error: {e}")
-                client_requested_disconnect = True 
+                print(f"[{get_formatted_time()}] <{state.username}> ({client_address}) Handler error: {e}")
+                state.disconnect.set()
                 break
 
     except Exception as e:
-        print(f"[{get_formatted_time()}] <{username}> ({client_address}) Fatal handler error: {e}")
+        print(f"[{get_formatted_time()}] <{state.username}> ({client_address}) Fatal handler error: {e}")
 
     finally:
-        print(f"[{get_formatted_time()}] <{username}> ({client_address}) Closing client connection.")
+        if command_pool is not None:
+            # Selesaikan baris yang masih antri sebelum client dilepas
+            try:
+                command_pool.flush(client_address, timeout=WORKER_FLUSH_TIMEOUT)
+            except Exception as e:
+                print(f"[{get_formatted_time()}] <{state.username}> ({client_address}) Pending commands dropped: {e}")
+        if shutdown_event.is_set() and not state.disconnect.is_set():
+            # Saat shutdown semua koneksi ditutup bersamaan oleh serve()
+            return
+        release_client(client_conn, client_address, state.username)
 
-        # Broadcast "left chat" (kecuali server shutdown)
-        if not shutdown_event.is_set() and client_conn.connected:
-            leave_msg = f"{get_formatted_time()} [SERVER]: {username} has left the chat.\n"
-            broadcast_message(leave_msg.encode("utf-8"),
-                              sender_addr=client_address,
-                              exclude_sender=False)
+def register_client(conn_socket: BetterUDPSocket, client_address: tuple) -> bool:
+    """Tambahkan client baru ke connected_clients. Return False jika duplikat."""
+    with clients_lock:
+        if client_address in connected_clients:
+            print(f"[{get_formatted_time()}] Duplicate connection from {client_address}. Rejecting.")
+            try:
+                conn_socket.close()
+            except:
+                pass
+            return False
 
-        with clients_lock:
-            if client_address in connected_clients:
-                del connected_clients[client_address]
-                print(f"[{get_formatted_time()}] Client {client_address} removed. Total: {len(connected_clients)}")
+        # Add new client
+        connected_clients[client_address] = conn_socket
+        client_names[client_address] = f"User-{client_address[1]}"
+        rooms.join(client_address, DEFAULT_ROOM)
+        outbox = Outbox(conn_socket, on_error=_on_outbox_error, **outbox_options)
+        client_outboxes[client_address] = outbox
+        if rate_limit_options:
+            rate_limiters[client_address] = RateLimiter(**rate_limit_options)
+        client_count = len(connected_clients)
 
-        try:
-            if client_conn.connected:
-                client_conn.close()
-        except Exception as e:
-            print(f"[{get_formatted_time()}] Error closing connection for {client_address}: {e}")
+    if reaper is not None:
+        reaper.add(client_address)
+    if keepalive_options:
+        conn_socket.enable_keepalive(on_dead=_on_peer_dead, **keepalive_options)
+    if conn_socket.blocking:
+        outbox.start()
+    if sessions is None:
+        send_history(conn_socket, client_address, DEFAULT_ROOM, history_catchup)
+    else:
+        pending_catchup.add(client_address)
+    publish_presence()
+
+    print(f"[{get_formatted_time()}] New client connected: {client_address} (Total: {client_count})")
+    return True
 
 def listen_for_connections(server_socket: BetterUDPSocket):
     """Listen for new client connections in separate thread."""
@@ -212,21 +1184,9 @@ def listen_for_connections(server_socket: BetterUDPSocket):
                 except: pass
                 break # Keluar dari loop listener
     
-            with clients_lock:
-                if client_address in connected_clients:
-                    print(f"[{get_formatted_time()}] Duplicate connection from {client_address}. Rejecting.")
-                    try:
-                        conn_socket.close()
-                    except:
-                        pass
-                    continue
+            if not register_client(conn_socket, client_address):
+                continue
 
-                # Add new client
-                connected_clients[client_address] = conn_socket
-                client_count = len(connected_clients)
-            
-            print(f"[{get_formatted_time()}] New client connected: {client_address} (Total: {client_count})")
-            
             # Start handler thread for this client
             client_thread = threading.Thread(
                 target=client_handler,
@@ -246,27 +1206,260 @@ def listen_for_connections(server_socket: BetterUDPSocket):
 
 
 def main():
-    SERVER_IP = '0.0.0.0'
-    SERVER_PORT = 55555
+    parser = argparse.ArgumentParser(description="Chat server for TCP-over-UDP.")
+    parser.add_argument("host", nargs="?", default="0.0.0.0", help="IP address to bind")
+    parser.add_argument("-p", "--port", type=int, default=55555, help="Port to listen on")
+    parser.add_argument("--engine", choices=("thread", "reactor"), default="thread",
+                        help="thread: satu thread per client, reactor: satu event loop (selectors)")
+    parser.add_argument("-w", "--workers", type=int, default=4,
+                        help="Ukuran worker pool perintah chat untuk engine thread (0 = tanpa pool)")
+    parser.add_argument("--outbox-size", type=int, default=256, help="Maksimal pesan antri per client")
+    parser.add_argument("--outbox-bytes", type=int, default=64 * 1024, help="Maksimal byte antri per client")
+    parser.add_argument("--overflow-policy", choices=OVERFLOW_POLICIES, default="drop_oldest",
+                        help="Tindakan saat outbox client penuh")
+    parser.add_argument("--stall-timeout", type=float, default=None,
+                        help="Putus client yang tidak ACK selama N detik (default: tidak pernah)")
+    parser.add_argument("--keepalive-idle", type=float, default=10.0,
+                        help="Kirim probe keepalive setelah client diam N detik (0 = nonaktif)")
+    parser.add_argument("--keepalive-interval", type=float, default=2.0, help="Jeda antar probe keepalive")
+    parser.add_argument("--keepalive-probes", type=int, default=3,
+                        help="Jumlah probe tak terjawab sebelum client dianggap mati")
+    parser.add_argument("--idle-timeout", type=float, default=0,
+                        help="Lepas client yang tidak mengirim apa pun selama N detik (0 = nonaktif)")
+    parser.add_argument("--presence-window", type=float, default=0.25,
+                        help="Jendela (detik) penggabungan update jumlah online sebelum di-push")
+    parser.add_argument("--history-size", type=int, default=100,
+                        help="Jumlah pesan yang disimpan per room (0 = history nonaktif)")
+    parser.add_argument("--history-catchup", type=int, default=20,
+                        help="Jumlah pesan history yang dikirim saat client join/reconnect")
+    parser.add_argument("--history-log", default=None, metavar="PATH",
+                        help="File log append-only (mmap) untuk menyimpan history antar restart")
+    parser.add_argument("--chat-log", default=None, metavar="DIR",
+                        help="Direktori audit log pesan chat (segment append-only + index waktu)")
+    parser.add_argument("--chat-log-segment-mb", type=int, default=16,
+                        help="Ukuran maksimal satu file segment audit log (MB)")
+    parser.add_argument("--rate-limit-msgs", type=float, default=20.0,
+                        help="Batas pesan/detik per client (0 = rate limit nonaktif)")
+    parser.add_argument("--rate-limit-burst", type=float, default=40.0,
+                        help="Jumlah pesan beruntun yang boleh lewat sebelum dibatasi")
+    parser.add_argument("--rate-limit-bytes", type=float, default=32 * 1024,
+                        help="Batas byte/detik per client (0 = tanpa batas byte)")
+    parser.add_argument("--rate-limit-bytes-burst", type=float, default=64 * 1024,
+                        help="Byte beruntun yang boleh lewat sebelum dibatasi")
+    parser.add_argument("--rate-limit-penalty", choices=RATE_LIMIT_PENALTIES, default="delay",
+                        help="Tindakan untuk client yang melewati batas")
+    parser.add_argument("--close-timeout", type=float, default=2.0,
+                        help="Batas waktu total menunggu FIN+ACK semua client saat shutdown")
+    parser.add_argument("--fast-open", action="store_true",
+                        help="Terima data di SYN dari client yang punya cookie (hemat satu RTT saat reconnect)")
+    parser.add_argument("--compress", action="store_true",
+                        help="Izinkan kompresi payload (zlib) untuk client yang menawarkannya saat handshake")
+    parser.add_argument("--compact-header", action="store_true",
+                        help="Izinkan header segment kompak untuk client yang menawarkannya saat handshake")
+    parser.add_argument("--fec", action="store_true",
+                        help="Izinkan parity FEC (pulihkan segment hilang tanpa retransmit) untuk client yang menawarkannya")
+    parser.add_argument("--session-grace", type=float, default=30.0,
+                        help="Simpan sesi client yang koneksinya mati selama N detik untuk !resume (0 = nonaktif)")
+    parser.add_argument("--session-buffer", type=int, default=64 * 1024,
+                        help="Maksimal byte pesan terakhir yang disimpan per sesi untuk dikirim ulang")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Jumlah proses server yang berbagi port via SO_REUSEPORT (Linux)")
+    parser.add_argument("--node-id", default=None,
+                        help="Aktifkan federation dengan ID node ini (default host:port jika --peer dipakai)")
+    parser.add_argument("--peer", action="append", default=[], metavar="HOST:PORT",
+                        help="Server lain yang dihubungi untuk federation (boleh berulang)")
+    parser.add_argument("--peer-secret", default=None,
+                        help="Secret bersama untuk link federation (wajib jika --peer/--node-id dipakai)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Matikan debug log protokol")
+    args = parser.parse_args()
+
+    if args.shards > 1 and (args.peer or args.node_id):
+        parser.error("--peer/--node-id cannot be combined with --shards")
+    if (args.peer or args.node_id) and not args.peer_secret:
+        parser.error("--peer/--node-id requires --peer-secret")
+
+    # Secret cookie dibuat sebelum fork agar semua shard menerima cookie yang sama
+    args.fast_open_secret = os.urandom(16) if args.fast_open else None
+
+    if args.shards > 1:
+        run_sharded(args)
+    else:
+        serve(args)
 
-    server_socket = BetterUDPSocket()
+def run_sharded(args):
+    """
+    Fork `args.shards` proses server yang bind ke port yang sama dengan
+    SO_REUSEPORT. Kernel membagi client ke shard berdasarkan alamatnya,
+    sehingga setiap shard memegang subset koneksi dengan GIL sendiri.
+    Broadcast, jumlah client dan shutdown disebarkan lewat ShardBus.
+    """
+    if not hasattr(os, "fork") or not hasattr(socket, "SO_REUSEPORT"):
+        print(f"[{get_formatted_time()}] --shards requires fork() and SO_REUSEPORT (Linux).")
+        return
+
+    bus_dir = tempfile.mkdtemp(prefix="chat-shards-")
+    pids = []
+    for shard_id in range(args.shards):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                run_shard(args, shard_id, bus_dir)
+            except BaseException as e:
+                if not isinstance(e, (KeyboardInterrupt, SystemExit)):
+                    print(f"[{get_formatted_time()}] Shard {shard_id} error: {e}")
+                    exit_code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(exit_code)
+        pids.append(pid)
+
+    print(f"[{get_formatted_time()}] Started {args.shards} shards on port {args.port}: {pids}")
+    try:
+        for pid in pids:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        # Ctrl+C juga diterima setiap shard; tunggu semuanya selesai shutdown
+        for pid in pids:
+            os.waitpid(pid, 0)
+    finally:
+        shutil.rmtree(bus_dir, ignore_errors=True)
+    print(f"[{get_formatted_time()}] All shards stopped.")
+
+def run_shard(args, shard_id: int, bus_dir: str):
+    """Jalankan satu shard (di proses anak hasil fork)."""
+    global shard_bus
+    shard_bus = ShardBus(bus_dir, shard_id, args.shards, on_message=on_bus_message)
+    if args.engine == "thread":
+        shard_bus.start()
+    shard_bus.publish("hello", b"0")
+    try:
+        serve(args, shard_id=shard_id)
+    finally:
+        shard_bus.close()
+
+def serve(args, shard_id: int = None):
+    """Jalankan server (satu proses) sampai shutdown."""
+    outbox_options.update(
+        maxlen=args.outbox_size,
+        max_bytes=args.outbox_bytes,
+        overflow=args.overflow_policy,
+        stall_timeout=args.stall_timeout,
+    )
+    if args.keepalive_idle > 0:
+        keepalive_options.update(
+            idle=args.keepalive_idle,
+            interval=args.keepalive_interval,
+            probes=args.keepalive_probes,
+        )
+
+    if args.rate_limit_msgs > 0:
+        rate_limit_options.update(
+            msg_rate=args.rate_limit_msgs,
+            msg_burst=args.rate_limit_burst,
+            byte_rate=args.rate_limit_bytes,
+            byte_burst=args.rate_limit_bytes_burst,
+            penalty=args.rate_limit_penalty,
+        )
+
+    global command_pool
+    if args.engine == "thread" and args.workers > 0:
+        command_pool = KeyedExecutor(max_workers=args.workers)
+
+    SERVER_IP = args.host
+    SERVER_PORT = args.port
+
+    global reaper
+    reaper = IdleReaper(args.idle_timeout or None, reap_clients)
+    if args.engine == "thread":
+        reaper.start()
+
+    global presence
+    presence = PresenceNotifier(total_client_count, push_presence, window=args.presence_window)
+    if args.engine == "thread":
+        presence.start()
+
+    global history, history_catchup
+    if args.history_size > 0:
+        log = None
+        if args.history_log:
+            # Setiap shard menerima semua pesan room, jadi masing-masing
+            # cukup menulis log sendiri
+            path = args.history_log if shard_id is None else f"{args.history_log}.shard{shard_id}"
+            log = HistoryLog(path)
+        history = HistoryStore(capacity=args.history_size, log=log)
+        history_catchup = args.history_catchup
+
+    global sessions
+    if args.session_grace > 0:
+        sessions = SessionStore(grace=args.session_grace, max_bytes=args.session_buffer)
+
+    global chat_log
+    if args.chat_log:
+        directory = args.chat_log if shard_id is None else os.path.join(args.chat_log, f"shard-{shard_id}")
+        chat_log = ChatLogWriter(directory, segment_bytes=args.chat_log_segment_mb * 1024 * 1024)
+        chat_log.start()
+
+    global federation
+    if args.peer or args.node_id:
+        federation = Federation(
+            args.node_id or f"{SERVER_IP}:{SERVER_PORT}",
+            deliver=lambda message, room: broadcast_message(message, exclude_sender=False,
+                                                            local_only=True, room=room),
+            debug=not args.quiet,
+            secret=args.peer_secret,
+        )
+
+    server_socket = BetterUDPSocket(debug=not args.quiet)
     listener_thread = None
+    reactor = None
     
     try:
-        server_socket.listen(SERVER_IP, SERVER_PORT)
-        print(f"[{get_formatted_time()}] Server listening on {SERVER_IP}:{SERVER_PORT}")
+        server_socket.listen(SERVER_IP, SERVER_PORT, reuse_port=shard_id is not None)
+        if args.fast_open:
+            global fast_open_listener
+            server_socket.enable_fast_open(args.fast_open_secret)
+            fast_open_listener = server_socket
+        if args.compress:
+            server_socket.enable_compression()
+        if args.compact_header:
+            server_socket.enable_compact_header()
+        if args.fec:
+            server_socket.enable_fec()
+        shard_info = f", shard {shard_id}/{args.shards}" if shard_id is not None else ""
+        print(f"[{get_formatted_time()}] Server listening on {SERVER_IP}:{SERVER_PORT} (engine: {args.engine}{shard_info})")
         print(f"[{get_formatted_time()}] Press Ctrl+C to stop server\n")
 
-        listener_thread = threading.Thread(
-            target=listen_for_connections,
-            args=(server_socket,),
-            daemon=True
-        )
-        listener_thread.start()
+        if federation is not None:
+            print(f"[{get_formatted_time()}] Federation node id: {federation.node_id}")
+            for peer in args.peer:
+                host, port = peer.rsplit(":", 1)
+                federation.connect_to(host, int(port))
+
+        if args.engine == "reactor":
+            # Event loop berjalan di main thread sampai shutdown_event di-set
+            reactor = ReactorServer(
+                server_socket,
+                on_connect=register_client,
+                on_message=handle_message,
+                on_disconnect=release_client,
+                stop_event=shutdown_event,
+                on_tick=reactor_tick,
+                admit=check_rate_limit,
+            )
+            reactor.run()
+        else:
+            listener_thread = threading.Thread(
+                target=listen_for_connections,
+                args=(server_socket,),
+                daemon=True
+            )
+            listener_thread.start()
 
         # Main server loop, periksa shutdown_event
         while not shutdown_event.is_set():
             time.sleep(0.5) # Cek setiap setengah detik
+            expire_sessions()
             
             # Opsi: Pemeriksaan periodik koneksi mati (bisa juga dipindahkan ke dalam broadcast_message)
             # with clients_lock:
@@ -282,9 +1475,10 @@ def main():
             f"{get_formatted_time()} [SERVER]: Server is shutting down NOW. "
             f"(Due to KeyboardInterrupt)"
         )
-        broadcast_message((shutdown_message + "\n").encode("utf-8"),
-                            exclude_sender=False)
-        broadcast_message(b"SHUTDOWN\n", exclude_sender=False)
+        # Setiap shard menerima Ctrl+C sendiri, jadi cukup client lokal
+        broadcast_message(shutdown_message.encode("utf-8"),
+                            exclude_sender=False, local_only=True)
+        send_control(b"SHUTDOWN", local_only=True)
         print(f"\n[{get_formatted_time()}] Server shutdown requested by user (Ctrl+C).")
         shutdown_event.set() # Set event untuk memberi tahu thread lain
     except Exception as e:
@@ -303,24 +1497,56 @@ def main():
         
         # Kirim pesan terakhir ke semua klien yang masih terhubung
         final_shutdown_msg = f"[{get_formatted_time()}] [SERVER]: Server has been shut down. You are disconnected."
-        broadcast_message(final_shutdown_msg.encode(), exclude_sender=False) # Kirim ke semua
+        broadcast_message(final_shutdown_msg.encode(), exclude_sender=False, local_only=True) # Kirim ke semua client lokal
+        if reactor:
+            reactor.drain(timeout=2.0) # Koneksi non-blocking: proses ACK sampai antrian kosong
+        else:
+            flush_deadline = time.time() + 5.0
+            with clients_lock:
+                outboxes = list(client_outboxes.values())
+            for outbox in outboxes:
+                outbox.flush(timeout=max(0.0, flush_deadline - time.time()))
         time.sleep(0.5) # Beri waktu pesan terkirim
 
-        # Tutup semua koneksi klien
-        print(f"[{get_formatted_time()}] Closing all client connections...")
+        final_metrics = outbox_metrics()
+
+        # Tutup semua koneksi klien sekaligus: FIN ke semua peer, tunggu
+        # FIN+ACK sampai satu deadline bersama, sisanya ditutup paksa
         with clients_lock:
-            client_list = list(connected_clients.items()) # Salin list untuk iterasi aman
-        
-        for addr, conn in client_list: # Iterasi pada salinan
-            print(f"[{get_formatted_time()}] Closing connection to {addr}")
-            try:
-                if conn.connected: # Hanya tutup jika masih 'connected' menurut state objek
-                    conn.close()
-            except Exception as e:
-                print(f"[{get_formatted_time()}] Error closing connection to {addr} during final shutdown: {e}")
+            client_list = list(connected_clients.values()) # Salin list untuk iterasi aman
+        print(f"[{get_formatted_time()}] Closing {len(client_list)} client connections...")
+        close_started = time.time()
+        graceful, forced = close_all(client_list, timeout=args.close_timeout)
+        print(f"[{get_formatted_time()}] Closed {graceful} connections gracefully, {forced} forced "
+              f"in {time.time() - close_started:.2f}s")
         
         with clients_lock:
+            for outbox in client_outboxes.values():
+                outbox.close()
+            client_outboxes.clear()
             connected_clients.clear()
+
+        if command_pool is not None:
+            command_pool.shutdown(wait=False)
+
+        presence.stop()
+        reaper.stop()
+        if history is not None:
+            history.close()
+        if chat_log is not None:
+            chat_log.close()
+            print(f"[{get_formatted_time()}] Chat log stats: {chat_log.stats()}")
+
+        if sessions is not None:
+            print(f"[{get_formatted_time()}] Session stats: {sessions.stats()}")
+
+        if fast_open_listener is not None:
+            print(f"[{get_formatted_time()}] Fast open: accepted={server_socket.stats['fast_open_accepted']} "
+                  f"rejected={server_socket.stats['fast_open_rejected']}")
+
+        if federation is not None:
+            print(f"[{get_formatted_time()}] Federation stats: {federation.stats()}")
+            federation.close()
         
         # Tutup server socket
         try:
@@ -329,6 +1555,7 @@ def main():
         except Exception as e:
             print(f"[{get_formatted_time()}] Error closing server socket: {e}")
             
+        print(f"[{get_formatted_time()}] Outbox metrics at shutdown: {final_metrics}")
         print(f"[{get_formatted_time()}] Server stopped.")
 
 if __name__ == "__main__":
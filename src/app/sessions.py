@@ -0,0 +1,259 @@
+# sessions.py
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+from protocol.framing import MessageDecoder, encode_message
+
+
+# Pesan penanda awal stream sesi di satu koneksi: "SESSION <token> <n>".
+# Pesan setelah penanda adalah pesan ke-n, n+1, ... dari stream sesi.
+SESSION_PREFIX = "SESSION "
+
+
+def session_marker(token: str, seq: int) -> bytes:
+    return f"{SESSION_PREFIX}{token} {seq}".encode("utf-8")
+
+
+class Session:
+    """
+    Sesi chat yang bisa dilanjutkan (resume) dari koneksi baru.
+
+    Posisi stream dihitung per pesan (frame), bukan per byte: pesan keluar
+    dicatat saat diambil sender outbox (_take_batch), setelah kebijakan
+    overflow membuang/menggabungkan pesan, sehingga hitungan server sama
+    dengan pesan yang benar-benar dikirim ke client. Frame pesan terakhir
+    disimpan (maksimal `max_bytes`) untuk dikirim ulang mulai dari posisi
+    yang dilaporkan client.
+    """
+    def __init__(self, token: str, name: str, max_bytes: int = 64 * 1024):
+        self.token = token
+        self.name = name
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+        # Frame pesan terakhir: lines[0] adalah pesan nomor first_seq
+        self.lines: Deque[bytes] = deque()
+        self.retained_bytes = 0
+        self.first_seq = 0
+        self.next_seq = 0
+        self.decoder = MessageDecoder()
+        # Penanda yang harus lewat dulu sebelum pesan dicatat (None = mencatat)
+        self.marker: Optional[bytes] = None
+
+        # Koneksi saat ini, atau alamat lama + waktu putus selama grace period
+        self.addr: Optional[tuple] = None
+        self.detached_at: Optional[float] = None
+        self.rooms: List[str] = []
+        self.active_room: Optional[str] = None
+        # Client memakai protokol biner (app.commands): selama terputus
+        # pesan chat dicatat dalam bentuk paket
+        self.binary = False
+
+    def start_stream(self, seq: int) -> bytes:
+        """Frame penanda untuk koneksi baru; pesan berikutnya bernomor `seq`."""
+        with self.lock:
+            self.marker = session_marker(self.token, seq)
+            self.decoder = MessageDecoder()
+            return encode_message(self.marker)
+
+    @property
+    def streaming(self) -> bool:
+        """True jika penanda sudah terkirim (client sudah tahu token-nya)."""
+        return self.marker is None
+
+    def record(self, data: bytes):
+        """Catat frame yang diserahkan ke transport (dipanggil per batch)."""
+        with self.lock:
+            for message in self.decoder.messages(data):
+                if self.marker is not None:
+                    if message == self.marker:
+                        self.marker = None
+                    continue
+                frame = encode_message(message)
+                self.lines.append(frame)
+                self.retained_bytes += len(frame)
+                self.next_seq += 1
+            while self.lines and self.retained_bytes > self.max_bytes:
+                self.retained_bytes -= len(self.lines.popleft())
+                self.first_seq += 1
+
+    def rewind(self, seq: int) -> Tuple[int, List[bytes], int]:
+        """
+        Siapkan resume dari pesan `seq` (posisi terakhir yang diterima client).
+        Return (posisi awal, frame yang dikirim ulang, jumlah pesan hilang).
+        Frame yang dikirim ulang dilepas dari buffer karena akan dicatat
+        lagi saat melewati outbox koneksi baru.
+        """
+        with self.lock:
+            missed = max(0, self.first_seq - seq)
+            start = min(max(seq, self.first_seq), self.next_seq)
+            replay = []
+            while self.next_seq > start:
+                line = self.lines.pop()
+                self.retained_bytes -= len(line)
+                self.next_seq -= 1
+                replay.append(line)
+            replay.reverse()
+            return start, replay, missed
+
+
+class SessionStore:
+    """
+    Sesi aktif dan sesi yang terputus (detached). Sesi yang terputus tetap
+    menjadi anggota room-nya dan mencatat pesan selama `grace` detik; jika
+    tidak dilanjutkan dalam waktu itu, expire() mengembalikannya agar server
+    mengumumkan leave.
+    """
+    def __init__(self, grace: float = 30.0, max_bytes: int = 64 * 1024):
+        self.grace = grace
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.by_token: Dict[str, Session] = {}
+        self.by_addr: Dict[tuple, Session] = {}
+        # Alamat lama sesi terputus -> sesi (kunci keanggotaan room-nya)
+        self.detached: Dict[tuple, Session] = {}
+
+        # Metrics
+        self.created = 0
+        self.resumed = 0
+        self.expired = 0
+        self.replayed_lines = 0
+
+    def create(self, addr: tuple, name: str) -> Session:
+        session = Session(secrets.token_hex(16), name, self.max_bytes)
+        session.addr = addr
+        with self.lock:
+            old = self.by_addr.pop(addr, None)
+            if old is not None:
+                self.by_token.pop(old.token, None)
+            self.by_token[session.token] = session
+            self.by_addr[addr] = session
+            self.created += 1
+        return session
+
+    def get(self, addr: tuple) -> Optional[Session]:
+        with self.lock:
+            return self.by_addr.get(addr)
+
+    def is_detached(self, addr: tuple) -> bool:
+        with self.lock:
+            return addr in self.detached
+
+    def end(self, addr: tuple) -> Optional[Session]:
+        """Akhiri sesi koneksi `addr` tanpa grace period (!disconnect, FIN)."""
+        with self.lock:
+            session = self.by_addr.pop(addr, None)
+            if session is not None:
+                self.by_token.pop(session.token, None)
+            return session
+
+    def detach(self, addr: tuple, rooms: List[str], active_room: str,
+               now: float = None) -> Optional[Session]:
+        """Koneksi putus tanpa disengaja: simpan sesi selama grace period."""
+        with self.lock:
+            session = self.by_addr.pop(addr, None)
+            if session is None:
+                return None
+            session.rooms = rooms
+            session.active_room = active_room
+            session.detached_at = time.time() if now is None else now
+            self.detached[addr] = session
+            return session
+
+    def resume(self, token: str, addr: tuple) -> Tuple[Optional[Session], Optional[tuple]]:
+        """
+        Pasang sesi `token` ke koneksi baru. Return (sesi, alamat lama), atau
+        (None, None) jika token tidak dikenal/kedaluwarsa. Sesi yang masih
+        menempel ke koneksi lama (server belum sadar koneksi itu mati) juga
+        dipindahkan; pemanggil yang melepas koneksi lama tersebut.
+        """
+        with self.lock:
+            session = self.by_token.get(token)
+            if session is None:
+                return None, None
+            old_addr = session.addr
+            if session.detached_at is not None:
+                self.detached.pop(old_addr, None)
+                session.detached_at = None
+            else:
+                self.by_addr.pop(old_addr, None)
+            session.addr = addr
+            self.by_addr[addr] = session
+            self.resumed += 1
+            return session, old_addr
+
+    def detached_sessions(self) -> List[Tuple[tuple, Session]]:
+        with self.lock:
+            return list(self.detached.items())
+
+    def expire(self, now: float = None) -> List[Tuple[tuple, Session]]:
+        """Buang sesi terputus yang melewati grace period."""
+        now = time.time() if now is None else now
+        expired = []
+        with self.lock:
+            for addr, session in list(self.detached.items()):
+                if now - session.detached_at >= self.grace:
+                    del self.detached[addr]
+                    self.by_token.pop(session.token, None)
+                    expired.append((addr, session))
+            self.expired += len(expired)
+        return expired
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "active": len(self.by_addr),
+                "detached": len(self.detached),
+                "created": self.created,
+                "resumed": self.resumed,
+                "expired": self.expired,
+                "replayed_lines": self.replayed_lines,
+            }
+
+
+class ResumeState:
+    """
+    Sisi client: token sesi dan jumlah pesan yang sudah diterima. Setiap
+    pesan dari server dilewatkan ke on_line(); penanda SESSION mengatur
+    ulang posisi dan tidak ditampilkan.
+    """
+    def __init__(self):
+        self.token: Optional[str] = None
+        self.received = 0
+
+    def on_packet(self):
+        """Paket biner dari server (bukan penanda sesi): hanya dihitung."""
+        if self.token is not None:
+            self.received += 1
+
+    def on_line(self, text: str) -> bool:
+        """Return True jika pesan adalah penanda sesi (bukan pesan chat)."""
+        if text.startswith(SESSION_PREFIX):
+            parts = text.split()
+            if len(parts) == 3 and parts[2].isdigit():
+                self.token = parts[1]
+                self.received = int(parts[2])
+                return True
+        if self.token is not None:
+            self.received += 1
+        return False
+
+    def join_line(self, name: str, offer: str = "") -> str:
+        """
+        Pesan pertama koneksi: lanjutkan sesi jika ada, selain itu join baru.
+        `offer` adalah penawaran versi protokol (app.commands.make_offer).
+        """
+        if self.token is None:
+            return f"AWAL: !awal {name}{offer}"
+        return f"RESUME: !resume {self.token} {self.received} {name}{offer}"
+
+
+def backoff_delays(base: float = 0.5, cap: float = 30.0, jitter: float = 0.5) -> Iterator[float]:
+    """Jeda reconnect eksponensial (base, 2*base, ... sampai cap) dengan jitter."""
+    delay = base
+    while True:
+        yield delay * (1 - jitter * random.random())
+        delay = min(cap, delay * 2)
@@ -0,0 +1,206 @@
+# shard_bus.py
+import itertools
+import os
+import socket
+import threading
+import time
+from typing import Callable, Optional
+from protocol.framing import MAX_MESSAGE_SIZE
+
+
+class ShardBus:
+    """
+    Bus pesan antar proses shard server di satu host, memakai Unix domain
+    socket (SOCK_DGRAM). Setiap shard bind ke `<bus_dir>/shard-<id>.sock`;
+    publish() mengirim satu datagram ke semua shard lain.
+
+    Format datagram: b"<kind> <shard_id>\\n" + payload
+    Contoh kind: broadcast (payload = pesan chat), room (payload = nama room,
+    newline, pesan chat), control (pesan kontrol urgent, mis. SHUTDOWN),
+    count (jumlah client lokal), shutdown (payload kosong).
+
+    Payload lebih besar dari FRAGMENT_SIZE dipecah menjadi beberapa datagram
+    b"<kind> <shard_id> <msg_id> <index> <count>\\n" + potongan payload,
+    dikirim berurutan dan disusun kembali oleh penerima. Datagram Unix tidak
+    hilang atau berubah urutan, jadi fragment yang melompat berarti pengirim
+    menyerah di tengah jalan dan pesannya dibuang.
+
+    Penerimaan bisa lewat thread (start(), untuk engine thread) atau dipoll
+    dari event loop (poll(), untuk engine reactor).
+    """
+    MAX_DATAGRAM = 64 * 1024
+    FRAGMENT_SIZE = 32 * 1024
+    # Pesan chat terbesar ditambah nama room
+    MAX_PAYLOAD = MAX_MESSAGE_SIZE + 1024
+    # Fragment dikirim blocking (antrian datagram penerima pendek); batas
+    # waktu per shard tujuan
+    SEND_TIMEOUT = 1.0
+
+    def __init__(self, bus_dir: str, shard_id: int, num_shards: int,
+                 on_message: Callable[[str, int, bytes], None]):
+        self.bus_dir = bus_dir
+        self.shard_id = shard_id
+        self.num_shards = num_shards
+        self.on_message = on_message
+        self.path = self.shard_path(shard_id)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.setblocking(False)
+        # Socket terpisah (tanpa bind) untuk fragment, agar self.sock tetap
+        # non-blocking bagi engine reactor
+        self.fragment_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.fragment_lock = threading.Lock()
+        self._fragment_ids = itertools.count(1)
+        self._partial = {}
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+
+        # Metrics
+        self.published = 0
+        self.received = 0
+        self.send_errors = 0
+        self.oversized = 0
+        self.truncated = 0
+        self.incomplete = 0
+
+    def shard_path(self, shard_id: int) -> str:
+        return os.path.join(self.bus_dir, f"shard-{shard_id}.sock")
+
+    def publish(self, kind: str, payload: bytes = b"") -> bool:
+        """
+        Kirim pesan ke semua shard lain. Shard yang belum/tidak aktif
+        dilewati. Return False (tidak dikirim sama sekali) jika payload
+        melebihi MAX_PAYLOAD.
+        """
+        if len(payload) > self.MAX_PAYLOAD:
+            self.oversized += 1
+            return False
+        if len(payload) <= self.FRAGMENT_SIZE:
+            datagram = f"{kind} {self.shard_id}\n".encode("utf-8") + payload
+            for peer in self._peers():
+                try:
+                    self.sock.sendto(datagram, self.shard_path(peer))
+                    self.published += 1
+                except OSError:
+                    # FileNotFoundError/ConnectionRefusedError: shard peer mati
+                    # BlockingIOError: buffer socket peer penuh
+                    self.send_errors += 1
+            return True
+
+        chunks = [payload[i:i + self.FRAGMENT_SIZE] for i in range(0, len(payload), self.FRAGMENT_SIZE)]
+        # Lock: fragment dua pesan besar tidak boleh berselang-seling
+        with self.fragment_lock:
+            msg_id = next(self._fragment_ids)
+            datagrams = [f"{kind} {self.shard_id} {msg_id} {index} {len(chunks)}\n".encode("utf-8") + chunk
+                         for index, chunk in enumerate(chunks)]
+            for peer in self._peers():
+                deadline = time.time() + self.SEND_TIMEOUT
+                try:
+                    for datagram in datagrams:
+                        self.fragment_sock.settimeout(max(0.0, deadline - time.time()))
+                        self.fragment_sock.sendto(datagram, self.shard_path(peer))
+                    self.published += 1
+                except OSError:
+                    # Termasuk socket.timeout: shard peer tidak menguras antriannya
+                    self.send_errors += 1
+        return True
+
+    def _peers(self):
+        return [peer for peer in range(self.num_shards) if peer != self.shard_id]
+
+    def _dispatch(self, datagram: bytes):
+        header, _, payload = datagram.partition(b"\n")
+        try:
+            kind, sender, *fragment = header.decode("utf-8").split(" ")
+            sender_id = int(sender)
+            fragment = [int(field) for field in fragment]
+        except ValueError:
+            return
+        if len(fragment) == 3:
+            payload = self._reassemble(sender_id, *fragment, payload)
+            if payload is None:
+                return
+        elif fragment:
+            return
+        self.received += 1
+        self.on_message(kind, sender_id, payload)
+
+    def _reassemble(self, sender_id: int, msg_id: int, index: int, count: int,
+                    chunk: bytes) -> Optional[bytes]:
+        """Simpan satu fragment; return payload utuh setelah fragment terakhir."""
+        if index == 0:
+            if sender_id in self._partial:
+                self.incomplete += 1
+            if count * self.FRAGMENT_SIZE > self.MAX_PAYLOAD + self.FRAGMENT_SIZE:
+                self._partial.pop(sender_id, None)
+                return None
+            self._partial[sender_id] = (msg_id, [])
+        partial = self._partial.get(sender_id)
+        if partial is None or partial[0] != msg_id or len(partial[1]) != index:
+            # Fragment sebelumnya tidak pernah dikirim: buang pesan ini
+            if self._partial.pop(sender_id, None) is not None:
+                self.incomplete += 1
+            return None
+        partial[1].append(chunk)
+        if len(partial[1]) < count:
+            return None
+        del self._partial[sender_id]
+        return b"".join(partial[1])
+
+    def _recv(self) -> Optional[bytes]:
+        """Satu datagram dari socket; None jika terpotong (lebih dari MAX_DATAGRAM)."""
+        datagram, _, flags, _ = self.sock.recvmsg(self.MAX_DATAGRAM)
+        if flags & socket.MSG_TRUNC:
+            self.truncated += 1
+            print(f"[SHARD BUS] Dropped truncated datagram on shard {self.shard_id}")
+            return None
+        return datagram
+
+    def poll(self) -> int:
+        """Proses semua pesan yang sudah ada tanpa blocking. Return jumlahnya."""
+        handled = 0
+        while True:
+            try:
+                datagram = self._recv()
+            except (BlockingIOError, InterruptedError):
+                return handled
+            except OSError:
+                return handled
+            if datagram is not None:
+                self._dispatch(datagram)
+            handled += 1
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def start(self):
+        """Jalankan thread penerima (untuk engine thread)."""
+        self.running = True
+        self.sock.settimeout(0.5)
+
+        def _recv_loop():
+            while self.running:
+                try:
+                    datagram = self._recv()
+                except socket.timeout:
+                    continue
+                except OSError:
+                    break
+                if datagram is not None:
+                    self._dispatch(datagram)
+
+        self.thread = threading.Thread(target=_recv_loop, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.sock.close()
+        self.fragment_sock.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,70 @@
+# workers.py
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Hashable, Tuple
+
+
+class KeyedExecutor:
+    """
+    Worker pool dengan jaminan urutan per key (misalnya per alamat client).
+    Task dengan key yang sama dijalankan berurutan satu per satu, sedangkan
+    task dengan key berbeda bisa berjalan paralel di thread pool yang
+    ukurannya tetap. Antrian per key dibatasi `max_pending`: submit() akan
+    menunggu jika antrian key tersebut penuh, sehingga client yang membanjiri
+    server hanya memperlambat thread pembacanya sendiri.
+    """
+    def __init__(self, max_workers: int = 4, max_pending: int = 64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat-worker")
+        self._queues: Dict[Hashable, Deque[Tuple[Callable, tuple, Future]]] = {}
+        self._cond = threading.Condition()
+
+    def submit(self, key: Hashable, fn: Callable, *args) -> Future:
+        """Antrikan fn(*args) untuk key; return Future hasilnya."""
+        future = Future()
+        with self._cond:
+            while len(self._queues.get(key, ())) >= self.max_pending:
+                self._cond.wait()
+            queue = self._queues.get(key)
+            if queue is None:
+                # Key idle: buat antrian dan jadwalkan ke pool
+                self._queues[key] = deque([(fn, args, future)])
+                self._pool.submit(self._run_next, key)
+            else:
+                # Key sedang diproses worker lain, cukup ikut antri
+                queue.append((fn, args, future))
+        return future
+
+    def _run_next(self, key: Hashable):
+        with self._cond:
+            fn, args, future = self._queues[key][0]
+
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        with self._cond:
+            queue = self._queues[key]
+            queue.popleft()
+            if queue:
+                # Jadwalkan ulang (bukan loop) agar key lain kebagian worker
+                self._pool.submit(self._run_next, key)
+            else:
+                del self._queues[key]
+            self._cond.notify_all()
+
+    def pending(self, key: Hashable) -> int:
+        """Jumlah task yang masih antri/berjalan untuk key."""
+        with self._cond:
+            return len(self._queues.get(key, ()))
+
+    def flush(self, key: Hashable, timeout: float = None):
+        """Tunggu sampai semua task yang sudah diantrikan untuk key selesai."""
+        self.submit(key, lambda: None).result(timeout=timeout)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
@@ -3,7 +3,10 @@ from tkinter import ttk, scrolledtext, messagebox, simpledialog
 import threading
 import time
 from datetime import datetime
+from protocol.framing import encode_message
 from protocol.socket_wrapper import BetterUDPSocket
+from app.sessions import ResumeState, backoff_delays
+from app.commands import PROTOCOL_BINARY, CommandCodec, is_packet
 from collections import deque
 import os
 
@@ -32,6 +35,10 @@ class ModernChatTCPGUI:
         
         self.client_socket = None
         self.connected = False
+        # Token sesi + jumlah baris diterima, untuk !resume saat reconnect
+        self.resume_state = ResumeState()
+        # Protokol perintah (teks/biner) hasil negosiasi + tabel id -> nama
+        self.codec = CommandCodec()
         self.username = ""
         self.server_ip = ""
         self.server_port = 0
@@ -40,7 +47,6 @@ class ModernChatTCPGUI:
         self.messages = deque(maxlen=100)
         
         self.receive_thread = None
-        self.heartbeat_thread = None
         self.running = False
         
         self.connection_dots = 0
@@ -408,20 +414,16 @@ class ModernChatTCPGUI:
             
             self.root.update()
             
-            self.client_socket = BetterUDPSocket()
-            self.client_socket.connect(self.server_ip, self.server_port)
+            # Connect manual selalu memulai sesi baru
+            self.resume_state = ResumeState()
+            self.codec = CommandCodec()
+            self.client_socket = self.open_connection()
             
             self.connected = True
             self.running = True
             self.connection_start_time = time.time()
             self.messages_sent = 0
             
-            try:
-                initial_join = f"AWAL: !awal {self.username}\n"
-                self.client_socket.send(initial_join.encode("utf-8"))
-            except Exception as e:
-                print(f"Error sending initial join message: {e}")
-            
             self.connection_status.config(text="● CONNECTED", fg=self.colors['success'])
             self.status_detail.config(text=f"Connected to {self.server_ip}:{self.server_port}")
             
@@ -450,12 +452,55 @@ class ModernChatTCPGUI:
             
             messagebox.showerror("❌ Connection Failed", f"Failed to connect to server:\n\n{str(e)}")
     
+    def open_connection(self):
+        sock = BetterUDPSocket()
+        # Pesan kontrol (SHUTDOWN, COUNT, balasan !kill) lewat jalur urgent
+        sock.on_urgent = self.receive_urgent
+        # Tawarkan kompresi, header kompak dan FEC; masing-masing hanya aktif
+        # jika server menjalankan --compress / --compact-header / --fec
+        sock.enable_compression()
+        sock.enable_compact_header()
+        sock.enable_fec()
+        # Join (atau !resume) + berlangganan jumlah online (server push COUNT
+        # saat berubah). Saat reconnect, kedua pesan ini ikut di SYN berkat
+        # cookie fast open. Join menawarkan protokol biner; sampai server
+        # menjawab, pesan dikirim sebagai teks
+        self.codec.reset()
+        initial_join = (encode_message(self.resume_state.join_line(self.username, self.codec.offer()).encode("utf-8"))
+                        + encode_message(b"[PRESENCE]: !presence"))
+        sock.connect(self.server_ip, self.server_port, data=initial_join)
+        # Keepalive: deteksi server yang hilang tanpa FIN agar bisa reconnect
+        sock.enable_keepalive(idle=5.0, interval=1.0, probes=3)
+        return sock
+
+    def reconnect(self):
+        """Sambung ulang dengan exponential backoff lalu lanjutkan sesi."""
+        self.root.after(0, lambda: self.connection_status.config(text="● RECONNECTING",
+                                                                 fg=self.colors['warning']))
+        for delay in backoff_delays():
+            if not self.running:
+                return False
+            try:
+                sock = self.open_connection()
+            except Exception:
+                time.sleep(delay)
+                continue
+            old, self.client_socket = self.client_socket, sock
+            try:
+                old.close()
+            except Exception:
+                pass
+            self.root.after(0, lambda: self.connection_status.config(text="● CONNECTED",
+                                                                     fg=self.colors['success']))
+            self.root.after(0, lambda: self.add_message("SYSTEM", "🔁 Reconnected, session resumed", system=True))
+            return True
+        return False
+
     def disconnect_from_server(self):
         try:
             if self.connected and self.client_socket:
                 self.add_message("SYSTEM", "📤 Sending disconnect request...", system=True)
-                disconnect_msg = f"{self.username}: !disconnect\n"
-                self.client_socket.send(disconnect_msg.encode("utf-8"))
+                self.client_socket.send_message(self.codec.encode(self.username, "!disconnect"))
                 time.sleep(0.2)
                 
             self.cleanup_connection()
@@ -498,34 +543,44 @@ class ModernChatTCPGUI:
     def start_background_threads(self):
         self.receive_thread = threading.Thread(target=self.receive_messages, daemon=True)
         self.receive_thread.start()
-        
-        self.heartbeat_thread = threading.Thread(target=self.send_heartbeat, daemon=True)
-        self.heartbeat_thread.start()
     
     def receive_messages(self):
         while self.running and self.connected:
             try:
-                data = self.client_socket.receive(timeout=1.0)
-                if data:
-                    message = data.decode().strip()
+                # Satu frame = satu pesan utuh, walaupun terpotong di beberapa segment
+                data = self.client_socket.recv_message(timeout=1.0)
+                if data is not None and is_packet(data):
+                    # Paket biner: chat ber-id, atau update tabel nama (USER/ROOM)
+                    self.resume_state.on_packet()
+                    message = self.codec.decode(data)
+                    if message is not None:
+                        self.root.after(0, lambda m=message: self.process_received_message(m))
+                elif data is not None:
+                    message = data.decode("utf-8", errors="replace").strip()
+                    if self.resume_state.on_line(message) or self.codec.on_reply(message):
+                        continue
                     if message:
                         self.root.after(0, lambda m=message: self.process_received_message(m))
+                elif self.client_socket.peer_closed:
+                    # Server menutup koneksi (FIN)
+                    if self.running:
+                        self.root.after(0, lambda: self.handle_connection_error())
+                    break
             except Exception:
+                if self.running and self.client_socket.dead and self.resume_state.token:
+                    # Jaringan putus (keepalive): reconnect dan resume sesi
+                    if self.reconnect():
+                        continue
                 if self.running:
                     self.root.after(0, lambda: self.handle_connection_error())
                 break
     
-    def send_heartbeat(self):
-        while self.running and self.connected:
-            try:
-                heartbeat_msg = f"[HEARTBEAT]: !heartbeat\n"
-                self.client_socket.send(heartbeat_msg.encode("utf-8"))
-                time.sleep(1)
-            except Exception:
-                if self.running:
-                    self.root.after(0, lambda: self.handle_connection_error())
-                break
-    
+    def receive_urgent(self, data):
+        """Pesan kontrol urgent: diproses tanpa menunggu data chat yang antri."""
+        message = data.decode("utf-8", errors="replace").strip()
+        if message:
+            self.root.after(0, lambda m=message: self.process_received_message(m))
+
     def process_received_message(self, message):
         try:
             if message == "SHUTDOWN":
@@ -564,8 +619,7 @@ class ModernChatTCPGUI:
             return
         
         try:
-            full_message = f"{self.username}: {message}\n"
-            self.client_socket.send(full_message.encode("utf-8"))
+            self.client_socket.send_message(self.codec.encode(self.username, message))
             
             self.message_entry.delete(0, tk.END)
             self.messages_sent += 1
@@ -593,8 +647,12 @@ class ModernChatTCPGUI:
                 old_name = self.username
                 self.username = new_name.strip()
                 
-                change_message = f"[SERVER]: {old_name} changes its username to {self.username}\n"
-                self.client_socket.send(change_message.encode("utf-8"))
+                if self.codec.version >= PROTOCOL_BINARY:
+                    # Paket tidak membawa nama: beri tahu server lewat !name
+                    self.client_socket.send_message(self.codec.encode(self.username, f"!name {self.username}"))
+                else:
+                    change_message = f"[SERVER]: {old_name} changes its username to {self.username}"
+                    self.client_socket.send_message(change_message.encode("utf-8"))
                 
                 self.add_message("SYSTEM", f"✅ Username changed from '{old_name}' to '{self.username}'", system=True)
                 
@@ -616,8 +674,7 @@ class ModernChatTCPGUI:
                                          show='*')
         if password:
             try:
-                kill_message = f"{self.username}: !kill {password}\n"
-                self.client_socket.send(kill_message.encode("utf-8"))
+                self.client_socket.send_message(self.codec.encode(self.username, f"!kill {password}"))
                 self.add_message("SYSTEM", "💀 Kill command sent to server", system=True)
             except Exception as e:
                 messagebox.showerror("❌ Error", f"Failed to send kill command: {str(e)}")
@@ -658,8 +715,6 @@ class ModernChatTCPGUI:
         try:
             if self.receive_thread and self.receive_thread.is_alive():
                 self.receive_thread.join(timeout=1.0)
-            if self.heartbeat_thread and self.heartbeat_thread.is_alive():
-                self.heartbeat_thread.join(timeout=1.0)
         except:
             pass
         
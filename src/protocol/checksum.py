@@ -1,24 +1,42 @@
-def compute_checksum(data: bytes) -> int:
+import struct
+
+def ones_complement_sum(data: bytes) -> int:
     """
-    Hitung checksum untuk data yang diberikan.
-    Menggunakan algoritma checksum 16-bit.
-    :param data: Data yang akan dihitung checksum-nya.
-    :return: Nilai checksum 16-bit.
+    Hitung jumlah one's complement 16-bit dari data (belum dikomplemen).
+    Karena penjumlahan one's complement bersifat asosiatif, jumlah bagian
+    header dan payload bisa dihitung terpisah lalu digabung dengan
+    add_ones_complement() (checksum inkremental, RFC 1071/1624).
+    :param data: Data yang akan dijumlahkan.
+    :return: Jumlah 16-bit yang sudah di-fold.
     """
     # 1) Jika panjang data ganjil, tambahkan byte nol di akhir
     if len(data) % 2 != 0:
         data += b'\x00'
 
-    total = 0
-    # 2) Hitung jumlah dari setiap 16-bit word
-    for i in range(0, len(data), 2):
-        word = (data[i] << 8) + data[i + 1]
-        total += word
-        # wrap around jika total lebih dari 16 bit
+    # 2) Jumlahkan setiap 16-bit word (big-endian)
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    return add_ones_complement(total)
+
+def add_ones_complement(*values: int) -> int:
+    """
+    Gabungkan beberapa jumlah 16-bit dengan end-around carry.
+    :return: Jumlah 16-bit yang sudah di-fold.
+    """
+    total = sum(values)
+    # wrap around jika total lebih dari 16 bit
+    while total >> 16:
         total = (total & 0xFFFF) + (total >> 16)
+    return total
 
+def compute_checksum(data: bytes) -> int:
+    """
+    Hitung checksum untuk data yang diberikan.
+    Menggunakan algoritma checksum 16-bit.
+    :param data: Data yang akan dihitung checksum-nya.
+    :return: Nilai checksum 16-bit.
+    """
     # 3) Ambil komplemen dari total
-    checksum = ~total & 0xFFFF
+    checksum = ~ones_complement_sum(data) & 0xFFFF
     return checksum
 
 def verify_checksum(data: bytes, checksum: int) -> bool:
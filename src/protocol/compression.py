@@ -0,0 +1,226 @@
+# compression.py
+import threading
+import time
+import zlib
+from typing import Dict
+
+from .framing import FramingError, MAX_MESSAGE_SIZE
+from .segment import PreparedMessage
+from .varint import IncompleteVarint, decode_varint, encode_varint
+
+
+# Kompresi payload per koneksi, dinegosiasikan saat handshake (lihat
+# BetterUDPSocket.enable_compression). Setelah aktif, setiap send() di
+# stream 0 menjadi satu blok: header varint (panjang isi << 2 | jenis) lalu
+# isi blok. Stream lain, jalur urgent dan data fast open di SYN tidak
+# dikompres.
+BLOCK_RAW = 0     # apa adanya: payload kecil, atau hasil kompresi tidak lebih kecil
+BLOCK_DICT = 1    # deflate mandiri dengan preset dictionary (pesan chat pendek)
+BLOCK_STREAM = 2  # lanjutan stream deflate milik koneksi (transfer bulk)
+KIND_BITS = 2
+
+# Blok lebih kecil dari ini dikirim RAW tanpa menyentuh zlib
+MIN_COMPRESS_SIZE = 32
+# Data sebesar ini atau lebih, dan PreparedMessage bulk, memakai stream
+# deflate: history di dalamnya ikut menjadi referensi blok berikutnya
+BULK_SIZE = 1024
+# Data yang lebih besar dipecah menjadi beberapa blok. Penerima menolak
+# blok yang isinya (setelah dekompresi) melebihi batas ini.
+MAX_BLOCK_SIZE = MAX_MESSAGE_SIZE
+LEVEL = 6
+
+# Deflate pesan pendek: window 2 KB (dictionary maksimal 2 KB) dan memLevel
+# kecil, sehingga compressor baru per pesan murah (beberapa mikrodetik).
+# Stream bulk memakai window penuh 32 KB, dibuat sekali per koneksi.
+DICT_WBITS = -11
+DICT_MEMLEVEL = 4
+STREAM_WBITS = -15
+
+# String yang sering muncul di stream chat: frame header pesan pendek,
+# pesan server, perintah, timestamp, lalu kata-kata chat umum. zlib paling
+# murah merujuk bagian akhir dictionary, jadi yang paling sering di akhir.
+PRESET_DICTIONARY = "".join((
+    "Usage: !join <room>, !leave [room], !rooms Unknown command: ",
+    "Rate limit exceeded. You are disconnected. Session expired, joining as a new client. ",
+    "Server is shutting down NOW. Server has been shut down. ",
+    "Recent messages in #lobby No history for #lobby Now chatting in #Left #",
+    "outbox clients= depth= dropped= coalesced= sessions active= detached= resumed= ",
+    "!heartbeat !history !stats !rooms !join !leave !name !disconnect !kill !awal !resume ",
+    "[PRESENCE]: !presence COUNT: SESSION ",
+    "the you and that have this for not with but what are was just yes okay thanks ",
+    "yang dan di ini itu aku kamu ada tidak sudah belum bisa mau apa kita lagi juga ",
+    "have left the chat. has left the chat. changes its username to has joined!. ",
+    "[SERVER]: [10:00 AM] [11:00 AM] [12:00 PM] [1:00 PM] [2:00 PM] [3:00 PM] ",
+    "[4:00 PM] [5:00 PM] [6:00 PM] [7:00 PM] [8:00 PM] [9:00 PM] [SERVER]: ",
+    "\x00\x00\x00\x1e\x00\x00\x00\x28\x00\x00\x00\x32\x00\x00\x00",
+)).encode("utf-8")[-(1 << -DICT_WBITS):]
+
+
+class CompressionError(FramingError):
+    """Blok kompresi tidak valid (stream rusak atau peer tanpa kompresi)."""
+
+
+def encode_block(kind: int, body: bytes) -> bytes:
+    return encode_varint(len(body) << KIND_BITS | kind) + body
+
+
+def dict_block(data: bytes) -> bytes:
+    """
+    Blok mandiri (tidak bergantung state koneksi): DICT, atau RAW jika data
+    kecil atau tidak mengecil. Karena mandiri, hasilnya bisa dipakai bersama
+    oleh semua penerima broadcast.
+    """
+    if len(data) >= MIN_COMPRESS_SIZE:
+        compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, DICT_WBITS, DICT_MEMLEVEL,
+                                      zdict=PRESET_DICTIONARY)
+        body = compressor.compress(data) + compressor.flush()
+        if len(body) < len(data):
+            return encode_block(BLOCK_DICT, body)
+    return encode_block(BLOCK_RAW, data)
+
+
+class Compressor:
+    """
+    Sisi pengirim satu koneksi. Pesan pendek menjadi blok DICT (atau RAW),
+    data besar masuk stream deflate koneksi (Z_SYNC_FLUSH per blok, jadi
+    setiap blok bisa langsung didekompresi penerima). Rasio dan waktu CPU
+    dicatat di `stats` koneksi.
+    """
+    def __init__(self, stats: Dict[str, float]):
+        self.stats = stats
+        stats.update(compress_in=0, compress_out=0, compress_ratio=1.0,
+                     compress_time=0.0, compress_bypassed=0)
+        self._stream = None
+        self.lock = threading.Lock()
+
+    def compress(self, data: bytes, bulk: bool = False) -> bytes:
+        """data -> satu blok atau lebih, siap di-chunk."""
+        start = time.perf_counter()
+        blocks = []
+        for i in range(0, len(data), MAX_BLOCK_SIZE):
+            piece = data[i:i + MAX_BLOCK_SIZE]
+            if len(piece) < MIN_COMPRESS_SIZE:
+                self.stats["compress_bypassed"] += 1
+                blocks.append(encode_block(BLOCK_RAW, piece))
+            elif bulk or len(piece) >= BULK_SIZE:
+                blocks.append(self._stream_block(piece))
+            else:
+                blocks.append(dict_block(piece))
+        out = b"".join(blocks)
+        self._record(len(data), len(out), time.perf_counter() - start)
+        return out
+
+    def prepare(self, message: PreparedMessage, chunk_size: int) -> PreparedMessage:
+        """
+        PreparedMessage versi terkompresi. Blok DICT/RAW disimpan di
+        message.compressed sehingga broadcast hanya mengompres (dan
+        menghitung checksum chunk) sekali untuk semua penerima; bulk memakai
+        stream koneksi ini.
+        """
+        if message.bulk:
+            return PreparedMessage(self.compress(message.data, bulk=True),
+                                   message.max_payload_size, bulk=True)
+        prepared = message.compressed
+        elapsed = 0.0
+        if prepared is None or prepared.max_payload_size != chunk_size:
+            start = time.perf_counter()
+            prepared = PreparedMessage(dict_block(message.data), chunk_size)
+            elapsed = time.perf_counter() - start
+            message.compressed = prepared
+        if len(message.data) < MIN_COMPRESS_SIZE:
+            self.stats["compress_bypassed"] += 1
+        self._record(len(message.data), len(prepared.data), elapsed)
+        return prepared
+
+    def _stream_block(self, data: bytes) -> bytes:
+        with self.lock:
+            if self._stream is None:
+                self._stream = zlib.compressobj(LEVEL, zlib.DEFLATED, STREAM_WBITS,
+                                                zdict=PRESET_DICTIONARY)
+            body = self._stream.compress(data) + self._stream.flush(zlib.Z_SYNC_FLUSH)
+        return encode_block(BLOCK_STREAM, body)
+
+    def _record(self, size_in: int, size_out: int, elapsed: float):
+        stats = self.stats
+        stats["compress_in"] += size_in
+        stats["compress_out"] += size_out
+        stats["compress_time"] += elapsed
+        if stats["compress_in"]:
+            stats["compress_ratio"] = stats["compress_out"] / stats["compress_in"]
+
+
+class Decompressor:
+    """
+    Sisi penerima: byte stream in-order dari peer -> data aplikasi. Blok
+    yang belum lengkap ditahan di buffer. `raw_prefix` byte pertama (data
+    fast open di SYN, dikirim sebelum kompresi disepakati) diteruskan apa
+    adanya.
+    """
+    def __init__(self, stats: Dict[str, float], raw_prefix: int = 0):
+        self.stats = stats
+        stats.update(decompress_in=0, decompress_out=0, decompress_time=0.0)
+        self.raw_prefix = raw_prefix
+        self.buffer = bytearray()
+        self._stream = None
+
+    def feed(self, data: bytes) -> bytes:
+        """Tambahkan data; return isi semua blok yang sudah lengkap."""
+        result = b""
+        if self.raw_prefix:
+            result = data[:self.raw_prefix]
+            data = data[self.raw_prefix:]
+            self.raw_prefix -= len(result)
+        self.buffer += data
+        offset = 0
+        parts = []
+        start_time = time.perf_counter()
+        while offset < len(self.buffer):
+            try:
+                header, start = decode_varint(self.buffer, offset)
+            except IncompleteVarint:
+                break
+            except ValueError as e:
+                raise CompressionError(str(e)) from None
+            kind = header & ((1 << KIND_BITS) - 1)
+            length = header >> KIND_BITS
+            if length > 2 * MAX_BLOCK_SIZE:
+                raise CompressionError(f"Block length {length} exceeds {2 * MAX_BLOCK_SIZE} bytes")
+            end = start + length
+            if end > len(self.buffer):
+                break
+            parts.append(self._decode(kind, bytes(self.buffer[start:end])))
+            self.stats["decompress_in"] += end - offset
+            offset = end
+        if offset:
+            del self.buffer[:offset]
+            out = b"".join(parts)
+            self.stats["decompress_out"] += len(out)
+            self.stats["decompress_time"] += time.perf_counter() - start_time
+            result += out
+        return result
+
+    def _decode(self, kind: int, body: bytes) -> bytes:
+        if kind == BLOCK_RAW:
+            return body
+        try:
+            if kind == BLOCK_DICT:
+                decompressor = zlib.decompressobj(DICT_WBITS, zdict=PRESET_DICTIONARY)
+                data = decompressor.decompress(body, MAX_BLOCK_SIZE + 1)
+                complete = decompressor.eof
+            elif kind == BLOCK_STREAM:
+                if self._stream is None:
+                    self._stream = zlib.decompressobj(STREAM_WBITS, zdict=PRESET_DICTIONARY)
+                data = self._stream.decompress(body, MAX_BLOCK_SIZE + 1)
+                complete = not self._stream.unconsumed_tail
+            else:
+                raise CompressionError(f"Unknown block type {kind}")
+        except zlib.error as e:
+            raise CompressionError(f"Corrupt compressed block: {e}") from None
+        if not complete or len(data) > MAX_BLOCK_SIZE:
+            raise CompressionError(f"Invalid compressed block ({len(body)} bytes)")
+        return data
+
+    @property
+    def buffered(self) -> int:
+        """Byte blok yang sudah diterima tetapi belum lengkap."""
+        return len(self.buffer)
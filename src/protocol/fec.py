@@ -0,0 +1,157 @@
+# fec.py
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+# Forward error correction stream 0 (dinegosiasikan saat handshake, lihat
+# BetterUDPSocket.enable_fec). Pengirim mengelompokkan segment data menjadi
+# grup berurutan dan mengirim satu segment parity per grup: XOR payload
+# semua segment grup (yang lebih pendek dianggap diisi nol). Jika tepat satu
+# segment grup hilang, penerima membangunnya kembali dari parity dan segment
+# lain tanpa menunggu retransmission (RTO).
+#
+# Segment parity: flag FEC_FLAG tanpa ACK, seq_num = seq awal grup,
+# ack_num = seq akhir grup (eksklusif), urgent_pointer = jumlah segment
+# grup (tanpa flag URG field ini tidak dipakai). Penerima menjawabnya
+# dengan satu ACK untuk seluruh grup (lihat BetterUDPSocket._handle_parity).
+
+# Ukuran grup (K) dipilih dari perkiraan loss: K ~ LOSS_BUDGET / loss,
+# sehingga rata-rata satu grup kehilangan ~LOSS_BUDGET segment dan jarang
+# kehilangan dua (yang tetap ditangani retransmission). Overhead = 1/K.
+MIN_GROUP = 2
+MAX_GROUP = 16
+LOSS_BUDGET = 0.2
+# Perkiraan loss awal (FEC diaktifkan karena link diduga lossy) dan bobot
+# EWMA per segment
+INITIAL_LOSS = 0.02
+LOSS_ALPHA = 0.02
+# Grup yang belum penuh dikirim parity-nya setelah selama ini, tetapi hanya
+# jika masih ada segment grup yang belum di-ACK
+FLUSH_DELAY = 0.1
+# Payload segment terbaru yang disimpan penerima untuk rekonstruksi
+CACHE_SIZE = 256
+
+
+def xor_into(parity: bytearray, payload: bytes):
+    """parity ^= payload (parity diperpanjang dengan nol jika perlu)"""
+    if len(payload) > len(parity):
+        parity.extend(bytes(len(payload) - len(parity)))
+    value = int.from_bytes(parity[:len(payload)], "big") ^ int.from_bytes(payload, "big")
+    parity[:len(payload)] = value.to_bytes(len(payload), "big")
+
+
+class FecEncoder:
+    """
+    Sisi pengirim: kumpulkan segment data baru (bukan retransmission) ke
+    grup, kembalikan parity saat grup penuh atau saat flush(). Perkiraan
+    loss diperbarui dari retransmission dan segment yang dipulihkan peer;
+    statistik dicatat di `stats` koneksi.
+    """
+    def __init__(self, stats: Dict[str, float]):
+        self.stats = stats
+        stats.update(fec_parity_sent=0, fec_parity_bytes=0, fec_losses=0,
+                     fec_loss=INITIAL_LOSS, fec_group=group_size(INITIAL_LOSS))
+        self.loss = INITIAL_LOSS
+        self.seqs: List[int] = []
+        self.end = 0
+        self.parity = bytearray()
+        self.started_at = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seq: int, payload: bytes, now: float) -> Optional[Tuple[int, int, int, bytes]]:
+        """Tambahkan segment; return (awal, akhir, jumlah, parity) jika grup penuh."""
+        with self.lock:
+            self.loss *= 1 - LOSS_ALPHA
+            if not self.seqs:
+                self.started_at = now
+            self.seqs.append(seq)
+            self.end = seq + len(payload)
+            xor_into(self.parity, payload)
+            if len(self.seqs) >= group_size(self.loss):
+                return self._emit()
+            return None
+
+    def flush(self, now: float, unacked: Dict[int, object]) -> Optional[Tuple[int, int, int, bytes]]:
+        """
+        Parity untuk grup yang belum penuh, jika sudah FLUSH_DELAY detik dan
+        masih ada segment-nya di `unacked`. Grup yang seluruhnya sudah di-ACK
+        dibuang tanpa parity.
+        """
+        with self.lock:
+            if not self.seqs or now - self.started_at < FLUSH_DELAY:
+                return None
+            if any(seq in unacked for seq in self.seqs):
+                return self._emit()
+            self._reset()
+            return None
+
+    def record_loss(self):
+        """Satu segment hilang (di-retransmit, atau dipulihkan penerima dari parity)"""
+        with self.lock:
+            self.loss = min(1.0, self.loss + LOSS_ALPHA)
+            self.stats["fec_losses"] += 1
+
+    def _emit(self) -> Tuple[int, int, int, bytes]:
+        group = (self.seqs[0], self.end, len(self.seqs), bytes(self.parity))
+        self._reset()
+        self.stats["fec_parity_sent"] += 1
+        self.stats["fec_parity_bytes"] += len(group[3])
+        self.stats["fec_loss"] = self.loss
+        self.stats["fec_group"] = group_size(self.loss)
+        return group
+
+    def _reset(self):
+        self.seqs = []
+        self.parity = bytearray()
+
+
+def group_size(loss: float) -> int:
+    """K untuk perkiraan loss `loss`"""
+    if loss <= LOSS_BUDGET / MAX_GROUP:
+        return MAX_GROUP
+    return max(MIN_GROUP, min(MAX_GROUP, int(LOSS_BUDGET / loss)))
+
+
+class FecDecoder:
+    """
+    Sisi penerima: simpan payload segment stream 0 terbaru per seq, lalu
+    untuk setiap parity bangun kembali satu segment grup yang hilang.
+    """
+    def __init__(self, stats: Dict[str, float]):
+        self.stats = stats
+        stats.update(fec_parity_received=0, fec_recovered=0, fec_unrecoverable=0)
+        self.received: "OrderedDict[int, bytes]" = OrderedDict()
+
+    def add(self, seq: int, payload: bytes):
+        self.received[seq] = payload
+        if len(self.received) > CACHE_SIZE:
+            self.received.popitem(last=False)
+
+    def recover(self, start: int, end: int, count: int, parity: bytes) -> Optional[List[Tuple[int, bytes]]]:
+        """
+        Segment grup [start, end) yang dibangun kembali: [] jika tidak ada
+        yang hilang, [(seq, payload)] jika tepat satu yang hilang, None jika
+        lebih dari satu (grup tidak bisa dilengkapi).
+        """
+        self.stats["fec_parity_received"] += 1
+        present = sorted(seq for seq in self.received if start <= seq < end)
+        payloads = [self.received.pop(seq) for seq in present]
+        gaps = []
+        pos = start
+        for seq, payload in zip(present + [end], payloads + [b""]):
+            if seq > pos:
+                gaps.append((pos, seq))
+            pos = max(pos, seq + len(payload))
+        if not gaps:
+            return []
+        if len(gaps) > 1 or len(present) != count - 1 or gaps[0][1] - gaps[0][0] > len(parity):
+            # Lebih dari satu segment hilang: menunggu retransmission
+            self.stats["fec_unrecoverable"] += 1
+            return None
+        restored = bytearray(parity)
+        for payload in payloads:
+            xor_into(restored, payload)
+        seq, gap_end = gaps[0]
+        self.stats["fec_recovered"] += 1
+        return [(seq, bytes(restored[:gap_end - seq]))]
@@ -0,0 +1,73 @@
+# framing.py
+import struct
+from typing import List, Optional
+
+
+# Framing pesan di atas byte stream: setiap pesan diawali panjangnya (u32
+# big-endian). Isi pesan bebas (boleh berisi newline) dan penerima tidak
+# perlu mencari delimiter di buffer.
+HEADER = struct.Struct("!I")
+HEADER_SIZE = HEADER.size
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+
+class FramingError(ValueError):
+    """Panjang frame melebihi batas (stream rusak atau peer tanpa framing)."""
+
+
+def encode_message(payload: bytes) -> bytes:
+    """Satu pesan dalam format frame: panjang + payload."""
+    if len(payload) > MAX_MESSAGE_SIZE:
+        raise FramingError(f"Message too large: {len(payload)} > {MAX_MESSAGE_SIZE} bytes")
+    return HEADER.pack(len(payload)) + payload
+
+
+class MessageDecoder:
+    """
+    Decoder incremental untuk stream frame.
+
+    feed() menambahkan byte ke bytearray; next_message() mengambil satu pesan
+    utuh dengan membaca header di posisi baca saat ini, tanpa memindai atau
+    memotong ulang buffer. Byte yang sudah dibaca baru dibuang (sekali
+    salin) saat melebihi separuh buffer.
+    """
+    def __init__(self, max_message_size: int = MAX_MESSAGE_SIZE):
+        self.max_message_size = max_message_size
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def feed(self, data: bytes):
+        if self.offset and self.offset * 2 >= len(self.buffer):
+            del self.buffer[:self.offset]
+            self.offset = 0
+        self.buffer += data
+
+    def next_message(self) -> Optional[bytes]:
+        """Pesan utuh berikutnya, atau None jika frame belum lengkap."""
+        if len(self.buffer) - self.offset < HEADER_SIZE:
+            return None
+        (length,) = HEADER.unpack_from(self.buffer, self.offset)
+        if length > self.max_message_size:
+            raise FramingError(f"Frame length {length} exceeds {self.max_message_size} bytes")
+        start = self.offset + HEADER_SIZE
+        end = start + length
+        if end > len(self.buffer):
+            return None
+        self.offset = end
+        return bytes(self.buffer[start:end])
+
+    def messages(self, data: bytes = b"") -> List[bytes]:
+        """feed(data) lalu ambil semua pesan yang sudah lengkap."""
+        if data:
+            self.feed(data)
+        result = []
+        while True:
+            message = self.next_message()
+            if message is None:
+                return result
+            result.append(message)
+
+    @property
+    def buffered(self) -> int:
+        """Byte yang sudah diterima tetapi belum menjadi pesan utuh."""
+        return len(self.buffer) - self.offset
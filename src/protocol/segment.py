@@ -1,5 +1,67 @@
 import struct
-from .checksum import compute_checksum, verify_checksum
+from typing import List, Optional, Tuple
+from .checksum import add_ones_complement, ones_complement_sum, verify_checksum
+from .varint import decode_varint, encode_varint
+
+# Header kompak untuk koneksi ESTABLISHED (dinegosiasikan saat handshake,
+# lihat BetterUDPSocket.enable_compact_header). Port diganti connection id,
+# seq/ack dikirim sebagai delta terhadap sequence awal, dan field yang
+# bernilai default tidak dikirim:
+# B      : 0000EUAF, F=FIN, A=ACK, U=URG, E=ada byte field opsional.
+#          Byte pertama < 0x10 membedakannya dari header penuh, yang diawali
+#          src_port >= 0x1000 (header kompak hanya dipakai jika kedua port
+#          >= MIN_COMPACT_PORT)
+# H      : checksum (header dengan checksum 0, lalu payload)
+# [B]    : field opsional: 0x01 stream_id, 0x02 urgent_pointer, 0x04 window
+# varint : connection id
+# varint : seq, zigzag delta terhadap sequence awal pengirim
+# varint : ack, zigzag delta terhadap sequence awal penerima
+# varint : field opsional, urut sesuai bit
+# Stream selain 0 dan jalur urgent memulai sequence dari 0, jadi basis
+# delta-nya 0. Segment dengan flag lain (SYN) selalu memakai header penuh.
+COMPACT_FIN = 0x01
+COMPACT_ACK = 0x02
+COMPACT_URG = 0x04
+COMPACT_EXT = 0x08
+COMPACT_LIMIT = 0x10
+MIN_COMPACT_PORT = COMPACT_LIMIT << 8
+EXT_STREAM = 0x01
+EXT_URGENT_POINTER = 0x02
+EXT_WINDOW = 0x04
+DEFAULT_WINDOW = 1024
+# Flag header penuh yang bisa dikirim dengan header kompak
+COMPACT_FLAGS = ((0x01, COMPACT_FIN), (0x10, COMPACT_ACK), (0x20, COMPACT_URG))
+
+
+def zigzag(delta: int) -> int:
+    """Delta bertanda -> bilangan tak bertanda kecil (0, -1, 1, -2 -> 0, 1, 2, 3)."""
+    return delta << 1 if delta >= 0 else (-delta << 1) - 1
+
+
+def unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def seq_delta(value: int, base: int) -> int:
+    """Selisih dua sequence number 32 bit, -2^31 .. 2^31-1."""
+    return ((value - base + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+
+class CompactContext:
+    """
+    State yang disepakati kedua sisi saat handshake untuk header kompak:
+    connection id, port kedua sisi (diisi ulang ke Segment saat decode) dan
+    sequence awal stream 0 milik sisi ini (local_base) dan peer (peer_base).
+    """
+    def __init__(self, conn_id: int, local_port: int, peer_port: int,
+                 local_base: int, peer_base: int):
+        self.conn_id = conn_id
+        self.local_port = local_port
+        self.peer_port = peer_port
+        self.local_base = local_base
+        self.peer_base = peer_base
+
+
 class Segment:
     # Format Header:
     # !   : network byte order (big-endian)
@@ -7,7 +69,8 @@ class Segment:
     # H   : dst_port (16 bit)
     # I   : seq_num (32 bit)
     # I   : ack_num (32 bit)
-    # B   : data_offset + reserved (4+4 bit)
+    # B   : data_offset + options (4+4 bit); options hanya dipakai di
+    #       SYN/SYN+ACK untuk negosiasi fitur koneksi (lihat socket_wrapper)
     # B   : flags (8 bit)
     # H   : window (16 bit)
     # H   : checksum (16 bit)
@@ -15,6 +78,13 @@ class Segment:
     HEADER_FORMAT = '!HHIIBBHHH'
     HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
 
+    # Ekstensi stream (setelah header, data_offset = 6), hanya untuk segment
+    # stream selain 0 (lihat BetterUDPSocket.open_stream):
+    # H   : stream_id (16 bit)
+    # H   : reserved (16 bit)
+    STREAM_FORMAT = '!HH'
+    STREAM_SIZE = struct.calcsize(STREAM_FORMAT)
+
     # Konstruktor
     def __init__(self,
                  src_port: int,
@@ -23,36 +93,68 @@ class Segment:
                  ack_num: int = 0,
                  flags: int = 0,
                  window: int = 1024,
-                 payload: bytes = b''):
+                 payload: bytes = b'',
+                 payload_sum: Optional[int] = None,
+                 stream_id: int = 0,
+                 options: int = 0):
         self.src_port = src_port
         self.dst_port = dst_port
         self.seq_num = seq_num
         self.ack_num = ack_num
-        self.data_offset = 5
+        self.stream_id = stream_id
+        self.data_offset = 5 + (self.STREAM_SIZE // 4 if stream_id else 0)
+        self.options = options
         self.flags = flags
         self.window = window
         self.urgent_pointer = 0
         self.payload = payload
-    
-    def to_bytes(self) -> bytes:
-        # Pack header tanpa checksum
-        # Data offset adalah 5 (5 * 4 = 20 bytes header)
-        offset_reserved = (self.data_offset << 4)
-        header_wo_checksum = struct.pack(
-            self.HEADER_FORMAT,
+        # Jumlah one's complement payload boleh diberikan dari luar (lihat
+        # PreparedMessage) agar payload yang sama tidak dihitung ulang
+        self._payload_sum = payload_sum
+
+    @property
+    def payload(self) -> bytes:
+        return self._payload
+
+    @payload.setter
+    def payload(self, value: bytes):
+        self._payload = value
+        self._payload_sum = None
+
+    def header_sum(self) -> int:
+        """Jumlah one's complement seluruh field header (checksum dianggap 0)"""
+        return add_ones_complement(
             self.src_port,
             self.dst_port,
-            self.seq_num,
-            self.ack_num,
-            offset_reserved,
-            self.flags,
+            self.seq_num >> 16, self.seq_num & 0xFFFF,
+            self.ack_num >> 16, self.ack_num & 0xFFFF,
+            (self.data_offset << 12) | (self.options << 8) | self.flags,
             self.window,
-            0,  # Placeholder for checksum
-            self.urgent_pointer
+            self.urgent_pointer,
+            self.stream_id,
         )
 
-        # Hitung checksum
-        checksum = compute_checksum(header_wo_checksum + self.payload)
+    def compute_checksum(self) -> int:
+        """
+        Checksum = komplemen dari (jumlah header + jumlah payload). Jumlah
+        payload di-cache, sehingga retransmission dan segment yang payload-nya
+        dipakai bersama hanya menghitung ulang bagian header.
+        """
+        if self._payload_sum is None:
+            self._payload_sum = ones_complement_sum(self._payload)
+        return ~add_ones_complement(self.header_sum(), self._payload_sum) & 0xFFFF
+    
+    def to_bytes(self, compact: Optional[CompactContext] = None) -> bytes:
+        """Header penuh, atau header kompak jika `compact` diberikan dan flag-nya bisa"""
+        if compact is not None and not self.flags & ~0x31:
+            return self._to_compact(compact)
+
+        # Data offset 5 (20 byte header), atau 6 jika ada ekstensi stream
+        offset_reserved = (self.data_offset << 4) | self.options
+
+        # Hitung checksum (header 20 byte selalu genap, jadi jumlahnya bisa
+        # digabung langsung dengan jumlah payload)
+        checksum = self.compute_checksum()
 
         # Pack header dengan checksum
         header = struct.pack(
@@ -67,10 +169,100 @@ class Segment:
             checksum,
             self.urgent_pointer
         )
+        if self.stream_id:
+            header += struct.pack(self.STREAM_FORMAT, self.stream_id, 0)
         return header + self.payload
     
+    def _to_compact(self, compact: CompactContext) -> bytes:
+        first = 0
+        for flag, bit in COMPACT_FLAGS:
+            if self.flags & flag:
+                first |= bit
+        if self.stream_id or first & COMPACT_URG:
+            seq_base = ack_base = 0
+        else:
+            seq_base, ack_base = compact.local_base, compact.peer_base
+        fields = [compact.conn_id,
+                  zigzag(seq_delta(self.seq_num, seq_base)),
+                  zigzag(seq_delta(self.ack_num, ack_base))]
+        ext = 0
+        if self.stream_id:
+            ext |= EXT_STREAM
+            fields.append(self.stream_id)
+        if self.urgent_pointer:
+            ext |= EXT_URGENT_POINTER
+            fields.append(self.urgent_pointer)
+        if self.window != DEFAULT_WINDOW:
+            ext |= EXT_WINDOW
+            fields.append(self.window)
+        rest = b"".join(encode_varint(field) for field in fields)
+        if ext:
+            first |= COMPACT_EXT
+            rest = bytes((ext,)) + rest
+
+        # Header kompak bisa ganjil: jumlah header (di-pad) dan jumlah
+        # payload (yang di-cache) digabung tanpa menyambung byte-nya
+        if self._payload_sum is None:
+            self._payload_sum = ones_complement_sum(self._payload)
+        header_sum = ones_complement_sum(bytes((first, 0, 0)) + rest)
+        checksum = ~add_ones_complement(header_sum, self._payload_sum) & 0xFFFF
+        return bytes((first, checksum >> 8, checksum & 0xFF)) + rest + self._payload
+
+    @classmethod
+    def _from_compact(cls, raw: bytes, compact: CompactContext) -> 'Segment':
+        if len(raw) < 4:
+            raise ValueError("Compact header too short")
+        first = raw[0]
+        checksum = (raw[1] << 8) | raw[2]
+        offset = 3
+        ext = 0
+        if first & COMPACT_EXT:
+            ext = raw[3]
+            offset = 4
+        conn_id, offset = decode_varint(raw, offset)
+        seq_field, offset = decode_varint(raw, offset)
+        ack_field, offset = decode_varint(raw, offset)
+        stream_id = urgent_pointer = 0
+        window = DEFAULT_WINDOW
+        if ext & EXT_STREAM:
+            stream_id, offset = decode_varint(raw, offset)
+        if ext & EXT_URGENT_POINTER:
+            urgent_pointer, offset = decode_varint(raw, offset)
+        if ext & EXT_WINDOW:
+            window, offset = decode_varint(raw, offset)
+
+        payload = raw[offset:]
+        header_sum = ones_complement_sum(bytes((first, 0, 0)) + raw[3:offset])
+        if ~add_ones_complement(header_sum, ones_complement_sum(payload)) & 0xFFFF != checksum:
+            raise ValueError("Checksum verification failed")
+        if conn_id != compact.conn_id:
+            raise ValueError(f"Connection ID mismatch: {conn_id} != {compact.conn_id}")
+
+        flags = 0
+        for flag, bit in COMPACT_FLAGS:
+            if first & bit:
+                flags |= flag
+        if stream_id or first & COMPACT_URG:
+            seq_base = ack_base = 0
+        else:
+            seq_base, ack_base = compact.peer_base, compact.local_base
+        segment = cls(compact.peer_port, compact.local_port,
+                      (seq_base + unzigzag(seq_field)) & 0xFFFFFFFF,
+                      (ack_base + unzigzag(ack_field)) & 0xFFFFFFFF,
+                      flags, window, payload, stream_id=stream_id)
+        segment.urgent_pointer = urgent_pointer
+        return segment
+
     @classmethod
-    def from_bytes(cls, raw: bytes) -> 'Segment' :
+    def from_bytes(cls, raw: bytes, compact: Optional[CompactContext] = None) -> 'Segment' :
+        """
+        Parse header penuh, atau header kompak (byte pertama < 0x10) jika
+        koneksi sudah menyepakatinya (`compact`). ValueError jika checksum
+        atau connection id salah.
+        """
+        if compact is not None and raw and raw[0] < COMPACT_LIMIT:
+            return cls._from_compact(raw, compact)
+
         #Ambil header
         header = raw[:cls.HEADER_SIZE]
         
@@ -82,7 +274,8 @@ class Segment:
         data_offset = (offset_reserved >> 4)
         header_len = data_offset * 4
 
-        # Ambil payload
+        # Ambil ekstensi stream (jika ada) dan payload
+        extension = raw[cls.HEADER_SIZE:header_len]
         payload = raw[header_len:]
 
         # Verifikasi checksum
@@ -91,10 +284,41 @@ class Segment:
             src_port, dst_port, seq_num, ack_num,
             offset_reserved, flags, window, 0, urgent_pointer
         )
-        if not verify_checksum(zero_checksum + payload, checksum):
+        if not verify_checksum(zero_checksum + extension + payload, checksum):
             raise ValueError("Checksum verification failed")
-        
+
+        stream_id = 0
+        if len(extension) >= cls.STREAM_SIZE:
+            stream_id, _ = struct.unpack(cls.STREAM_FORMAT, extension[:cls.STREAM_SIZE])
+
         # Buat instance Segment
-        segment = cls(src_port, dst_port, seq_num, ack_num, flags, window, payload)
+        segment = cls(src_port, dst_port, seq_num, ack_num, flags, window, payload,
+                      stream_id=stream_id, options=offset_reserved & 0x0F)
         segment.urgent_pointer = urgent_pointer
-        return segment
\ No newline at end of file
+        return segment
+
+
+class PreparedMessage:
+    """
+    Pesan yang di-chunk sekali untuk dikirim ke banyak koneksi (broadcast).
+    Setiap chunk menyimpan jumlah one's complement payload-nya, sehingga
+    per koneksi hanya field header (port/seq/ack) yang perlu dihitung.
+
+    bulk=True: chunk dikirim apa adanya walaupun lebih besar dari payload
+    maksimal socket (transfer besar sekali jalan, misalnya catch-up history).
+    """
+    def __init__(self, data: bytes, max_payload_size: int = 64, bulk: bool = False):
+        self.data = data
+        self.max_payload_size = max_payload_size
+        self.bulk = bulk
+        self.chunks: List[Tuple[bytes, int]] = [
+            (chunk, ones_complement_sum(chunk))
+            for chunk in (data[i:i + max_payload_size]
+                          for i in range(0, len(data), max_payload_size))
+        ]
+        # Versi terkompresi (lihat protocol.compression), dibuat sekali oleh
+        # koneksi pertama yang memakai kompresi lalu dipakai bersama
+        self.compressed: Optional['PreparedMessage'] = None
+
+    def __len__(self) -> int:
+        return len(self.data)
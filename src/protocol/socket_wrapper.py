@@ -1,11 +1,70 @@
 # File: src/protocol/socket_wrapper.py
 
+import hashlib
+import hmac
+import json
+import os
 import socket
 import random
+import selectors
 import time
 import threading
-from typing import Dict, Tuple, Optional
-from .segment import Segment
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Tuple, Optional
+from .segment import CompactContext, MIN_COMPACT_PORT, Segment, PreparedMessage
+from .framing import FramingError, MessageDecoder, encode_message
+from .compression import Compressor, Decompressor
+from .fec import FecDecoder, FecEncoder
+from .state import (CLOSED, ESTABLISHED, FIN_WAIT, LAST_ACK, SYN_RCVD, TIME_WAIT,
+                    next_state)
+
+# State penutupan yang masih butuh timer/segment sebelum CLOSED
+CLOSING_STATES = (FIN_WAIT, LAST_ACK, TIME_WAIT)
+
+# Fast open: listener menaruh cookie di payload SYN+ACK. Client menyimpannya
+# per alamat server (fast_open_cookies) dan pada koneksi berikutnya mengirim
+# cookie + data aplikasi di payload SYN.
+FAST_OPEN_COOKIE_SIZE = 8
+fast_open_cookies: Dict[tuple, bytes] = {}
+
+# Data urgent (send(data, urgent=True)) dikirim dengan flag URG di ruang
+# sequence sendiri, jadi tidak antri di belakang data biasa. urgent_pointer
+# = jumlah byte pesan urgent yang tersisa mulai dari awal segment ini;
+# segment terakhir sebuah pesan memiliki urgent_pointer == len(payload).
+URG_FLAG = 0x20
+MAX_URGENT_MESSAGE = 0xFFFF
+
+# Forward error correction (lihat protocol.fec): segment parity membawa
+# FEC_FLAG tanpa ACK. Penerima menjawab parity grup yang lengkap (atau
+# berhasil dipulihkan) dengan satu ACK grup, FEC_FLAG | ACK: seq_num/ack_num
+# = awal/akhir grup, urgent_pointer = jumlah segment yang dipulihkan. ACK
+# grup juga menutup ACK per segment yang hilang tanpa menunggu RTO.
+FEC_FLAG = 0x40
+
+# Opsi koneksi (bit di field options header SYN/SYN+ACK). Client
+# menawarkan opsi di SYN, listener menjawab irisannya dengan opsi yang ia
+# aktifkan di SYN+ACK. Peer lama mengabaikan bit ini dan menjawab 0.
+OPT_COMPRESSION = 0x1
+OPT_COMPACT_HEADER = 0x2
+OPT_FEC = 0x4
+
+
+def load_fast_open_cookies(path: str):
+    """Muat cache cookie fast open dari file JSON (jika ada)."""
+    try:
+        with open(path) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return
+    for host, port, cookie in entries:
+        fast_open_cookies[(host, port)] = bytes.fromhex(cookie)
+
+
+def save_fast_open_cookies(path: str):
+    """Simpan cache cookie fast open agar dipakai proses client berikutnya."""
+    entries = [[host, port, cookie.hex()] for (host, port), cookie in fast_open_cookies.items()]
+    with open(path, "w") as f:
+        json.dump(entries, f)
 
 class SelectiveRepeatWindow:
     """
@@ -65,14 +124,88 @@ class SelectiveRepeatWindow:
                    if not self.acked.get(seq, False)}
 
 
+class Stream:
+    """
+    Stream tambahan di dalam satu koneksi (lihat BetterUDPSocket.open_stream).
+
+    Setiap stream punya ruang sequence, window Selective Repeat (flow
+    control) dan buffer reassembly sendiri, sehingga segment yang hilang di
+    satu stream tidak menahan data stream lain. Stream 0 adalah byte stream
+    bawaan koneksi (send()/receive() milik socket); state-nya tetap disimpan
+    di socket dengan nama atribut yang sama seperti di sini.
+    """
+    def __init__(self, conn: 'BetterUDPSocket', stream_id: int):
+        self.conn = conn
+        self.stream_id = stream_id
+        self.seq = 0
+        self.send_window = SelectiveRepeatWindow(window_size=conn.window_size)
+        self.segment_timers: Dict[int, float] = {}
+        self.pending_chunks: Deque[Tuple[bytes, Optional[int]]] = deque()
+        self.recv_buffer: Dict[int, bytes] = {}
+        self.expected_seq = 0
+
+    def send(self, data: bytes):
+        """Kirim data di stream ini (semantik sama dengan BetterUDPSocket.send)."""
+        self.conn._send_chunks(self.conn._chunk(data), stream=self)
+
+    def send_prepared(self, messages: List[PreparedMessage]):
+        self.conn._send_chunks(self.conn._prepared_chunks(messages), stream=self, linger=False)
+
+    def receive(self, timeout: float = None) -> bytes:
+        """
+        Terima data in-order dari stream ini. Datagram yang dibaca selama
+        menunggu diproses seperti biasa; data stream lain tetap di buffer
+        stream masing-masing.
+        """
+        conn = self.conn
+        if not conn.connected:
+            raise RuntimeError("Socket not connected")
+        result = conn._read_in_order(self)
+        if result:
+            return result
+        if not conn.blocking:
+            conn.pump()
+            return conn._read_in_order(self)
+
+        deadline = time.time() + (1.0 if timeout is None else timeout)
+        while conn.connected:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            conn._process_incoming_acks(timeout=min(remaining, 0.1))
+            result = conn._read_in_order(self)
+            if result:
+                return result
+        return b''
+
+
 class BetterUDPSocket:
+    # Buffer recvfrom cukup untuk datagram UDP terbesar, sehingga peer yang
+    # memakai segment lebih besar (set_segment_size) tetap terbaca utuh
+    RECV_BUFFER_SIZE = 65535
+
+    # Penutupan: FIN/FIN+ACK dikirim ulang setiap CLOSE_RETRY detik sampai
+    # CLOSE_TIMEOUT; TIME_WAIT sengaja singkat agar socket cepat didaur ulang
+    CLOSE_RETRY = 0.5
+    CLOSE_TIMEOUT = 2.0
+    TIME_WAIT_DURATION = 0.5
+
+    # Batas jumlah stream tambahan per koneksi; segment untuk stream baru
+    # di atas batas ini dibuang
+    MAX_STREAMS = 64
+
     def __init__(self, udp_socket: socket.socket = None, mtu: int = 128, debug: bool = True):
         self.udp_socket = udp_socket or socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         # Pastikan blocking (karena kita akan menggunakan timeout secara eksplisit)
         self.udp_socket.setblocking(True)
         self.mtu = mtu
+        # Batas payload per segment (spesifikasi: 64 byte)
+        self.max_payload = 64
         self.peer_addr = None
-        self.connected = False
+        # State koneksi (lihat protocol/state.py); `connected` = ESTABLISHED
+        self.state = CLOSED
+        # False jika socket dijalankan oleh event loop (lihat setblocking())
+        self.blocking = True
         
         self.debug = debug
         # Sequence tracking sesuai spesifikasi TCP
@@ -89,10 +222,111 @@ class BetterUDPSocket:
         self.timeout = 4.0  # Diperbesar agar server punya cukup waktu untuk ACK
         self.segment_timers: Dict[int, float] = {}
 
+        # Chunk (payload, payload_sum) yang menunggu slot window (hanya
+        # dipakai di mode non-blocking)
+        self.pending_chunks: Deque[Tuple[bytes, Optional[int]]] = deque()
+
+        # Stream tambahan (id != 0). Sisi connect() membuka id ganjil, sisi
+        # accept() id genap, sehingga kedua sisi tidak memakai id yang sama.
+        # Stream yang dibuka peer masuk antrian accept_stream().
+        self.streams: Dict[int, Stream] = {}
+        self._next_stream_id = 1
+        self._incoming_streams: Deque[Stream] = deque()
+
+        # Jalur urgent: state sequence/window sendiri (dibuat saat dipakai).
+        # Pesan urgent yang lengkap diserahkan ke on_urgent(data); tanpa
+        # callback, pesan disimpan di urgent_messages.
+        self._urgent: Optional[Stream] = None
+        self._urgent_lock = threading.Lock()
+        self._urgent_partial = b''
+        self._urgent_ends = set()
+        self.on_urgent: Optional[Callable[[bytes], None]] = None
+        self.urgent_messages: Deque[bytes] = deque(maxlen=1024)
+
+        # Decoder frame untuk recv_message() (lihat protocol.framing)
+        self.message_decoder = MessageDecoder()
+
+        # Opsi yang ditawarkan (client) / diizinkan (listener), dan opsi
+        # hasil negosiasi handshake untuk koneksi ini
+        self.offered_options = 0
+        self.options = 0
+        # Kompresi payload stream 0 (lihat enable_compression)
+        self.compressor: Optional[Compressor] = None
+        self.decompressor: Optional[Decompressor] = None
+        # Header kompak setelah handshake (lihat enable_compact_header)
+        self.compact: Optional[CompactContext] = None
+        # Parity XOR untuk stream 0 (lihat enable_fec)
+        self.fec_encoder: Optional[FecEncoder] = None
+        self.fec_decoder: Optional[FecDecoder] = None
+
+        # State handshake sisi server untuk accept_nowait()
+        self._synack: Optional[Segment] = None
+        self._synack_sent_at = 0.0
+        self.handshake_deadline = 0.0
+
+        # Keepalive (lihat enable_keepalive); None = nonaktif
+        self.keepalive_idle: Optional[float] = None
+        self.keepalive_interval = 0.0
+        self.keepalive_probes = 0
+        self.on_dead: Optional[Callable[['BetterUDPSocket'], None]] = None
+        self.last_recv = 0.0
+        self._probes_sent = 0
+        self._last_probe_at = 0.0
+        # True jika koneksi diputus karena peer tidak menjawab keepalive
+        self.dead = False
+        self.stats = {"probes_sent": 0, "probes_answered": 0, "probes_received": 0,
+                      "fast_open_accepted": 0, "fast_open_rejected": 0,
+                      "urgent_sent": 0, "urgent_received": 0}
+
+        # Fast open (lihat enable_fast_open). Di listener: secret cookie dan
+        # koneksi fast open terbaru per (alamat, seq SYN), agar SYN yang
+        # dikirim ulang tidak membuka koneksi (dan men-deliver data) dua kali.
+        # Di client: True jika data di SYN diterima server.
+        self.fast_open_secret: Optional[bytes] = None
+        self._fast_open_conns: "OrderedDict[tuple, BetterUDPSocket]" = OrderedDict()
+        self.fast_open_accepted = False
+
+        # Penutupan koneksi: FIN kita dijawab peer (fin_acked), atau peer
+        # yang menutup duluan (peer_closed)
+        self.fin_acked = False
+        self.peer_closed = False
+        self._peer_fin_ack = 0
+        # FIN peer yang tiba sebelum semua data stream 0 di depannya; diproses
+        # begitu gap tertutup (lihat _handle_fin)
+        self._early_fin: Optional[Segment] = None
+        self._close_sent_at = 0.0
+        self._close_deadline = 0.0
+        self._time_wait_until = 0.0
+
         # Thread management
         self.retransmit_thread = None
         self.running = False
 
+    @property
+    def connected(self) -> bool:
+        return self.state == ESTABLISHED
+
+    @connected.setter
+    def connected(self, value: bool):
+        # Kompatibilitas: set langsung tanpa lewat tabel transisi
+        self.state = ESTABLISHED if value else CLOSED
+
+    def _transition(self, event: str) -> bool:
+        """Pindah state sesuai tabel TRANSITIONS. Return False jika event tidak valid."""
+        new_state = next_state(self.state, event)
+        if new_state is None:
+            if self.debug:
+                print(f"[STATE] Ignored {event} in {self.state}")
+            return False
+        if self.debug and new_state != self.state:
+            print(f"[STATE] {self.state} --{event}--> {new_state}")
+        self.state = new_state
+        if new_state == CLOSED:
+            self.running = False
+        elif new_state == TIME_WAIT:
+            self._time_wait_until = time.time() + self.TIME_WAIT_DURATION
+        return True
+
     @property
     def window_size(self) -> int:
         """Dapatkan ukuran window saat ini"""
@@ -111,109 +345,344 @@ class BetterUDPSocket:
     def _retransmit_worker(self):
         """Background worker untuk automatic retransmission"""
         while self.running and self.connected:
+            self.service_timers()
+            time.sleep(0.1)
+
+    def service_timers(self, current_time: float = None):
+        """
+        Jalankan satu putaran timer: retransmit segment yang timeout dan
+        (untuk koneksi setengah-terbuka) SYN+ACK. Dipanggil oleh retransmit
+        thread di mode blocking, atau oleh event loop di mode non-blocking.
+        """
+        if current_time is None:
             current_time = time.time()
-            unacked = self.send_window.get_unacked_segments()
 
+        if self.state == SYN_RCVD:
+            if current_time - self._synack_sent_at > 0.5:
+                self._send_synack(current_time)
+            return
+
+        if self.state in CLOSING_STATES:
+            self._service_close_timers(current_time)
+            if self.state == FIN_WAIT:
+                # Peer baru menerima FIN setelah semua data di depannya
+                # sampai: data yang belum di-ACK dikirim ulang bersama FIN
+                self._retransmit_expired(current_time, self.CLOSE_RETRY)
+            return
+
+        # Koneksi fast open sudah ESTABLISHED sebelum SYN+ACK pasti sampai:
+        # kirim ulang sampai segment pertama dari client diterima
+        if self._synack is not None and current_time - self._synack_sent_at > 0.5:
+            self._send_synack(current_time)
+
+        if self.keepalive_idle is not None and self.connected:
+            self._service_keepalive(current_time)
+            if not self.connected:
+                return
+
+        self._flush_urgent()
+        if self.fec_encoder is not None:
+            group = self.fec_encoder.flush(current_time, self.send_window.get_unacked_segments())
+            if group is not None:
+                self._send_parity(*group)
+        self._retransmit_expired(current_time, self.timeout)
+
+    def _retransmit_expired(self, current_time: float, timeout: float):
+        """Kirim ulang segment (semua stream) yang belum di-ACK lebih dari `timeout` detik"""
+        streams = [self, *list(self.streams.values())]
+        if self._urgent is not None:
+            streams.append(self._urgent)
+        for stream in streams:
+            unacked = stream.send_window.get_unacked_segments()
             for seq_num, segment in unacked.items():
-                if seq_num in self.segment_timers:
-                    if current_time - self.segment_timers[seq_num] > self.timeout:
+                if seq_num in stream.segment_timers:
+                    if current_time - stream.segment_timers[seq_num] > timeout:
                         try:
-                            self.udp_socket.sendto(segment.to_bytes(), self.peer_addr)
-                            self.segment_timers[seq_num] = current_time
+                            self.udp_socket.sendto(segment.to_bytes(self.compact), self.peer_addr)
+                            stream.segment_timers[seq_num] = current_time
+                            if stream is self and self.fec_encoder is not None:
+                                self.fec_encoder.record_loss()
                             if self.debug:
-                                print(f"[RETRANSMIT] Seq {seq_num}")
+                                print(f"[RETRANSMIT] Seq {seq_num}{self._stream_label(segment.stream_id)}")
                         except Exception as e:
                             if self.debug:
                                 print(f"[ERROR] Retransmit failed: {e}")
-            time.sleep(0.1)
 
-    def send(self, data: bytes):
+    def enable_keepalive(self, idle: float = 10.0, interval: float = 2.0, probes: int = 3,
+                         on_dead: Optional[Callable[['BetterUDPSocket'], None]] = None):
+        """
+        Aktifkan keepalive: jika tidak ada segment apa pun dari peer selama
+        `idle` detik, kirim probe (ACK kosong dengan seq = seq - 1, yang
+        dijawab peer dengan ACK) setiap `interval` detik. Jika `probes` probe
+        tidak terjawab, koneksi ditandai mati (connected=False, dead=True)
+        dan on_dead(socket) dipanggil.
+        """
+        self.keepalive_idle = idle
+        self.keepalive_interval = interval
+        self.keepalive_probes = probes
+        self.on_dead = on_dead
+        self.last_recv = time.time()
+        self._probes_sent = 0
+        if self.blocking and self.connected:
+            # Timer keepalive berjalan di retransmit thread
+            self._start_retransmit_timer()
+
+    def _service_keepalive(self, current_time: float):
+        if current_time - self.last_recv < self.keepalive_idle:
+            return
+        if current_time - self._last_probe_at < self.keepalive_interval and self._probes_sent:
+            return
+        if self._probes_sent >= self.keepalive_probes:
+            self._mark_dead()
+            return
+
+        probe = Segment(
+            src_port=self.udp_socket.getsockname()[1],
+            dst_port=self.peer_addr[1],
+            seq_num=(self.seq - 1) & 0xFFFFFFFF,
+            ack_num=self.expected_seq,
+            flags=0x10,
+            payload=b''
+        )
+        try:
+            self.udp_socket.sendto(probe.to_bytes(self.compact), self.peer_addr)
+        except OSError as e:
+            if self.debug:
+                print(f"[ERROR] Keepalive probe failed: {e}")
+        self._probes_sent += 1
+        self._last_probe_at = current_time
+        self.stats["probes_sent"] += 1
+        if self.debug:
+            print(f"[KEEPALIVE] Probe {self._probes_sent}/{self.keepalive_probes} to {self.peer_addr}")
+
+    def _mark_dead(self):
+        """Peer tidak menjawab keepalive. Socket UDP ditutup oleh pemiliknya (close())."""
+        if self.debug:
+            print(f"[KEEPALIVE] Peer {self.peer_addr} is dead")
+        self.dead = True
+        self._transition("abort")
+        if self.on_dead:
+            self.on_dead(self)
+
+    def setblocking(self, flag: bool):
+        """
+        Atur mode blocking seperti socket biasa. Di mode non-blocking,
+        send() hanya mengantrikan data, receive() hanya membaca datagram yang
+        sudah tersedia, dan retransmission dijalankan lewat service_timers()
+        oleh event loop (tanpa thread per koneksi).
+        """
+        self.blocking = flag
+        self.udp_socket.setblocking(flag)
+
+    def fileno(self) -> int:
+        """File descriptor UDP socket, agar bisa didaftarkan ke selectors."""
+        return self.udp_socket.fileno()
+
+    @property
+    def max_payload_size(self) -> int:
+        """Spesifikasi: maksimal 64 byte untuk payload (kecuali set_segment_size)"""
+        max_payload_size = min(self.max_payload, self.mtu - Segment.HEADER_SIZE)
+        if max_payload_size <= 0:
+            raise ValueError("Header terlalu besar, tidak ada ruang untuk payload")
+        return max_payload_size
+
+    def set_segment_size(self, mtu: int):
+        """
+        Pakai segment yang lebih besar untuk koneksi ini, misalnya link antar
+        server. Hanya mempengaruhi sisi pengirim; penerima selalu membaca
+        dengan RECV_BUFFER_SIZE.
+        """
+        self.mtu = mtu
+        self.max_payload = mtu - Segment.HEADER_SIZE
+
+    def _chunk(self, data: bytes) -> List[Tuple[bytes, Optional[int]]]:
+        """Bagi data menjadi chunks ≤ 64 byte sesuai spesifikasi"""
+        max_payload_size = self.max_payload_size
+        return [(data[i:i + max_payload_size], None) for i in range(0, len(data), max_payload_size)]
+
+    def _prepared_chunks(self, messages: List[PreparedMessage]) -> List[Tuple[bytes, Optional[int]]]:
+        """Pakai chunk yang sudah disiapkan jika ukurannya cocok dengan socket ini"""
+        chunks = []
+        for message in messages:
+            if message.bulk or message.max_payload_size == self.max_payload_size:
+                chunks.extend(message.chunks)
+            else:
+                chunks.extend(self._chunk(message.data))
+        return chunks
+
+    def _transmit_chunk(self, chunk: bytes, payload_sum: Optional[int] = None,
+                        stream: Optional[Stream] = None, urgent_pointer: int = 0):
+        """Bungkus chunk jadi segment, simpan di window (stream), lalu kirim"""
+        target = stream or self
+        seq_num = target.seq
+        urgent = stream is not None and stream is self._urgent
+        segment = Segment(
+            src_port=self.udp_socket.getsockname()[1],
+            dst_port=self.peer_addr[1],
+            seq_num=seq_num,
+            ack_num=self.ack,
+            flags=0x10 | (URG_FLAG if urgent else 0),
+            payload=chunk,
+            payload_sum=payload_sum,
+            stream_id=stream.stream_id if stream else 0
+        )
+        segment.urgent_pointer = urgent_pointer
+
+        # Simpan di window dan kirim
+        target.send_window.add_segment(seq_num, segment)
+        self.udp_socket.sendto(segment.to_bytes(self.compact), self.peer_addr)
+        target.segment_timers[seq_num] = time.time()
+
+        # Update sequence number sesuai ukuran data
+        target.seq += len(chunk)
+        with target.send_window.lock:
+            target.send_window.next_seq_num = seq_num + 1
+
+        if self.debug:
+            print(f"[SEND] Seq {seq_num}, Payload: {len(chunk)} bytes{self._stream_label(segment.stream_id)}")
+
+        if stream is None and self.fec_encoder is not None:
+            group = self.fec_encoder.add(seq_num, chunk, target.segment_timers[seq_num])
+            if group is not None:
+                self._send_parity(*group)
+
+    def _send_parity(self, start: int, end: int, count: int, parity: bytes):
+        """Kirim segment parity untuk grup stream 0 [start, end) (tidak di-ACK, tidak di-retransmit)"""
+        segment = Segment(
+            src_port=self.udp_socket.getsockname()[1],
+            dst_port=self.peer_addr[1],
+            seq_num=start,
+            ack_num=end,
+            flags=FEC_FLAG,
+            payload=parity
+        )
+        segment.urgent_pointer = count
+        try:
+            self.udp_socket.sendto(segment.to_bytes(self.compact), self.peer_addr)
+        except OSError as e:
+            if self.debug:
+                print(f"[ERROR] Sending parity: {e}")
+            return
+        if self.debug:
+            print(f"[FEC] Parity for seq {start}..{end} ({count} segments)")
+
+    @staticmethod
+    def _stream_label(stream_id: int) -> str:
+        return f", stream {stream_id}" if stream_id else ""
+
+    def _flush_pending(self):
+        """Kirim chunk yang mengantri selama window (per stream) masih ada slot"""
+        # Urgent selalu didahulukan
+        self._flush_urgent()
+        while self.pending_chunks and self.send_window.can_send():
+            self._transmit_chunk(*self.pending_chunks.popleft())
+        for stream in list(self.streams.values()):
+            while stream.pending_chunks and stream.send_window.can_send():
+                self._transmit_chunk(*stream.pending_chunks.popleft(), stream=stream)
+
+    def send(self, data: bytes, urgent: bool = False):
         """
         Kirim data dengan flow control Selective Repeat.
         Data dibagi menjadi segment dengan payload ≤ 64 bytes.
+        Di mode non-blocking, data diantrikan dan langsung return.
+        Jika kompresi disepakati, data dikirim sebagai blok terkompresi.
+
+        urgent=True: `data` adalah satu pesan kontrol yang dikirim lewat
+        jalur urgent (flag URG) mendahului data biasa yang masih antri, dan
+        diserahkan ke on_urgent di penerima tanpa menunggu data biasa.
+        Tidak pernah blocking; keandalan dijamin retransmission.
         """
+        if urgent:
+            self._send_urgent(data)
+            return
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        self._send_chunks(self._chunk(data))
+
+    def _send_urgent(self, data: bytes):
         if not self.connected:
             raise RuntimeError("Socket not connected")
-        
-        self._start_retransmit_timer()
-        
+        if not 0 < len(data) <= MAX_URGENT_MESSAGE:
+            raise ValueError(f"Urgent message must be 1..{MAX_URGENT_MESSAGE} bytes")
+        with self._urgent_lock:
+            if self._urgent is None:
+                self._urgent = Stream(self, 0)
+            remaining = len(data)
+            for chunk, _ in self._chunk(data):
+                self._urgent.pending_chunks.append((chunk, remaining))
+                remaining -= len(chunk)
+        self.stats["urgent_sent"] += 1
+        self._flush_urgent()
+        if self.blocking:
+            # Retransmit thread juga mengirim sisa chunk saat window terbuka
+            self._start_retransmit_timer()
+
+    def _flush_urgent(self):
+        urgent = self._urgent
+        if urgent is None or not urgent.pending_chunks:
+            return
+        with self._urgent_lock:
+            while urgent.pending_chunks and urgent.send_window.can_send():
+                chunk, pointer = urgent.pending_chunks.popleft()
+                self._transmit_chunk(chunk, stream=urgent, urgent_pointer=pointer)
+
+    def send_prepared(self, messages: List[PreparedMessage]):
+        """
+        Kirim satu atau beberapa PreparedMessage sebagai satu pengiriman.
+        Payload dan checksum payload dipakai bersama oleh semua penerima;
+        per koneksi hanya header (port/seq/ack) yang dibangun.
+        Di mode blocking return begitu semua segment di-ACK, tanpa jeda
+        send(): sender Outbox langsung lanjut ke batch berikutnya.
+        """
+        if self.compressor is not None:
+            chunk_size = self.max_payload_size
+            messages = [self.compressor.prepare(message, chunk_size) for message in messages]
+        self._send_chunks(self._prepared_chunks(messages), linger=False)
 
-        # Spesifikasi: maksimal 64 byte untuk payload
-        max_payload_size = min(64, self.mtu - Segment.HEADER_SIZE)
-        if max_payload_size <= 0:
-            raise ValueError("Header terlalu besar, tidak ada ruang untuk payload")
+    def _send_chunks(self, chunks: List[Tuple[bytes, Optional[int]]], stream: Optional[Stream] = None,
+                     linger: bool = True):
+        """
+        Kirim daftar (payload, payload_sum) lewat window Selective Repeat (stream).
+        linger: jeda 1 detik setelah semua segment di-ACK (perilaku send() blocking)
+        """
+        if not self.connected:
+            raise RuntimeError("Socket not connected")
+        target = stream or self
 
-        # Bagi data menjadi chunks ≤ 64 byte
-        chunks = [data[i:i + max_payload_size] for i in range(0, len(data), max_payload_size)]
+        if not self.blocking:
+            target.pending_chunks.extend(chunks)
+            self._flush_pending()
+            return
+
+        self._start_retransmit_timer()
 
-        sent_first = False
         for chunk in chunks:
             # Tunggu sampai window ada slot kosong
-            while not self.send_window.can_send():
+            while not target.send_window.can_send():
+                if not self.connected:
+                    raise ConnectionError("Connection closed while sending")
                 self._process_incoming_acks(timeout=0.01)
                 time.sleep(0.001)
 
-            seq_num = self.seq
-            segment = Segment(
-                src_port=self.udp_socket.getsockname()[1],
-                dst_port=self.peer_addr[1],
-                seq_num=seq_num,
-                ack_num=self.ack,
-                flags=0x10, 
-                payload=chunk
-            )
-
-            # Simpan di window dan kirim
-            self.send_window.add_segment(seq_num, segment)
-            self.udp_socket.sendto(segment.to_bytes(), self.peer_addr)
-            self.segment_timers[seq_num] = time.time()
-
-            # Start retransmit timer hanya sekali setelah segmen pertama terkirim
-            if not sent_first:
-                self._start_retransmit_timer()
-                sent_first = True
-
-            # Update sequence number sesuai ukuran data
-            self.seq += len(chunk)
-            with self.send_window.lock:
-                self.send_window.next_seq_num = seq_num + 1
-
-            if self.debug:
-                print(f"[SEND] Seq {seq_num}, Payload: {len(chunk)} bytes")
+            self._transmit_chunk(*chunk, stream=stream)
 
         # Tunggu sampai semua segment di‐ACK
-        while self.send_window.get_unacked_segments():
+        while target.send_window.get_unacked_segments():
+            if not self.connected:
+                raise ConnectionError("Connection closed while waiting for ACK")
             self._process_incoming_acks(timeout=0.1)
-        time.sleep(1)
+        if linger:
+            time.sleep(1)
     
     def _process_incoming_acks(self, timeout: float = 0.1):
         """Proses ACK yang masuk dari peer"""
         try:
             self.udp_socket.settimeout(timeout)
-            raw, addr = self.udp_socket.recvfrom(self.mtu)
+            raw, addr = self.udp_socket.recvfrom(self.RECV_BUFFER_SIZE)
             if addr != self.peer_addr:
                 return
 
-            segment = Segment.from_bytes(raw)
-
-            # Jika ACK flag ter‐set
-            if segment.flags & 0x10:
-                ack_num = segment.ack_num
-                # Cari seq yang di‐ACK (ack_num – payload_size)
-                for seq in list(self.send_window.buffer.keys()):
-                    sent_segment = self.send_window.buffer[seq]
-                    if ack_num == seq + len(sent_segment.payload):
-                        moved = self.send_window.mark_acked(seq)
-                        if self.debug:
-                            if moved:
-                                print(f"[ACK] Received ACK for seq {seq}, window moved")
-                            else:
-                                print(f"[ACK] Received ACK for seq {seq}")
-                        break
-
-            # Jika ada payload, forward ke handler
-            if segment.payload:
-                self._handle_data_segment(segment)
+            self._handle_segment(Segment.from_bytes(raw, self.compact))
 
         except socket.timeout:
             pass
@@ -221,50 +690,413 @@ class BetterUDPSocket:
             if self.debug:
                 print(f"[ERROR] Processing ACK: {e}")
 
-    def _handle_data_segment(self, segment: Segment):
+    def _handle_segment(self, segment: Segment):
+        """Satu titik masuk untuk semua segment dari peer (ACK maupun data)"""
+        # Final ACK handshake untuk koneksi dari accept_nowait()
+        if self._synack is not None and self.connected:
+            # Fast open: segment apa pun dari client berarti SYN+ACK sudah
+            # sampai; final ACK handshake tidak perlu diproses lagi
+            final_ack = segment.flags == 0x10 and segment.ack_num == self._synack.seq_num + 1
+            self._synack = None
+            if final_ack and not segment.payload:
+                return
+
+        if self.state == SYN_RCVD:
+            if segment.flags == 0x10 and segment.ack_num == self._synack.seq_num + 1:
+                self._synack = None
+                self._transition("rcv_ack")
+                if self.debug:
+                    print(f"[HANDSHAKE] Received final ACK from {self.peer_addr} ack={segment.ack_num}")
+                    print(f"[CONNECTED] {self.peer_addr} connected (server ephemeral port={self.udp_socket.getsockname()[1]})")
+            return
+
+        self.last_recv = time.time()
+        if self._probes_sent:
+            self.stats["probes_answered"] += 1
+            self._probes_sent = 0
+
+        if segment.flags & 0x01:
+            self._handle_fin(segment)
+            return
+
+        if self.state == LAST_ACK:
+            # ACK terakhir untuk FIN+ACK kita
+            if segment.flags & 0x10 and segment.ack_num == (self.seq + 1) & 0xFFFFFFFF:
+                self._transition("rcv_ack")
+            return
+        if self.state == TIME_WAIT:
+            return
+
+        if segment.flags & FEC_FLAG and not segment.flags & 0x10:
+            self._handle_parity(segment)
+            return
+
+        # Probe keepalive: ACK kosong dengan seq satu sebelum yang diharapkan
+        if (segment.flags == 0x10 and not segment.payload and not segment.stream_id
+                and segment.seq_num == (self.expected_seq - 1) & 0xFFFFFFFF):
+            self.stats["probes_received"] += 1
+            self._send_ack(self.expected_seq)
+            return
+
+        target = self._stream_target(segment)
+        if target is None:
+            return
+
+        if segment.flags & FEC_FLAG:
+            # ACK grup (parity tanpa ACK sudah ditangani di atas)
+            self._handle_group_ack(segment)
+        # Jika ACK flag ter‐set
+        elif segment.flags & 0x10:
+            ack_num = segment.ack_num
+            # Cari seq yang di‐ACK (ack_num – payload_size) di window stream-nya
+            for seq in list(target.send_window.buffer.keys()):
+                sent_segment = target.send_window.buffer[seq]
+                if ack_num == seq + len(sent_segment.payload):
+                    moved = target.send_window.mark_acked(seq)
+                    if self.debug:
+                        label = self._stream_label(segment.stream_id)
+                        if moved:
+                            print(f"[ACK] Received ACK for seq {seq}{label}, window moved")
+                        else:
+                            print(f"[ACK] Received ACK for seq {seq}{label}")
+                    break
+
+            if not self.blocking:
+                self._flush_pending()
+            elif target is self._urgent:
+                self._flush_urgent()
+
+        # Jika ada payload, forward ke handler
+        if segment.payload:
+            self._handle_data_segment(segment, target)
+
+    def _stream_target(self, segment: Segment):
+        """
+        Pemilik state sequence untuk segment: jalur urgent untuk segment URG,
+        socket ini untuk stream 0, atau Stream (dibuat jika peer membuka
+        stream baru). None jika batas MAX_STREAMS terlewati.
+        """
+        if segment.flags & URG_FLAG:
+            with self._urgent_lock:
+                if self._urgent is None:
+                    self._urgent = Stream(self, 0)
+            return self._urgent
+        stream_id = segment.stream_id
+        if not stream_id:
+            return self
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            if len(self.streams) >= self.MAX_STREAMS:
+                return None
+            stream = self.streams[stream_id] = Stream(self, stream_id)
+            self._incoming_streams.append(stream)
+        return stream
+
+    def pump(self) -> int:
+        """
+        Baca semua datagram yang sudah tersedia tanpa blocking dan proses
+        lewat _handle_segment(). Return jumlah datagram yang dibaca.
+        """
+        count = 0
+        while True:
+            try:
+                raw, addr = self.udp_socket.recvfrom(self.RECV_BUFFER_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                if self.debug:
+                    print(f"[ERROR] Pump: {e}")
+                break
+
+            count += 1
+            if addr != self.peer_addr:
+                continue
+            try:
+                self._handle_segment(Segment.from_bytes(raw, self.compact))
+            except Exception as e:
+                if self.debug:
+                    print(f"[ERROR] Processing segment: {e}")
+        return count
+
+    def _handle_data_segment(self, segment: Segment, target=None):
         """Handle segment data yang diterima sesuai spesifikasi TCP"""
+        target = target or self
         seq_num = segment.seq_num
         payload_len = len(segment.payload)
 
-        # Simpan data di buffer
-        self.recv_buffer[seq_num] = segment.payload
+        if target is self._urgent:
+            # Duplikat yang sudah diserahkan cukup di-ACK ulang
+            if seq_num >= target.expected_seq:
+                target.recv_buffer[seq_num] = segment.payload
+                if segment.urgent_pointer == payload_len:
+                    self._urgent_ends.add(seq_num + payload_len)
+            self._send_segment(0x10 | URG_FLAG, seq_num + payload_len)
+            self._deliver_urgent()
+            return
+
+        # Simpan data di buffer stream-nya
+        target.recv_buffer[seq_num] = segment.payload
+        if target is self and self.fec_decoder is not None:
+            self.fec_decoder.add(seq_num, segment.payload)
 
         # Kirim ACK (seq saat ini, ack = seq_num + payload_len)
-        ack_segment = Segment(
+        self._send_ack(seq_num + payload_len, segment.stream_id)
+        if self.debug:
+            print(f"[ACK SENT] For seq {seq_num} -> ack {seq_num + payload_len}{self._stream_label(segment.stream_id)}")
+        if target is self:
+            self._check_early_fin()
+
+    def _check_early_fin(self):
+        """Proses FIN yang ditahan jika data di depannya sudah lengkap"""
+        fin = self._early_fin
+        if fin is not None and fin.seq_num == self._received_end() & 0xFFFFFFFF:
+            self._handle_fin(fin)
+
+    def _handle_parity(self, segment: Segment):
+        """Parity grup stream 0: bangun kembali segment yang hilang, lalu ACK grup"""
+        if self.fec_decoder is None:
+            return
+        start, end = segment.seq_num, segment.ack_num
+        if end <= self.expected_seq:
+            # Seluruh grup sudah di-deliver; hanya ACK-nya yang hilang
+            recovered = []
+        else:
+            recovered = self.fec_decoder.recover(start, end, segment.urgent_pointer, segment.payload)
+            if recovered is None:
+                # Lebih dari satu segment hilang: ditutup retransmission
+                return
+        for seq_num, payload in recovered:
+            self.recv_buffer[seq_num] = payload
+            if self.debug:
+                print(f"[FEC] Recovered seq {seq_num} ({len(payload)} bytes) from parity")
+        ack = Segment(
             src_port=self.udp_socket.getsockname()[1],
             dst_port=self.peer_addr[1],
-            seq_num=self.seq,
-            ack_num=seq_num + payload_len,
-            flags=0x10,
+            seq_num=start,
+            ack_num=end,
+            flags=0x10 | FEC_FLAG,
             payload=b''
         )
+        ack.urgent_pointer = len(recovered)
         try:
-            self.udp_socket.sendto(ack_segment.to_bytes(), self.peer_addr)
+            self.udp_socket.sendto(ack.to_bytes(self.compact), self.peer_addr)
+        except OSError as e:
+            if self.debug:
+                print(f"[ERROR] Sending group ACK: {e}")
+        if recovered:
+            self._check_early_fin()
+
+    def _handle_group_ack(self, segment: Segment):
+        """ACK grup FEC: peer sudah punya seluruh data stream 0 [seq_num, ack_num)"""
+        for seq in list(self.send_window.buffer.keys()):
+            if segment.seq_num <= seq < segment.ack_num:
+                self.send_window.mark_acked(seq)
+        if self.fec_encoder is not None:
+            # Segment yang dipulihkan peer tetap dihitung sebagai loss
+            for _ in range(segment.urgent_pointer):
+                self.fec_encoder.record_loss()
+        if not self.blocking:
+            self._flush_pending()
+        if self.debug:
+            print(f"[ACK] Received group ACK for seq {segment.seq_num}..{segment.ack_num}")
+
+    def _deliver_urgent(self):
+        """Serahkan pesan urgent yang sudah lengkap (in-order) ke on_urgent"""
+        urgent = self._urgent
+        while urgent.expected_seq in urgent.recv_buffer:
+            chunk = urgent.recv_buffer.pop(urgent.expected_seq)
+            urgent.expected_seq += len(chunk)
+            self._urgent_partial += chunk
+            if urgent.expected_seq not in self._urgent_ends:
+                continue
+            self._urgent_ends.discard(urgent.expected_seq)
+            message, self._urgent_partial = self._urgent_partial, b''
+            self.stats["urgent_received"] += 1
             if self.debug:
-                print(f"[ACK SENT] For seq {seq_num} -> ack {seq_num + payload_len}")
+                print(f"[URGENT] Received {len(message)} bytes from {self.peer_addr}")
+            if self.on_urgent is not None:
+                try:
+                    self.on_urgent(message)
+                except Exception as e:
+                    if self.debug:
+                        print(f"[ERROR] on_urgent: {e}")
+            else:
+                self.urgent_messages.append(message)
+
+    def _send_ack(self, ack_num: int, stream_id: int = 0):
+        """Kirim ACK tanpa payload"""
+        self._send_segment(0x10, ack_num, stream_id)
+
+    def _send_segment(self, flags: int, ack_num: int, stream_id: int = 0):
+        """Kirim segment kontrol (tanpa payload) dengan seq saat ini"""
+        segment = Segment(
+            src_port=self.udp_socket.getsockname()[1],
+            dst_port=self.peer_addr[1],
+            seq_num=self.streams[stream_id].seq if stream_id else self.seq,
+            ack_num=ack_num,
+            flags=flags,
+            payload=b'',
+            stream_id=stream_id
+        )
+        try:
+            self.udp_socket.sendto(segment.to_bytes(self.compact), self.peer_addr)
         except Exception as e:
             if self.debug:
-                print(f"[ERROR] Sending ACK: {e}")
+                print(f"[ERROR] Sending segment (flags={flags:#04x}): {e}")
+
+    def _handle_fin(self, segment: Segment):
+        """FIN atau FIN+ACK dari peer, sesuai state saat ini"""
+        now = time.time()
+        fin_ack = (segment.seq_num + 1) & 0xFFFFFFFF
+        if segment.flags & 0x10:
+            # FIN+ACK: jawaban untuk FIN kita
+            if self.state == FIN_WAIT:
+                self.fin_acked = True
+                self._transition("rcv_finack")
+            if self.state == TIME_WAIT:
+                # ACK terakhir; FIN+ACK yang dikirim ulang dijawab lagi
+                self._send_ack(fin_ack)
+            return
+
+        if self.state in (ESTABLISHED, FIN_WAIT) and \
+                segment.seq_num != self._received_end() & 0xFFFFFFFF:
+            # Data sebelum FIN masih ada yang hilang: tahan FIN sampai
+            # retransmission menutup gap, seperti data out-of-order
+            self._early_fin = segment
+            if self.debug:
+                print(f"[CLOSE] Holding FIN seq={segment.seq_num} from {self.peer_addr} until earlier data arrives")
+            return
+        self._early_fin = None
+
+        if self.state == ESTABLISHED:
+            self.peer_closed = True
+            self._peer_fin_ack = fin_ack
+            self._transition("rcv_fin")
+            # Tidak ada half-close di aplikasi ini: CLOSE_WAIT langsung
+            # ditutup dengan FIN+ACK
+            self._transition("close")
+            self._close_deadline = now + self.CLOSE_TIMEOUT
+            self._send_close_segment(now)
+            if self.debug:
+                print(f"[CLOSE] Received FIN from {self.peer_addr}, sent FIN+ACK")
+        elif self.state == FIN_WAIT:
+            # Close bersamaan
+            self.fin_acked = True
+            self._peer_fin_ack = fin_ack
+            self._transition("rcv_fin")
+            self._send_segment(0x11, fin_ack)
+        elif self.state == LAST_ACK:
+            # FIN+ACK kita hilang, peer mengirim ulang FIN
+            self._send_close_segment(now)
+        elif self.state == TIME_WAIT:
+            self._send_segment(0x11, fin_ack)
+
+    def _received_end(self) -> int:
+        """Sequence setelah data stream 0 yang sudah diterima tanpa gap"""
+        end = self.expected_seq
+        while end in self.recv_buffer:
+            end += len(self.recv_buffer[end])
+        return end
+
+    def _send_close_segment(self, current_time: float):
+        """Kirim (ulang) FIN di FIN_WAIT atau FIN+ACK di LAST_ACK"""
+        if self.state == FIN_WAIT:
+            self._send_segment(0x01, self.ack)
+        elif self.state == LAST_ACK:
+            self._send_segment(0x11, self._peer_fin_ack)
+        self._close_sent_at = current_time
+
+    def _service_close_timers(self, current_time: float):
+        if self.state == TIME_WAIT:
+            if current_time >= self._time_wait_until:
+                self._transition("timeout")
+            return
+        if current_time >= self._close_deadline:
+            if self.debug:
+                print(f"[CLOSE] No answer from {self.peer_addr} in {self.state}, giving up")
+            self._transition("timeout")
+        elif current_time - self._close_sent_at >= self.CLOSE_RETRY:
+            self._send_close_segment(current_time)
+
+    def _read_in_order(self, stream: Optional[Stream] = None) -> bytes:
+        """Ambil data dari recv_buffer (stream) yang sudah bisa di‐deliver in‐order"""
+        target = stream or self
+        result = b''
+        while target.expected_seq in target.recv_buffer:
+            chunk = target.recv_buffer.pop(target.expected_seq)
+            result += chunk
+            target.expected_seq += len(chunk)
+        if result and stream is None and self.decompressor is not None:
+            result = self.decompressor.feed(result)
+        return result
+
+    def open_stream(self, stream_id: int = None) -> Stream:
+        """
+        Buka stream baru di koneksi ini (atau ambil stream `stream_id` yang
+        sudah ada). Data stream dikirim dengan segment ber-ekstensi stream dan
+        punya window serta reassembly sendiri, jadi loss di satu stream tidak
+        menahan stream 0 maupun stream lain. Peer melihatnya lewat
+        accept_stream() saat segment pertamanya tiba.
+        """
+        if stream_id is None:
+            stream_id = self._next_stream_id
+            while stream_id in self.streams:
+                stream_id += 2
+            self._next_stream_id = stream_id + 2
+        if not 0 < stream_id <= 0xFFFF:
+            raise ValueError(f"Invalid stream id: {stream_id}")
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            stream = self.streams[stream_id] = Stream(self, stream_id)
+        return stream
+
+    def accept_stream(self, timeout: float = None) -> Stream:
+        """Tunggu stream yang dibuka peer. TimeoutError jika tidak ada."""
+        deadline = time.time() + (1.0 if timeout is None else timeout)
+        while not self._incoming_streams:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not self.connected:
+                raise TimeoutError("No incoming stream")
+            if self.blocking:
+                self._process_incoming_acks(timeout=min(remaining, 0.1))
+            else:
+                self.pump()
+                break
+        if not self._incoming_streams:
+            raise TimeoutError("No incoming stream")
+        return self._incoming_streams.popleft()
 
     def receive(self, timeout: float = None) -> bytes:
         """
         Terima data dari peer dengan Selective Repeat flow control.
         Mengembalikan byte yang sudah di‐urutkan secara in‐order.
+        Selama penutupan (FIN_WAIT/LAST_ACK/TIME_WAIT) receive() tetap
+        memproses segment penutupan dan mengembalikan b'' sampai CLOSED.
         """
+        if self.state in CLOSING_STATES:
+            result = self._read_in_order()
+            if not result:
+                if self.blocking:
+                    self._process_incoming_acks(timeout=min(timeout or 0.1, 0.1))
+                else:
+                    self.pump()
+                self.service_timers()
+            return result
+
         if not self.connected:
             raise RuntimeError("Socket not connected")
 
-        result = b''
-
         # Periksa buffer untuk data yang sudah bisa di‐deliver in‐order
-        while self.expected_seq in self.recv_buffer:
-            chunk = self.recv_buffer.pop(self.expected_seq)
-            result += chunk
-            self.expected_seq += len(chunk)
+        result = self._read_in_order()
 
         if result:
             return result
 
+        if not self.blocking:
+            # Mode event loop: proses datagram yang tersedia saja
+            self.pump()
+            return self._read_in_order()
+
         # Tunggu data baru
         try:
             if timeout is not None:
@@ -272,32 +1104,61 @@ class BetterUDPSocket:
             else:
                 self.udp_socket.settimeout(1.0)
 
-            raw, addr = self.udp_socket.recvfrom(self.mtu)
+            raw, addr = self.udp_socket.recvfrom(self.RECV_BUFFER_SIZE)
             if addr != self.peer_addr:
                 return b''
 
-            segment = Segment.from_bytes(raw)
-            if segment.payload:
-                self._handle_data_segment(segment)
+            segment = Segment.from_bytes(raw, self.compact)
+            self._handle_segment(segment)
 
-                # Periksa lagi apakah ada data in‐order sekarang
-                while self.expected_seq in self.recv_buffer:
-                    chunk = self.recv_buffer.pop(self.expected_seq)
-                    result += chunk
-                    self.expected_seq += len(chunk)
-
-            return result
+            # Periksa lagi apakah ada data in‐order sekarang
+            return self._read_in_order()
 
         except socket.timeout:
             return b''
+        except FramingError:
+            # Blok kompresi rusak: stream tidak bisa dilanjutkan
+            raise
         except Exception as e:
             if self.debug:
                 print(f"[ERROR] Receiving data: {e}")
             return b''
 
-    def connect(self, ip_address: str, port: int, timeout: float = 5.0):
+    def send_message(self, data: bytes):
+        """Kirim satu pesan ber-framing (length prefix), pasangan recv_message()."""
+        self.send(encode_message(data))
+
+    def recv_message(self, timeout: float = None) -> Optional[bytes]:
+        """
+        Terima satu pesan utuh yang dikirim dengan send_message(). Return None
+        jika belum ada pesan lengkap dalam `timeout` detik (default 1 detik;
+        mode non-blocking: hanya datagram yang sudah tersedia). Jangan
+        dicampur dengan receive() pada socket yang sama. FramingError jika
+        stream berisi frame yang tidak valid.
+        """
+        message = self.message_decoder.next_message()
+        if message is not None:
+            return message
+        deadline = time.time() + (1.0 if timeout is None else timeout)
+        while True:
+            data = self.receive(timeout=max(0.0, deadline - time.time()) or 0.01)
+            if data:
+                self.message_decoder.feed(data)
+                message = self.message_decoder.next_message()
+                if message is not None:
+                    return message
+            if not self.blocking or time.time() >= deadline:
+                return None
+
+    def connect(self, ip_address: str, port: int, timeout: float = 5.0, data: bytes = b''):
         """
         Inisiasi 3-way handshake sesuai spesifikasi TCP, dengan retransmit SYN.
+
+        `data` (opsional) adalah data aplikasi pertama. Jika ada cookie fast
+        open untuk server ini, data (sebanyak muat satu segment) ikut di SYN
+        dan langsung di-deliver server tanpa menunggu handshake selesai.
+        Sisanya, atau semuanya jika cookie ditolak, dikirim dengan send()
+        setelah terhubung.
         """
         # Pastikan socket sudah bind atau bind ephemeral kalau belum
         try:
@@ -307,13 +1168,19 @@ class BetterUDPSocket:
 
         x = random.randrange(0, 2**32)
         self.seq = x
+        self._transition("send_syn")
         server_addr = (ip_address, port)
+        cookie = fast_open_cookies.get(server_addr)
+        syn_data = b''
+        if cookie is not None and data:
+            syn_data = data[:self.max_payload_size - FAST_OPEN_COOKIE_SIZE]
         syn = Segment(
             src_port=self.udp_socket.getsockname()[1],
             dst_port=port,
             seq_num=self.seq,
             flags=0x02,  # SYN
-            payload=b'',
+            payload=cookie + syn_data if syn_data else b'',
+            options=self.offered_options,
         )
 
         interval = 0.5
@@ -332,14 +1199,19 @@ class BetterUDPSocket:
             while time.time() < wait_until:
                 try:
                     self.udp_socket.settimeout(wait_until - time.time())
-                    raw, addr = self.udp_socket.recvfrom(self.mtu)
+                    raw, addr = self.udp_socket.recvfrom(self.RECV_BUFFER_SIZE)
                     segment = Segment.from_bytes(raw)
                     # Cukup cek flag == SYN+ACK dan ack_num benar,
                     # tanpa memeriksa port asli lagi
-                    if segment.flags == 0x12 and segment.ack_num == x + 1:
+                    # ack_num = x + 1 + len(syn_data) jika data fast open diterima
+                    if segment.flags == 0x12 and segment.ack_num in (x + 1, x + 1 + len(syn_data)):
                         y = segment.seq_num
                         self.peer_addr = addr
                         received_synack = True
+                        if len(segment.payload) == FAST_OPEN_COOKIE_SIZE:
+                            fast_open_cookies[server_addr] = segment.payload
+                        self.fast_open_accepted = bool(syn_data) and segment.ack_num == x + 1 + len(syn_data)
+                        self._apply_options(segment.options & self.offered_options, x, y)
                         if self.debug:
                             print(f"[HANDSHAKE] Received SYN+ACK from {addr}, server_seq={y}, ack={segment.ack_num}")
                         break
@@ -352,10 +1224,15 @@ class BetterUDPSocket:
                 break
 
         if not received_synack:
+            self._transition("timeout")
             raise TimeoutError("Handshake timeout: did not receive SYN+ACK")
 
         # Kirim final ACK
         self.seq += 1
+        if self.fast_open_accepted:
+            self.seq += len(syn_data)
+        else:
+            syn_data = b''
         self.ack = y + 1
         ack_segment = Segment(
             src_port=self.udp_socket.getsockname()[1],
@@ -369,13 +1246,20 @@ class BetterUDPSocket:
         if self.debug:
             print(f"[HANDSHAKE] Sent final ACK (seq={self.seq}, ack={self.ack}) to {self.peer_addr}")
 
-        self.connected = True
+        self._transition("rcv_synack")
         self.expected_seq = y + 1
         self.send_window.next_seq_num = self.seq
         self.send_window.base = self.seq
         self.udp_socket.setblocking(True)
         if self.debug:
-            print(f"[CONNECTED] Connected to {self.peer_addr}")
+            fast_open = f" (fast open: {len(syn_data)} bytes in SYN)" if syn_data else ""
+            compression = ", compressed" if self.compressor is not None else ""
+            compact = ", compact header" if self.compact is not None else ""
+            fec = ", FEC" if self.fec_encoder is not None else ""
+            print(f"[CONNECTED] Connected to {self.peer_addr}{fast_open}{compression}{compact}{fec}")
+
+        if len(data) > len(syn_data):
+            self.send(data[len(syn_data):])
 
     def get_state(self):
         """
@@ -383,40 +1267,128 @@ class BetterUDPSocket:
         """
         return self
 
-    def listen(self, ip: str, port: int):
+    def listen(self, ip: str, port: int, reuse_port: bool = False):
         """
         Siapkan socket untuk menerima koneksi masuk.
+        reuse_port=True memasang SO_REUSEPORT agar beberapa proses bisa bind
+        ke port yang sama; kernel membagi datagram per alamat pengirim.
         """
+        if reuse_port:
+            self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.udp_socket.bind((ip, port))
+        self._transition("listen")
         if self.debug:
             print(f"[LISTEN] Listening on {ip}:{port}")
 
-    # socket_wrapper.py - Critical fix for accept() method
+    def enable_fast_open(self, secret: bytes = None, max_recent: int = 1024):
+        """
+        Aktifkan fast open di listener. Setiap SYN+ACK membawa cookie (HMAC
+        alamat IP client dengan `secret`). SYN berikutnya dari IP yang sama
+        boleh membawa cookie + data: koneksi langsung ESTABLISHED dan data
+        sudah bisa dibaca saat accept() kembali, satu RTT lebih cepat.
+        Listener yang berbagi port (shard) harus memakai secret yang sama.
+        """
+        self.fast_open_secret = secret or os.urandom(16)
+        self._fast_open_max_recent = max_recent
 
-    def accept(self, timeout: float = None):
+    def enable_compression(self):
         """
-        Tunggu dan terima koneksi masuk dengan 3-way handshake, dengan retransmit SYN+ACK.
+        Tawarkan (client, sebelum connect()) atau izinkan (listener) kompresi
+        payload. Hanya aktif jika kedua sisi memanggilnya; setelah itu data
+        stream 0 dikirim sebagai blok zlib (lihat protocol.compression) dan
+        rasio serta waktu CPU-nya tercatat di stats.
         """
-        if timeout is not None:
-            self.udp_socket.settimeout(timeout)
-        else:
-            self.udp_socket.setblocking(True)
+        self.offered_options |= OPT_COMPRESSION
 
-        # 1. Tunggu SYN
-        try:
-            raw, addr = self.udp_socket.recvfrom(self.mtu)
-        except socket.timeout:
-            raise TimeoutError("Accept timed out waiting for SYN")
+    def enable_compact_header(self):
+        """
+        Tawarkan (client) atau izinkan (listener) header kompak. Setelah
+        handshake, segment dikirim dengan connection id dan seq/ack sebagai
+        delta varint (lihat protocol.segment), bukan header 20 byte.
+        Handshake sendiri selalu memakai header penuh. Listener hanya
+        menyetujuinya jika port kedua sisi >= MIN_COMPACT_PORT.
+        """
+        self.offered_options |= OPT_COMPACT_HEADER
 
-        syn = Segment.from_bytes(raw)
-        if syn.flags != 0x02:
-            raise ValueError("Expected SYN")
+    def enable_fec(self):
+        """
+        Tawarkan (client) atau izinkan (listener) forward error correction.
+        Setelah handshake, setiap K segment data stream 0 diikuti satu
+        segment parity (K menyesuaikan perkiraan loss, lihat protocol.fec),
+        sehingga satu segment yang hilang per grup dipulihkan penerima tanpa
+        menunggu retransmission. Statistiknya tercatat di stats (fec_*).
+        """
+        self.offered_options |= OPT_FEC
 
+    def _apply_options(self, options: int, local_isn: int, peer_isn: int, raw_prefix: int = 0):
+        """
+        Pasang opsi hasil negosiasi. local_isn/peer_isn adalah sequence SYN
+        kedua sisi; raw_prefix = byte data fast open di SYN.
+        """
+        self.options = options
+        if options & OPT_COMPRESSION:
+            self.compressor = Compressor(self.stats)
+            self.decompressor = Decompressor(self.stats, raw_prefix)
+        if options & OPT_COMPACT_HEADER:
+            self.compact = CompactContext(
+                conn_id=(local_isn ^ peer_isn) & 0x3FFF,
+                local_port=self.udp_socket.getsockname()[1],
+                peer_port=self.peer_addr[1],
+                local_base=(local_isn + 1) & 0xFFFFFFFF,
+                peer_base=(peer_isn + 1) & 0xFFFFFFFF,
+            )
+        if options & OPT_FEC:
+            self.fec_encoder = FecEncoder(self.stats)
+            self.fec_decoder = FecDecoder(self.stats)
+
+    def _accepted_options(self, offered: int, peer_port: int, local_port: int) -> int:
+        """Opsi di SYN yang disetujui listener untuk koneksi baru"""
+        options = offered & self.offered_options
+        if min(peer_port, local_port) < MIN_COMPACT_PORT:
+            # Byte pertama header penuh dari port kecil mirip header kompak
+            options &= ~OPT_COMPACT_HEADER
+        return options
+
+    def _fast_open_cookie(self, ip: str) -> bytes:
+        digest = hmac.new(self.fast_open_secret, ip.encode("utf-8"), hashlib.sha256).digest()
+        return digest[:FAST_OPEN_COOKIE_SIZE]
+
+    def _fast_open_duplicate(self, syn: Segment, addr: tuple) -> bool:
+        """
+        SYN fast open yang dikirim ulang (SYN+ACK hilang) dijawab ulang oleh
+        koneksi yang sudah dibuat, bukan membuka koneksi baru.
+        """
+        conn = self._fast_open_conns.get((addr, syn.seq_num))
+        if conn is None:
+            return False
+        if conn._synack is not None and conn.connected:
+            conn._send_synack()
+        return True
+
+    def _open_child(self, syn: Segment, addr: tuple) -> 'BetterUDPSocket':
+        """
+        Siapkan koneksi setengah-terbuka untuk SYN yang diterima: ephemeral
+        socket baru dan segment SYN+ACK yang siap dikirim dari socket tersebut.
+        SYN dengan cookie fast open yang valid menghasilkan koneksi yang
+        langsung ESTABLISHED dengan data SYN di recv_buffer.
+        """
         x = syn.seq_num
         if self.debug:
             print(f"[HANDSHAKE] Received SYN from {addr} seq={x}")
 
-        # 2. Siapkan ephemeral socket untuk SYN+ACK
+        cookie = b''
+        data = b''
+        if self.fast_open_secret is not None:
+            cookie = self._fast_open_cookie(addr[0])
+            if len(syn.payload) > FAST_OPEN_COOKIE_SIZE and \
+                    hmac.compare_digest(syn.payload[:FAST_OPEN_COOKIE_SIZE], cookie):
+                data = syn.payload[FAST_OPEN_COOKIE_SIZE:]
+                self.stats["fast_open_accepted"] += 1
+            elif syn.payload:
+                # Cookie salah/kedaluwarsa: handshake biasa, client mengirim ulang datanya
+                self.stats["fast_open_rejected"] += 1
+
+        # Siapkan ephemeral socket untuk SYN+ACK
         new_conn_socket_raw = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         listening_ip = self.udp_socket.getsockname()[0]
         if listening_ip == '0.0.0.0':
@@ -425,37 +1397,89 @@ class BetterUDPSocket:
         eph_port = new_conn_socket_raw.getsockname()[1]
 
         y = random.randrange(0, 2**32)
-        
-        # CRITICAL FIX: Create new socket for this client BEFORE sending SYN+ACK
-        client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        client_socket.bind(('', 0))  # Bind to new port
-        new_port = client_socket.getsockname()[1]
-        
-        # Send SYN+ACK with the NEW port number
-        synack = Segment(
+
+        conn = BetterUDPSocket(new_conn_socket_raw, mtu=self.mtu, debug=self.debug)
+        conn.peer_addr = addr
+        conn._next_stream_id = 2
+        conn.seq = y + 1
+        conn.ack = x + 1 + len(data)
+        conn.expected_seq = x + 1
+        conn._transition("rcv_syn")
+        conn._synack = Segment(
             src_port=eph_port,
             dst_port=addr[1],
             seq_num=y,
-            ack_num=x + 1,
+            ack_num=conn.ack,
             flags=0x12,  # SYN+ACK
-            payload=b''
+            payload=cookie,
+            options=self._accepted_options(syn.options, addr[1], eph_port)
         )
+        conn._apply_options(conn._synack.options, y, x, raw_prefix=len(data))
+        if data:
+            conn.recv_buffer[x + 1] = data
+            conn._transition("rcv_cookie")
+            self._fast_open_conns[(addr, x)] = conn
+            if len(self._fast_open_conns) > self._fast_open_max_recent:
+                self._fast_open_conns.popitem(last=False)
+            if self.debug:
+                print(f"[FAST OPEN] Accepted {len(data)} bytes in SYN from {addr}")
+        return conn
+
+    def _send_synack(self, current_time: float = None):
+        """Kirim (atau kirim ulang) SYN+ACK milik koneksi setengah-terbuka"""
+        self.udp_socket.sendto(self._synack.to_bytes(), self.peer_addr)
+        self._synack_sent_at = current_time if current_time is not None else time.time()
+        if self.debug:
+            local = self.udp_socket.getsockname()
+            print(f"[HANDSHAKE] Sent SYN+ACK from {local[0]}:{local[1]} seq={self._synack.seq_num} to {self.peer_addr}")
+
+    def accept(self, timeout: float = None):
+        """
+        Tunggu dan terima koneksi masuk dengan 3-way handshake, dengan retransmit SYN+ACK.
+        """
+        if timeout is not None:
+            self.udp_socket.settimeout(timeout)
+        else:
+            self.udp_socket.setblocking(True)
+
+        # 1. Tunggu SYN
+        while True:
+            try:
+                raw, addr = self.udp_socket.recvfrom(self.RECV_BUFFER_SIZE)
+            except socket.timeout:
+                raise TimeoutError("Accept timed out waiting for SYN")
+
+            syn = Segment.from_bytes(raw)
+            if syn.flags != 0x02:
+                raise ValueError("Expected SYN")
+            if not self._fast_open_duplicate(syn, addr):
+                break
+
+        # 2. Siapkan ephemeral socket untuk SYN+ACK
+        conn = self._open_child(syn, addr)
+        y = conn._synack.seq_num
+
+        if conn.connected:
+            # Fast open: tidak menunggu final ACK, SYN+ACK dikirim ulang oleh
+            # retransmit thread sampai client mengirim segment pertamanya
+            conn._send_synack()
+            conn.udp_socket.setblocking(True)
+            conn._start_retransmit_timer()
+            return conn, addr
 
         interval = 0.5
         deadline = time.time() + (timeout if timeout is not None else 5.0)
         received_final = False
 
         while time.time() < deadline:
-            new_conn_socket_raw.sendto(synack.to_bytes(), addr)
-            if self.debug:
-                print(f"[HANDSHAKE] Sent SYN+ACK from {listening_ip}:{eph_port} seq={y} to {addr}")
+            conn._send_synack()
 
             wait_until = time.time() + interval
             while time.time() < wait_until:
                 try:
-                    new_conn_socket_raw.settimeout(wait_until - time.time())
-                    raw2, addr2 = new_conn_socket_raw.recvfrom(self.mtu)
-                    fin_ack = Segment.from_bytes(raw2)
+                    conn.udp_socket.settimeout(wait_until - time.time())
+                    raw2, addr2 = conn.udp_socket.recvfrom(self.RECV_BUFFER_SIZE)
+                    fin_ack = Segment.from_bytes(raw2, conn.compact)
                     # Cukup cek flag==ACK dan ack_num benar, tanpa memeriksa port lagi
                     if fin_ack.flags == 0x10 and fin_ack.ack_num == y + 1:
                         received_final = True
@@ -471,19 +1495,46 @@ class BetterUDPSocket:
                 break
 
         if not received_final:
-            new_conn_socket_raw.close()
+            conn._transition("timeout")
+            conn.udp_socket.close()
             raise TimeoutError("Handshake timeout: did not receive final ACK")
 
         # 3. Setup koneksi
-        conn = BetterUDPSocket(new_conn_socket_raw, mtu=self.mtu)
-        conn.peer_addr = addr
-        conn.connected = True
-        conn.seq = y + 1
-        conn.ack = x + 1
-        conn.expected_seq = x + 1
+        conn._synack = None
+        conn._transition("rcv_ack")
         conn.udp_socket.setblocking(True)
         if self.debug:
-            print(f"[CONNECTED] {addr} connected (server ephemeral port={eph_port})")
+            print(f"[CONNECTED] {addr} connected (server ephemeral port={conn.udp_socket.getsockname()[1]})")
+        return conn, addr
+
+    def accept_nowait(self, handshake_timeout: float = 5.0):
+        """
+        Versi non-blocking dari accept() untuk event loop. Baca satu SYN yang
+        sudah tersedia (jika ada), kirim SYN+ACK, lalu kembalikan koneksi
+        setengah-terbuka dalam mode non-blocking. Koneksi menjadi `connected`
+        saat final ACK diproses oleh pump(); SYN+ACK dikirim ulang oleh
+        service_timers() sampai `handshake_deadline`.
+        Return (conn, addr), atau None jika tidak ada SYN yang valid.
+        """
+        while True:
+            try:
+                raw, addr = self.udp_socket.recvfrom(self.RECV_BUFFER_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return None
+
+            try:
+                syn = Segment.from_bytes(raw)
+            except Exception:
+                return None
+            if syn.flags != 0x02:
+                return None
+            if not self._fast_open_duplicate(syn, addr):
+                break
+
+        conn = self._open_child(syn, addr)
+        conn.setblocking(False)
+        conn.handshake_deadline = time.time() + handshake_timeout
+        conn._send_synack()
         return conn, addr
 
     def start_receiving_in_background(self, callback):
@@ -512,33 +1563,145 @@ class BetterUDPSocket:
 
     def close(self):
         """
-        Tutup koneksi dengan FIN-ACK handshake.
+        Tutup koneksi. Dari ESTABLISHED kirim FIN (FIN_WAIT); di mode blocking
+        tunggu FIN+ACK sampai CLOSE_TIMEOUT. Sisa penutupan (TIME_WAIT, atau
+        LAST_ACK jika peer menutup duluan) diselesaikan di background oleh
+        `closing_sockets`, jadi close() tidak ikut menunggu timer tersebut.
         """
-        if self.connected:
-            try:
-                fin_segment = Segment(
-                    src_port=self.udp_socket.getsockname()[1],
-                    dst_port=self.peer_addr[1],
-                    seq_num=self.seq,
-                    ack_num=self.ack,
-                    flags=0x01,  # FIN
-                    payload=b''
-                )
-                self.udp_socket.sendto(fin_segment.to_bytes(), self.peer_addr)
-                if self.debug:
-                    print("[CLOSE] Sent FIN")
-
-                self.udp_socket.settimeout(2.0)
-                raw, addr = self.udp_socket.recvfrom(self.mtu)
-                response = Segment.from_bytes(raw)
-                if response.flags & 0x11 and self.debug:  # FIN+ACK
+        if self.state == ESTABLISHED:
+            self.send_fin()
+            if self.blocking:
+                while self.state == FIN_WAIT:
+                    self._process_incoming_acks(timeout=0.1)
+                    self.service_timers()
+                if self.debug and self.fin_acked:
                     print("[CLOSE] Received FIN+ACK, connection closed gracefully")
-            except Exception as e:
-                if self.debug:
-                    print(f"[CLOSE] Error during graceful close: {e}")
 
-        self.running = False
-        self.connected = False
+        if self.state in CLOSING_STATES:
+            closing_sockets.add(self)
+            return
+
+        self._transition("abort")
         self.udp_socket.close()
         if self.debug:
             print("[CLOSE] Socket closed")
+
+    def send_fin(self):
+        """Mulai penutupan aktif: kirim FIN tanpa menunggu jawaban (FIN_WAIT)."""
+        now = time.time()
+        if self.state == ESTABLISHED:
+            self._transition("close")
+            self._close_deadline = now + self.CLOSE_TIMEOUT
+        self._send_close_segment(now)
+        if self.debug:
+            print(f"[CLOSE] Sent FIN to {self.peer_addr}")
+
+
+class ClosingSockets:
+    """
+    Socket yang sedang menyelesaikan penutupan (FIN_WAIT, LAST_ACK,
+    TIME_WAIT). Satu thread memproses segment dan timer semua socket ini,
+    lalu menutup file descriptor-nya begitu mencapai CLOSED. Thread hanya
+    hidup selama ada socket yang ditunggu.
+    """
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.conns = set()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+    def add(self, conn: BetterUDPSocket):
+        conn.setblocking(False)
+        with self.lock:
+            self.conns.add(conn)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, daemon=True)
+                self.thread.start()
+
+    def __len__(self) -> int:
+        return len(self.conns)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                conns = list(self.conns)
+            now = time.time()
+            for conn in conns:
+                try:
+                    conn.pump()
+                    conn.service_timers(now)
+                except OSError:
+                    conn._transition("abort")
+                if conn.state not in CLOSING_STATES:
+                    try:
+                        conn.udp_socket.close()
+                    except OSError:
+                        pass
+                    with self.lock:
+                        self.conns.discard(conn)
+            with self.lock:
+                if not self.conns:
+                    self.thread = None
+                    return
+
+
+closing_sockets = ClosingSockets()
+
+
+def close_all(conns: List[BetterUDPSocket], timeout: float = 2.0) -> Tuple[int, int]:
+    """
+    Tutup banyak koneksi sekaligus dengan satu deadline global.
+
+    FIN dikirim ke semua peer terlebih dahulu, lalu semua socket dipoll
+    bersama (selectors) dan FIN+ACK diproses lewat _handle_segment seperti
+    segment lain; FIN dikirim ulang oleh timer masing-masing socket. Saat
+    `timeout` habis, koneksi yang tersisa ditutup paksa. TIME_WAIT
+    diselesaikan di background (closing_sockets), sehingga total waktu
+    dibatasi `timeout`, berapa pun jumlah koneksinya.
+
+    Return (jumlah ditutup dengan FIN+ACK, jumlah ditutup paksa).
+    """
+    deadline = time.time() + timeout
+    selector = selectors.DefaultSelector()
+    closing = []
+    for conn in conns:
+        if not conn.connected:
+            continue
+        # Koneksi dipindah ke mode non-blocking agar bisa dipoll bersama
+        conn.setblocking(False)
+        conn.send_fin()
+        conn._close_deadline = deadline
+        closing.append(conn)
+        selector.register(conn, selectors.EVENT_READ, conn)
+
+    waiting = list(closing)
+    while waiting:
+        now = time.time()
+        if now >= deadline:
+            break
+        for key, _ in selector.select(min(deadline - now, BetterUDPSocket.CLOSE_RETRY)):
+            key.data.pump()
+        now = time.time()
+        still_waiting = []
+        for conn in waiting:
+            conn.service_timers(now)
+            if conn.state == FIN_WAIT:
+                still_waiting.append(conn)
+            else:
+                selector.unregister(conn)
+        waiting = still_waiting
+    selector.close()
+
+    graceful = sum(1 for conn in closing if conn.fin_acked)
+    forced = len(closing) - graceful
+    for conn in conns:
+        if conn.state in (TIME_WAIT, LAST_ACK):
+            closing_sockets.add(conn)
+            continue
+        conn._transition("abort")
+        try:
+            conn.udp_socket.close()
+        except OSError:
+            pass
+    return graceful, forced
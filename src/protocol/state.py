@@ -0,0 +1,54 @@
+# File: src/protocol/state.py
+
+from typing import Dict, Optional, Tuple
+
+# State koneksi (penyederhanaan diagram state TCP)
+CLOSED = "CLOSED"
+LISTEN = "LISTEN"
+SYN_SENT = "SYN_SENT"
+SYN_RCVD = "SYN_RCVD"
+ESTABLISHED = "ESTABLISHED"
+FIN_WAIT = "FIN_WAIT"       # FIN sudah dikirim, menunggu FIN+ACK peer
+CLOSE_WAIT = "CLOSE_WAIT"   # FIN peer diterima, aplikasi belum menutup
+LAST_ACK = "LAST_ACK"       # FIN+ACK sudah dikirim, menunggu ACK terakhir
+TIME_WAIT = "TIME_WAIT"     # menjawab FIN+ACK duplikat sebentar sebelum CLOSED
+
+# Event:
+#   listen      : listen() dipanggil
+#   send_syn    : connect() mengirim SYN
+#   rcv_syn     : SYN diterima listener (koneksi anak dibuat)
+#   rcv_synack  : SYN+ACK diterima
+#   rcv_ack     : ACK yang ditunggu (final handshake / ACK untuk FIN+ACK)
+#   rcv_cookie  : SYN membawa cookie fast open yang valid (tanpa final ACK)
+#   close       : aplikasi menutup koneksi (kirim FIN / FIN+ACK)
+#   rcv_fin     : FIN dari peer
+#   rcv_finack  : FIN+ACK dari peer untuk FIN kita
+#   timeout     : timer state habis (handshake, FIN, TIME_WAIT)
+#   abort       : koneksi dibuang paksa (keepalive mati, deadline shutdown)
+TRANSITIONS: Dict[Tuple[str, str], str] = {
+    (CLOSED, "listen"): LISTEN,
+    (CLOSED, "send_syn"): SYN_SENT,
+    (CLOSED, "rcv_syn"): SYN_RCVD,
+    (SYN_SENT, "rcv_synack"): ESTABLISHED,
+    (SYN_SENT, "timeout"): CLOSED,
+    (SYN_RCVD, "rcv_ack"): ESTABLISHED,
+    (SYN_RCVD, "rcv_cookie"): ESTABLISHED,
+    (SYN_RCVD, "timeout"): CLOSED,
+    (ESTABLISHED, "close"): FIN_WAIT,
+    (ESTABLISHED, "rcv_fin"): CLOSE_WAIT,
+    (CLOSE_WAIT, "close"): LAST_ACK,
+    (LAST_ACK, "rcv_ack"): CLOSED,
+    (LAST_ACK, "timeout"): CLOSED,
+    (FIN_WAIT, "rcv_finack"): TIME_WAIT,
+    # Close bersamaan: FIN peer bersilangan dengan FIN kita
+    (FIN_WAIT, "rcv_fin"): TIME_WAIT,
+    (FIN_WAIT, "timeout"): CLOSED,
+    (TIME_WAIT, "timeout"): CLOSED,
+}
+
+
+def next_state(state: str, event: str) -> Optional[str]:
+    """State berikutnya untuk (state, event), atau None jika tidak valid."""
+    if event == "abort":
+        return CLOSED
+    return TRANSITIONS.get((state, event))
@@ -0,0 +1,44 @@
+# varint.py
+from typing import Tuple
+
+
+# Integer tak bertanda dengan panjang variabel (LEB128): 7 bit per byte,
+# bit tertinggi = masih ada byte berikutnya. Nilai < 128 cukup 1 byte.
+MAX_VARINT_SIZE = 10
+
+
+class IncompleteVarint(ValueError):
+    """Data berakhir di tengah varint (byte berikutnya belum diterima)."""
+
+
+def encode_varint(value: int) -> bytes:
+    if value < 0:
+        raise ValueError(f"Varint must be non-negative: {value}")
+    if value < 0x80:
+        return bytes((value,))
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def decode_varint(data, offset: int = 0) -> Tuple[int, int]:
+    """
+    Return (nilai, offset sesudah varint). IncompleteVarint jika data habis
+    sebelum varint selesai, ValueError jika varint lebih dari 10 byte.
+    """
+    value = 0
+    shift = 0
+    end = len(data)
+    while offset < end:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+        if shift >= 7 * MAX_VARINT_SIZE:
+            raise ValueError("Varint too long")
+    raise IncompleteVarint("Truncated varint")
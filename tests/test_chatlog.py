@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+from app.chatlog import ChatLogWriter
+
+
+class TestChatLogWriter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_async_writer_group_commits(self):
+        writer = ChatLogWriter(self.directory, fsync=False)
+        # Isi antrian dulu agar writer mengambil semuanya sebagai satu batch
+        for i in range(500):
+            writer.append("lobby", "alice@127.0.0.1:1", f"message {i}".encode(), timestamp=1000 + i)
+        writer.start()
+        writer.close()
+
+        self.assertEqual(writer.records, 500)
+        self.assertEqual(writer.commits, 1)
+        with open(os.path.join(self.directory, "chat-000001.log"), "rb") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], b"1000.000000\tlobby\talice@127.0.0.1:1\tmessage 0")
+        self.assertEqual(len(lines), 500)
+
+    def test_segments_and_range_query(self):
+        writer = ChatLogWriter(self.directory, segment_bytes=2048, index_every=256, fsync=False)
+        for i in range(200):
+            writer.write_batch([f"{1000 + i:.6f}\tdev\tbob\tline {i}\n".encode()])
+
+        self.assertGreater(len(writer.segments), 1)
+        self.assertGreater(len(writer.segments[0].index), 1)
+        result = list(writer.read_range(1050, 1059.5))
+        self.assertEqual([r[3] for r in result], [f"line {i}".encode() for i in range(50, 60)])
+        self.assertEqual(result[0][:3], (1050.0, "dev", "bob"))
+        self.assertEqual(list(writer.read_range(2000, 3000)), [])
+        writer.close()
+
+        # Segment dan index dibaca ulang setelah restart
+        reopened = ChatLogWriter(self.directory, segment_bytes=2048, index_every=256, fsync=False)
+        self.assertEqual(len(reopened.segments), len(writer.segments))
+        self.assertEqual(len(list(reopened.read_range(0, 5000))), 200)
+        reopened.close()
+
+    def test_multiline_message_stays_one_record(self):
+        writer = ChatLogWriter(self.directory, fsync=False)
+        writer.append("lobby", "eve\tx", b"a\nb\n", timestamp=5)
+        writer.start()
+        writer.close()
+        self.assertEqual(list(writer.read_range(0, 10)), [(5.0, "lobby", "eve x", b"a b")])
+
+
+if __name__ == "__main__":
+    unittest.main()
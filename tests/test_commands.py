@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime
+from app.commands import (COMMAND_OPCODES, HEADER_SIZE, OP_CHAT, OP_JOIN, OP_ROOM, OP_USER,
+                          PROTOCOL_BINARY, PROTOCOL_TEXT, CommandCodec, IdTable, choose_protocol,
+                          decode_packet, encode_chat, encode_packet, formatted_time, is_packet, make_offer,
+                          parse_offer)
+from app.sessions import ResumeState
+
+
+class TestPackets(unittest.TestCase):
+    def test_round_trip(self):
+        packet = encode_packet(OP_CHAT, "halo ✓".encode("utf-8"), 513, 7)
+        self.assertEqual(len(packet), HEADER_SIZE + len("halo ✓".encode("utf-8")))
+        self.assertEqual(decode_packet(packet), (OP_CHAT, 513, 7, "halo ✓".encode("utf-8")))
+
+    def test_packets_and_text_are_distinguishable(self):
+        for opcode in set(COMMAND_OPCODES.values()) | {OP_CHAT, OP_USER, OP_ROOM}:
+            self.assertTrue(is_packet(encode_packet(opcode)))
+            # Opcode bukan whitespace, jadi tidak hilang saat teks di-strip
+            self.assertEqual(bytes([opcode]).strip(), bytes([opcode]))
+        for text in (b"alice: hi", b"[SERVER]: x", b"COUNT: 3", b"\nalice: hi", b""):
+            self.assertFalse(is_packet(text))
+
+    def test_short_packet_is_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_packet(b"\x01\x00")
+
+
+class TestNegotiation(unittest.TestCase):
+    def test_offer_is_split_from_name(self):
+        self.assertEqual(parse_offer("alice" + make_offer()), ("alice", (1, 2)))
+        self.assertEqual(parse_offer("alice smith proto=2"), ("alice smith", (2,)))
+        # Client lama: tidak ada penawaran
+        self.assertEqual(parse_offer("alice"), ("alice", ()))
+
+    def test_choose_highest_common_version(self):
+        self.assertEqual(choose_protocol((1, 2)), PROTOCOL_BINARY)
+        self.assertEqual(choose_protocol((1, 9)), PROTOCOL_TEXT)
+        self.assertEqual(choose_protocol(()), PROTOCOL_TEXT)
+
+    def test_join_and_resume_lines_carry_offer(self):
+        state = ResumeState()
+        self.assertEqual(state.join_line("bob", " proto=1,2"), "AWAL: !awal bob proto=1,2")
+        state.on_line("SESSION abc 4")
+        state.on_packet()
+        self.assertEqual(state.join_line("bob", " proto=1,2"), "RESUME: !resume abc 5 bob proto=1,2")
+
+
+class TestCommandCodec(unittest.TestCase):
+    def test_text_until_server_accepts(self):
+        codec = CommandCodec()
+        self.assertEqual(codec.encode("alice", "hi"), b"alice: hi")
+        self.assertFalse(codec.on_reply("PROTO nonsense"))
+        self.assertTrue(codec.on_reply("PROTO 2 17"))
+        self.assertEqual((codec.version, codec.user_id), (PROTOCOL_BINARY, 17))
+
+        self.assertEqual(decode_packet(codec.encode("alice", "hi")), (OP_CHAT, 0, 0, b"hi"))
+        self.assertEqual(decode_packet(codec.encode("alice", "!join dev")), (OP_JOIN, 0, 0, b"dev"))
+        # Perintah yang tidak punya opcode tetap teks
+        self.assertEqual(codec.encode("alice", "!bogus x"), b"alice: !bogus x")
+
+        codec.reset()
+        self.assertEqual(codec.encode("alice", "hi"), b"alice: hi")
+
+    def test_decode_uses_announced_names(self):
+        codec = CommandCodec()
+        self.assertIsNone(codec.decode(encode_packet(OP_USER, b"bob", 3)))
+        self.assertIsNone(codec.decode(encode_packet(OP_ROOM, b"dev", room_id=2)))
+        sent_at = datetime.now()
+        self.assertTrue(codec.decode(encode_chat("hi", 3, 0, sent_at)).endswith("] bob: hi"))
+        self.assertTrue(codec.decode(encode_chat("yo", 3, 2, sent_at)).endswith("] [#dev] bob: yo"))
+
+    def test_decode_uses_server_send_time(self):
+        # Paket hasil replay sesi menampilkan waktu kirim, bukan waktu resume
+        codec = CommandCodec()
+        codec.decode(encode_packet(OP_USER, b"bob", 3))
+        for sent_at in (datetime(2024, 5, 1, 15, 4), datetime(2024, 5, 1, 0, 30)):
+            # Sama persis dengan timestamp yang dilihat client teks
+            self.assertEqual(codec.decode(encode_chat("hi", 3, 0, sent_at)), f"{formatted_time(sent_at)} bob: hi")
+        with self.assertRaises(ValueError):
+            codec.decode(encode_packet(OP_CHAT, b"x", 3))
+
+
+class TestIdTable(unittest.TestCase):
+    def test_ids_are_stable_and_released(self):
+        table = IdTable()
+        self.assertEqual(table.assign("a"), (1, True))
+        self.assertEqual(table.assign("a"), (1, False))
+        self.assertEqual(table.assign("b"), (2, True))
+        self.assertEqual(table.key_of(2), "b")
+        self.assertEqual(table.release("a"), 1)
+        self.assertIsNone(table.key_of(1))
+        # Id yang dilepas tidak langsung dipakai ulang
+        self.assertEqual(table.assign("c"), (3, True))
+
+    def test_wraps_around_and_reports_full(self):
+        table = IdTable(max_id=3)
+        for key in "abc":
+            table.assign(key)
+        self.assertEqual(table.assign("d"), (0, False))
+        table.release("b")
+        self.assertEqual(table.assign("d"), (2, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
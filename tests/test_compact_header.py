@@ -0,0 +1,128 @@
+import threading
+import time
+import unittest
+from protocol.segment import CompactContext, Segment
+from protocol.socket_wrapper import BetterUDPSocket, OPT_COMPACT_HEADER, URG_FLAG
+
+
+def contexts(client_isn=1000, server_isn=2**32 - 10):
+    """Context kedua sisi untuk satu koneksi (client port 40000, server 50000)."""
+    conn_id = (client_isn ^ server_isn) & 0x3FFF
+    client = CompactContext(conn_id, 40000, 50000, client_isn + 1, (server_isn + 1) & 0xFFFFFFFF)
+    server = CompactContext(conn_id, 50000, 40000, (server_isn + 1) & 0xFFFFFFFF, client_isn + 1)
+    return client, server
+
+
+class TestCompactSegment(unittest.TestCase):
+    def round_trip(self, segment: Segment) -> Segment:
+        client, server = contexts()
+        raw = segment.to_bytes(client)
+        parsed = Segment.from_bytes(raw, server)
+        for field in ("src_port", "dst_port", "seq_num", "ack_num", "flags", "window",
+                      "payload", "stream_id", "urgent_pointer"):
+            self.assertEqual(getattr(parsed, field), getattr(segment, field), field)
+        return raw
+
+    def test_chat_segment_is_small(self):
+        segment = Segment(40000, 50000, 1001 + 5000, (2**32 - 9 + 300) & 0xFFFFFFFF,
+                          flags=0x10, payload=b"x" * 40)
+        raw = self.round_trip(segment)
+        self.assertLessEqual(len(raw) - 40, 10)
+        self.assertEqual(len(segment.to_bytes()) - 40, Segment.HEADER_SIZE)
+
+    def test_optional_fields_and_flags(self):
+        self.round_trip(Segment(40000, 50000, 3, 7, flags=0x10, payload=b"s", stream_id=5))
+        urgent = Segment(40000, 50000, 0, 0, flags=0x10 | URG_FLAG, payload=b"SHUTDOWN")
+        urgent.urgent_pointer = 8
+        self.round_trip(urgent)
+        self.round_trip(Segment(40000, 50000, 1001, 0, flags=0x01))
+        self.round_trip(Segment(40000, 50000, 1001, 5, flags=0x11, window=512))
+
+    def test_negative_delta_for_keepalive_probe(self):
+        # Probe: seq satu sebelum sequence awal
+        self.round_trip(Segment(40000, 50000, 1000, (2**32 - 9) & 0xFFFFFFFF, flags=0x10))
+
+    def test_full_header_still_parsed(self):
+        client, server = contexts()
+        synack = Segment(40000, 50000, 5, 1001, flags=0x12, payload=b"cookie!!")
+        # SYN tidak punya bentuk kompak
+        raw = synack.to_bytes(client)
+        self.assertEqual(raw, synack.to_bytes())
+        self.assertEqual(Segment.from_bytes(raw, server).flags, 0x12)
+
+    def test_corruption_and_foreign_connection_are_rejected(self):
+        client, server = contexts()
+        raw = bytearray(Segment(40000, 50000, 1001, 0, flags=0x10, payload=b"hi").to_bytes(client))
+        raw[-1] ^= 0xFF
+        with self.assertRaises(ValueError):
+            Segment.from_bytes(bytes(raw), server)
+        _, other = contexts(client_isn=77)
+        with self.assertRaises(ValueError):
+            Segment.from_bytes(Segment(40000, 50000, 1001, 0, flags=0x10).to_bytes(client), other)
+
+
+class TestCompactConnection(unittest.TestCase):
+    def setUp(self):
+        self.listener = BetterUDPSocket(debug=False)
+        self.listener.listen('127.0.0.1', 0)
+        self.addr = ('127.0.0.1', self.listener.udp_socket.getsockname()[1])
+        self.sockets = [self.listener]
+
+    def tearDown(self):
+        for s in self.sockets:
+            s.running = False
+            s.connected = False
+            s.udp_socket.close()
+
+    def connect(self, client_compact: bool):
+        accepted = {}
+        t = threading.Thread(target=lambda: accepted.update(conn=self.listener.accept(timeout=5)[0]))
+        t.start()
+        client = BetterUDPSocket(debug=False)
+        if client_compact:
+            client.enable_compact_header()
+        client.connect(*self.addr)
+        t.join(timeout=6)
+        self.sockets += [client, accepted["conn"]]
+        return client, accepted["conn"]
+
+    def test_needs_both_sides(self):
+        client, conn = self.connect(client_compact=True)
+        self.assertIsNone(client.compact)
+        self.assertIsNone(conn.compact)
+
+    def test_messages_streams_and_urgent_over_compact_header(self):
+        self.listener.enable_compact_header()
+        client, conn = self.connect(client_compact=True)
+        self.assertEqual((client.options, conn.options), (OPT_COMPACT_HEADER, OPT_COMPACT_HEADER))
+        self.assertEqual(client.compact.conn_id, conn.compact.conn_id)
+
+        received = []
+
+        def read():
+            deadline = time.time() + 5
+            while len(received) < 2 and time.time() < deadline:
+                message = conn.recv_message(timeout=0.2)
+                if message is not None:
+                    received.append(message)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        client.send_message(b"alice: halo")
+        client.send_message(b"alice: " + b"y" * 150)
+        reader.join(timeout=6)
+        self.assertEqual(received, [b"alice: halo", b"alice: " + b"y" * 150])
+
+        client.send(b"SHUTDOWN", urgent=True)
+        stream = client.open_stream()
+        got = {}
+        t = threading.Thread(target=lambda: got.update(data=conn.accept_stream(timeout=3).receive(timeout=3)))
+        t.start()
+        stream.send(b"file")
+        t.join(timeout=6)
+        self.assertEqual(got["data"], b"file")
+        self.assertEqual(list(conn.urgent_messages), [b"SHUTDOWN"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import threading
+import time
+import unittest
+from protocol.compression import (BLOCK_DICT, BLOCK_RAW, BLOCK_STREAM, KIND_BITS, MIN_COMPRESS_SIZE,
+                                  CompressionError, Compressor, Decompressor, dict_block, encode_block)
+from protocol.framing import encode_message
+from protocol.segment import PreparedMessage, Segment
+from protocol.socket_wrapper import BetterUDPSocket, OPT_COMPRESSION, fast_open_cookies
+from protocol.varint import decode_varint, encode_varint
+
+CHAT = b"".join(encode_message(f"[3:45 PM] user{i}: nanti kita makan siang di kantin ya".encode())
+                for i in range(3))
+
+
+def block_kind(block: bytes) -> int:
+    return decode_varint(block)[0] & ((1 << KIND_BITS) - 1)
+
+
+class TestBlocks(unittest.TestCase):
+    def test_varint_round_trip(self):
+        for value in (0, 1, 127, 128, 300, 2**32 - 1, 2**63):
+            self.assertEqual(decode_varint(encode_varint(value)), (value, len(encode_varint(value))))
+        self.assertEqual(len(encode_varint(127)), 1)
+
+    def test_small_payload_bypasses_zlib(self):
+        stats = {}
+        block = Compressor(stats).compress(b"hi")
+        self.assertEqual(block, encode_block(BLOCK_RAW, b"hi"))
+        self.assertEqual(stats["compress_bypassed"], 1)
+
+    def test_chat_uses_preset_dictionary(self):
+        stats = {}
+        block = Compressor(stats).compress(CHAT)
+        self.assertEqual(block_kind(block), BLOCK_DICT)
+        self.assertLess(len(block), len(CHAT))
+        self.assertLess(stats["compress_ratio"], 1.0)
+        self.assertEqual(Decompressor({}).feed(block), CHAT)
+
+    def test_incompressible_data_stays_raw(self):
+        data = bytes(range(MIN_COMPRESS_SIZE, 2 * MIN_COMPRESS_SIZE))
+        self.assertEqual(block_kind(dict_block(data)), BLOCK_RAW)
+
+    def test_bulk_stream_round_trip_at_every_split(self):
+        compressor = Compressor({})
+        history = CHAT * 40
+        stream = compressor.compress(history, bulk=True) + compressor.compress(b"ok") + \
+            compressor.compress(history)
+        self.assertEqual(block_kind(stream), BLOCK_STREAM)
+        expected = history + b"ok" + history
+        for split in range(0, len(stream) + 1, 7):
+            decompressor = Decompressor({})
+            got = decompressor.feed(stream[:split]) + decompressor.feed(stream[split:])
+            self.assertEqual(got, expected)
+            self.assertEqual(decompressor.buffered, 0)
+
+    def test_raw_prefix_passes_through(self):
+        decompressor = Decompressor({}, raw_prefix=5)
+        self.assertEqual(decompressor.feed(b"hel"), b"hel")
+        self.assertEqual(decompressor.feed(b"lo" + encode_block(BLOCK_RAW, b"!")), b"lo!")
+
+    def test_corrupt_block_is_rejected(self):
+        with self.assertRaises(CompressionError):
+            Decompressor({}).feed(encode_block(BLOCK_DICT, b"\xff" * 10))
+        with self.assertRaises(CompressionError):
+            Decompressor({}).feed(encode_block(3, b"x"))
+
+    def test_broadcast_compresses_once(self):
+        message = PreparedMessage(CHAT)
+        first, second = Compressor({}), Compressor({})
+        prepared = first.prepare(message, 64)
+        self.assertIs(second.prepare(message, 64), prepared)
+        self.assertEqual(second.stats["compress_out"], len(prepared.data))
+        self.assertEqual(second.stats["compress_time"], 0.0)
+
+
+class TestNegotiation(unittest.TestCase):
+    def setUp(self):
+        fast_open_cookies.clear()
+        self.listener = BetterUDPSocket(debug=False)
+        self.listener.listen('127.0.0.1', 0)
+        self.addr = ('127.0.0.1', self.listener.udp_socket.getsockname()[1])
+        self.sockets = [self.listener]
+
+    def tearDown(self):
+        for s in self.sockets:
+            s.running = False
+            s.connected = False
+            s.udp_socket.close()
+        fast_open_cookies.clear()
+
+    def connect(self, client_compress: bool, data: bytes = b''):
+        accepted = {}
+        t = threading.Thread(target=lambda: accepted.update(conn=self.listener.accept(timeout=5)[0]))
+        t.start()
+        client = BetterUDPSocket(debug=False)
+        if client_compress:
+            client.enable_compression()
+        client.connect(*self.addr, data=data)
+        t.join(timeout=6)
+        self.sockets += [client, accepted["conn"]]
+        return client, accepted["conn"]
+
+    def test_option_needs_both_sides(self):
+        client, conn = self.connect(client_compress=True)
+        self.assertEqual((client.options, conn.options), (0, 0))
+        self.assertIsNone(client.compressor)
+
+        self.listener.enable_compression()
+        client, conn = self.connect(client_compress=False)
+        self.assertIsNone(conn.compressor)
+        client, conn = self.connect(client_compress=True)
+        self.assertEqual((client.options, conn.options), (OPT_COMPRESSION, OPT_COMPRESSION))
+
+    def test_options_survive_segment_round_trip(self):
+        syn = Segment(1, 2, 3, flags=0x02, options=OPT_COMPRESSION)
+        self.assertEqual(Segment.from_bytes(syn.to_bytes()).options, OPT_COMPRESSION)
+
+    def test_compressed_messages_with_fast_open_data(self):
+        self.listener.enable_compression()
+        self.listener.enable_fast_open()
+        self.connect(client_compress=True)
+        first = encode_message(b"AWAL: !awal alice")
+        client, conn = self.connect(client_compress=True, data=first)
+        self.assertTrue(client.fast_open_accepted)
+
+        received = []
+
+        def read():
+            deadline = time.time() + 5
+            while len(received) < 3 and time.time() < deadline:
+                message = conn.recv_message(timeout=0.2)
+                if message is not None:
+                    received.append(message)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        client.send_message(CHAT)
+        client.send_prepared([PreparedMessage(encode_message(CHAT * 40), bulk=True)])
+        reader.join(timeout=6)
+        self.assertEqual(received, [b"AWAL: !awal alice", CHAT, CHAT * 40])
+        self.assertLess(client.stats["compress_out"], client.stats["compress_in"])
+        self.assertEqual(conn.stats["decompress_out"], client.stats["compress_in"])
+
+
+if __name__ == "__main__":
+    unittest.main()
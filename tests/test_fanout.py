@@ -0,0 +1,164 @@
+import threading
+import time
+import unittest
+from app.fanout import Outbox, OutboxOverflow
+from protocol.framing import encode_message
+from protocol.segment import PreparedMessage
+from protocol.socket_wrapper import BetterUDPSocket
+
+
+class SlowConn:
+    """Koneksi tiruan: send() menunggu gate, seperti peer yang lambat ACK."""
+    def __init__(self):
+        self.blocking = True
+        self.pending_chunks = []
+        self.peer_addr = ("127.0.0.1", 1)
+        self.max_payload_size = 64
+        self.sent = []
+        self.gate = threading.Event()
+
+    def send_prepared(self, messages):
+        self.gate.wait(5)
+        self.sent.append(b"".join(m.data for m in messages))
+
+
+class TestOutbox(unittest.TestCase):
+    def test_put_does_not_wait_for_slow_sender(self):
+        conn = SlowConn()
+        outbox = Outbox(conn)
+        outbox.start()
+
+        start = time.time()
+        for i in range(50):
+            outbox.put(f"msg {i}\n".encode())
+        self.assertLess(time.time() - start, 0.5)
+
+        conn.gate.set()
+        self.assertTrue(outbox.flush(timeout=2))
+        self.assertEqual(b"".join(conn.sent), b"".join(f"msg {i}\n".encode() for i in range(50)))
+        # Pesan yang antri selama send pertama dikirim sebagai satu batch
+        self.assertLessEqual(len(conn.sent), 2)
+        outbox.close()
+
+    def test_prepared_message_is_shared(self):
+        conn = SlowConn()
+        conn.gate.set()
+        shared = PreparedMessage(b"broadcast\n")
+        outbox = Outbox(conn)
+        outbox.put(b"reply\n")
+        outbox.put(shared)
+        batch = outbox._take_batch()
+        self.assertEqual([m.data for m in batch], [b"reply\n", b"broadcast\n"])
+        self.assertIs(batch[1], shared)
+
+    def test_bounded_queue_drops_oldest(self):
+        conn = SlowConn()
+        outbox = Outbox(conn, maxlen=3)
+        for i in range(5):
+            outbox.put(bytes([i]))
+        self.assertEqual(list(outbox.queue), [b"\x02", b"\x03", b"\x04"])
+        self.assertEqual(outbox.dropped, 2)
+
+    def test_byte_limit_drops_oldest(self):
+        outbox = Outbox(SlowConn(), maxlen=100, max_bytes=10)
+        for msg in (b"aaaa", b"bbbb", b"cccc"):
+            outbox.put(msg)
+        self.assertEqual(list(outbox.queue), [b"bbbb", b"cccc"])
+        self.assertEqual(outbox.stats()["bytes"], 8)
+
+    def test_disconnect_policy_reports_overflow(self):
+        errors = []
+        outbox = Outbox(SlowConn(), maxlen=2, overflow="disconnect",
+                        on_error=lambda ob, e: errors.append(e))
+        self.assertTrue(outbox.put(b"1"))
+        self.assertTrue(outbox.put(b"2"))
+        self.assertFalse(outbox.put(b"3"))
+        # put() tidak memanggil on_error; alasan disimpan untuk pemanggil
+        self.assertEqual(errors, [])
+        self.assertIsInstance(outbox.error, OutboxOverflow)
+        self.assertTrue(outbox.closed)
+
+    def test_coalesce_policy_merges_queue(self):
+        outbox = Outbox(SlowConn(), maxlen=3, overflow="coalesce")
+        for i in range(4):
+            outbox.put(f"{i}\n".encode())
+        self.assertEqual(list(outbox.queue), [b"0\n1\n2\n", b"3\n"])
+        stats = outbox.stats()
+        self.assertEqual(stats["dropped"], 0)
+        self.assertEqual(stats["coalesced"], 2)
+        self.assertEqual(stats["max_depth"], 3)
+
+    def test_stalled_sender_is_disconnected(self):
+        conn = SlowConn()
+        outbox = Outbox(conn, stall_timeout=0.05)
+        outbox.start()
+        outbox.put(b"first")
+        time.sleep(0.2)
+        self.assertFalse(outbox.put(b"second"))
+        self.assertIsInstance(outbox.error, OutboxOverflow)
+        conn.gate.set()
+
+    def test_send_failure_keeps_queue_for_take_pending(self):
+        conn = SlowConn()
+        conn.gate.set()
+        errors = []
+        outbox = Outbox(conn, on_error=lambda ob, e: errors.append(e))
+        outbox.put(b"sent")
+        batch = outbox._take_batch()
+        outbox.put(b"queued")
+        # Peer mati saat batch dikirim: yang masih antri bisa disimpan ke sesi
+        outbox._fail(ConnectionError("peer dead"))
+        self.assertEqual([m.data for m in batch], [b"sent"])
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(outbox.take_pending(), b"queued")
+
+    def test_closed_outbox_rejects_messages(self):
+        outbox = Outbox(SlowConn())
+        outbox.close()
+        self.assertFalse(outbox.put(b"x"))
+
+
+
+class TestOutboxOverSocket(unittest.TestCase):
+    def test_batches_are_not_spaced_by_send_pause(self):
+        listener = BetterUDPSocket(debug=False)
+        listener.listen("127.0.0.1", 0)
+        accepted = {}
+        t = threading.Thread(target=lambda: accepted.update(conn=listener.accept(timeout=5)[0]))
+        t.start()
+        client = BetterUDPSocket(debug=False)
+        client.connect("127.0.0.1", listener.udp_socket.getsockname()[1])
+        t.join(timeout=6)
+        received = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                message = client.recv_message(timeout=0.1)
+                if message is not None:
+                    received.append(message)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        outbox = Outbox(accepted["conn"])
+        outbox.start()
+        try:
+            start = time.time()
+            # Tiga batch berturut-turut: send() blocking berhenti 1 detik per
+            # pengiriman, sender outbox tidak
+            for i in range(3):
+                outbox.put(encode_message(f"batch {i}".encode()))
+                self.assertTrue(outbox.flush(timeout=5))
+            self.assertLess(time.time() - start, 1.0)
+        finally:
+            done.set()
+            reader.join(timeout=2)
+            outbox.close()
+            for sock in (listener, client):
+                sock.running = False
+                sock.udp_socket.close()
+        self.assertEqual(received, [f"batch {i}".encode() for i in range(3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
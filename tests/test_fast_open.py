@@ -0,0 +1,126 @@
+import threading
+import time
+import unittest
+from protocol.segment import Segment
+from protocol.socket_wrapper import BetterUDPSocket, FAST_OPEN_COOKIE_SIZE, fast_open_cookies
+
+
+class TestFastOpen(unittest.TestCase):
+    def setUp(self):
+        fast_open_cookies.clear()
+        self.listener = BetterUDPSocket(debug=False)
+        self.listener.listen('127.0.0.1', 0)
+        self.listener.enable_fast_open()
+        self.addr = ('127.0.0.1', self.listener.udp_socket.getsockname()[1])
+        self.sockets = [self.listener]
+
+    def tearDown(self):
+        for s in self.sockets:
+            s.running = False
+            s.connected = False
+            s.udp_socket.close()
+        fast_open_cookies.clear()
+
+    def connect(self, data=b''):
+        """
+        connect() dengan accept() + pembacaan len(data) byte di thread lain
+        (server harus membaca agar send() sisa data di-ACK).
+        Return (client, conn server, data yang diterima server).
+        """
+        accepted = {}
+
+        def serve():
+            conn = self.listener.accept(timeout=5)[0]
+            received = b""
+            deadline = time.time() + 5
+            while len(received) < len(data) and time.time() < deadline:
+                received += conn.receive(timeout=0.1)
+            accepted.update(conn=conn, received=received)
+
+        t = threading.Thread(target=serve)
+        t.start()
+        client = BetterUDPSocket(debug=False)
+        client.connect(*self.addr, data=data)
+        t.join(timeout=6)
+        self.sockets += [client, accepted["conn"]]
+        return client, accepted["conn"], accepted["received"]
+
+    def test_first_connect_issues_cookie(self):
+        client, conn, _ = self.connect()
+        self.assertEqual(len(fast_open_cookies[self.addr]), FAST_OPEN_COOKIE_SIZE)
+        self.assertFalse(client.fast_open_accepted)
+        self.assertEqual(self.listener.stats["fast_open_accepted"], 0)
+
+    def test_reconnect_delivers_syn_data_before_handshake_completes(self):
+        self.connect()
+        line = b"AWAL: !awal alice\n"
+
+        # Client hanya mengirim SYN (cookie + data), tanpa menunggu SYN+ACK
+        client = BetterUDPSocket(debug=False)
+        client.udp_socket.bind(('127.0.0.1', 0))
+        self.sockets.append(client)
+        syn = Segment(src_port=client.udp_socket.getsockname()[1], dst_port=self.addr[1],
+                      seq_num=1000, flags=0x02, payload=fast_open_cookies[self.addr] + line)
+        client.udp_socket.sendto(syn.to_bytes(), self.addr)
+
+        conn, _ = self.listener.accept(timeout=2)
+        self.sockets.append(conn)
+        self.assertTrue(conn.connected)
+        self.assertEqual(conn.receive(timeout=0.1), line)
+        self.assertEqual(self.listener.stats["fast_open_accepted"], 1)
+
+        # SYN yang dikirim ulang tidak membuka koneksi kedua
+        client.udp_socket.sendto(syn.to_bytes(), self.addr)
+        with self.assertRaises(TimeoutError):
+            self.listener.accept(timeout=0.3)
+
+    def test_reconnect_with_connect_data(self):
+        self.connect()
+        data = b"AWAL: !awal alice\n[PRESENCE]: !presence\n"
+        start = time.time()
+        client, conn, received = self.connect(data=data)
+        elapsed = time.time() - start
+
+        self.assertTrue(client.fast_open_accepted)
+        # Data muat di SYN: connect() tidak perlu send() yang menunggu ACK
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(received, data)
+
+        # Koneksi tetap dua arah setelah fast open
+        replies = []
+
+        def read():
+            deadline = time.time() + 3
+            while not replies and time.time() < deadline:
+                chunk = conn.receive(timeout=0.1)
+                if chunk:
+                    replies.append(chunk)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        client.send(b"hello\n")
+        reader.join(timeout=4)
+        self.assertEqual(replies, [b"hello\n"])
+
+    def test_long_data_sends_remainder_after_handshake(self):
+        self.connect()
+        data = b"x" * 150 + b"\n"
+        client, conn, received = self.connect(data=data)
+        self.assertEqual(received, data)
+        self.assertTrue(client.fast_open_accepted)
+
+    def test_invalid_cookie_falls_back_to_handshake(self):
+        fast_open_cookies[self.addr] = b"\x00" * FAST_OPEN_COOKIE_SIZE
+        data = b"AWAL: !awal mallory\n"
+        client, conn, received = self.connect(data=data)
+
+        self.assertFalse(client.fast_open_accepted)
+        self.assertEqual(self.listener.stats["fast_open_rejected"], 1)
+        # Data tetap sampai lewat send() biasa, tepat satu kali
+        self.assertEqual(received, data)
+        self.assertEqual(conn.receive(timeout=0.2), b"")
+        self.assertNotEqual(fast_open_cookies[self.addr], b"\x00" * FAST_OPEN_COOKIE_SIZE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+import threading
+import time
+import unittest
+from protocol.fec import FLUSH_DELAY, MAX_GROUP, MIN_GROUP, FecDecoder, FecEncoder, group_size
+from protocol.framing import encode_message
+from protocol.segment import Segment
+from protocol.socket_wrapper import BetterUDPSocket, FEC_FLAG, OPT_FEC
+
+
+class DropDataSegment:
+    """Socket UDP yang membuang segment data (bukan parity) ke-`index` (mulai 0)."""
+    def __init__(self, sock, index: int):
+        self.sock = sock
+        self.index = index
+        self.seen = 0
+        self.dropped = False
+
+    def sendto(self, data: bytes, addr: tuple) -> int:
+        segment = Segment.from_bytes(data)
+        if segment.payload and not segment.flags & FEC_FLAG:
+            self.seen += 1
+            if self.seen == self.index + 1:
+                self.dropped = True
+                return len(data)
+        return self.sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class DropFirstAck:
+    """Socket UDP yang membuang ACK tanpa payload pertama."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.dropped = False
+
+    def sendto(self, data: bytes, addr: tuple) -> int:
+        segment = Segment.from_bytes(data)
+        if not self.dropped and segment.flags == 0x10 and not segment.payload:
+            self.dropped = True
+            return len(data)
+        return self.sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def group(encoder: FecEncoder, payloads: list, start: int = 1000) -> tuple:
+    """Masukkan payload berurutan mulai seq `start`; return (daftar (seq, payload), parity)"""
+    segments, parity, seq = [], None, start
+    for payload in payloads:
+        segments.append((seq, payload))
+        parity = encoder.add(seq, payload, 0.0) or parity
+        seq += len(payload)
+    return segments, parity
+
+
+class TestParity(unittest.TestCase):
+    def setUp(self):
+        self.encoder = FecEncoder({})
+        # Loss 5%: grup 4 segment
+        self.encoder.loss = 0.05
+        self.payloads = [bytes([i]) * 64 for i in range(1, 4)]
+        self.payloads.append(b"tail")
+
+    def test_recovers_one_missing_segment(self):
+        segments, parity = group(self.encoder, self.payloads)
+        self.assertEqual(parity[:3], (1000, segments[-1][0] + 4, len(segments)))
+        for lost in (0, len(segments) // 2, len(segments) - 1):
+            decoder = FecDecoder({})
+            for i, (seq, payload) in enumerate(segments):
+                if i != lost:
+                    decoder.add(seq, payload)
+            self.assertEqual(decoder.recover(*parity), [segments[lost]])
+            self.assertEqual(decoder.stats["fec_recovered"], 1)
+
+    def test_two_missing_segments_wait_for_retransmission(self):
+        segments, parity = group(self.encoder, self.payloads)
+        for lost in ((0, 1), (0, len(segments) - 1)):
+            decoder = FecDecoder({})
+            for i, (seq, payload) in enumerate(segments):
+                if i not in lost:
+                    decoder.add(seq, payload)
+            self.assertIsNone(decoder.recover(*parity))
+            self.assertEqual(decoder.stats["fec_unrecoverable"], 1)
+
+    def test_complete_group_needs_nothing(self):
+        segments, parity = group(self.encoder, self.payloads)
+        decoder = FecDecoder({})
+        for seq, payload in segments:
+            decoder.add(seq, payload)
+        self.assertEqual(decoder.recover(*parity), [])
+        self.assertEqual(len(decoder.received), 0)
+
+    def test_group_size_follows_loss(self):
+        self.assertEqual(group_size(0.0), MAX_GROUP)
+        self.assertEqual(group_size(0.05), 4)
+        self.assertEqual(group_size(0.5), MIN_GROUP)
+        for _ in range(5):
+            self.encoder.record_loss()
+        lossy = group_size(self.encoder.loss)
+        for i in range(500):
+            self.encoder.add(i * 64, b"x" * 64, 0.0)
+        self.assertLess(lossy, group_size(self.encoder.loss))
+        self.assertEqual(group_size(self.encoder.loss), MAX_GROUP)
+
+    def test_partial_group_flushed_only_while_unacked(self):
+        self.encoder.add(1000, b"halo", 0.0)
+        self.assertIsNone(self.encoder.flush(FLUSH_DELAY / 2, {1000: None}))
+        self.assertEqual(self.encoder.flush(FLUSH_DELAY, {1000: None})[:3], (1000, 1004, 1))
+        self.encoder.add(1004, b"lagi", 1.0)
+        self.assertIsNone(self.encoder.flush(2.0, {}))
+        self.assertEqual(self.encoder.seqs, [])
+        self.assertEqual(self.encoder.stats["fec_parity_sent"], 1)
+
+
+class TestFecConnection(unittest.TestCase):
+    def setUp(self):
+        self.listener = BetterUDPSocket(debug=False)
+        self.listener.listen('127.0.0.1', 0)
+        self.addr = ('127.0.0.1', self.listener.udp_socket.getsockname()[1])
+        self.sockets = [self.listener]
+
+    def tearDown(self):
+        for s in self.sockets:
+            s.running = False
+            s.connected = False
+            s.udp_socket.close()
+
+    def connect(self, client_fec: bool, udp_socket=None):
+        accepted = {}
+        t = threading.Thread(target=lambda: accepted.update(conn=self.listener.accept(timeout=5)[0]))
+        t.start()
+        client = BetterUDPSocket(udp_socket, debug=False)
+        if client_fec:
+            client.enable_fec()
+        client.connect(*self.addr)
+        t.join(timeout=6)
+        self.sockets += [client, accepted["conn"]]
+        return client, accepted["conn"]
+
+    def test_needs_both_sides(self):
+        client, conn = self.connect(client_fec=True)
+        self.assertIsNone(client.fec_encoder)
+        self.listener.enable_fec()
+        client, conn = self.connect(client_fec=False)
+        self.assertIsNone(conn.fec_decoder)
+
+    def test_lost_segment_recovered_without_retransmission(self):
+        self.listener.enable_fec()
+        client, conn = self.connect(True, DropDataSegment(BetterUDPSocket(debug=False).udp_socket, 1))
+        self.assertEqual((client.options, conn.options), (OPT_FEC, OPT_FEC))
+        # RTO lebih lama dari batas waktu tes: hanya parity yang bisa menutup gap
+        client.timeout = 30.0
+        message = b"alice: " + bytes(range(256)) * 2
+        received = {}
+        reader = threading.Thread(target=lambda: received.update(message=conn.recv_message(timeout=5)))
+        reader.start()
+        start = time.time()
+        client.send(encode_message(message))
+        reader.join(timeout=6)
+
+        self.assertTrue(client.udp_socket.dropped)
+        self.assertEqual(received["message"], message)
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(conn.stats["fec_recovered"], 1)
+        self.assertGreaterEqual(client.stats["fec_losses"], 1)
+        self.assertGreater(client.stats["fec_parity_sent"], 0)
+
+    def test_lost_ack_closed_by_group_ack(self):
+        self.listener.enable_fec()
+        client, conn = self.connect(True)
+        conn.udp_socket = DropFirstAck(conn.udp_socket)
+        client.timeout = 30.0
+        done = threading.Event()
+
+        def read():
+            # Server terus membaca agar parity (setelah pesan lengkap) dijawab
+            deadline = time.time() + 5
+            while not done.is_set() and time.time() < deadline:
+                conn.receive(timeout=0.1)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        start = time.time()
+        # send() menunggu semua segment di-ACK (lalu jeda 1 detik)
+        client.send(encode_message(b"bob: " + b"z" * 150))
+        done.set()
+        reader.join(timeout=6)
+
+        self.assertTrue(conn.udp_socket.dropped)
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(conn.stats["fec_recovered"], 0)
+        self.assertEqual(client.send_window.get_unacked_segments(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
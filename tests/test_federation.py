@@ -0,0 +1,126 @@
+import base64
+import unittest
+from app.federation import Federation, FEDERATION_MTU
+from protocol.framing import MessageDecoder, encode_message
+
+
+class FakeConn:
+    def __init__(self):
+        self.blocking = True
+        self.mtu = 128
+
+    def set_segment_size(self, mtu):
+        self.mtu = mtu
+
+
+class LoopbackOutbox:
+    """Outbox tiruan: put() langsung mengantarkan frame ke node tujuan."""
+    def __init__(self, target: Federation, via: tuple):
+        self.target = target
+        self.via = via
+        self.queue = []
+        self.lines = []
+
+    def put(self, line: bytes) -> bool:
+        self.lines.append(line)
+        for message in MessageDecoder().messages(line):
+            self.target.handle_link_line(self.via, message.decode().strip())
+        return True
+
+    def close(self):
+        pass
+
+
+def link(a: Federation, b: Federation):
+    """Hubungkan a <-> b; alamat link adalah nama node lawan."""
+    a.attach((b.node_id, 0), FakeConn(), LoopbackOutbox(b, (a.node_id, 0)), b.node_id)
+    b.attach((a.node_id, 0), FakeConn(), LoopbackOutbox(a, (b.node_id, 0)), a.node_id)
+
+
+class TestFederation(unittest.TestCase):
+    def setUp(self):
+        self.delivered = {}
+        self.nodes = {}
+        for name in ("A", "B", "C"):
+            self.delivered[name] = []
+            self.nodes[name] = Federation(
+                name, deliver=lambda message, room, out=self.delivered[name]: out.append(message))
+
+    def test_cycle_delivers_once(self):
+        a, b, c = self.nodes["A"], self.nodes["B"], self.nodes["C"]
+        link(a, b)
+        link(b, c)
+        link(c, a)
+
+        a.publish(b"hello\n")
+
+        self.assertEqual(self.delivered["A"], [])
+        self.assertEqual(self.delivered["B"], [b"hello\n"])
+        self.assertEqual(self.delivered["C"], [b"hello\n"])
+        self.assertGreater(a.duplicates + b.duplicates + c.duplicates, 0)
+
+    def test_relay_line_format_and_segment_size(self):
+        a, b = self.nodes["A"], self.nodes["B"]
+        link(a, b)
+        a.publish(b"multi\nline\n")
+
+        outbox = a.links[("B", 0)].outbox
+        msg_id = a.epoch << 32 | 1
+        self.assertEqual(outbox.lines[0],
+                         encode_message(f"!relay A {msg_id} ".encode() + base64.b64encode(b"multi\nline\n")))
+        self.assertEqual(a.links[("B", 0)].conn.mtu, FEDERATION_MTU)
+        self.assertEqual(self.delivered["B"], [b"multi\nline\n"])
+
+    def test_non_relay_and_malformed_lines(self):
+        a = self.nodes["A"]
+        self.assertFalse(a.handle_link_line(("B", 0), "[SERVER]: hello"))
+        self.assertTrue(a.handle_link_line(("B", 0), "!relay B x notbase64!"))
+        self.assertEqual(self.delivered["A"], [])
+
+    def test_room_is_carried_across_links(self):
+        rooms = []
+        b = Federation("B", deliver=lambda message, room: rooms.append((message, room)))
+        link(self.nodes["A"], b)
+        self.nodes["A"].publish(b"hi\n", room="dev")
+        self.nodes["A"].publish(b"all\n")
+        self.assertEqual(rooms, [(b"hi\n", "dev"), (b"all\n", None)])
+
+    def test_restarted_node_is_not_deduplicated(self):
+        a, b = self.nodes["A"], self.nodes["B"]
+        link(a, b)
+        a.publish(b"before\n")
+        # Node A di-restart dengan node_id yang sama; B masih mengingat pesan lama
+        restarted = Federation("A", deliver=lambda message, room: None)
+        del b.links[("A", 0)]
+        link(restarted, b)
+        restarted.publish(b"after\n")
+        self.assertNotEqual(restarted.epoch, a.epoch)
+        self.assertEqual(self.delivered["B"], [b"before\n", b"after\n"])
+        self.assertEqual(b.duplicates, 0)
+
+    def test_peer_needs_secret(self):
+        a = Federation("A", deliver=lambda m, room: None, secret="s3cret")
+        self.assertEqual(a.peer_line(), b"!peer A s3cret")
+        self.assertEqual(a.accept_peer(("10.0.0.3", 4000), "B s3cret"), "B")
+        self.assertIsNone(a.accept_peer(("10.0.0.3", 4000), "B wrong"))
+        self.assertIsNone(a.accept_peer(("10.0.0.3", 4000), "B"))
+
+    def test_local_client_cannot_become_peer(self):
+        # Client chat biasa di host yang sama dengan node lain tetap ditolak
+        local = ("127.0.0.1", 40555)
+        for secret in (None, "s3cret"):
+            a = Federation("A", deliver=lambda m, room: None, secret=secret)
+            self.assertIsNone(a.accept_peer(local, "EVIL"))
+            self.assertIsNone(a.accept_peer(local, "EVIL guess"))
+            self.assertFalse(a.is_link(local))
+        self.assertIsNone(Federation("A", deliver=lambda m, room: None).accept_peer(local, "B s3cret"))
+
+    def test_seen_cache_is_bounded(self):
+        a = Federation("A", deliver=lambda m, room: None, seen_size=2)
+        for i in range(5):
+            a.handle_link_line(("B", 0), f"!relay B {i} " + base64.b64encode(b"x").decode())
+        self.assertEqual(len(a.seen), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import threading
+import unittest
+from app.history import HistoryStore
+from protocol.framing import FramingError, HEADER_SIZE, MessageDecoder, encode_message
+from protocol.socket_wrapper import BetterUDPSocket
+
+
+class TestMessageDecoder(unittest.TestCase):
+    def test_round_trip_at_every_split_point(self):
+        messages = [b"alice: hi", b"", b"multi\nline\nmessage", b"x" * 300]
+        stream = b"".join(encode_message(m) for m in messages)
+        for split in range(len(stream) + 1):
+            decoder = MessageDecoder()
+            got = decoder.messages(stream[:split]) + decoder.messages(stream[split:])
+            self.assertEqual(got, messages)
+            self.assertEqual(decoder.buffered, 0)
+
+    def test_byte_by_byte_feed_compacts_buffer(self):
+        decoder = MessageDecoder()
+        got = []
+        for _ in range(100):
+            for byte in encode_message(b"ping"):
+                got += decoder.messages(bytes([byte]))
+        self.assertEqual(got, [b"ping"] * 100)
+        # Byte yang sudah dibaca tidak menumpuk di buffer
+        self.assertLessEqual(len(decoder.buffer), 2 * (HEADER_SIZE + 4))
+
+    def test_partial_frame_waits_for_rest(self):
+        decoder = MessageDecoder()
+        frame = encode_message(b"hello")
+        self.assertEqual(decoder.messages(frame[:-1]), [])
+        self.assertEqual(decoder.buffered, len(frame) - 1)
+        self.assertEqual(decoder.messages(frame[-1:]), [b"hello"])
+
+    def test_oversized_frame_is_rejected(self):
+        decoder = MessageDecoder(max_message_size=16)
+        decoder.feed(encode_message(b"x" * 17))
+        with self.assertRaises(FramingError):
+            decoder.next_message()
+
+    def test_history_catch_up_frames_each_message(self):
+        store = HistoryStore()
+        store.append("lobby", b"one")
+        store.append("lobby", b"two\nlines")
+        prepared = store.catch_up("lobby", 10, header=b"history:", frame=encode_message)
+        self.assertEqual(MessageDecoder().messages(prepared.data), [b"history:", b"one", b"two\nlines"])
+
+
+class TestSocketMessages(unittest.TestCase):
+    def test_send_and_recv_message(self):
+        listener = BetterUDPSocket(debug=False)
+        listener.listen('127.0.0.1', 0)
+        accepted = {}
+        t = threading.Thread(target=lambda: accepted.update(conn=listener.accept(timeout=5)[0]))
+        t.start()
+        client = BetterUDPSocket(debug=False)
+        client.connect('127.0.0.1', listener.udp_socket.getsockname()[1])
+        t.join(timeout=5)
+        server = accepted["conn"]
+
+        sent = [b"alice: hello", b"alice: a\nmessage spanning " + b"y" * 100]
+        received = []
+
+        def read():
+            while len(received) < len(sent):
+                message = server.recv_message(timeout=3)
+                if message is None:
+                    return
+                received.append(message)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for message in sent:
+            client.send_message(message)
+        reader.join(timeout=6)
+        self.assertEqual(received, sent)
+        self.assertIsNone(server.recv_message(timeout=0.1))
+
+        for s in (listener, client, server):
+            s.running = False
+            s.connected = False
+            s.udp_socket.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from app.history import CATCHUP_PAYLOAD, HistoryLog, HistoryStore
+
+
+class TestHistoryStore(unittest.TestCase):
+    def test_ring_is_bounded_per_room(self):
+        store = HistoryStore(capacity=3)
+        for i in range(5):
+            store.append("lobby", f"m{i}\n".encode())
+        store.append("dev", b"d0\n")
+
+        self.assertEqual(store.recent("lobby", 10), [b"m2\n", b"m3\n", b"m4\n"])
+        self.assertEqual(store.recent("lobby", 2), [b"m3\n", b"m4\n"])
+        self.assertEqual(store.recent("dev", 10), [b"d0\n"])
+        self.assertEqual(store.recent("unknown", 10), [])
+
+    def test_least_recently_used_room_is_dropped(self):
+        store = HistoryStore(capacity=3, max_rooms=2)
+        store.append("a", b"1\n")
+        store.append("b", b"2\n")
+        store.append("a", b"3\n")
+        store.append("c", b"4\n")
+        self.assertEqual(sorted(store.rings), ["a", "c"])
+
+    def test_catch_up_is_one_bulk_transfer(self):
+        store = HistoryStore(capacity=100)
+        for i in range(50):
+            store.append("lobby", f"12:00 PM user: message number {i}\n".encode())
+
+        prepared = store.catch_up("lobby", 50, header=b"history:\n")
+        self.assertTrue(prepared.bulk)
+        self.assertTrue(prepared.data.startswith(b"history:\n12:00 PM user: message number 0\n"))
+        self.assertEqual(prepared.data.count(b"\n"), 51)
+        # Jauh lebih sedikit segment daripada chunk 64 byte
+        self.assertEqual(len(prepared.chunks), -(-len(prepared.data) // CATCHUP_PAYLOAD))
+        self.assertIsNone(store.catch_up("empty", 10))
+
+
+class TestHistoryLog(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        os.unlink(self.path)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def test_history_survives_restart(self):
+        store = HistoryStore(capacity=2, log=HistoryLog(self.path, initial_size=64))
+        for i in range(4):
+            store.append("lobby", f"m{i}\n".encode())
+        store.append("dev", "é\n".encode())
+        store.close()
+
+        # File sudah diperbesar dari 64 byte, lalu dibaca ulang saat start
+        log = HistoryLog(self.path)
+        self.assertGreater(os.path.getsize(self.path), 64)
+        reopened = HistoryStore(capacity=2, log=log)
+        self.assertEqual(reopened.recent("lobby", 10), [b"m2\n", b"m3\n"])
+        self.assertEqual(reopened.recent("dev", 10), ["é\n".encode()])
+
+        # Append setelah restart melanjutkan dari akhir data, bukan menimpa
+        reopened.append("lobby", b"m4\n")
+        reopened.close()
+        log = HistoryLog(self.path)
+        replayed = list(log.replay())
+        log.close()
+        self.assertEqual(len(replayed), 6)
+        self.assertEqual(replayed[-1], ("lobby", b"m4\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
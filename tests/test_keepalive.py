@@ -0,0 +1,74 @@
+import threading
+import time
+import unittest
+from protocol.socket_wrapper import BetterUDPSocket
+
+
+class TestKeepalive(unittest.TestCase):
+    def setUp(self):
+        self.server = BetterUDPSocket(debug=False)
+        self.server.listen('127.0.0.1', 0)
+        port = self.server.udp_socket.getsockname()[1]
+
+        accepted = {}
+        t = threading.Thread(target=lambda: accepted.update(conn=self.server.accept(timeout=5)[0]))
+        t.start()
+        self.client = BetterUDPSocket(debug=False)
+        self.client.connect('127.0.0.1', port)
+        t.join(timeout=5)
+        self.conn = accepted["conn"]
+
+        # Kedua sisi membaca terus, seperti thread penerima client/server;
+        # jawaban probe diproses oleh pembaca ini
+        self.reading = {self.conn: True, self.client: True}
+        self.readers = [threading.Thread(target=self._read_loop, args=(s,), daemon=True)
+                        for s in (self.conn, self.client)]
+        for reader in self.readers:
+            reader.start()
+
+    def _read_loop(self, sock):
+        while self.reading[sock] and sock.connected:
+            try:
+                sock.receive(timeout=0.05)
+            except Exception:
+                return
+
+    def tearDown(self):
+        for sock in self.reading:
+            self.reading[sock] = False
+        for reader in self.readers:
+            reader.join(timeout=1)
+        for s in (self.client, self.conn, self.server):
+            s.running = False
+            s.udp_socket.close()
+
+    def test_idle_peer_answers_probes(self):
+        dead = []
+        self.client.enable_keepalive(idle=0.2, interval=0.1, probes=2, on_dead=dead.append)
+
+        time.sleep(1.0)
+        self.assertTrue(self.client.connected)
+        self.assertEqual(dead, [])
+        self.assertGreater(self.client.stats["probes_sent"], 0)
+        self.assertGreater(self.client.stats["probes_answered"], 0)
+        self.assertGreater(self.conn.stats["probes_received"], 0)
+
+    def test_silent_peer_is_marked_dead(self):
+        dead = []
+        self.reading[self.conn] = False
+        self.readers[0].join(timeout=1)
+        self.conn.udp_socket.close()
+
+        self.client.enable_keepalive(idle=0.2, interval=0.1, probes=2, on_dead=dead.append)
+        deadline = time.time() + 2
+        while not dead and time.time() < deadline:
+            time.sleep(0.05)
+
+        self.assertEqual(dead, [self.client])
+        self.assertTrue(self.client.dead)
+        self.assertFalse(self.client.connected)
+        self.assertEqual(self.client.stats["probes_sent"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
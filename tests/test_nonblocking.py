@@ -0,0 +1,68 @@
+import selectors
+import threading
+import time
+import unittest
+from protocol.socket_wrapper import BetterUDPSocket
+
+
+class TestNonBlockingMode(unittest.TestCase):
+    def setUp(self):
+        self.server = BetterUDPSocket(debug=False)
+        self.server.listen('127.0.0.1', 0)
+        self.server.setblocking(False)
+        self.port = self.server.udp_socket.getsockname()[1]
+        self.client = BetterUDPSocket(debug=False)
+        self.conn = None
+
+    def tearDown(self):
+        for s in (self.client, self.conn, self.server):
+            if s is not None:
+                s.udp_socket.close()
+
+    def _run_until(self, sel, condition, timeout=3.0):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            for key, _ in sel.select(0.05):
+                if key.data == "listener":
+                    accepted = self.server.accept_nowait()
+                    if accepted:
+                        self.conn, _ = accepted
+                        sel.register(self.conn, selectors.EVENT_READ, "conn")
+                else:
+                    self.conn.pump()
+            if self.conn is not None:
+                self.conn.service_timers()
+
+    def test_accept_nowait_and_queued_send(self):
+        sel = selectors.DefaultSelector()
+        sel.register(self.server, selectors.EVENT_READ, "listener")
+
+        # connect() blocking di thread ini, jadi SYN sudah antri di listener
+        # sebelum event loop memprosesnya; SYN+ACK dikirim ulang oleh timer.
+        t = threading.Thread(target=self.client.connect, args=('127.0.0.1', self.port))
+        t.start()
+        self._run_until(sel, lambda: self.conn is not None and self.conn.connected)
+        t.join(timeout=5)
+        self.assertTrue(self.conn.connected)
+        self.assertTrue(self.client.connected)
+
+        # send() non-blocking tidak menunggu ACK
+        data = b"Y" * 300
+        self.conn.send(data)
+        self.assertTrue(self.conn.pending_chunks or self.conn.send_window.buffer)
+
+        received = b""
+        deadline = time.time() + 3
+        while len(received) < len(data) and time.time() < deadline:
+            received += self.client.receive(timeout=0.1)
+            self._run_until(sel, lambda: True, timeout=0)
+            self.conn.pump()
+        self.assertEqual(received, data)
+
+        self._run_until(sel, lambda: not self.conn.send_window.buffer and not self.conn.pending_chunks)
+        self.assertFalse(self.conn.pending_chunks)
+        self.assertFalse(self.conn.send_window.buffer)
+
+
+if __name__ == "__main__":
+    unittest.main()
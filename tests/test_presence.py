@@ -0,0 +1,39 @@
+import unittest
+from app.presence import PresenceNotifier
+
+
+class TestPresenceNotifier(unittest.TestCase):
+    def setUp(self):
+        self.count = 0
+        self.published = []
+        self.notifier = PresenceNotifier(lambda: self.count, self.published.append, window=0.5)
+
+    def test_changes_are_coalesced_within_window(self):
+        for _ in range(10):
+            self.count += 1
+            self.notifier.mark_changed()
+        start = self.notifier.dirty_since
+
+        self.assertFalse(self.notifier.poll(start + 0.1))
+        self.assertTrue(self.notifier.poll(start + 0.5))
+        self.assertEqual(self.published, [10])
+        self.assertEqual(self.notifier.changes, 10)
+
+    def test_unchanged_count_is_not_published(self):
+        self.count = 3
+        self.notifier.mark_changed()
+        self.notifier.poll(self.notifier.dirty_since + 1)
+
+        # Join lalu leave dalam satu window: jumlah tetap, tidak ada push
+        self.notifier.mark_changed()
+        self.notifier.mark_changed()
+        self.assertFalse(self.notifier.poll(self.notifier.dirty_since + 1))
+        self.assertEqual(self.published, [3])
+
+    def test_idle_poll_does_nothing(self):
+        self.assertFalse(self.notifier.poll())
+        self.assertEqual(self.published, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
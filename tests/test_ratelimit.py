@@ -0,0 +1,67 @@
+import unittest
+from app.ratelimit import RateLimiter, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(rate=2, burst=3, now=0)
+        for _ in range(3):
+            self.assertEqual(bucket.wait_time(1, now=0), 0)
+            bucket.consume(1)
+        self.assertAlmostEqual(bucket.wait_time(1, now=0), 0.5)
+        self.assertEqual(bucket.wait_time(1, now=0.5), 0)
+        # Refill tidak pernah melebihi burst
+        self.assertEqual(bucket.wait_time(1, now=100), 0)
+        self.assertEqual(bucket.tokens, 3)
+
+    def test_amount_larger_than_burst_waits_for_full_bucket(self):
+        bucket = TokenBucket(rate=10, burst=20, now=0)
+        bucket.consume(15)
+        self.assertAlmostEqual(bucket.wait_time(50, now=0), 1.5)
+
+    def test_zero_rate_is_unlimited(self):
+        bucket = TokenBucket(rate=0, burst=100, now=0)
+        for _ in range(5):
+            self.assertEqual(bucket.wait_time(1000, now=0), 0.0)
+            bucket.consume(1000)
+        limiter = RateLimiter(msg_rate=1, msg_burst=2, byte_rate=0, byte_burst=100)
+        limiter.messages.last = limiter.bytes.last = 0
+        self.assertEqual(limiter.admit(500, now=0), ("ok", 0.0))
+        self.assertEqual(limiter.admit(500, now=0), ("ok", 0.0))
+        self.assertEqual(limiter.admit(1, now=0)[0], "delay")
+
+
+class TestRateLimiter(unittest.TestCase):
+    def make(self, penalty):
+        limiter = RateLimiter(msg_rate=1, msg_burst=2, byte_rate=100, byte_burst=100, penalty=penalty)
+        limiter.messages.last = limiter.bytes.last = 0
+        return limiter
+
+    def test_delay_reports_wait_for_slowest_bucket(self):
+        limiter = self.make("delay")
+        self.assertEqual(limiter.admit(10, now=0), ("ok", 0.0))
+        # Bucket byte yang habis menentukan lama delay
+        verdict, wait = limiter.admit(150, now=0)
+        self.assertEqual(verdict, "delay")
+        self.assertAlmostEqual(wait, 0.1)
+        self.assertEqual(limiter.admit(150, now=0.1), ("ok", 0.0))
+        verdict, wait = limiter.admit(1, now=0.1)
+        self.assertEqual(verdict, "delay")
+        self.assertAlmostEqual(wait, 0.9)
+        self.assertEqual((limiter.admitted, limiter.limited), (2, 2))
+
+    def test_drop_and_disconnect_do_not_consume_tokens(self):
+        for penalty in ("drop", "disconnect"):
+            limiter = self.make(penalty)
+            limiter.admit(1, now=0)
+            limiter.admit(1, now=0)
+            self.assertEqual(limiter.admit(1, now=0), (penalty, 0.0))
+            self.assertEqual(limiter.admit(1, now=1), ("ok", 0.0))
+
+    def test_unknown_penalty(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(1, 1, 1, 1, penalty="ban")
+
+
+if __name__ == "__main__":
+    unittest.main()
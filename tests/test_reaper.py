@@ -0,0 +1,50 @@
+import unittest
+from app.reaper import IdleReaper
+
+
+class TestIdleReaper(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.reaper = IdleReaper(timeout=10, on_expire=self.batches.append, batch_size=3)
+
+    def test_touch_keeps_entry_alive(self):
+        self.reaper.add("a", now=0)
+        self.reaper.add("b", now=0)
+        self.reaper.touch("a", now=8)
+
+        self.assertEqual(self.reaper.poll(now=11), ["b"])
+        self.assertEqual(self.reaper.poll(now=17), [])
+        self.assertEqual(self.reaper.poll(now=19), ["a"])
+        self.assertEqual(self.batches, [["b"], ["a"]])
+
+    def test_expired_entries_are_evicted_in_batches(self):
+        for i in range(5):
+            self.reaper.add(i, now=i * 0.1)
+
+        self.assertEqual(self.reaper.poll(now=20), [0, 1, 2])
+        self.assertEqual(self.reaper.poll(now=20), [3, 4])
+        self.assertEqual(len(self.reaper), 0)
+        self.assertEqual(self.reaper.evicted, 5)
+
+    def test_expire_and_remove(self):
+        self.reaper.add("alive", now=0)
+        self.reaper.add("dead", now=5)
+        self.reaper.add("gone", now=5)
+        self.reaper.expire("dead")
+        self.reaper.remove("gone")
+
+        self.assertEqual(self.reaper.poll(now=6), ["dead"])
+        # Key yang sudah dikeluarkan tidak hidup lagi lewat touch()
+        self.reaper.touch("dead", now=7)
+        self.assertEqual(len(self.reaper), 1)
+
+    def test_expire_only_mode(self):
+        reaper = IdleReaper(timeout=None, on_expire=lambda keys: None)
+        reaper.add("a", now=0)
+        reaper.add("b", now=0)
+        reaper.expire("b")
+        self.assertEqual(reaper.poll(now=10 ** 9), ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
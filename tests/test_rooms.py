@@ -0,0 +1,51 @@
+import unittest
+from app.rooms import RoomIndex, DEFAULT_ROOM
+
+
+class TestRoomIndex(unittest.TestCase):
+    def setUp(self):
+        self.rooms = RoomIndex()
+        for member in ("a", "b", "c"):
+            self.rooms.join(member, DEFAULT_ROOM)
+
+    def test_join_indexes_both_directions(self):
+        self.assertTrue(self.rooms.join("a", "dev"))
+        self.assertFalse(self.rooms.join("a", "dev"))
+        self.rooms.join("b", "dev")
+
+        self.assertEqual(sorted(self.rooms.members_of("dev")), ["a", "b"])
+        self.assertEqual(self.rooms.rooms_for("a"), ["dev", DEFAULT_ROOM])
+        self.assertEqual(self.rooms.active_room("a"), "dev")
+        self.assertEqual(self.rooms.active_room("c"), DEFAULT_ROOM)
+
+    def test_leave_falls_back_and_drops_empty_rooms(self):
+        self.rooms.join("a", "dev")
+        self.rooms.join("a", "ops")
+        self.assertTrue(self.rooms.leave("a", "ops"))
+        self.assertFalse(self.rooms.leave("a", "ops"))
+        self.assertEqual(self.rooms.active_room("a"), DEFAULT_ROOM)
+        self.assertNotIn("ops", dict(self.rooms.list_rooms()))
+        self.assertEqual(dict(self.rooms.list_rooms())["dev"], 1)
+
+    def test_leave_all_removes_member_everywhere(self):
+        self.rooms.join("a", "dev")
+        self.rooms.join("b", "dev")
+        self.assertEqual(self.rooms.leave_all("a"), ["dev", DEFAULT_ROOM])
+
+        self.assertEqual(self.rooms.members_of("dev"), ["b"])
+        self.assertEqual(sorted(self.rooms.members_of(DEFAULT_ROOM)), ["b", "c"])
+        self.assertEqual(self.rooms.rooms_for("a"), [])
+        # Lobby tetap ada walaupun kosong
+        for member in ("b", "c"):
+            self.rooms.leave_all(member)
+        self.assertEqual(self.rooms.list_rooms(), [(DEFAULT_ROOM, 0)])
+
+    def test_valid_name(self):
+        self.assertTrue(RoomIndex.valid_name("dev-ops_2"))
+        self.assertFalse(RoomIndex.valid_name(""))
+        self.assertFalse(RoomIndex.valid_name("a b"))
+        self.assertFalse(RoomIndex.valid_name("x" * 33))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -59,5 +59,25 @@ class TestSegmentAndChecksum(unittest.TestCase):
         from src.protocol.checksum import verify_checksum
         self.assertTrue(verify_checksum(hdr_wo_chk + payload, chk))
 
+    def test_cached_payload_sum_matches_full_checksum(self):
+        from src.protocol.segment import PreparedMessage
+        from src.protocol.checksum import compute_checksum
+        data = b"shared broadcast payload with an odd length!"
+        prepared = PreparedMessage(data, max_payload_size=16)
+        self.assertEqual(b"".join(c for c, _ in prepared.chunks), data)
+
+        # Payload yang sama, header berbeda per penerima
+        for port, seq in ((1111, 7), (2222, 2**32 - 1)):
+            for chunk, chunk_sum in prepared.chunks:
+                seg = Segment(port, 5678, seq, ack_num=99, flags=0x10,
+                              payload=chunk, payload_sum=chunk_sum)
+                raw = seg.to_bytes()
+                self.assertEqual(Segment.from_bytes(raw).payload, chunk)
+                plain = Segment(port, 5678, seq, ack_num=99, flags=0x10, payload=chunk)
+                self.assertEqual(raw, plain.to_bytes())
+
+        # Checksum dari header+payload tanpa cache tetap sama
+        self.assertEqual(compute_checksum(b"abc"), compute_checksum(b"ab" + b"c"))
+
 if __name__ == "__main__":
     unittest.main()
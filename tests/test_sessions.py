@@ -0,0 +1,141 @@
+import itertools
+import unittest
+from app.fanout import Outbox
+from app.sessions import ResumeState, Session, SessionStore, backoff_delays, session_marker
+from protocol.framing import MessageDecoder, encode_message
+
+
+class FakeConn:
+    def __init__(self):
+        self.blocking = False
+        self.pending_chunks = []
+        self.peer_addr = ("127.0.0.1", 1)
+        self.max_payload_size = 64
+        self.sent = []
+
+    def send_prepared(self, messages):
+        self.sent.append(b"".join(m.data for m in messages))
+
+
+def lines(start, stop):
+    return b"".join(encode_message(f"line {i}".encode()) for i in range(start, stop))
+
+
+def messages(data):
+    return [m.decode() for m in MessageDecoder().messages(data)]
+
+
+class TestSession(unittest.TestCase):
+    def test_records_only_after_marker(self):
+        session = Session("tok", "alice")
+        marker = session.start_stream(0)
+        self.assertFalse(session.streaming)
+        data = encode_message(b"history before join") + marker + lines(0, 2)
+        # Frame terakhir terpotong di antara dua batch
+        session.record(data[:-3])
+        session.record(data[-3:])
+        self.assertTrue(session.streaming)
+        self.assertEqual(session.next_seq, 2)
+        self.assertEqual(list(session.lines), [lines(0, 1), lines(1, 2)])
+
+    def test_rewind_replays_from_client_position(self):
+        session = Session("tok", "alice")
+        session.record(session.start_stream(0) + lines(0, 10))
+        start, replay, missed = session.rewind(7)
+        self.assertEqual((start, b"".join(replay), missed), (7, lines(7, 10), 0))
+        # Pesan yang dikirim ulang dicatat lagi di posisi yang sama
+        session.record(session.start_stream(start) + b"".join(replay) + lines(10, 12))
+        self.assertEqual(session.next_seq, 12)
+        self.assertEqual(b"".join(session.lines), lines(0, 12))
+
+    def test_buffer_is_bounded(self):
+        session = Session("tok", "alice", max_bytes=len(lines(15, 20)))
+        session.record(session.start_stream(0) + lines(0, 20))
+        self.assertEqual(session.first_seq, 15)
+        self.assertLessEqual(session.retained_bytes, session.max_bytes)
+        start, replay, missed = session.rewind(3)
+        self.assertEqual((start, b"".join(replay), missed), (15, lines(15, 20), 12))
+
+
+class TestSessionStore(unittest.TestCase):
+    def test_detach_resume_and_expire(self):
+        store = SessionStore(grace=10)
+        old, new = ("127.0.0.1", 1000), ("127.0.0.1", 2000)
+        session = store.create(old, "alice")
+        store.detach(old, ["lobby", "dev"], "dev", now=100)
+        self.assertTrue(store.is_detached(old))
+        self.assertEqual(store.expire(now=105), [])
+
+        resumed, old_addr = store.resume(session.token, new)
+        self.assertIs(resumed, session)
+        self.assertEqual(old_addr, old)
+        self.assertEqual((session.rooms, session.active_room), (["lobby", "dev"], "dev"))
+        self.assertIs(store.get(new), session)
+        self.assertFalse(store.is_detached(old))
+
+        store.detach(new, ["lobby"], "lobby", now=200)
+        self.assertEqual(store.expire(now=210), [(new, session)])
+        self.assertEqual(store.resume(session.token, old), (None, None))
+        self.assertEqual(store.stats()["expired"], 1)
+
+    def test_resume_moves_session_from_stale_connection(self):
+        store = SessionStore()
+        session = store.create(("127.0.0.1", 1000), "alice")
+        resumed, old_addr = store.resume(session.token, ("127.0.0.1", 2000))
+        self.assertIs(resumed, session)
+        self.assertEqual(old_addr, ("127.0.0.1", 1000))
+        self.assertIsNone(store.get(("127.0.0.1", 1000)))
+
+    def test_end_forgets_token(self):
+        store = SessionStore()
+        session = store.create(("127.0.0.1", 1000), "alice")
+        store.end(("127.0.0.1", 1000))
+        self.assertEqual(store.resume(session.token, ("127.0.0.1", 2000)), (None, None))
+
+
+class TestResume(unittest.TestCase):
+    def test_client_position_survives_outbox_drops(self):
+        """Posisi dicatat saat batch diambil sender, setelah overflow membuang pesan."""
+        session = Session("tok", "alice")
+        outbox = Outbox(FakeConn(), maxlen=4)
+        outbox.on_sent = session.record
+        outbox.put(session.start_stream(0))
+        outbox.pump()
+        for i in range(10):
+            outbox.put(lines(i, i + 1))
+        outbox.pump()
+
+        client = ResumeState()
+        for message in messages(b"".join(outbox.conn.sent)):
+            client.on_line(message)
+        self.assertEqual(client.token, "tok")
+        self.assertEqual(client.received, session.next_seq)
+        self.assertEqual(client.received, 4)
+
+    def test_reconnect_gets_exactly_the_missing_lines(self):
+        session = Session("tok", "alice")
+        session.record(session.start_stream(0) + lines(0, 10))
+        client = ResumeState()
+        # Client hanya menerima sampai pesan 5 sebelum koneksi putus
+        for message in messages(encode_message(session_marker("tok", 0)) + lines(0, 6)):
+            client.on_line(message)
+        self.assertEqual(client.join_line("alice"), "RESUME: !resume tok 6 alice")
+
+        start, replay, _ = session.rewind(client.received)
+        delivered = []
+        for message in messages(session.start_stream(start) + b"".join(replay)):
+            if not client.on_line(message):
+                delivered.append(message)
+        self.assertEqual(delivered, [f"line {i}" for i in range(6, 10)])
+        self.assertEqual(client.received, 10)
+
+    def test_new_client_joins(self):
+        self.assertEqual(ResumeState().join_line("bob"), "AWAL: !awal bob")
+
+    def test_backoff_grows_to_cap(self):
+        delays = list(itertools.islice(backoff_delays(base=1, cap=8, jitter=0), 6))
+        self.assertEqual(delays, [1, 2, 4, 8, 8, 8])
+
+
+if __name__ == "__main__":
+    unittest.main()
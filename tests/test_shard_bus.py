@@ -0,0 +1,96 @@
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+from app.shard_bus import ShardBus
+from protocol.socket_wrapper import BetterUDPSocket
+
+
+class TestShardBus(unittest.TestCase):
+    def setUp(self):
+        self.bus_dir = tempfile.mkdtemp(prefix="test-shards-")
+        self.received = {0: [], 1: [], 2: []}
+        self.buses = [
+            ShardBus(self.bus_dir, i, 3,
+                     on_message=lambda kind, sender, payload, i=i: self.received[i].append((kind, sender, payload)))
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        for bus in self.buses:
+            bus.close()
+        shutil.rmtree(self.bus_dir, ignore_errors=True)
+
+    def test_publish_reaches_every_other_shard(self):
+        self.buses[0].publish("broadcast", b"hello\n")
+        self.buses[0].publish("count", b"3")
+
+        for i in (1, 2):
+            self.assertEqual(self.buses[i].poll(), 2)
+            self.assertEqual(self.received[i], [("broadcast", 0, b"hello\n"), ("count", 0, b"3")])
+        self.assertEqual(self.buses[0].poll(), 0)
+
+    def test_threaded_receiver(self):
+        self.buses[1].start()
+        self.buses[2].publish("shutdown")
+        deadline = time.time() + 2
+        while not self.received[1] and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.received[1], [("shutdown", 2, b"")])
+
+    def test_payload_larger_than_datagram_is_fragmented(self):
+        # Antrian datagram penerima pendek: penerima harus menguras sambil pengirim menunggu
+        for bus in self.buses[1:]:
+            bus.start()
+        payloads = [bytes(range(256)) * 400, b"m" * ShardBus.MAX_PAYLOAD]
+        for payload in payloads:
+            self.assertTrue(self.buses[0].publish("broadcast", payload))
+        self.buses[0].publish("count", b"3")
+        deadline = time.time() + 5
+        while any(len(self.received[i]) < 3 for i in (1, 2)) and time.time() < deadline:
+            time.sleep(0.01)
+        for i in (1, 2):
+            self.assertEqual(self.received[i], [("broadcast", 0, payloads[0]), ("broadcast", 0, payloads[1]),
+                                                ("count", 0, b"3")])
+        self.assertEqual(self.buses[0].send_errors, 0)
+
+    def test_oversized_payload_is_refused(self):
+        self.assertFalse(self.buses[0].publish("broadcast", b"x" * (ShardBus.MAX_PAYLOAD + 1)))
+        self.assertEqual(self.buses[0].oversized, 1)
+        self.assertEqual(self.buses[1].poll(), 0)
+
+    def test_truncated_datagram_is_dropped(self):
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sender.sendto(b"broadcast 0\n" + b"x" * ShardBus.MAX_DATAGRAM, self.buses[1].path)
+        finally:
+            sender.close()
+        self.buses[1].poll()
+        self.assertEqual(self.received[1], [])
+        self.assertEqual(self.buses[1].truncated, 1)
+
+    def test_dead_peer_is_skipped(self):
+        self.buses[2].close()
+        self.buses[0].publish("broadcast", b"x")
+        self.assertEqual(self.buses[0].send_errors, 1)
+        self.assertEqual(self.buses[1].poll(), 1)
+
+
+@unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "SO_REUSEPORT not available")
+class TestReusePortListen(unittest.TestCase):
+    def test_two_listeners_share_port(self):
+        a = BetterUDPSocket(debug=False)
+        b = BetterUDPSocket(debug=False)
+        try:
+            a.listen("127.0.0.1", 0, reuse_port=True)
+            port = a.udp_socket.getsockname()[1]
+            b.listen("127.0.0.1", port, reuse_port=True)
+            self.assertEqual(b.udp_socket.getsockname()[1], port)
+        finally:
+            a.udp_socket.close()
+            b.udp_socket.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
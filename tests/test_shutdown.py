@@ -0,0 +1,79 @@
+import threading
+import time
+import unittest
+from protocol.socket_wrapper import BetterUDPSocket, close_all
+from protocol.state import CLOSED, TIME_WAIT
+
+
+class TestCloseAll(unittest.TestCase):
+    NUM_CLIENTS = 12
+    SILENT = 3
+
+    def setUp(self):
+        self.server = BetterUDPSocket(debug=False)
+        self.server.listen('127.0.0.1', 0)
+        port = self.server.udp_socket.getsockname()[1]
+
+        self.conns = []
+        self.clients = []
+        for _ in range(self.NUM_CLIENTS):
+            accepted = {}
+            t = threading.Thread(target=lambda: accepted.update(conn=self.server.accept(timeout=5)[0]))
+            t.start()
+            client = BetterUDPSocket(debug=False)
+            client.connect('127.0.0.1', port)
+            t.join(timeout=5)
+            self.conns.append(accepted["conn"])
+            self.clients.append(client)
+
+        # Client yang "silent" tidak pernah membaca, jadi tidak menjawab FIN
+        self.readers = [threading.Thread(target=self._read_loop, args=(c,), daemon=True)
+                        for c in self.clients[self.SILENT:]]
+        for reader in self.readers:
+            reader.start()
+
+    def _read_loop(self, sock):
+        while sock.connected:
+            try:
+                sock.receive(timeout=0.05)
+            except Exception:
+                return
+
+    def tearDown(self):
+        for s in self.clients + [self.server]:
+            s.running = False
+            s.connected = False
+            s.udp_socket.close()
+        for reader in self.readers:
+            reader.join(timeout=1)
+
+    def test_close_is_bounded_by_one_deadline(self):
+        start = time.time()
+        graceful, forced = close_all(self.conns, timeout=1.0)
+        elapsed = time.time() - start
+
+        self.assertEqual((graceful, forced), (self.NUM_CLIENTS - self.SILENT, self.SILENT))
+        # Satu deadline untuk semua koneksi, bukan timeout per koneksi
+        self.assertLess(elapsed, 1.5)
+        self.assertTrue(all(not c.connected for c in self.conns))
+        self.assertTrue(all(c.peer_closed for c in self.clients[self.SILENT:]))
+        # Koneksi yang dijawab menunggu sebentar di TIME_WAIT, sisanya langsung
+        # CLOSED; file descriptor TIME_WAIT ditutup di background
+        self.assertTrue(all(c.state == TIME_WAIT for c in self.conns[self.SILENT:]))
+        self.assertTrue(all(c.fileno() == -1 for c in self.conns[:self.SILENT]))
+        time.sleep(BetterUDPSocket.TIME_WAIT_DURATION + 0.3)
+        self.assertTrue(all(c.state == CLOSED for c in self.conns))
+        self.assertTrue(all(c.fileno() == -1 for c in self.conns))
+
+    def test_returns_early_when_all_peers_answer(self):
+        start = time.time()
+        graceful, forced = close_all(self.conns[self.SILENT:], timeout=5.0)
+        self.assertEqual((graceful, forced), (self.NUM_CLIENTS - self.SILENT, 0))
+        self.assertLess(time.time() - start, 1.0)
+        for conn in self.conns[:self.SILENT]:
+            conn.connected = False
+            conn.udp_socket.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
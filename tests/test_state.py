@@ -0,0 +1,181 @@
+import threading
+import time
+import unittest
+from protocol.segment import Segment
+from protocol.socket_wrapper import BetterUDPSocket, closing_sockets
+from protocol.state import (CLOSED, CLOSE_WAIT, ESTABLISHED, FIN_WAIT, LAST_ACK, LISTEN,
+                            SYN_RCVD, SYN_SENT, TIME_WAIT, next_state)
+
+
+class DropShortDataSegment:
+    """Socket UDP yang membuang segment data pertama dengan payload sepanjang `length`."""
+    def __init__(self, sock, length: int):
+        self.sock = sock
+        self.length = length
+        self.dropped = False
+
+    def sendto(self, data: bytes, addr: tuple) -> int:
+        if not self.dropped and len(Segment.from_bytes(data).payload) == self.length:
+            self.dropped = True
+            return len(data)
+        return self.sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class TestTransitionTable(unittest.TestCase):
+    def run_events(self, state, events):
+        for event in events:
+            state = next_state(state, event)
+        return state
+
+    def test_open(self):
+        self.assertEqual(next_state(CLOSED, "listen"), LISTEN)
+        self.assertEqual(self.run_events(CLOSED, ["send_syn", "rcv_synack"]), ESTABLISHED)
+        self.assertEqual(self.run_events(CLOSED, ["rcv_syn", "rcv_ack"]), ESTABLISHED)
+        # Fast open: cookie valid di SYN, tanpa menunggu final ACK
+        self.assertEqual(self.run_events(CLOSED, ["rcv_syn", "rcv_cookie"]), ESTABLISHED)
+        self.assertEqual(next_state(SYN_SENT, "timeout"), CLOSED)
+        self.assertEqual(next_state(SYN_RCVD, "timeout"), CLOSED)
+
+    def test_active_close(self):
+        self.assertEqual(next_state(ESTABLISHED, "close"), FIN_WAIT)
+        self.assertEqual(next_state(FIN_WAIT, "rcv_finack"), TIME_WAIT)
+        self.assertEqual(next_state(TIME_WAIT, "timeout"), CLOSED)
+
+    def test_passive_close(self):
+        self.assertEqual(next_state(ESTABLISHED, "rcv_fin"), CLOSE_WAIT)
+        self.assertEqual(next_state(CLOSE_WAIT, "close"), LAST_ACK)
+        self.assertEqual(next_state(LAST_ACK, "rcv_ack"), CLOSED)
+        self.assertEqual(next_state(LAST_ACK, "timeout"), CLOSED)
+
+    def test_simultaneous_close(self):
+        self.assertEqual(self.run_events(ESTABLISHED, ["close", "rcv_fin"]), TIME_WAIT)
+
+    def test_invalid_and_abort(self):
+        self.assertIsNone(next_state(ESTABLISHED, "rcv_synack"))
+        self.assertIsNone(next_state(TIME_WAIT, "close"))
+        for state in (SYN_SENT, ESTABLISHED, FIN_WAIT, LAST_ACK, TIME_WAIT):
+            self.assertEqual(next_state(state, "abort"), CLOSED)
+
+
+class TestCloseHandshake(unittest.TestCase):
+    def setUp(self):
+        self.listener = BetterUDPSocket(debug=False)
+        self.listener.listen('127.0.0.1', 0)
+        self.assertEqual(self.listener.state, LISTEN)
+        port = self.listener.udp_socket.getsockname()[1]
+
+        accepted = {}
+        t = threading.Thread(target=lambda: accepted.update(conn=self.listener.accept(timeout=5)[0]))
+        t.start()
+        self.client = BetterUDPSocket(debug=False)
+        self.client.connect('127.0.0.1', port)
+        t.join(timeout=5)
+        self.server = accepted["conn"]
+        self.assertEqual(self.client.state, ESTABLISHED)
+        self.assertEqual(self.server.state, ESTABLISHED)
+
+    def tearDown(self):
+        self.listener.close()
+
+    def read_until_closed(self, sock, states):
+        """receive() sampai socket keluar dari state penutupan, catat state yang dilewati"""
+        while sock.state != CLOSED:
+            states.append(sock.state)
+            try:
+                sock.receive(timeout=0.05)
+            except Exception:
+                return
+
+    def wait_for(self, predicate, timeout=3.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline and not predicate():
+            time.sleep(0.02)
+        return predicate()
+
+    def test_active_and_passive_close(self):
+        server_states = []
+        reader = threading.Thread(target=self.read_until_closed, args=(self.server, server_states))
+        reader.start()
+
+        start = time.time()
+        self.client.close()
+        # close() kembali setelah FIN+ACK, tidak menunggu TIME_WAIT
+        self.assertLess(time.time() - start, 1.0)
+        self.assertTrue(self.client.fin_acked)
+        self.assertEqual(self.client.state, TIME_WAIT)
+
+        reader.join(timeout=3)
+        self.assertTrue(self.server.peer_closed)
+        self.assertIn(LAST_ACK, server_states)
+        self.assertEqual(self.server.state, CLOSED)
+        self.server.close()
+        self.assertEqual(self.server.fileno(), -1)
+
+        # TIME_WAIT habis di background, lalu socket dibebaskan
+        self.assertTrue(self.wait_for(lambda: self.client.fileno() == -1))
+        self.assertEqual(self.client.state, CLOSED)
+
+    def test_last_ack_without_final_ack_is_recycled(self):
+        self.server.CLOSE_TIMEOUT = 0.3
+        self.server.CLOSE_RETRY = 0.1
+        server_states = []
+        reader = threading.Thread(target=self.read_until_closed, args=(self.server, server_states))
+        reader.start()
+
+        # FIN dari client, tetapi client tidak pernah membaca FIN+ACK
+        self.client.send_fin()
+        self.assertTrue(self.wait_for(lambda: self.server.state == LAST_ACK))
+        self.server.close()
+        self.assertIn(self.server, closing_sockets.conns)
+
+        self.assertTrue(self.wait_for(lambda: self.server.fileno() == -1))
+        self.assertEqual(self.server.state, CLOSED)
+        reader.join(timeout=1)
+        self.client.close()
+
+    def test_fin_waits_for_missing_data(self):
+        # Segment data terakhir hilang, lalu FIN menyusul sebelum retransmission
+        self.client.udp_socket = DropShortDataSegment(self.client.udp_socket, 22)
+        self.client.setblocking(False)
+        data = b"a" * 64 + b"b" * 64 + b"c" * 22
+        received = []
+
+        def read():
+            deadline = time.time() + 5
+            while self.server.state != CLOSED and time.time() < deadline:
+                try:
+                    received.append(self.server.receive(timeout=0.05))
+                except RuntimeError:
+                    return
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        self.client.send(data)
+        self.client.send_fin()
+        time.sleep(0.2)
+        self.assertTrue(self.client.udp_socket.dropped)
+        # FIN ditahan: koneksi belum ditutup selama data di depannya hilang
+        self.assertEqual(self.server.state, ESTABLISHED)
+        self.assertFalse(self.server.peer_closed)
+
+        # Client di FIN_WAIT tetap mengirim ulang data yang belum di-ACK
+        deadline = time.time() + 3
+        while self.client.state == FIN_WAIT and time.time() < deadline:
+            self.client.pump()
+            self.client.service_timers()
+            time.sleep(0.01)
+        reader.join(timeout=6)
+
+        self.assertTrue(self.client.fin_acked)
+        self.assertTrue(self.server.peer_closed)
+        self.assertEqual(b"".join(received), data)
+        self.server.close()
+        self.client.close()
+        self.assertTrue(self.wait_for(lambda: self.client.fileno() == -1))
+
+
+if __name__ == "__main__":
+    unittest.main()
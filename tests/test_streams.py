@@ -0,0 +1,135 @@
+import threading
+import time
+import unittest
+from protocol.segment import Segment
+from protocol.socket_wrapper import BetterUDPSocket
+
+
+class DropFirstStreamSegment:
+    """Socket UDP yang membuang segment data pertama dari `stream_id`."""
+    def __init__(self, sock, stream_id: int):
+        self.sock = sock
+        self.stream_id = stream_id
+        self.dropped = False
+
+    def sendto(self, data: bytes, addr: tuple) -> int:
+        segment = Segment.from_bytes(data)
+        if not self.dropped and segment.stream_id == self.stream_id and segment.payload:
+            self.dropped = True
+            return len(data)
+        return self.sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class TestStreamSegment(unittest.TestCase):
+    def test_stream_extension_round_trip(self):
+        seg = Segment(1000, 2000, 7, ack_num=9, flags=0x10, payload=b"data", stream_id=3)
+        raw = seg.to_bytes()
+        self.assertEqual(len(raw), Segment.HEADER_SIZE + Segment.STREAM_SIZE + 4)
+        parsed = Segment.from_bytes(raw)
+        self.assertEqual((parsed.stream_id, parsed.seq_num, parsed.payload), (3, 7, b"data"))
+
+        # Stream 0 tetap memakai header 20 byte
+        plain = Segment(1000, 2000, 7, payload=b"data")
+        self.assertEqual(len(plain.to_bytes()), Segment.HEADER_SIZE + 4)
+        self.assertEqual(Segment.from_bytes(plain.to_bytes()).stream_id, 0)
+
+    def test_stream_id_is_covered_by_checksum(self):
+        raw = bytearray(Segment(1000, 2000, 7, payload=b"data", stream_id=3).to_bytes())
+        raw[Segment.HEADER_SIZE + 1] = 4
+        with self.assertRaises(ValueError):
+            Segment.from_bytes(bytes(raw))
+
+
+class TestStreams(unittest.TestCase):
+    def setUp(self):
+        self.listener = BetterUDPSocket(debug=False)
+        self.listener.listen('127.0.0.1', 0)
+        self.addr = ('127.0.0.1', self.listener.udp_socket.getsockname()[1])
+
+    def tearDown(self):
+        for s in (self.listener, self.client, self.server):
+            s.running = False
+            s.connected = False
+            s.udp_socket.close()
+
+    def connect(self, udp_socket=None):
+        accepted = {}
+        t = threading.Thread(target=lambda: accepted.update(conn=self.listener.accept(timeout=5)[0]))
+        t.start()
+        self.client = BetterUDPSocket(udp_socket, debug=False)
+        self.client.connect(*self.addr)
+        t.join(timeout=5)
+        self.server = accepted["conn"]
+
+    def read(self, receiver, expected: int, out: dict, key: str):
+        data = b""
+        deadline = time.time() + 6
+        while len(data) < expected and time.time() < deadline:
+            data += receiver.receive(timeout=0.1)
+        out[key] = (data, time.time())
+
+    def test_open_and_accept_stream(self):
+        self.connect()
+        stream = self.client.open_stream()
+        self.assertEqual(stream.stream_id, 1)
+        self.assertEqual(self.client.open_stream().stream_id, 3)
+
+        out = {}
+        payload = b"file chunk " * 20
+
+        def serve():
+            incoming = self.server.accept_stream(timeout=3)
+            out["id"] = incoming.stream_id
+            self.read(incoming, len(payload), out, "stream")
+
+        t = threading.Thread(target=serve)
+        t.start()
+        stream.send(payload)
+        t.join(timeout=8)
+        self.assertEqual(out["id"], 1)
+        self.assertEqual(out["stream"][0], payload)
+        # Stream 0 tidak menerima data stream lain
+        self.assertEqual(self.server._read_in_order(), b"")
+
+        # Sisi accept membuka stream genap; dua arah
+        reply = self.server.open_stream()
+        self.assertEqual(reply.stream_id, 2)
+        t = threading.Thread(target=self.read, args=(self.client.open_stream(2), 5, out, "reply"))
+        t.start()
+        reply.send(b"ok!\n\n")
+        t.join(timeout=8)
+        self.assertEqual(out["reply"][0], b"ok!\n\n")
+
+    def test_loss_on_one_stream_does_not_block_stream_zero(self):
+        self.connect(DropFirstStreamSegment(BetterUDPSocket(debug=False).udp_socket, stream_id=1))
+        self.client.timeout = 1.0
+        bulk = self.client.open_stream()
+        bulk_data = b"B" * 300
+        control = b"SHUTDOWN\n"
+
+        out = {}
+        readers = [
+            threading.Thread(target=self.read, args=(self.server, len(control), out, "control")),
+            threading.Thread(target=self.read, args=(self.server.open_stream(1), len(bulk_data), out, "bulk")),
+        ]
+        for t in readers:
+            t.start()
+        sender = threading.Thread(target=bulk.send, args=(bulk_data,))
+        sender.start()
+        time.sleep(0.1)
+        self.client.send(control)
+        for t in readers + [sender]:
+            t.join(timeout=8)
+
+        self.assertTrue(self.client.udp_socket.dropped)
+        self.assertEqual(out["control"][0], control)
+        self.assertEqual(out["bulk"][0], bulk_data)
+        # Data stream 0 tiba sebelum retransmission stream 1 menutup gap
+        self.assertLess(out["control"][1], out["bulk"][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+from protocol.segment import Segment
+from protocol.socket_wrapper import BetterUDPSocket, URG_FLAG
+
+
+class DropFirstDataSegment:
+    """Socket UDP yang membuang segment data biasa (non-URG) pertama."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.dropped = False
+
+    def sendto(self, data: bytes, addr: tuple) -> int:
+        segment = Segment.from_bytes(data)
+        if not self.dropped and segment.payload and not segment.flags & URG_FLAG:
+            self.dropped = True
+            return len(data)
+        return self.sock.sendto(data, addr)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class TestUrgent(unittest.TestCase):
+    def setUp(self):
+        self.listener = BetterUDPSocket(debug=False)
+        self.listener.listen('127.0.0.1', 0)
+        self.addr = ('127.0.0.1', self.listener.udp_socket.getsockname()[1])
+        self.urgent = []
+        self.stream = b""
+
+    def tearDown(self):
+        for s in (self.listener, self.client, self.server):
+            s.running = False
+            s.connected = False
+            s.udp_socket.close()
+
+    def connect(self, udp_socket=None):
+        accepted = {}
+        t = threading.Thread(target=lambda: accepted.update(conn=self.listener.accept(timeout=5)[0]))
+        t.start()
+        self.client = BetterUDPSocket(udp_socket, debug=False)
+        self.client.connect(*self.addr)
+        t.join(timeout=5)
+        self.server = accepted["conn"]
+        # Catat berapa byte data biasa yang sudah diterima saat pesan urgent tiba
+        self.server.on_urgent = lambda data: self.urgent.append((data, len(self.stream)))
+
+    def read(self, expected: int, deadline: float):
+        while len(self.stream) < expected and time.time() < deadline:
+            self.stream += self.server.receive(timeout=0.1)
+
+    def test_urgent_message_goes_to_callback(self):
+        self.connect()
+        message = b"COUNT: 3\n" * 20
+        reader = threading.Thread(target=self.read, args=(1, time.time() + 1.5))
+        reader.start()
+        self.client.send(message, urgent=True)
+        reader.join(timeout=3)
+
+        # Pesan multi-segment diserahkan utuh, sekali, dan tidak masuk stream data
+        self.assertEqual(self.urgent, [(message, 0)])
+        self.assertEqual(self.stream, b"")
+        self.assertEqual(self.client.stats["urgent_sent"], 1)
+        self.assertEqual(self.server.stats["urgent_received"], 1)
+
+    def test_urgent_overtakes_queued_data(self):
+        self.connect(DropFirstDataSegment(BetterUDPSocket(debug=False).udp_socket))
+        self.client.setblocking(False)
+        data = b"x" * 2000
+        reader = threading.Thread(target=self.read, args=(len(data), time.time() + 10))
+        reader.start()
+
+        self.client.send(data)
+        self.assertTrue(self.client.pending_chunks)
+        self.client.send(b"SHUTDOWN\n", urgent=True)
+        while reader.is_alive():
+            self.client.pump()
+            self.client.service_timers()
+            time.sleep(0.01)
+
+        self.assertEqual(self.stream, data)
+        # Urgent tiba selagi data biasa masih antri/tertahan segment yang hilang
+        self.assertEqual(len(self.urgent), 1)
+        message, received_before = self.urgent[0]
+        self.assertEqual(message, b"SHUTDOWN\n")
+        self.assertLess(received_before, len(data))
+
+    def test_rejects_oversized_urgent_message(self):
+        self.connect()
+        with self.assertRaises(ValueError):
+            self.client.send(b"x" * 70000, urgent=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import threading
+import time
+import unittest
+from app.workers import KeyedExecutor
+
+
+class TestKeyedExecutor(unittest.TestCase):
+    def setUp(self):
+        self.pool = KeyedExecutor(max_workers=4, max_pending=8)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_order_per_key(self):
+        results = []
+        lock = threading.Lock()
+
+        def work(key, i):
+            time.sleep(0.001)
+            with lock:
+                results.append((key, i))
+
+        for i in range(20):
+            for key in ("a", "b", "c"):
+                self.pool.submit(key, work, key, i)
+        for key in ("a", "b", "c"):
+            self.pool.flush(key, timeout=5)
+
+        for key in ("a", "b", "c"):
+            self.assertEqual([i for k, i in results if k == key], list(range(20)))
+
+    def test_slow_key_does_not_block_other_keys(self):
+        gate = threading.Event()
+        self.pool.submit("slow", gate.wait, 5)
+
+        done = self.pool.submit("fast", lambda: "ok")
+        self.assertEqual(done.result(timeout=1), "ok")
+        self.assertEqual(self.pool.pending("slow"), 1)
+
+        gate.set()
+        self.pool.flush("slow", timeout=5)
+        self.assertEqual(self.pool.pending("slow"), 0)
+
+    def test_exception_is_reported_on_future(self):
+        future = self.pool.submit("a", lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            future.result(timeout=1)
+        # Key tetap bisa dipakai setelah task gagal
+        self.assertEqual(self.pool.submit("a", lambda: 2).result(timeout=1), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()